@@ -1,10 +1,26 @@
 import psycopg2
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
-import re
-import json
-import subprocess
 import os
+import sys
+
+# instrumentation, metrics and profiling are shared with the PyQt application.
+PYQT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pyqt")
+if PYQT_DIR not in sys.path:
+    sys.path.append(PYQT_DIR)
+
+import repository  # noqa: E402
+import validation  # noqa: E402
+import instrumentation  # noqa: E402
+import metrics  # noqa: E402
+import profiling  # noqa: E402
+from pg_backup import incremental_backup, jsonl_backup, restore_backup, snapshot_backup  # noqa: E402
+
+# Database settings from school.ini / the environment (see repository.load_config).
+CONFIG = repository.load_config()
+
+# Connection settings for the PostgreSQL database, used by the backup functions.
+DB_PARAMS = CONFIG["postgres"]
 
 def connect_to_db():
     """
@@ -18,19 +34,36 @@ def connect_to_db():
         psycopg2.Error: If there is an issue connecting to the PostgreSQL database.
     """
     try:
-        conn = psycopg2.connect(
-            dbname="Lab_2_435L_tkinter",  # The name of the database to connect to.
-            user="postgres",              # The username to authenticate with PostgreSQL.
-            password="doudi123$",         # The password for the PostgreSQL user.
-            host="localhost",             # The host where the PostgreSQL server is located.
-            port="5432"                   # The port where PostgreSQL is listening.
-        )
+        conn = psycopg2.connect(**DB_PARAMS)
         return conn
     except psycopg2.Error as e:
         # Show an error message if the connection fails.
         messagebox.showerror("Database Connection Error", str(e))
         return None
 
+def connect_repository(config=None, backend=None):
+    """
+    Opens the repository all forms and tables read and write through.
+
+    The backend comes from the configuration: PostgreSQL unless school.ini or
+    SCHOOL_BACKEND selects SQLite.
+
+    Args:
+        config (dict, optional): Settings like `CONFIG`, which is used if omitted.
+        backend (str, optional): Overrides the configured backend.
+
+    Returns:
+        repository.Repository: The open repository.
+
+    Raises:
+        SystemExit: If the database cannot be opened (an error message is shown first).
+    """
+    try:
+        return repository.open_repository(backend, config=config or CONFIG, default_backend="postgres")
+    except Exception as e:
+        messagebox.showerror("Database Connection Error", str(e))
+        raise SystemExit(1)
+
 def create_search_frame():
     """
     Creates a search frame for the user interface where users can input search queries.
@@ -72,68 +105,29 @@ def create_search_frame():
     # It passes the search entry and the selected criteria as arguments to search_records.
     tk.Button(search_frame, text="Search", command=lambda: search_records(search_entry.get(), search_criteria.get())).pack(side=tk.LEFT, padx=5)
 
-
-# Initialize the main application window
-root = tk.Tk()
-root.title("School Management System")
-root.geometry("1000x600")
-root.resizable(True, True)
-
-# Create a canvas widget for displaying scrollable content within the window
-canvas = tk.Canvas(root)
-
-# Create a vertical scrollbar that will allow the canvas to be scrolled
-scrollbar = tk.Scrollbar(root, orient="vertical", command=canvas.yview)
-
-# Create a scrollable frame that will hold all the elements and widgets
-scrollable_frame = tk.Frame(canvas)
-
-# Bind the configuration of the frame to update the canvas scroll region
-scrollable_frame.bind(
-    "<Configure>",
-    lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-)
-
-# Create a window in the canvas where the scrollable frame will be embedded
-canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-
-# Configure the canvas to work with the vertical scrollbar
-canvas.configure(yscrollcommand=scrollbar.set)
-
-# Pack the canvas to fill the available space within the window
-canvas.pack(side="left", fill="both", expand=True)
-
-# Pack the scrollbar on the right side of the window, filling the vertical space
-scrollbar.pack(side="right", fill="y")
-
 # Initialize global variables to store the available courses and dropdown widgets
 available_courses = []  # This will store the available courses fetched from the database
 course_dropdown = None  # Dropdown widget for selecting courses in the student form
 instructor_course_dropdown = None  # Dropdown widget for selecting courses in the instructor form
 students = []  # List to store student data
 instructors = []  # List to store instructor data
+course_keys = {}  # Course name -> repository key, for the course dropdowns
+record_keys = {}  # (treeview, item id) -> repository key of the record shown in that row
 
 def validate_age(age):
     """
-    Validates if the provided age is a positive integer.
+    Validates the age entered in a form, using the shared rules in validation.py.
 
     Args:
         age (str): The age input as a string.
 
     Returns:
-        int: The validated age as an integer if valid, or None if invalid.
-
-    Raises:
-        ValueError: If the age is negative or not a valid integer.
+        int: The validated age as an integer if valid, or None if invalid (an
+        error message is shown).
     """
     try:
-        # Attempt to convert the age to an integer
-        age = int(age)
-        if age < 0:
-            # Raise an error if the age is negative
-            raise ValueError("Age cannot be negative.")
-        return age
-    except ValueError as ve:
+        return validation.validate_age(age)
+    except validation.ValidationError as ve:
         # Show an error message box if the age is invalid
         messagebox.showerror("Invalid Age", f"Invalid age: {ve}")
         return None
@@ -141,24 +135,21 @@ def validate_age(age):
 
 def validate_email(email):
     """
-    Validates if the provided email follows a valid email format using a regular expression.
+    Validates the email entered in a form, using the shared rules in validation.py.
 
     Args:
         email (str): The email address input as a string.
 
     Returns:
-        str: The validated email if it matches the expected format, or None if invalid.
+        str: The validated email if it matches the expected format, or None if
+        invalid (an error message is shown).
     """
-    # Regular expression pattern for validating an email address
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    
-    # Check if the email matches the pattern
-    if not re.match(pattern, email):
+    try:
+        return validation.validate_email(email)
+    except validation.ValidationError as ve:
         # Show an error message if the email is invalid
-        messagebox.showerror("Invalid Email", f"Invalid email format: {email}")
+        messagebox.showerror("Invalid Email", str(ve))
         return None
-    
-    return email
 
 def student_form():
     """
@@ -298,6 +289,7 @@ def course_form():
     # Add Course Button, connected to the `add_course` function
     tk.Button(course_frame, text="Add Course", command=lambda: add_course(course_id.get(), course_name.get())).grid(row=3, columnspan=2, pady=10)
 
+@instrumentation.action
 def add_student(name, age, email, student_id, course_name):
     """
     Adds a new student to the database.
@@ -327,38 +319,18 @@ def add_student(name, age, email, student_id, course_name):
     email = validate_email(email)
 
     if age is not None and email is not None:
-        conn = connect_to_db()  # Establish connection to the database
-        if conn:
-            try:
-                cur = conn.cursor()
-                
-                # Insert the student into the 'students' table
-                cur.execute(
-                    "INSERT INTO students (student_id, name, age, email) VALUES (%s, %s, %s, %s);",
-                    (student_id, name, age, email)
-                )
-
-                # If a course is selected, register the student in the course
-                if course_name:
-                    cur.execute("SELECT course_id FROM courses WHERE course_name = %s;", (course_name,))
-                    course_id = cur.fetchone()[0]
-                    
-                    cur.execute(
-                        "INSERT INTO registrations (student_id, course_id) VALUES (%s, %s);",
-                        (student_id, course_id)
-                    )
-
-                conn.commit()  # Commit the changes to the database
-                cur.close()  # Close the cursor
-                messagebox.showinfo("Success", f"Student Added: {name}, {age}, {email}")
-                
-                populate_treeviews()  # Refresh the UI treeviews to reflect the new student
-            except psycopg2.Error as e:
-                messagebox.showerror("Database Error", str(e))
-            finally:
-                conn.close()  # Ensure the connection is closed
+        try:
+            # Insert the student and, if a course is selected, register them
+            # for it in the same transaction
+            repo.add_student(student_id, name, age, email, course_key=course_keys.get(course_name))
+            messagebox.showinfo("Success", f"Student Added: {name}, {age}, {email}")
 
+            populate_treeviews()  # Refresh the UI treeviews to reflect the new student
+        except repo.Error as e:
+            messagebox.showerror("Database Error", str(e))
 
+
+@instrumentation.action
 def add_instructor(name, age, email, instructor_id, course_name):
     """
     Adds a new instructor to the database.
@@ -388,37 +360,17 @@ def add_instructor(name, age, email, instructor_id, course_name):
     email = validate_email(email)
 
     if age is not None and email is not None:
-        conn = connect_to_db()  # Establish connection to the database
-        if conn:
-            try:
-                cur = conn.cursor()
-
-                # Insert the instructor into the 'instructors' table
-                cur.execute(
-                    "INSERT INTO instructors (instructor_id, name, age, email) VALUES (%s, %s, %s, %s);",
-                    (instructor_id, name, age, email)
-                )
-
-                # If a course is assigned, register the instructor to that course
-                if course_name:
-                    cur.execute("SELECT course_id FROM courses WHERE course_name = %s;", (course_name,))
-                    course_id = cur.fetchone()[0]
-
-                    cur.execute(
-                        "INSERT INTO instructor_courses (instructor_id, course_id) VALUES (%s, %s);",
-                        (instructor_id, course_id)
-                    )
-
-                conn.commit()  # Commit the changes to the database
-                cur.close()  # Close the cursor
-                messagebox.showinfo("Success", f"Instructor Added: {name}, {age}, {email}, {instructor_id}")
-                
-                populate_treeviews()  # Refresh the UI treeviews to reflect the new instructor
-            except psycopg2.Error as e:
-                messagebox.showerror("Database Error", str(e))
-            finally:
-                conn.close()  # Ensure the connection is closed
+        try:
+            # Insert the instructor and, if a course is selected, assign them
+            # to it in the same transaction
+            repo.add_instructor(instructor_id, name, age, email, course_key=course_keys.get(course_name))
+            messagebox.showinfo("Success", f"Instructor Added: {name}, {age}, {email}, {instructor_id}")
 
+            populate_treeviews()  # Refresh the UI treeviews to reflect the new instructor
+        except repo.Error as e:
+            messagebox.showerror("Database Error", str(e))
+
+@instrumentation.action
 def add_course(course_id, course_name):
     """
     Adds a new course to the database.
@@ -439,32 +391,21 @@ def add_course(course_id, course_name):
         messagebox.showerror("Error", "Course ID and Course Name are required.")
         return
     
-    # Establish a connection to the database
-    conn = connect_to_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-
-            # Insert the course into the 'courses' table
-            cur.execute(
-                "INSERT INTO courses (course_id, course_name) VALUES (%s, %s);",
-                (course_id, course_name)
-            )
-            conn.commit()  # Commit the changes to the database
-            cur.close()  # Close the cursor
+    try:
+        # Insert the course into the 'courses' table
+        repo.add_course(course_id, course_name)
 
-            # Show success message
-            messagebox.showinfo("Success", f"Course Added: {course_id}, {course_name}")
+        # Show success message
+        messagebox.showinfo("Success", f"Course Added: {course_id}, {course_name}")
 
-            # Update dropdowns and refresh the UI treeviews
-            update_course_dropdowns()  
-            populate_treeviews()
-        except psycopg2.Error as e:
-            # Show error message if any database errors occur
-            messagebox.showerror("Database Error", str(e))
-        finally:
-            conn.close()  # Ensure the database connection is closed
+        # Update dropdowns and refresh the UI treeviews
+        update_course_dropdowns()
+        populate_treeviews()
+    except repo.Error as e:
+        # Show error message if any database errors occur
+        messagebox.showerror("Database Error", str(e))
 
+@instrumentation.action
 def populate_treeviews():
     """
     Populates the treeview widgets with data from the database.
@@ -474,55 +415,22 @@ def populate_treeviews():
     registrations and instructor_courses tables. The data is displayed in their 
     respective treeviews for students, instructors, and courses.
 
+    Rows are streamed from the repository in batches (server-side cursors on
+    PostgreSQL) and the UI is repainted after each batch, so the first rows show
+    up immediately and client memory stays flat regardless of table size.
+
     Returns:
         None
     """
-    # Establish a connection to the database
-    conn = connect_to_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-
-            # Clear all existing data from the treeviews (students, instructors, courses)
-            for tree in [student_tree, instructor_tree, course_tree]:
-                for item in tree.get_children():
-                    tree.delete(item)
-
-            # Fetch and populate student data
-            cur.execute("""
-                SELECT s.name, s.age, s.email, s.student_id, c.course_name 
-                FROM students s 
-                LEFT JOIN registrations r ON s.student_id = r.student_id 
-                LEFT JOIN courses c ON r.course_id = c.course_id;
-            """)
-            students = cur.fetchall()
-            for student in students:
-                student_tree.insert('', 'end', values=student)
-
-            # Fetch and populate instructor data
-            cur.execute("""
-                SELECT i.name, i.age, i.email, i.instructor_id, c.course_name 
-                FROM instructors i 
-                LEFT JOIN instructor_courses ic ON i.instructor_id = ic.instructor_id
-                LEFT JOIN courses c ON ic.course_id = c.course_id;
-            """)
-            instructors = cur.fetchall()
-            for instructor in instructors:
-                instructor_tree.insert('', 'end', values=instructor)
-
-            # Fetch and populate course data
-            cur.execute("SELECT course_id, course_name FROM courses;")
-            courses = cur.fetchall()
-            for course in courses:
-                course_tree.insert('', 'end', values=course)
-
-            cur.close()  # Close the cursor after use
-        except psycopg2.Error as e:
-            # Handle and display any database errors
-            messagebox.showerror("Database Error", str(e))
-        finally:
-            conn.close()  # Ensure the database connection is closed
-
+    try:
+        update_treeview(student_tree, repo.stream_students(), person_values)
+        update_treeview(instructor_tree, repo.stream_instructors(), person_values)
+        update_treeview(course_tree, repo.stream_courses(), course_values)
+    except repo.Error as e:
+        # Handle and display any database errors
+        messagebox.showerror("Database Error", str(e))
+
+@instrumentation.action
 def edit_record(treeview, data_list, columns):
     """
     Allows editing of a selected record in a treeview.
@@ -545,9 +453,10 @@ def edit_record(treeview, data_list, columns):
         messagebox.showwarning("Edit Record", "No record selected.")
         return
 
-    # Get the selected record's values
+    # Get the selected record's values and its repository key
     item = treeview.item(selected_item)['values']
-    
+    key = record_keys[treeview, selected_item[0]]
+
     # Create a new window for editing
     edit_window = tk.Toplevel(root)
     edit_window.title("Edit Record")
@@ -564,41 +473,27 @@ def edit_record(treeview, data_list, columns):
     # Function to save changes back to the database
     def save_changes():
         new_values = [entry.get() for entry in entries]
-        conn = connect_to_db()
-        if conn:
-            try:
-                cur = conn.cursor()
-                # Update the relevant table based on which treeview is being edited
-                if treeview == student_tree:
-                    cur.execute(
-                        "UPDATE students SET name = %s, age = %s, email = %s WHERE student_id = %s;",
-                        (new_values[0], new_values[1], new_values[2], item[3])
-                    )
-                elif treeview == instructor_tree:
-                    cur.execute(
-                        "UPDATE instructors SET name = %s, age = %s, email = %s WHERE instructor_id = %s::VARCHAR;",
-                        (new_values[0], new_values[1], new_values[2], str(item[3]))  
-                    )
-                elif treeview == course_tree:
-                    cur.execute(
-                        "UPDATE courses SET course_id = %s, course_name = %s WHERE course_id = %s;",
-                        (new_values[0], new_values[1], item[0])
-                    )
-                
-                # Commit changes and refresh the treeviews
-                conn.commit()
-                cur.close()
-                populate_treeviews()  
-                edit_window.destroy()
-            except psycopg2.Error as e:
-                # Show an error message in case of a database error
-                messagebox.showerror("Database Error", str(e))
-            finally:
-                conn.close()
+        try:
+            # Update the relevant table based on which treeview is being edited
+            if treeview == student_tree:
+                repo.update_student(key, new_values[0], new_values[1], new_values[2])
+            elif treeview == instructor_tree:
+                repo.update_instructor(key, new_values[0], new_values[1], new_values[2])
+            elif treeview == course_tree:
+                # A changed course ID is carried into the registrations and assignments
+                repo.update_course(key, new_values[1], course_id=new_values[0])
+
+            # Refresh the treeviews
+            populate_treeviews()
+            edit_window.destroy()
+        except repo.Error as e:
+            # Show an error message in case of a database error
+            messagebox.showerror("Database Error", str(e))
 
     # Add a button to save the changes
     tk.Button(edit_window, text="Save Changes", command=save_changes).grid(row=len(columns), columnspan=2)
 
+@instrumentation.action
 def delete_record(treeview, data_list):
     """
     Deletes a selected record from the database based on the selected treeview.
@@ -622,34 +517,24 @@ def delete_record(treeview, data_list):
 
     # Confirm deletion from the user
     if messagebox.askyesno("Delete Record", "Are you sure you want to delete the selected record?"):
-        conn = connect_to_db()
-        if conn:
-            try:
-                cur = conn.cursor()
-                item = treeview.item(selected_item)['values']
-
-                # Check which treeview is being used and delete the appropriate record
-                if treeview == student_tree:
-                    cur.execute("DELETE FROM students WHERE student_id = %s::VARCHAR;", (str(item[3]),))
-                    cur.execute("DELETE FROM registrations WHERE student_id = %s::VARCHAR;", (str(item[3]),))
-                elif treeview == instructor_tree:
-                    cur.execute("DELETE FROM instructor_courses WHERE instructor_id = %s::VARCHAR;", (str(item[3]),))
-                    cur.execute("DELETE FROM instructors WHERE instructor_id = %s::VARCHAR;", (str(item[3]),))
-                elif treeview == course_tree:
-                    cur.execute("DELETE FROM instructor_courses WHERE course_id = %s::VARCHAR;", (str(item[0]),))
-                    cur.execute("DELETE FROM registrations WHERE course_id = %s::VARCHAR;", (str(item[0]),))
-                    cur.execute("DELETE FROM courses WHERE course_id = %s::VARCHAR;", (str(item[0]),))
-
-                # Commit the deletion and refresh the treeview
-                conn.commit()
-                cur.close()
-                populate_treeviews()  # Refresh the treeviews to reflect changes
-            except psycopg2.Error as e:
-                # Handle database errors
-                messagebox.showerror("Database Error", str(e))
-            finally:
-                conn.close()
+        try:
+            key = record_keys[treeview, selected_item[0]]
+
+            # Check which treeview is being used and delete the appropriate record.
+            # Registrations and instructor assignments are removed along with it.
+            if treeview == student_tree:
+                repo.delete_student(key)
+            elif treeview == instructor_tree:
+                repo.delete_instructor(key)
+            elif treeview == course_tree:
+                repo.delete_course(key)
+
+            populate_treeviews()  # Refresh the treeviews to reflect changes
+        except repo.Error as e:
+            # Handle database errors
+            messagebox.showerror("Database Error", str(e))
 
+@instrumentation.action
 def update_course_dropdowns():
     """
     Updates the dropdown menus for both students and instructors with the available courses.
@@ -664,35 +549,32 @@ def update_course_dropdowns():
     Returns:
         None
     """
-    # Connect to the database
-    conn = connect_to_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-            # Fetch all course names from the 'courses' table
-            cur.execute("SELECT course_name FROM courses;")
-            courses = [course[0] for course in cur.fetchall()]  # Extract course names
-
-            # Update the course dropdown for students if available
-            if course_dropdown:
-                course_dropdown['values'] = courses
-
-            # Update the course dropdown for instructors if available
-            if instructor_course_dropdown:
-                instructor_course_dropdown['values'] = courses
-
-            # Close the cursor after successful update
-            cur.close()
-        except psycopg2.Error as e:
-            # Handle database connection errors
-            messagebox.showerror("Database Error", str(e))
-        finally:
-            conn.close()
-
+    try:
+        # Fetch all courses and remember the key of each course name
+        course_keys.clear()
+        for key, _, course_name, _ in repo.courses():
+            course_keys[course_name] = key
+        courses = list(course_keys)  # Extract course names
+
+        # Update the course dropdown for students if available
+        if course_dropdown:
+            course_dropdown['values'] = courses
+
+        # Update the course dropdown for instructors if available
+        if instructor_course_dropdown:
+            instructor_course_dropdown['values'] = courses
+    except repo.Error as e:
+        # Handle database connection errors
+        messagebox.showerror("Database Error", str(e))
+
+@instrumentation.action
 def search_records(search_term, criteria):
     """
     Searches for records in the database based on the provided search term and criteria.
 
+    Matching rows are streamed from the repository straight into the treeviews
+    rather than being fetched into lists first.
+
     Args:
         search_term (str): The term to search for.
         criteria (str): The criteria to search by. It can be "Name", "ID", or "Course".
@@ -700,166 +582,95 @@ def search_records(search_term, criteria):
     Returns:
         None
     """
-    conn = connect_to_db()
-    if conn:
-        try:
-            cur = conn.cursor()
-
-            # Search by student or instructor name
-            if criteria == "Name":
-                # Query for students based on name
-                cur.execute("""
-                    SELECT s.name, s.age, s.email, s.student_id, c.course_name 
-                    FROM students s 
-                    LEFT JOIN registrations r ON s.student_id = r.student_id 
-                    LEFT JOIN courses c ON r.course_id = c.course_id 
-                    WHERE s.name ILIKE %s;
-                """, ('%' + search_term + '%',))
-                filtered_students = cur.fetchall()
-                
-                # Query for instructors based on name
-                cur.execute("""
-                    SELECT i.name, i.age, i.email, i.instructor_id, c.course_name 
-                    FROM instructors i 
-                    LEFT JOIN instructor_courses ic ON i.instructor_id = ic.instructor_id
-                    LEFT JOIN courses c ON ic.course_id = c.course_id 
-                    WHERE i.name ILIKE %s;
-                """, ('%' + search_term + '%',))
-                filtered_instructors = cur.fetchall()
-
-            # Search by student or instructor ID
-            elif criteria == "ID":
-                # Query for students based on ID
-                cur.execute("""
-                    SELECT s.name, s.age, s.email, s.student_id, c.course_name 
-                    FROM students s 
-                    LEFT JOIN registrations r ON s.student_id = r.student_id 
-                    LEFT JOIN courses c ON r.course_id = c.course_id 
-                    WHERE s.student_id::TEXT ILIKE %s;
-                """, ('%' + search_term + '%',))
-                filtered_students = cur.fetchall()
-                
-                # Query for instructors based on ID
-                cur.execute("""
-                    SELECT i.name, i.age, i.email, i.instructor_id, c.course_name 
-                    FROM instructors i 
-                    LEFT JOIN instructor_courses ic ON i.instructor_id = ic.instructor_id
-                    LEFT JOIN courses c ON ic.course_id = c.course_id 
-                    WHERE i.instructor_id::TEXT ILIKE %s;
-                """, ('%' + search_term + '%',))
-                filtered_instructors = cur.fetchall()
-
-            # Search by course name
-            elif criteria == "Course":
-                # Query for students based on course name
-                cur.execute("""
-                    SELECT s.name, s.age, s.email, s.student_id, c.course_name 
-                    FROM students s 
-                    LEFT JOIN registrations r ON s.student_id = r.student_id 
-                    LEFT JOIN courses c ON r.course_id = c.course_id 
-                    WHERE c.course_name ILIKE %s;
-                """, ('%' + search_term + '%',))
-                filtered_students = cur.fetchall()
-                
-                # Query for instructors based on course name
-                cur.execute("""
-                    SELECT i.name, i.age, i.email, i.instructor_id, c.course_name 
-                    FROM instructors i 
-                    LEFT JOIN instructor_courses ic ON i.instructor_id = ic.instructor_id
-                    LEFT JOIN courses c ON ic.course_id = c.course_id 
-                    WHERE c.course_name ILIKE %s;
-                """, ('%' + search_term + '%',))
-                filtered_instructors = cur.fetchall()
-
-            # Update the tree views with the filtered results
-            update_treeview(student_tree, filtered_students)
-            update_treeview(instructor_tree, filtered_instructors)
-
-            # Query for courses based on course name
-            cur.execute("SELECT course_id, course_name FROM courses WHERE course_name ILIKE %s;", ('%' + search_term + '%',))
-            filtered_courses = cur.fetchall()
-            update_treeview(course_tree, filtered_courses)
-
-            cur.close()
-        except psycopg2.Error as e:
-            messagebox.showerror("Database Error", str(e))
-        finally:
-            conn.close()
+    # Students and instructors are matched on the chosen field; courses by name
+    field = criteria.lower()
+    try:
+        update_treeview(student_tree, repo.stream_students(search_term, field), person_values)
+        update_treeview(instructor_tree, repo.stream_instructors(search_term, field), person_values)
+        update_treeview(course_tree, repo.stream_courses(search_term), course_values)
+    except repo.Error as e:
+        messagebox.showerror("Database Error", str(e))
+
+def person_values(row):
+    """
+    Returns the treeview values of a student or instructor row from the repository.
+
+    Args:
+        row (tuple): (key, id, name, age, email, course_name).
+
+    Returns:
+        tuple: (name, age, email, id, course_name), in treeview column order.
+    """
+    _, person_id, name, age, email, course_name = row
+    return name, age, email, person_id, course_name
+
+def course_values(row):
+    """
+    Returns the treeview values of a course row from the repository.
+
+    Args:
+        row (tuple): (key, course_id, course_name).
 
-def update_treeview(treeview, data):
+    Returns:
+        tuple: (course_id, course_name).
+    """
+    return row[1:]
+
+def update_treeview(treeview, batches, to_values):
     """
-    Updates the specified treeview widget with new data.
+    Replaces the contents of a treeview with streamed rows.
+
+    The repository key of every row is kept in `record_keys`, so editing and
+    deleting address the record directly instead of parsing the displayed IDs.
 
     Args:
         treeview (ttk.Treeview): The treeview widget to update.
-        data (list): A list of tuples containing the data to display in the treeview.
+        batches (iterable): Lists of repository rows, e.g. `repo.stream_students()`;
+            consumed incrementally.
+        to_values (callable): Turns a repository row into the displayed values.
 
     Returns:
         None
     """
     # Clear all existing items in the treeview
-    for item in treeview.get_children():
-        treeview.delete(item)
-
-    # Insert new data into the treeview
-    for record in data:
-        treeview.insert('', 'end', values=record)
-
+    for item_id in treeview.get_children():
+        record_keys.pop((treeview, item_id), None)
+    treeview.delete(*treeview.get_children())
+
+    # Insert new data into the treeview, repainting after every batch of rows
+    with metrics.refresh(f"{treeview.winfo_name()} tree") as refreshed:
+        for batch in batches:
+            for row in batch:
+                item_id = treeview.insert('', 'end', values=to_values(row))
+                record_keys[treeview, item_id] = row[0]
+            refreshed.rows += len(batch)
+            treeview.update_idletasks()
+
+@instrumentation.action
 def backup_database():
     """
     Backs up the current database contents (students, instructors, courses, registrations, and assignments)
-    into a JSON file selected by the user.
+    into a folder selected by the user.
 
-    This function prompts the user to select a file location and name, then gathers data from the database,
-    including students, instructors, courses, registrations, and instructor assignments, and writes this
-    data into a JSON file.
+    Each table is written as a gzip-compressed JSON Lines file, streamed row by row from a
+    server-side cursor, so memory use stays constant however large the tables are. A
+    `manifest.json` in the folder records the row count and SHA-256 checksum of every table.
+    Backups in the original single-file JSON format can still be loaded with `restore_database`.
     
     Returns:
         None
     """
-    # Ask user to specify a file path for saving the JSON backup
-    file_path = filedialog.asksaveasfilename(
-        defaultextension=".json",
-        filetypes=[("JSON Files", "*.json")],
-        title="Save Database Backup"
-    )
+    # Ask user to specify a folder for saving the backup
+    target_dir = filedialog.askdirectory(title="Save Database Backup")
     
-    # If the user provides a file path, proceed with the backup
-    if file_path:
+    # If the user provides a folder, proceed with the backup
+    if target_dir:
         conn = connect_to_db()
         if not conn:
             return
-        cursor = conn.cursor()
 
         try:
-            # Fetch data from each table in the database
-            cursor.execute("SELECT * FROM students")
-            students = cursor.fetchall()
-
-            cursor.execute("SELECT * FROM instructors")
-            instructors = cursor.fetchall()
-
-            cursor.execute("SELECT * FROM courses")
-            courses = cursor.fetchall()
-
-            cursor.execute("SELECT * FROM registrations")
-            registrations = cursor.fetchall()
-
-            cursor.execute("SELECT * FROM instructor_courses")
-            assignments = cursor.fetchall()
-
-            # Organize fetched data into a structured dictionary for JSON export
-            backup_data = {
-                "students": [{"student_id": s[0], "name": s[1], "age": s[2], "email": s[3]} for s in students],
-                "instructors": [{"instructor_id": i[0], "name": i[1], "age": i[2], "email": i[3]} for i in instructors],
-                "courses": [{"course_id": c[0], "course_name": c[1]} for c in courses],
-                "registrations": [{"student_id": r[1], "course_id": r[2]} for r in registrations],
-                "assignments": [{"instructor_id": a[0], "course_id": a[1]} for a in assignments]
-            }
-
-            # Save the data into the selected JSON file
-            with open(file_path, 'w') as backup_file:
-                json.dump(backup_data, backup_file, indent=4)
+            jsonl_backup(conn, target_dir, compression="gzip")
             
             # Notify user of successful backup
             messagebox.showinfo("Success", "Database backup saved successfully!")
@@ -868,7 +679,98 @@ def backup_database():
             messagebox.showerror("Error", f"Failed to back up database: {e}")
         finally:
             # Close the database connection
-            cursor.close()
+            conn.close()
+
+@instrumentation.action
+def fast_backup_database():
+    """
+    Backs up all tables into a directory using PostgreSQL COPY streams.
+
+    This is much faster than the JSON backup for large databases: the tables are
+    read in parallel on pooled connections that share one exported snapshot, so
+    the backup is consistent across tables, and each table is streamed by the
+    server directly into a gzip-compressed file. A manifest records the snapshot,
+    row counts and timings. The backup can be loaded again with `restore_database`.
+
+    Returns:
+        None
+    """
+    target_dir = filedialog.askdirectory(title="Select Backup Folder")
+    if target_dir:
+        try:
+            manifest = snapshot_backup(DB_PARAMS, target_dir, compression="gzip")
+            rows = sum(table["rows"] for table in manifest["tables"])
+            messagebox.showinfo("Success", f"Backed up {rows} rows in {manifest['seconds']} s.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to back up database: {e}")
+
+@instrumentation.action
+def incremental_backup_database():
+    """
+    Backs up only the changes made since a previous backup.
+
+    The user picks the `manifest.json` of the previous backup in the chain (a full
+    backup or an earlier incremental one) and a folder for the new backup. Only the
+    rows recorded in the change log since that backup are written, so the cost is
+    proportional to the day's activity rather than the size of the database.
+
+    Returns:
+        None
+    """
+    parent_manifest = filedialog.askopenfilename(
+        title="Select Previous Backup",
+        filetypes=[("Backup manifest", "manifest.json")]
+    )
+    if not parent_manifest:
+        return
+    target_dir = filedialog.askdirectory(title="Save Incremental Backup")
+    if not target_dir:
+        return
+
+    conn = connect_to_db()
+    if conn:
+        try:
+            manifest = incremental_backup(conn, target_dir, os.path.dirname(parent_manifest))
+            messagebox.showinfo("Success", f"Backed up {manifest['changes']['rows']} changes in {manifest['seconds']} s.")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to back up database: {e}")
+        finally:
+            conn.close()
+
+@instrumentation.action
+def restore_database():
+    """
+    Restores the database from a backup, replacing all current data.
+
+    The user picks either the `manifest.json` of a backup folder (written by
+    `backup_database`, `fast_backup_database` or `incremental_backup_database`) or a
+    `.json` file in the original backup format. The load happens in a single transaction, so a failed restore
+    leaves the database unchanged.
+
+    Returns:
+        None
+    """
+    path = filedialog.askopenfilename(
+        title="Select Backup to Restore",
+        filetypes=[("Backup manifest", "manifest.json"), ("JSON Files", "*.json")]
+    )
+    if not path:
+        return
+    if not messagebox.askyesno("Restore Database", "This will replace all current data. Continue?"):
+        return
+
+    conn = connect_to_db()
+    if conn:
+        try:
+            # Incremental backups restore their full base and then replay the chain
+            report = restore_backup(conn, path)
+            rows = sum(table["rows"] for table in report["tables"])
+            messagebox.showinfo("Success", f"Restored {rows} rows in {report['seconds']} s.")
+            update_course_dropdowns()
+            populate_treeviews()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to restore database: {e}")
+        finally:
             conn.close()
 
 def initialize_ui():
@@ -896,81 +798,199 @@ def initialize_ui():
     # Create the course form interface for adding new courses
     course_form()
     
+    # Fill the course dropdowns of the student and instructor forms
+    update_course_dropdowns()
+
     # Populate the treeviews with data from the database (students, instructors, courses)
     populate_treeviews()
 
+def create_app(dsn=None, backend=None):
+    """
+    Builds the main window and opens its database, without starting the event loop.
+
+    The widgets, the repository and the form state are kept in this module's
+    globals, which the handlers above use, so there is one application per
+    process. `main` runs it; benchmarks can drive the returned window
+    themselves (see benchmarks/tkinter_treeview_benchmark.py).
+
+    Args:
+        dsn (str, optional): The database to use instead of the configured one:
+            a libpq connection string or URI for PostgreSQL (e.g.
+            "dbname=school host=localhost" or "postgresql://user@localhost/school"),
+            a database file for SQLite, or the service URL for the http backend.
+        backend (str, optional): "postgres", "sqlite" or "http"; defaults to the
+            configured backend, else PostgreSQL.
+
+    Returns:
+        tk.Tk: The main window; call `close_app` once it is no longer needed.
+    """
+    global root, repo, DB_PARAMS, canvas, scrollbar, scrollable_frame, notebook
+    global student_tree, instructor_tree, course_tree
+    global available_courses, course_dropdown, instructor_course_dropdown, students, instructors
+
+    config = {name: dict(value) if isinstance(value, dict) else value for name, value in CONFIG.items()}
+    backend = backend or config["backend"] or "postgres"
+    if dsn:
+        if backend == "postgres":
+            config["postgres"] = psycopg2.extensions.parse_dsn(dsn)
+        elif backend == "sqlite":
+            config["sqlite"]["path"] = dsn
+        else:
+            config["http"]["url"] = dsn
+    # The backup functions connect with these
+    DB_PARAMS = config["postgres"]
+
+    # Forget the state of a previous window
+    available_courses, course_dropdown, instructor_course_dropdown = [], None, None
+    students, instructors = [], []
+    course_keys.clear()
+    record_keys.clear()
+
+    # Initialize the main application window
+    root = tk.Tk()
+    root.title("School Management System")
+    root.geometry("1000x600")
+    root.resizable(True, True)
+
+    # All database access goes through the repository
+    repo = connect_repository(config, backend)
+
+    # Ctrl+Shift+I starts timing queries and actions; pressing it again prints
+    # the report (see instrumentation.py)
+    root.bind_all("<Control-I>", lambda event: instrumentation.toggle())
+    # Ctrl+Shift+P profiles the next few actions (see profiling.py)
+    root.bind_all("<Control-P>", lambda event: profiling.toggle())
+
+    # Create a canvas widget for displaying scrollable content within the window
+    canvas = tk.Canvas(root)
+
+    # Create a vertical scrollbar that will allow the canvas to be scrolled
+    scrollbar = tk.Scrollbar(root, orient="vertical", command=canvas.yview)
+
+    # Create a scrollable frame that will hold all the elements and widgets
+    scrollable_frame = tk.Frame(canvas)
+
+    # Bind the configuration of the frame to update the canvas scroll region
+    scrollable_frame.bind(
+        "<Configure>",
+        lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
+    )
+
+    # Create a window in the canvas where the scrollable frame will be embedded
+    canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+
+    # Configure the canvas to work with the vertical scrollbar
+    canvas.configure(yscrollcommand=scrollbar.set)
+
+    # Pack the canvas to fill the available space within the window
+    canvas.pack(side="left", fill="both", expand=True)
+
+    # Pack the scrollbar on the right side of the window, filling the vertical space
+    scrollbar.pack(side="right", fill="y")
+
+    notebook = ttk.Notebook(root)
+    notebook.pack(fill='both', expand=True)
+
+    # --- Students Tab ---
+    student_tab = ttk.Frame(notebook)
+    notebook.add(student_tab, text='Students')
+
+    # Treeview for displaying student data
+    student_tree = ttk.Treeview(student_tab, name="students", columns=("Name", "Age", "Email", "Student ID", "Registered Course"), show="headings")
+    student_tree.heading("Name", text="Name")
+    student_tree.heading("Age", text="Age")
+    student_tree.heading("Email", text="Email")
+    student_tree.heading("Student ID", text="Student ID")
+    student_tree.heading("Registered Course", text="Registered Course")
+    student_tree.pack(fill="both", expand=True)
+
+    # Horizontal scrollbar for the student treeview
+    student_tree_scroll_x = tk.Scrollbar(student_tab, orient='horizontal', command=student_tree.xview)
+    student_tree.configure(xscrollcommand=student_tree_scroll_x.set)
+    student_tree_scroll_x.pack(side='bottom', fill='x')
+
+    # Edit and Delete buttons for students
+    tk.Button(student_tab, text="Edit Student", command=lambda: edit_record(student_tree, students, ["Name", "Age", "Email", "Student ID", "Registered Course"])).pack(pady=5)
+    tk.Button(student_tab, text="Delete Student", command=lambda: delete_record(student_tree, students)).pack(pady=5)
+
+    # --- Instructors Tab ---
+    instructor_tab = ttk.Frame(notebook)
+    notebook.add(instructor_tab, text='Instructors')
+
+    # Treeview for displaying instructor data
+    instructor_tree = ttk.Treeview(instructor_tab, name="instructors", columns=("Name", "Age", "Email", "Instructor ID", "Assigned Course"), show="headings")
+    instructor_tree.heading("Name", text="Name")
+    instructor_tree.heading("Age", text="Age")
+    instructor_tree.heading("Email", text="Email")
+    instructor_tree.heading("Instructor ID", text="Instructor ID")
+    instructor_tree.heading("Assigned Course", text="Assigned Course")
+    instructor_tree.pack(fill="both", expand=True)
+
+    # Horizontal scrollbar for the instructor treeview
+    instructor_tree_scroll_x = tk.Scrollbar(instructor_tab, orient='horizontal', command=instructor_tree.xview)
+    instructor_tree.configure(xscrollcommand=instructor_tree_scroll_x.set)
+    instructor_tree_scroll_x.pack(side='bottom', fill='x')
+
+    # Edit and Delete buttons for instructors
+    tk.Button(instructor_tab, text="Edit Instructor", command=lambda: edit_record(instructor_tree, instructors, ["Name", "Age", "Email", "Instructor ID", "Assigned Course"])).pack(pady=5)
+    tk.Button(instructor_tab, text="Delete Instructor", command=lambda: delete_record(instructor_tree, instructors)).pack(pady=5)
+
+    # --- Courses Tab ---
+    course_tab = ttk.Frame(notebook)
+    notebook.add(course_tab, text='Courses')
+
+    # Treeview for displaying course data
+    course_tree = ttk.Treeview(course_tab, name="courses", columns=("Course ID", "Course Name"), show="headings")
+    course_tree.heading("Course ID", text="Course ID")
+    course_tree.heading("Course Name", text="Course Name")
+    course_tree.pack(fill="both", expand=True)
+
+    # Horizontal scrollbar for the course treeview
+    course_tree_scroll_x = tk.Scrollbar(course_tab, orient='horizontal', command=course_tree.xview)
+    course_tree.configure(xscrollcommand=course_tree_scroll_x.set)
+    course_tree_scroll_x.pack(side='bottom', fill='x')
+
+    # Edit and Delete buttons for courses
+    tk.Button(course_tab, text="Edit Course", command=lambda: edit_record(course_tree, available_courses, ["Course ID", "Course Name"])).pack(pady=5)
+    tk.Button(course_tab, text="Delete Course", command=lambda: delete_record(course_tree, available_courses)).pack(pady=5)
+
+    # --- Backup Database Button ---
+    # The backups are built on PostgreSQL (see pg_backup.py)
+    if repo.backend == "postgres":
+        tk.Button(root, text="Backup Database", command=backup_database).pack(side=tk.LEFT, padx=10, pady=10)
+        tk.Button(root, text="Fast Backup", command=fast_backup_database).pack(side=tk.LEFT, padx=10, pady=10)
+        tk.Button(root, text="Incremental Backup", command=incremental_backup_database).pack(side=tk.LEFT, padx=10, pady=10)
+        tk.Button(root, text="Restore Backup", command=restore_database).pack(side=tk.LEFT, padx=10, pady=10)
+
+    # Initialize the UI
+    initialize_ui()
+    return root
+
+def close_app():
+    """
+    Closes the window created by `create_app`, if it is still open, and the database.
+    """
+    try:
+        root.destroy()
+    except tk.TclError:
+        pass  # Already closed by the user
+    repo.close()
+
+def main():
+    """
+    Runs the School Management System with the configured database.
+    """
+    create_app()
+    # SCHOOL_METRICS_FILE / SCHOOL_METRICS_PORT publish the metrics (see metrics.py)
+    metrics_exporter = metrics.start_exporter_from_env()
+
+    # Start the main event loop
+    root.mainloop()
+
+    # Release the database connections once the window is closed
+    close_app()
+    if metrics_exporter is not None:
+        metrics_exporter.stop()
 
-notebook = ttk.Notebook(root)
-notebook.pack(fill='both', expand=True)
-
-# --- Students Tab ---
-student_tab = ttk.Frame(notebook)
-notebook.add(student_tab, text='Students')
-
-# Treeview for displaying student data
-student_tree = ttk.Treeview(student_tab, columns=("Name", "Age", "Email", "Student ID", "Registered Course"), show="headings")
-student_tree.heading("Name", text="Name")
-student_tree.heading("Age", text="Age")
-student_tree.heading("Email", text="Email")
-student_tree.heading("Student ID", text="Student ID")
-student_tree.heading("Registered Course", text="Registered Course")
-student_tree.pack(fill="both", expand=True)
-
-# Horizontal scrollbar for the student treeview
-student_tree_scroll_x = tk.Scrollbar(student_tab, orient='horizontal', command=student_tree.xview)
-student_tree.configure(xscrollcommand=student_tree_scroll_x.set)
-student_tree_scroll_x.pack(side='bottom', fill='x')
-
-# Edit and Delete buttons for students
-tk.Button(student_tab, text="Edit Student", command=lambda: edit_record(student_tree, students, ["Name", "Age", "Email", "Student ID", "Registered Course"])).pack(pady=5)
-tk.Button(student_tab, text="Delete Student", command=lambda: delete_record(student_tree, students)).pack(pady=5)
-
-# --- Instructors Tab ---
-instructor_tab = ttk.Frame(notebook)
-notebook.add(instructor_tab, text='Instructors')
-
-# Treeview for displaying instructor data
-instructor_tree = ttk.Treeview(instructor_tab, columns=("Name", "Age", "Email", "Instructor ID", "Assigned Course"), show="headings")
-instructor_tree.heading("Name", text="Name")
-instructor_tree.heading("Age", text="Age")
-instructor_tree.heading("Email", text="Email")
-instructor_tree.heading("Instructor ID", text="Instructor ID")
-instructor_tree.heading("Assigned Course", text="Assigned Course")
-instructor_tree.pack(fill="both", expand=True)
-
-# Horizontal scrollbar for the instructor treeview
-instructor_tree_scroll_x = tk.Scrollbar(instructor_tab, orient='horizontal', command=instructor_tree.xview)
-instructor_tree.configure(xscrollcommand=instructor_tree_scroll_x.set)
-instructor_tree_scroll_x.pack(side='bottom', fill='x')
-
-# Edit and Delete buttons for instructors
-tk.Button(instructor_tab, text="Edit Instructor", command=lambda: edit_record(instructor_tree, instructors, ["Name", "Age", "Email", "Instructor ID", "Assigned Course"])).pack(pady=5)
-tk.Button(instructor_tab, text="Delete Instructor", command=lambda: delete_record(instructor_tree, instructors)).pack(pady=5)
-
-# --- Courses Tab ---
-course_tab = ttk.Frame(notebook)
-notebook.add(course_tab, text='Courses')
-
-# Treeview for displaying course data
-course_tree = ttk.Treeview(course_tab, columns=("Course ID", "Course Name"), show="headings")
-course_tree.heading("Course ID", text="Course ID")
-course_tree.heading("Course Name", text="Course Name")
-course_tree.pack(fill="both", expand=True)
-
-# Horizontal scrollbar for the course treeview
-course_tree_scroll_x = tk.Scrollbar(course_tab, orient='horizontal', command=course_tree.xview)
-course_tree.configure(xscrollcommand=course_tree_scroll_x.set)
-course_tree_scroll_x.pack(side='bottom', fill='x')
-
-# Edit and Delete buttons for courses
-tk.Button(course_tab, text="Edit Course", command=lambda: edit_record(course_tree, available_courses, ["Course ID", "Course Name"])).pack(pady=5)
-tk.Button(course_tab, text="Delete Course", command=lambda: delete_record(course_tree, available_courses)).pack(pady=5)
-
-# --- Backup Database Button ---
-tk.Button(root, text="Backup Database", command=backup_database).pack(side=tk.LEFT, padx=10, pady=10)
-
-# Initialize the UI
-initialize_ui()
-
-# Start the main event loop
-root.mainloop()
+if __name__ == "__main__":
+    main()
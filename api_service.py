@@ -0,0 +1,899 @@
+"""
+HTTP/JSON API service for multi-station deployments.
+
+Serves the repository (see repository.py) of one database to any number of
+workstations, which use it through the "http" backend instead of opening the
+database themselves. The service keeps a pool of repository connections, so
+requests from all stations share a handful of connections. On SQLite it also
+keeps a single write queue, so writes from every station are group-committed
+together. Read responses are cached briefly and dropped on every write. Large
+lists are streamed, and every endpoint's latency is recorded under /metrics
+(and, with the process-wide metrics of pyqt/metrics.py, in Prometheus text
+format under /metrics/prometheus).
+
+Only the standard library is used: the server is built on asyncio streams and
+the database calls run on a dedicated thread pool, one thread per pooled
+connection.
+
+Usage:
+    python api_service.py                      # settings from school.ini [service]
+    python api_service.py --backend postgres --port 8765 --pool-size 16
+
+Endpoints (KIND is students, instructors or courses):
+    GET    /health
+    GET    /metrics
+    GET    /metrics/prometheus
+    GET    /KIND                       all rows
+    GET    /KIND/stream?search=&field=&batch_size=
+                                       newline-delimited JSON, one batch of rows per line
+    GET    /KIND/export                CSV, streamed
+    POST   /KIND                       add one record; returns {"key": ...}
+                                       (a course "capacity" is a 400 on PostgreSQL)
+    POST   /KIND/batch                 {"rows": [...]}; returns {"added": n}
+    PUT    /KIND/KEY                   update one record
+    DELETE /KIND/KEY                   delete one record
+    POST   /enrollments                {"student_key", "course_key"}
+    POST   /enrollments/batch          {"pairs": [[student_key, course_key], ...]}
+    POST   /assignments                {"instructor_key", "course_key"}
+    POST   /assignments/batch          {"pairs": [[instructor_key, course_key], ...]}
+    GET    /records?offset=&limit=&record_type=&prefix=&order_by=&descending=
+    GET    /records/count?record_type=&prefix=
+    GET    /stats
+    GET    /stats/courses
+    POST   /maintenance/analyze        refresh the planner statistics
+    POST   /maintenance/vacuum         reclaim the space of deleted rows
+
+Backups and restores read and write files on the server, so they are not
+served; run `school_cli.py backup` / `restore` on the server itself.
+"""
+import argparse
+import asyncio
+import contextlib
+import csv
+import io
+import json
+import os
+import re
+import signal
+import sqlite3
+import sys
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+# instrumentation and metrics are shared with the PyQt application.
+PYQT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pyqt")
+if PYQT_DIR not in sys.path:
+    sys.path.append(PYQT_DIR)
+
+import repository  # noqa: E402
+import validation  # noqa: E402
+import instrumentation  # noqa: E402
+import metrics  # noqa: E402
+from school_cli import EXPORT_COLUMNS  # noqa: E402
+
+# Largest request body accepted, in bytes.
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Seconds an idle keep-alive connection is kept open.
+KEEPALIVE_TIMEOUT = 60
+
+# Most read responses kept by the response cache.
+CACHE_ENTRIES = 256
+
+KINDS = ("students", "instructors", "courses")
+
+# Invalid rows listed in a 400 response to a batch write; the rest are only counted.
+MAX_REPORTED_ROWS = 100
+
+# Errors reported as 409 Conflict (duplicate IDs, broken foreign keys).
+INTEGRITY_ERRORS = (sqlite3.IntegrityError,) + (
+    (repository.psycopg2.IntegrityError,) if repository.psycopg2 else ())
+
+
+class HttpError(Exception):
+    """
+    Ends a request with an error status.
+
+    Args:
+        status (int): The HTTP status.
+        message (str): Sent to the client as {"error": message}.
+        details (dict, optional): Further keys of the response, such as the
+            per-field errors of an invalid record.
+    """
+
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details or {}
+
+
+class Request:
+    """
+    One parsed HTTP request.
+
+    Attributes:
+        method (str): The request method.
+        path (str): The decoded path, without the query string.
+        query (dict): Query parameters (the last value of repeated ones).
+        headers (dict): Headers, with lower-case names.
+        body (bytes): The request body.
+    """
+
+    def __init__(self, method, target, headers, body):
+        url = urlsplit(target)
+        self.method = method
+        self.path = url.path
+        self.query = dict(parse_qsl(url.query))
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        """
+        Decodes the body as a JSON object.
+
+        Raises:
+            HttpError: 400 if the body is not a JSON object.
+        """
+        try:
+            data = json.loads(self.body or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"Invalid JSON body: {e}")
+        if not isinstance(data, dict):
+            raise HttpError(400, "The JSON body must be an object")
+        return data
+
+    def int_arg(self, name, default):
+        value = self.query.get(name)
+        if value in (None, ""):
+            return default
+        try:
+            return int(value)
+        except ValueError:
+            raise HttpError(400, f"{name} must be an integer")
+
+
+class Response:
+    """
+    A complete response.
+
+    Args:
+        body: Sent as JSON unless it is bytes.
+        status (int): The HTTP status.
+        content_type (str): Content type of a bytes body.
+    """
+
+    def __init__(self, body=None, status=200, content_type="application/json"):
+        if not isinstance(body, bytes):
+            body = json.dumps(body, default=str).encode("utf-8")
+        self.body = body
+        self.status = status
+        self.content_type = content_type
+
+
+class StreamingResponse:
+    """
+    A response sent with chunked transfer encoding as its chunks are produced.
+
+    Args:
+        chunks: Async iterator of bytes.
+        content_type (str): The content type.
+    """
+
+    status = 200
+
+    def __init__(self, chunks, content_type):
+        self.chunks = chunks
+        self.content_type = content_type
+
+
+# ----------------- Pool, cache and metrics -----------------
+
+def open_repositories(config, backend, size):
+    """
+    Opens `size` repositories on the configured database.
+
+    The SQLite repositories share the first one's write queue, so there is a
+    single writer however many connections read.
+
+    Args:
+        config (dict): Settings from `repository.load_config`.
+        backend (str): "sqlite" or "postgres".
+        size (int): Number of connections.
+
+    Returns:
+        list: The open repositories; close them in reverse order.
+    """
+    if backend == "http":
+        raise ValueError("The API service cannot serve the http backend; set [service] backend")
+    first = repository.open_repository(backend, config)
+    repos = [first]
+    try:
+        for _ in range(size - 1):
+            if backend == "sqlite":
+                repos.append(repository.SQLiteRepository(first.db_path, writer=first.writer))
+            else:
+                repos.append(repository.open_repository(backend, config))
+    except BaseException:
+        for repo in reversed(repos):
+            repo.close()
+        raise
+    return repos
+
+
+class RepositoryPool:
+    """
+    Hands out pooled repositories to request handlers, one request at a time each.
+
+    Every repository call runs on a dedicated thread pool with one thread per
+    repository, so blocking database calls never stall the event loop and at
+    most `size` of them run at once; further requests wait for a free
+    connection.
+
+    Args:
+        repos (list): Open repositories on the same database.
+    """
+
+    def __init__(self, repos):
+        self.repos = repos
+        self.backend = repos[0].backend
+        self.Error = repos[0].Error
+        self.executor = ThreadPoolExecutor(max_workers=len(repos), thread_name_prefix="api-db")
+        self._free = asyncio.Queue()
+        for repo in repos:
+            self._free.put_nowait(repo)
+        self.waiting = 0
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        """
+        Checks out a repository for the duration of the `async with` block.
+        """
+        self.waiting += 1
+        try:
+            repo = await self._free.get()
+        finally:
+            self.waiting -= 1
+        try:
+            yield repo
+        finally:
+            self._free.put_nowait(repo)
+
+    async def run(self, func, *args):
+        """
+        Runs `func(*args)` on the database thread pool.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+
+    async def call(self, method, *args):
+        """
+        Calls a repository method on a pooled repository and returns its result.
+        """
+        async with self.acquire() as repo:
+            return await self.run(getattr(repo, method), *args)
+
+    def parse_key(self, text):
+        """
+        Turns a key taken from a URL back into the backend's key type.
+        """
+        if self.backend == "sqlite":
+            try:
+                return int(text)
+            except ValueError:
+                raise HttpError(404, f"No record with key {text!r}")
+        return text
+
+    def metrics(self):
+        stats = {"size": len(self.repos), "in_use": len(self.repos) - self._free.qsize(),
+                 "waiting": self.waiting}
+        writer = getattr(self.repos[0], "writer", None)
+        return {"pool": stats, "writer": writer.metrics() if writer else None}
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for repo in reversed(self.repos):
+            repo.close()
+
+
+class ResponseCache:
+    """
+    Keeps recent read responses until the next write or for `ttl` seconds.
+
+    Every write made through the service clears the cache. The time limit
+    bounds how stale an answer can get when the database is also changed
+    from outside the service (e.g. by school_cli.py).
+
+    Args:
+        ttl (float): Seconds an entry stays valid; 0 disables the cache.
+        entries (int): Most responses kept.
+    """
+
+    def __init__(self, ttl, entries=CACHE_ENTRIES):
+        self.ttl = ttl
+        self.entries = entries
+        self._responses = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._hit = metrics.CACHE_LOOKUPS.labels("api_response", "hit")
+        self._miss = metrics.CACHE_LOOKUPS.labels("api_response", "miss")
+
+    def get(self, key):
+        entry = self._responses.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            self.misses += 1
+            self._miss.inc()
+            return None
+        self._responses.move_to_end(key)
+        self.hits += 1
+        self._hit.inc()
+        return entry[1]
+
+    def put(self, key, response):
+        if self.ttl <= 0:
+            return
+        self._responses[key] = (time.monotonic(), response)
+        self._responses.move_to_end(key)
+        if len(self._responses) > self.entries:
+            self._responses.popitem(last=False)
+
+    def clear(self):
+        self._responses.clear()
+
+    def metrics(self):
+        return {"entries": len(self._responses), "hits": self.hits, "misses": self.misses,
+                "ttl_seconds": self.ttl}
+
+
+class EndpointMetrics:
+    """
+    Request counts and latency percentiles per endpoint.
+
+    Latencies cover the most recent 1024 requests of each endpoint and are
+    measured from the parsed request to the last byte written.
+    """
+
+    def __init__(self):
+        self._endpoints = {}
+        self._seconds = metrics.REGISTRY.histogram(
+            "school_api_request_duration_seconds", "Time to serve an API request.", ("endpoint", "status"))
+
+    def record(self, endpoint, seconds, status):
+        self._seconds.labels(endpoint, status).observe(seconds)
+        entry = self._endpoints.setdefault(endpoint, {"requests": 0, "errors": 0,
+                                                      "latencies": deque(maxlen=1024)})
+        entry["requests"] += 1
+        if status >= 400:
+            entry["errors"] += 1
+        entry["latencies"].append(seconds)
+
+    def snapshot(self):
+        report = {}
+        for endpoint, entry in sorted(self._endpoints.items()):
+            latencies = sorted(entry["latencies"])
+
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+
+            report[endpoint] = {
+                "requests": entry["requests"],
+                "errors": entry["errors"],
+                "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3),
+                "p50_ms": percentile(0.50),
+                "p95_ms": percentile(0.95),
+                "p99_ms": percentile(0.99),
+                "max_ms": round(latencies[-1] * 1000, 3),
+            }
+        return report
+
+
+# ----------------- Service -----------------
+
+class ApiService:
+    """
+    Routes HTTP requests to the pooled repositories.
+
+    Args:
+        pool (RepositoryPool): The pooled repositories.
+        cache_ttl (float): Seconds read responses stay cached (0 disables it).
+    """
+
+    def __init__(self, pool, cache_ttl=1.0):
+        self.pool = pool
+        self.cache = ResponseCache(cache_ttl)
+        self.metrics = EndpointMetrics()
+        self.started = time.time()
+        # (method, pattern, handler, endpoint name, cacheable)
+        kinds = "|".join(KINDS)
+        self.routes = [
+            ("GET", r"/health", self.health, "GET /health", False),
+            ("GET", r"/metrics", self.get_metrics, "GET /metrics", False),
+            ("GET", r"/metrics/prometheus", self.get_prometheus, "GET /metrics/prometheus", False),
+            ("GET", r"/records", self.records, "GET /records", True),
+            ("GET", r"/records/count", self.count_records, "GET /records/count", True),
+            ("GET", r"/stats", self.stats, "GET /stats", True),
+            ("GET", r"/stats/courses", self.course_stats, "GET /stats/courses", True),
+            ("POST", r"/maintenance/(?P<job>analyze|vacuum)", self.maintenance, "POST /maintenance/{job}", False),
+            ("POST", r"/enrollments", self.enroll, "POST /enrollments", False),
+            ("POST", r"/enrollments/batch", self.enroll_many, "POST /enrollments/batch", False),
+            ("POST", r"/assignments", self.assign, "POST /assignments", False),
+            ("POST", r"/assignments/batch", self.assign_many, "POST /assignments/batch", False),
+            ("GET", rf"/(?P<kind>{kinds})", self.list_rows, "GET /{kind}", True),
+            ("GET", rf"/(?P<kind>{kinds})/stream", self.stream, "GET /{kind}/stream", False),
+            ("GET", rf"/(?P<kind>{kinds})/export", self.export, "GET /{kind}/export", False),
+            ("POST", rf"/(?P<kind>{kinds})", self.add, "POST /{kind}", False),
+            ("POST", rf"/(?P<kind>{kinds})/batch", self.add_many, "POST /{kind}/batch", False),
+            ("PUT", rf"/(?P<kind>{kinds})/(?P<key>[^/]+)", self.update, "PUT /{kind}/{key}", False),
+            ("DELETE", rf"/(?P<kind>{kinds})/(?P<key>[^/]+)", self.delete, "DELETE /{kind}/{key}", False),
+        ]
+        self.routes = [(method, re.compile(pattern + r"/?"), *rest) for method, pattern, *rest in self.routes]
+        metrics.REGISTRY.add_collector(self._metric_samples)
+
+    def _metric_samples(self):
+        # Reported through metrics.REGISTRY while the service exists
+        pool = self.pool.metrics()["pool"]
+        yield ("school_api_pool_size", "gauge", "Pooled repository connections.", {}, pool["size"])
+        yield ("school_api_pool_in_use", "gauge", "Pooled connections serving a request.", {}, pool["in_use"])
+        yield ("school_api_pool_waiting", "gauge", "Requests waiting for a pooled connection.", {},
+               pool["waiting"])
+        yield ("school_api_cache_entries", "gauge", "Responses in the response cache.", {},
+               len(self.cache._responses))
+
+    def route(self, request):
+        """
+        Finds the handler of a request.
+
+        Returns:
+            tuple: (handler, path parameters, endpoint name, cacheable).
+
+        Raises:
+            HttpError: 404 for an unknown path, 405 for a wrong method.
+        """
+        allowed = []
+        for method, pattern, handler, endpoint, cacheable in self.routes:
+            match = pattern.fullmatch(request.path)
+            if match:
+                if method == request.method:
+                    return handler, {name: unquote(value) for name, value in match.groupdict().items()}, \
+                        endpoint, cacheable
+                allowed.append(method)
+        if allowed:
+            raise HttpError(405, f"{request.method} is not allowed on {request.path}")
+        raise HttpError(404, f"No such endpoint: {request.path}")
+
+    async def handle(self, request):
+        """
+        Runs a request through its handler, the cache and the error mapping.
+
+        Returns:
+            tuple: (Response or StreamingResponse, endpoint name).
+        """
+        endpoint = f"{request.method} (unmatched)"
+        try:
+            handler, params, endpoint, cacheable = self.route(request)
+            cache_key = (request.path, tuple(sorted(request.query.items())))
+            if cacheable:
+                cached = self.cache.get(cache_key)
+                if cached is not None:
+                    return cached, endpoint
+            response = await handler(request, **params)
+            if request.method != "GET":
+                self.cache.clear()
+            elif cacheable:
+                self.cache.put(cache_key, response)
+            return response, endpoint
+        except HttpError as e:
+            return Response({"error": str(e), "type": "HttpError", **e.details}, e.status), endpoint
+        except Exception as e:
+            return self.error_response(e), endpoint
+
+    def error_response(self, error):
+        if isinstance(error, INTEGRITY_ERRORS):
+            status = 409
+        elif isinstance(error, NotImplementedError):
+            status = 501
+        elif isinstance(error, (ValueError, TypeError, KeyError)):
+            status = 400
+        else:
+            status = 500
+        message = f"Missing field: {error.args[0]}" if isinstance(error, KeyError) else str(error)
+        # A failed request may have left things half-written; drop the cached reads
+        self.cache.clear()
+        return Response({"error": message or type(error).__name__, "type": type(error).__name__}, status)
+
+    # ----------------- Handlers -----------------
+
+    async def health(self, request):
+        return Response({"status": "ok", "backend": self.pool.backend,
+                         "uptime_seconds": round(time.time() - self.started, 1)})
+
+    async def get_metrics(self, request):
+        report = {"endpoints": self.metrics.snapshot(), "cache": self.cache.metrics()}
+        report.update(self.pool.metrics())
+        if instrumentation.RECORDER.enabled:
+            # Statement timings, when started with SCHOOL_INSTRUMENT=1
+            report["statements"] = instrumentation.summary()["statements"]
+        report["registry"] = metrics.snapshot()["metrics"]
+        return Response(report)
+
+    async def get_prometheus(self, request):
+        return Response(metrics.prometheus().encode("utf-8"), content_type="text/plain; version=0.0.4")
+
+    async def list_rows(self, request, kind):
+        return Response({"rows": await self.pool.call(kind)})
+
+    @staticmethod
+    def _person(person_id, name, age, email):
+        """
+        Checks a student or instructor with the rules of validation.py.
+
+        Returns:
+            tuple: (age, email) as they should be stored.
+
+        Raises:
+            HttpError: 400 with the per-field errors if the record is invalid.
+        """
+        errors = validation.validate_person(person_id, name, age, email)
+        if errors:
+            raise HttpError(400, "Invalid record", {"fields": errors})
+        return validation.validate_age(age), validation.validate_email(email)
+
+    @staticmethod
+    def _course(course_id, course_name, require_id=True):
+        ids = [course_id] if require_id or course_id is not None else None
+        errors = validation.validate_batch(ids=ids, names=[course_name]).errors(0)
+        if errors:
+            raise HttpError(400, "Invalid record", {"fields": errors})
+
+    @staticmethod
+    def _rows(kind, rows):
+        """
+        Checks the rows of a batch write with `validation.validate_batch`.
+
+        Returns:
+            list: The rows as they should be stored.
+
+        Raises:
+            HttpError: 400 listing the invalid rows (up to MAX_REPORTED_ROWS)
+            and their per-field errors, if any row is invalid.
+        """
+        width = 2 if kind == "courses" else 4
+        if not all(isinstance(row, list) and len(row) == width for row in rows):
+            shape = "[course_id, course_name]" if kind == "courses" else "[id, name, age, email]"
+            raise HttpError(400, f"Every row must be {shape}")
+        columns = list(zip(*rows)) or [()] * width
+        if kind == "courses":
+            result = validation.validate_batch(ids=columns[0], names=columns[1])
+        else:
+            result = validation.validate_batch(ids=columns[0], names=columns[1], ages=columns[2],
+                                               emails=columns[3])
+        if result.error_count:
+            invalid = result.error_rows()
+            raise HttpError(400, f"{len(invalid)} of {len(rows)} rows are invalid", {
+                "invalid_rows": len(invalid),
+                "rows": [{"row": row, "fields": result.errors(row)} for row in invalid[:MAX_REPORTED_ROWS]],
+            })
+        if kind == "courses":
+            return rows
+        ages = result.ages.tolist() if validation.np is not None else result.ages
+        return [[person_id, name, age, email.strip()]
+                for (person_id, name, _, email), age in zip(rows, ages)]
+
+    async def add(self, request, kind):
+        data = request.json()
+        if kind == "courses":
+            self._course(data["course_id"], data["course_name"])
+            key = await self.pool.call("add_course", data["course_id"], data["course_name"], data.get("capacity"))
+        else:
+            id_field = "student_id" if kind == "students" else "instructor_id"
+            method = "add_student" if kind == "students" else "add_instructor"
+            age, email = self._person(data[id_field], data["name"], data["age"], data["email"])
+            key = await self.pool.call(method, data[id_field], data["name"], age, email, data.get("course_key"))
+        return Response({"key": key}, 201)
+
+    async def add_many(self, request, kind):
+        rows = request.json().get("rows")
+        if not isinstance(rows, list):
+            raise HttpError(400, "Expected {\"rows\": [...]}")
+        return Response({"added": await self.pool.call(f"add_{kind}", self._rows(kind, rows))})
+
+    async def update(self, request, kind, key):
+        data = request.json()
+        key = self.pool.parse_key(key)
+        if kind == "courses":
+            # The course ID is optional: it is only changed when given
+            self._course(data.get("course_id"), data["course_name"], require_id=False)
+            await self.pool.call("update_course", key, data["course_name"], data.get("course_id"))
+        else:
+            # Updates carry no ID; the key in the path identifies the record
+            age, email = self._person(key, data["name"], data["age"], data["email"])
+            await self.pool.call(f"update_{kind[:-1]}", key, data["name"], age, email)
+        return Response({"updated": True})
+
+    async def delete(self, request, kind, key):
+        await self.pool.call(f"delete_{kind[:-1]}", self.pool.parse_key(key))
+        return Response({"deleted": True})
+
+    def _pairs(self, request):
+        pairs = request.json().get("pairs")
+        if not isinstance(pairs, list) or not all(isinstance(pair, list) and len(pair) == 2 for pair in pairs):
+            raise HttpError(400, "Expected {\"pairs\": [[key, course_key], ...]}")
+        return pairs
+
+    async def enroll(self, request):
+        data = request.json()
+        result = await self.pool.call("enroll", data["student_key"], data["course_key"])
+        return Response(result._asdict())
+
+    async def enroll_many(self, request):
+        results = await self.pool.call("enroll_many", self._pairs(request))
+        return Response({"results": [result._asdict() for result in results]})
+
+    async def assign(self, request):
+        data = request.json()
+        await self.pool.call("assign", data["instructor_key"], data["course_key"])
+        return Response({"assigned": 1})
+
+    async def assign_many(self, request):
+        return Response({"assigned": await self.pool.call("assign_many", self._pairs(request))})
+
+    async def records(self, request):
+        query = request.query
+        rows = await self.pool.call("record_page", request.int_arg("offset", 0), request.int_arg("limit", 100),
+                                    query.get("record_type") or None, query.get("prefix") or None,
+                                    query.get("order_by", "name"), query.get("descending") in ("1", "true"))
+        return Response({"rows": rows})
+
+    async def count_records(self, request):
+        count = await self.pool.call("count_records", request.query.get("record_type") or None,
+                                     request.query.get("prefix") or None)
+        return Response({"count": count})
+
+    async def stats(self, request):
+        return Response({"backend": self.pool.backend, "counts": await self.pool.call("counts")})
+
+    async def course_stats(self, request):
+        return Response({"rows": await self.pool.call("course_stats")})
+
+    async def maintenance(self, request, job):
+        started = time.perf_counter()
+        await self.pool.call(job)
+        return Response({"job": job, "seconds": round(time.perf_counter() - started, 3)})
+
+    def _open_stream(self, request, kind):
+        search = request.query.get("search") or None
+        batch_size = request.int_arg("batch_size", None)
+        if kind == "courses":
+            return lambda repo: repo.stream_courses(search, batch_size)
+        field = request.query.get("field", "name")
+        if field not in repository.SEARCH_FIELDS:
+            raise HttpError(400, f"field must be one of {', '.join(repository.SEARCH_FIELDS)}")
+        return lambda repo: getattr(repo, f"stream_{kind}")(search, field, batch_size)
+
+    async def _batches(self, open_stream):
+        """
+        Yields the batches of a repository stream, keeping one pooled
+        repository checked out until the stream ends or the client goes away.
+        """
+        async with self.pool.acquire() as repo:
+            batches = await self.pool.run(open_stream, repo)
+            try:
+                while True:
+                    batch = await self.pool.run(next, batches, None)
+                    if batch is None:
+                        return
+                    yield batch
+            finally:
+                # Releases the cursor (a server-side one on PostgreSQL)
+                await self.pool.run(batches.close)
+
+    async def stream(self, request, kind):
+        batches = self._batches(self._open_stream(request, kind))
+
+        async def chunks():
+            async with contextlib.aclosing(batches):
+                async for batch in batches:
+                    yield json.dumps(batch, default=str).encode("utf-8") + b"\n"
+
+        return StreamingResponse(chunks(), "application/x-ndjson")
+
+    async def export(self, request, kind):
+        batches = self._batches(self._open_stream(request, kind))
+
+        async def chunks():
+            text = io.StringIO()
+            writer = csv.writer(text)
+            writer.writerow(EXPORT_COLUMNS[kind])
+            async with contextlib.aclosing(batches):
+                async for batch in batches:
+                    writer.writerows(row[1:] for row in batch)
+                    yield text.getvalue().encode("utf-8")
+                    text.seek(0)
+                    text.truncate()
+            if text.tell():
+                yield text.getvalue().encode("utf-8")
+
+        return StreamingResponse(chunks(), "text/csv; charset=utf-8")
+
+    # ----------------- HTTP -----------------
+
+    async def read_request(self, reader):
+        """
+        Reads one request from a connection.
+
+        Returns:
+            Request or None: None when the client closed the connection.
+
+        Raises:
+            HttpError: For malformed requests.
+        """
+        try:
+            line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return None
+        if not line:
+            return None
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+            if len(headers) > 100:
+                raise HttpError(431, "Too many headers")
+        headers[":version"] = version
+
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(411, "Chunked request bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HttpError(400, "Invalid Content-Length")
+        if length > MAX_BODY_BYTES:
+            raise HttpError(413, f"Request bodies are limited to {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return Request(method.upper(), target, headers, body)
+
+    @staticmethod
+    def _head(status, content_type, extra, keep_alive):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"] + extra
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def write_response(self, writer, response, keep_alive):
+        """
+        Writes a response; streamed ones are sent chunk by chunk, waiting for
+        the client to keep up.
+        """
+        if isinstance(response, Response):
+            writer.write(self._head(response.status, response.content_type,
+                                    [f"Content-Length: {len(response.body)}"], keep_alive) + response.body)
+            await writer.drain()
+            return
+        writer.write(self._head(response.status, response.content_type, ["Transfer-Encoding: chunked"], keep_alive))
+        try:
+            async for chunk in response.chunks:
+                if chunk:
+                    writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    await writer.drain()
+        finally:
+            await response.chunks.aclose()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def serve_connection(self, reader, writer):
+        """
+        Serves the requests of one keep-alive connection in order.
+        """
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as e:
+                    await self.write_response(writer, Response({"error": str(e), "type": "HttpError"}, e.status),
+                                              keep_alive=False)
+                    return
+                if request is None:
+                    return
+                started = time.perf_counter()
+                keep_alive = (request.headers.get("connection", "").lower() != "close"
+                              and request.headers[":version"] != "HTTP/1.0")
+                response, endpoint = await self.handle(request)
+                try:
+                    await self.write_response(writer, response, keep_alive)
+                finally:
+                    self.metrics.record(endpoint, time.perf_counter() - started, response.status)
+                if not keep_alive:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # The client went away
+        except Exception as e:
+            # E.g. a database error in the middle of a stream: the status is
+            # already sent, so the broken chunked body is what tells the client
+            print(f"api_service: connection aborted: {type(e).__name__}: {e}", file=sys.stderr)
+        finally:
+            writer.close()
+            with contextlib.suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+async def serve(config, backend, host, port, pool_size, cache_ttl, ready=None):
+    """
+    Runs the service until cancelled.
+
+    Args:
+        config (dict): Settings from `repository.load_config`.
+        backend (str): Database served: "sqlite" or "postgres".
+        host (str): Address to listen on.
+        port (int): Port to listen on (0 picks a free one).
+        pool_size (int): Number of pooled database connections.
+        cache_ttl (float): Seconds read responses stay cached.
+        ready (callable, optional): Called with the bound (host, port) once
+            the service accepts connections.
+    """
+    repos = await asyncio.get_running_loop().run_in_executor(
+        None, open_repositories, config, backend, pool_size)
+    pool = RepositoryPool(repos)
+    server = None
+    try:
+        service = ApiService(pool, cache_ttl)
+        server = await asyncio.start_server(service.serve_connection, host, port)
+        # No signal handlers on Windows, nor outside the main thread (when embedded)
+        with contextlib.suppress(NotImplementedError, RuntimeError):
+            # Stop like Ctrl+C, so pending writes are committed before exiting
+            asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+        address = server.sockets[0].getsockname()[:2]
+        if ready:
+            ready(address)
+        print(f"Serving the {pool.backend} database on http://{address[0]}:{address[1]} "
+              f"with {pool_size} connections", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+    finally:
+        if server is not None:
+            server.close()
+        pool.close()
+
+
+def main(argv=None):
+    """
+    Starts the service with the [service] settings of school.ini, overridden
+    by the command-line options.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", help="settings file (default: school.ini or $SCHOOL_CONFIG)")
+    parser.add_argument("--backend", choices=("sqlite", "postgres"), help="database to serve")
+    parser.add_argument("--db", help="SQLite database file (overrides the configured path)")
+    parser.add_argument("--host", help="address to listen on")
+    parser.add_argument("--port", type=int, help="port to listen on")
+    parser.add_argument("--pool-size", type=int, help="number of database connections")
+    parser.add_argument("--cache-ttl", type=float, help="seconds read responses stay cached (0 disables)")
+    args = parser.parse_args(argv)
+
+    config = repository.load_config(args.config)
+    if args.db:
+        config["sqlite"]["path"] = args.db
+    settings = config["service"]
+    try:
+        asyncio.run(serve(
+            config,
+            args.backend or settings["backend"],
+            args.host or settings["host"],
+            args.port if args.port is not None else int(settings["port"]),
+            args.pool_size or int(settings["pool_size"]),
+            args.cache_ttl if args.cache_ttl is not None else float(settings["cache_ttl"]),
+        ))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
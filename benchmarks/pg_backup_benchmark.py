@@ -0,0 +1,130 @@
+"""
+Times the COPY-based backup (sequential and parallel snapshot) and restore in
+pg_backup.py against the JSON backup on a generated school.
+
+The default size is a "million-row school": 250,000 students, 2,000 instructors,
+5,000 courses, 740,000 registrations and 3,000 instructor assignments.
+
+Usage:
+    python benchmarks/pg_backup_benchmark.py --dsn "dbname=school_bench user=postgres"
+
+The target database must be a scratch database: its five tables are truncated
+and refilled. Create them first with `psql -f db/schema.sql`.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import psycopg2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from pg_backup import copy_backup, copy_restore, snapshot_backup  # noqa: E402
+from pg_stream import stream_rows  # noqa: E402
+
+
+def generate_school(conn, students, instructors, courses, registrations, assignments):
+    """
+    Fills the five tables with synthetic data using server-side generate_series.
+    """
+    with conn.cursor() as cur:
+        cur.execute("TRUNCATE students, instructors, courses, registrations, instructor_courses CASCADE;")
+        cur.execute("""
+            INSERT INTO students (student_id, name, age, email)
+            SELECT 'S' || g, 'Student ' || g, 18 + g %% 10, 'student' || g || '@school.edu'
+            FROM generate_series(1, %s) g;
+        """, (students,))
+        cur.execute("""
+            INSERT INTO instructors (instructor_id, name, age, email)
+            SELECT 'I' || g, 'Instructor ' || g, 30 + g %% 30, 'instructor' || g || '@school.edu'
+            FROM generate_series(1, %s) g;
+        """, (instructors,))
+        cur.execute("""
+            INSERT INTO courses (course_id, course_name)
+            SELECT 'C' || g, 'Course ' || g FROM generate_series(1, %s) g;
+        """, (courses,))
+        cur.execute("""
+            INSERT INTO registrations (student_id, course_id)
+            SELECT 'S' || (1 + g %% %s), 'C' || (1 + (g * 7919 + g / %s) %% %s)
+            FROM generate_series(1, %s) g
+            ON CONFLICT DO NOTHING;
+        """, (students, students, courses, registrations))
+        cur.execute("""
+            INSERT INTO instructor_courses (instructor_id, course_id)
+            SELECT DISTINCT 'I' || (1 + g %% %s), 'C' || (1 + g %% %s)
+            FROM generate_series(1, %s) g;
+        """, (instructors, courses, assignments))
+        cur.execute("ANALYZE;")
+    conn.commit()
+
+
+def time_json_backup(conn, path):
+    """
+    Times the row-by-row JSON backup written by Tkinter_with_db.backup_database.
+    """
+    started = time.perf_counter()
+    with open(path, "w") as backup_file:
+        for query in ("SELECT student_id, name, age, email FROM students",
+                      "SELECT instructor_id, name, age, email FROM instructors",
+                      "SELECT course_id, course_name FROM courses",
+                      "SELECT student_id, course_id FROM registrations",
+                      "SELECT instructor_id, course_id FROM instructor_courses"):
+            for row in stream_rows(conn, query):
+                json.dump(row, backup_file)
+                backup_file.write("\n")
+    conn.rollback()
+    return {"seconds": round(time.perf_counter() - started, 3), "bytes": os.path.getsize(path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True, help="libpq connection string of a scratch database")
+    parser.add_argument("--students", type=int, default=250_000)
+    parser.add_argument("--instructors", type=int, default=2_000)
+    parser.add_argument("--courses", type=int, default=5_000)
+    parser.add_argument("--registrations", type=int, default=740_000)
+    parser.add_argument("--assignments", type=int, default=3_000)
+    parser.add_argument("--compression", choices=["none", "gzip", "bz2", "xz"], default="gzip")
+    parser.add_argument("--skip-generate", action="store_true", help="reuse the data already in the database")
+    args = parser.parse_args()
+    compression = None if args.compression == "none" else args.compression
+
+    conn = psycopg2.connect(args.dsn)
+    try:
+        if not args.skip_generate:
+            generate_school(conn, args.students, args.instructors, args.courses,
+                            args.registrations, args.assignments)
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            json_result = time_json_backup(conn, os.path.join(work_dir, "backup.json"))
+            manifest = copy_backup(conn, os.path.join(work_dir, "copy"), compression=compression)
+            snapshot_manifest = snapshot_backup({"dsn": args.dsn}, os.path.join(work_dir, "snapshot"),
+                                                compression=compression)
+            restore_report = copy_restore(conn, os.path.join(work_dir, "copy"))
+
+        results = {
+            "rows": sum(table["rows"] for table in manifest["tables"]),
+            "compression": compression,
+            "json_backup": json_result,
+            "copy_backup": {
+                "seconds": manifest["seconds"],
+                "bytes": sum(table["bytes"] for table in manifest["tables"]),
+                "tables": manifest["tables"],
+            },
+            "snapshot_backup": {
+                "seconds": snapshot_manifest["seconds"],
+                "workers": snapshot_manifest["workers"],
+                "tables": snapshot_manifest["tables"],
+            },
+            "copy_restore": restore_report,
+        }
+        print(json.dumps(results, indent=4))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Times the Tkinter window's Treeview refresh, search and edit paths against a
+PostgreSQL database of increasing size.
+
+For every size, the database is filled with that many students (each
+registered for one course), a course per 50 students and an instructor per
+100, then the real window is built with `Tkinter_with_db.create_app` and
+driven without its event loop. Measured per size, each repeated --repeat
+times and reported as p50/p95/max in milliseconds:
+
+- startup: `create_app` up to the filled window;
+- refresh: `populate_treeviews`, and `update_treeview` of each tree on its own;
+- search: `search_records` for a few terms and criteria, from a handful of
+  matches to most of the rows;
+- edit: opening the edit window on a student (`edit_record`) and saving a new
+  name, which refreshes all three trees.
+
+Every timing includes processing the Tk events it queued, as a user would
+wait for them. Message boxes are answered automatically and counted; the run
+fails if one reports an error.
+
+Tk needs a display; on a headless machine, run it under Xvfb.
+
+Usage:
+    xvfb-run -a python benchmarks/tkinter_treeview_benchmark.py \\
+        --dsn "dbname=school_bench user=postgres" --sizes 1000,10000,50000 --out tk.json
+
+The target database must be a scratch database: its five tables are truncated
+and refilled. Create them first with `psql -f db/schema.sql`.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tkinter as tk
+
+import psycopg2
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import Tkinter_with_db as app  # noqa: E402
+from pg_backup_benchmark import generate_school  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000,50000"
+
+# (criteria, term): one student, a few hundred, a course's students, nothing.
+SEARCHES = (("ID", "S12345"), ("Name", "Student 12"), ("Course", "Course 7"), ("Name", "zzz"))
+
+STUDENT_COLUMNS = ["Name", "Age", "Email", "Student ID", "Registered Course"]
+
+
+class Dialogs:
+    """
+    Replaces the window's message boxes, which would wait for a click, and
+    counts them by kind.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def _answer(self, kind, answer):
+        def show(*args, **kwargs):
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+            return answer
+        return show
+
+    def install(self):
+        for kind, answer in (("showinfo", "ok"), ("showwarning", "ok"), ("showerror", "ok"), ("askyesno", True)):
+            setattr(app.messagebox, kind, self._answer(kind, answer))
+
+
+def percentile(values, p):
+    """Returns the `p`-th percentile (0-100) of `values` by nearest rank."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def timings(samples):
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    func(*args)
+    app.root.update()
+    return time.perf_counter() - started
+
+
+def shown_rows():
+    return sum(len(tree.get_children()) for tree in (app.student_tree, app.instructor_tree, app.course_tree))
+
+
+def edit_window():
+    """
+    Returns the edit window opened by `edit_record`.
+    """
+    windows = [child for child in app.root.winfo_children() if isinstance(child, tk.Toplevel)]
+    if not windows:
+        raise RuntimeError("edit_record did not open an edit window")
+    return windows[-1]
+
+
+def edit_student(name):
+    """
+    Opens the edit window on the first student and returns the time taken to
+    open it and to save `name`.
+    """
+    app.student_tree.selection_set(app.student_tree.get_children()[0])
+    opened = timed(app.edit_record, app.student_tree, app.students, STUDENT_COLUMNS)
+    window = edit_window()
+    entry = next(child for child in window.winfo_children() if isinstance(child, tk.Entry))
+    entry.delete(0, tk.END)
+    entry.insert(0, name)
+    save = next(child for child in window.winfo_children() if isinstance(child, tk.Button))
+    saved = timed(save.invoke)
+    if window.winfo_exists():
+        raise RuntimeError("Saving the edited student failed")
+    return opened, saved
+
+
+def run_size(dsn, dialogs, size, repeat):
+    """
+    Runs every measurement against a database of `size` students.
+    """
+    courses = max(size // 50, 10)
+    instructors = max(size // 100, 5)
+    conn = psycopg2.connect(dsn)
+    try:
+        generate_school(conn, size, instructors, courses, size, instructors)
+    finally:
+        conn.close()
+    result = {"students": size, "courses": courses, "instructors": instructors}
+    errors_before = dialogs.counts.get("showerror", 0)
+
+    startup = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        app.create_app(dsn, backend="postgres")
+        app.root.update()
+        startup.append(time.perf_counter() - started)
+        app.close_app()
+    result["startup"] = timings(startup)
+
+    app.create_app(dsn, backend="postgres")
+    try:
+        app.root.update()
+        result["shown_rows"] = shown_rows()
+        refreshes = {
+            "populate_treeviews": lambda: app.populate_treeviews(),
+            "students": lambda: app.update_treeview(app.student_tree, app.repo.stream_students(), app.person_values),
+            "instructors": lambda: app.update_treeview(app.instructor_tree, app.repo.stream_instructors(),
+                                                       app.person_values),
+            "courses": lambda: app.update_treeview(app.course_tree, app.repo.stream_courses(), app.course_values),
+        }
+        result["refresh"] = {name: timings([timed(refresh) for _ in range(repeat)])
+                             for name, refresh in refreshes.items()}
+
+        result["search"] = {}
+        for criteria, term in SEARCHES:
+            samples = [timed(app.search_records, term, criteria) for _ in range(repeat)]
+            result["search"][f"{criteria}:{term}"] = dict(timings(samples), shown_rows=shown_rows())
+        app.populate_treeviews()
+
+        opens, saves = [], []
+        for i in range(repeat):
+            opened, saved = edit_student(f"Edited Student {i}")
+            opens.append(opened)
+            saves.append(saved)
+        result["edit_open"] = timings(opens)
+        result["edit_save"] = timings(saves)
+    finally:
+        app.close_app()
+    if dialogs.counts.get("showerror", 0) != errors_before:
+        raise RuntimeError("The window showed an error; see the database log")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", required=True, help="libpq connection string of a scratch database")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated student counts")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every measurement")
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if sys.platform.startswith("linux") and not os.environ.get("DISPLAY"):
+        parser.error("no display; run under Xvfb, e.g. xvfb-run -a python " + " ".join(sys.argv))
+
+    dialogs = Dialogs()
+    dialogs.install()
+
+    results = {}
+    for size in (int(size) for size in args.sizes.split(",")):
+        results[str(size)] = run_size(args.dsn, dialogs, size, args.repeat)
+        print(f"{size} students done", file=sys.stderr)
+
+    report = {
+        "python": sys.version.split()[0],
+        "tk": tk.TkVersion,
+        "display": os.environ.get("DISPLAY"),
+        "repeat": args.repeat,
+        "dialogs": dialogs.counts,
+        "results": results,
+    }
+    print(json.dumps(report, indent=4))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Times validation.py on a generated import: the columnar batch API against
+validating the same rows one record at a time.
+
+Usage:
+    python benchmarks/validation_benchmark.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import validation  # noqa: E402
+
+
+def generate_rows(rows, error_rate, seed=0):
+    """
+    Returns id, name, age and email columns with about `error_rate` bad rows.
+    """
+    rng = random.Random(seed)
+    ids, names, ages, emails = [], [], [], []
+    for i in range(rows):
+        bad = rng.random() < error_rate
+        ids.append(f"S{i}")
+        names.append(f"Student {i}")
+        ages.append(rng.choice(["-3", "abc", "200", ""]) if bad else str(17 + i % 50))
+        emails.append(f"student{i}@school" if bad else f"student{i}@school.edu")
+    return ids, names, ages, emails
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--error-rate", type=float, default=0.01)
+    args = parser.parse_args()
+
+    ids, names, ages, emails = generate_rows(args.rows, args.error_rate)
+
+    started = time.perf_counter()
+    result = validation.validate_batch(ages=ages, emails=emails, ids=ids, names=names)
+    batch_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    row_errors = sum(1 for row in zip(ids, names, ages, emails) if validation.validate_person(*row))
+    row_seconds = time.perf_counter() - started
+
+    print(json.dumps({
+        "rows": args.rows,
+        "numpy": validation.np is not None,
+        "invalid_rows": result.error_count,
+        "batch_seconds": round(batch_seconds, 3),
+        "batch_rows_per_sec": round(args.rows / batch_seconds),
+        "row_at_a_time_seconds": round(row_seconds, 3),
+        "row_at_a_time_invalid_rows": row_errors,
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
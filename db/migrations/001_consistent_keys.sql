@@ -0,0 +1,67 @@
+-- Upgrade an existing Tkinter database to the layout in db/schema.sql.
+--
+-- * Aligns every key column to VARCHAR(50).
+-- * Replaces the plain foreign keys with ON DELETE / ON UPDATE CASCADE ones.
+-- * Adds the indexes needed for cascaded deletes and course lookups.
+--
+-- The whole migration runs in one transaction; re-running it is harmless.
+--
+-- Usage:
+--     psql -d Lab_2_435L_tkinter -f db/migrations/001_consistent_keys.sql
+
+BEGIN;
+
+-- Foreign keys must be dropped before the referenced columns change type.
+ALTER TABLE registrations DROP CONSTRAINT IF EXISTS registrations_student_id_fkey;
+ALTER TABLE registrations DROP CONSTRAINT IF EXISTS registrations_course_id_fkey;
+ALTER TABLE instructor_courses DROP CONSTRAINT IF EXISTS instructor_courses_instructor_id_fkey;
+ALTER TABLE instructor_courses DROP CONSTRAINT IF EXISTS instructor_courses_course_id_fkey;
+
+-- Consistent key types on both sides of every join.
+ALTER TABLE students ALTER COLUMN student_id TYPE VARCHAR(50) USING student_id::VARCHAR(50);
+ALTER TABLE instructors ALTER COLUMN instructor_id TYPE VARCHAR(50) USING instructor_id::VARCHAR(50);
+ALTER TABLE courses ALTER COLUMN course_id TYPE VARCHAR(50) USING course_id::VARCHAR(50);
+ALTER TABLE registrations ALTER COLUMN student_id TYPE VARCHAR(50) USING student_id::VARCHAR(50);
+ALTER TABLE registrations ALTER COLUMN course_id TYPE VARCHAR(50) USING course_id::VARCHAR(50);
+ALTER TABLE instructor_courses ALTER COLUMN instructor_id TYPE VARCHAR(50) USING instructor_id::VARCHAR(50);
+ALTER TABLE instructor_courses ALTER COLUMN course_id TYPE VARCHAR(50) USING course_id::VARCHAR(50);
+
+-- The old application deleted parents and children in separate statements,
+-- so orphaned rows may exist.  They would block the new constraints.
+DELETE FROM registrations r
+WHERE r.student_id IS NULL
+   OR r.course_id IS NULL
+   OR NOT EXISTS (SELECT 1 FROM students s WHERE s.student_id = r.student_id)
+   OR NOT EXISTS (SELECT 1 FROM courses c WHERE c.course_id = r.course_id);
+
+DELETE FROM instructor_courses ic
+WHERE NOT EXISTS (SELECT 1 FROM instructors i WHERE i.instructor_id = ic.instructor_id)
+   OR NOT EXISTS (SELECT 1 FROM courses c WHERE c.course_id = ic.course_id);
+
+ALTER TABLE registrations ALTER COLUMN student_id SET NOT NULL;
+ALTER TABLE registrations ALTER COLUMN course_id SET NOT NULL;
+
+ALTER TABLE registrations
+    ADD CONSTRAINT registrations_student_id_fkey FOREIGN KEY (student_id)
+        REFERENCES students(student_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    ADD CONSTRAINT registrations_course_id_fkey FOREIGN KEY (course_id)
+        REFERENCES courses(course_id) ON DELETE CASCADE ON UPDATE CASCADE;
+
+ALTER TABLE instructor_courses
+    ADD CONSTRAINT instructor_courses_instructor_id_fkey FOREIGN KEY (instructor_id)
+        REFERENCES instructors(instructor_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    ADD CONSTRAINT instructor_courses_course_id_fkey FOREIGN KEY (course_id)
+        REFERENCES courses(course_id) ON DELETE CASCADE ON UPDATE CASCADE;
+
+CREATE INDEX IF NOT EXISTS registrations_student_id_idx ON registrations (student_id);
+CREATE INDEX IF NOT EXISTS registrations_course_id_idx ON registrations (course_id);
+CREATE INDEX IF NOT EXISTS instructor_courses_course_id_idx ON instructor_courses (course_id);
+CREATE INDEX IF NOT EXISTS courses_course_name_idx ON courses (course_name);
+
+COMMIT;
+
+ANALYZE students;
+ANALYZE instructors;
+ANALYZE courses;
+ANALYZE registrations;
+ANALYZE instructor_courses;
@@ -0,0 +1,69 @@
+-- Change tracking for incremental backups (see pg_backup.incremental_backup).
+--
+-- Every INSERT, UPDATE and DELETE on the five tables appends a row to
+-- change_log with the primary key of the affected row, the new row contents
+-- and the ID of the writing transaction. An incremental backup exports the
+-- changes that were not yet visible in its parent backup's snapshot.
+--
+-- Re-running this migration is harmless.
+--
+-- Usage:
+--     psql -d Lab_2_435L_tkinter -f db/migrations/002_change_log.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS change_log (
+    change_id BIGSERIAL PRIMARY KEY,
+    txid BIGINT NOT NULL DEFAULT txid_current(),
+    table_name TEXT NOT NULL,
+    operation CHAR(1) NOT NULL,   -- 'I', 'U' or 'D'
+    row_key JSONB NOT NULL,       -- primary key of the row (before an update)
+    row_data JSONB,               -- row after the change; NULL for deletes
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- The trigger arguments are the primary key columns of the table.
+CREATE OR REPLACE FUNCTION log_change() RETURNS trigger AS $$
+DECLARE
+    key_source JSONB;
+    row_key JSONB := '{}'::jsonb;
+    key_column TEXT;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        key_source := to_jsonb(NEW);
+    ELSE
+        key_source := to_jsonb(OLD);
+    END IF;
+
+    FOREACH key_column IN ARRAY TG_ARGV LOOP
+        row_key := row_key || jsonb_build_object(key_column, key_source -> key_column);
+    END LOOP;
+
+    INSERT INTO change_log (table_name, operation, row_key, row_data)
+    VALUES (TG_TABLE_NAME, left(TG_OP, 1), row_key,
+            CASE WHEN TG_OP = 'DELETE' THEN NULL ELSE to_jsonb(NEW) END);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS students_change_log ON students;
+CREATE TRIGGER students_change_log AFTER INSERT OR UPDATE OR DELETE ON students
+    FOR EACH ROW EXECUTE PROCEDURE log_change('student_id');
+
+DROP TRIGGER IF EXISTS instructors_change_log ON instructors;
+CREATE TRIGGER instructors_change_log AFTER INSERT OR UPDATE OR DELETE ON instructors
+    FOR EACH ROW EXECUTE PROCEDURE log_change('instructor_id');
+
+DROP TRIGGER IF EXISTS courses_change_log ON courses;
+CREATE TRIGGER courses_change_log AFTER INSERT OR UPDATE OR DELETE ON courses
+    FOR EACH ROW EXECUTE PROCEDURE log_change('course_id');
+
+DROP TRIGGER IF EXISTS registrations_change_log ON registrations;
+CREATE TRIGGER registrations_change_log AFTER INSERT OR UPDATE OR DELETE ON registrations
+    FOR EACH ROW EXECUTE PROCEDURE log_change('registration_id');
+
+DROP TRIGGER IF EXISTS instructor_courses_change_log ON instructor_courses;
+CREATE TRIGGER instructor_courses_change_log AFTER INSERT OR UPDATE OR DELETE ON instructor_courses
+    FOR EACH ROW EXECUTE PROCEDURE log_change('instructor_id', 'course_id');
+
+COMMIT;
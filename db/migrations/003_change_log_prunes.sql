@@ -0,0 +1,23 @@
+-- Record how far change_log has been pruned (see pg_backup.incremental_backup).
+--
+-- Every incremental backup deletes the log entries its parent backup already
+-- covers, and a restore clears the log. Both record the snapshot up to which
+-- entries are gone in change_log_prunes, so an incremental backup whose parent
+-- was taken before that point is refused instead of silently missing changes.
+-- Prunes made before this migration were not recorded; take a new full backup
+-- after running it.
+--
+-- Re-running this migration is harmless.
+--
+-- Usage:
+--     psql -d Lab_2_435L_tkinter -f db/migrations/003_change_log_prunes.sql
+
+BEGIN;
+
+CREATE TABLE IF NOT EXISTS change_log_prunes (
+    prune_id BIGSERIAL PRIMARY KEY,
+    snapshot txid_snapshot NOT NULL,   -- entries visible in this snapshot are gone
+    pruned_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+COMMIT;
@@ -0,0 +1,27 @@
+-- One registration per student and course.
+--
+-- Removes repeated (student_id, course_id) rows, keeping the oldest, and adds
+-- a unique index on the pair, so the database rejects duplicates that two
+-- concurrent enrollments could otherwise both insert. The index leads with
+-- student_id, so it also replaces registrations_student_id_idx.
+--
+-- Re-running this migration is harmless.
+--
+-- Usage:
+--     psql -d Lab_2_435L_tkinter -f db/migrations/004_unique_registrations.sql
+
+BEGIN;
+
+LOCK TABLE registrations IN SHARE ROW EXCLUSIVE MODE;
+
+DELETE FROM registrations r
+USING registrations earlier
+WHERE earlier.student_id = r.student_id
+  AND earlier.course_id = r.course_id
+  AND earlier.registration_id < r.registration_id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS registrations_student_course_key
+    ON registrations (student_id, course_id);
+DROP INDEX IF EXISTS registrations_student_id_idx;
+
+COMMIT;
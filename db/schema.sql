@@ -0,0 +1,66 @@
+-- PostgreSQL schema for the Tkinter School Management System.
+--
+-- Every key column is VARCHAR(50) on both sides of each foreign key, so the
+-- application can compare keys without casts and the planner can use the
+-- primary key and foreign key indexes below.  Child rows in `registrations`
+-- and `instructor_courses` are removed (or re-keyed) by the database through
+-- ON DELETE / ON UPDATE CASCADE, so deleting a student, instructor or course
+-- is a single indexed DELETE.
+--
+-- Usage:
+--     psql -d Lab_2_435L_tkinter -f db/schema.sql
+--
+-- To upgrade an existing database in place, run the scripts in
+-- db/migrations/ in order instead.
+
+CREATE TABLE IF NOT EXISTS students (
+    student_id VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(100),
+    age INTEGER,
+    email VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS instructors (
+    instructor_id VARCHAR(50) PRIMARY KEY,
+    name VARCHAR(100),
+    age INTEGER,
+    email VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS courses (
+    course_id VARCHAR(50) PRIMARY KEY,
+    course_name VARCHAR(100)
+);
+
+CREATE TABLE IF NOT EXISTS registrations (
+    registration_id SERIAL PRIMARY KEY,
+    student_id VARCHAR(50) NOT NULL
+        REFERENCES students(student_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    course_id VARCHAR(50) NOT NULL
+        REFERENCES courses(course_id) ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+CREATE TABLE IF NOT EXISTS instructor_courses (
+    instructor_id VARCHAR(50)
+        REFERENCES instructors(instructor_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    course_id VARCHAR(50)
+        REFERENCES courses(course_id) ON DELETE CASCADE ON UPDATE CASCADE,
+    PRIMARY KEY (instructor_id, course_id)
+);
+
+-- Foreign key columns are not indexed automatically in PostgreSQL.  Without
+-- these, every cascaded delete from a parent table scans the child table.
+-- registrations_student_course_key (migration 004) covers student_id.
+CREATE INDEX IF NOT EXISTS registrations_course_id_idx ON registrations (course_id);
+-- instructor_id is already the leading column of the primary key.
+CREATE INDEX IF NOT EXISTS instructor_courses_course_id_idx ON instructor_courses (course_id);
+
+-- add_student/add_instructor resolve the selected course by name.
+CREATE INDEX IF NOT EXISTS courses_course_name_idx ON courses (course_name);
+
+-- Change tracking for incremental backups.
+\ir migrations/002_change_log.sql
+\ir migrations/003_change_log_prunes.sql
+
+-- One registration per student and course.
+\ir migrations/004_unique_registrations.sql
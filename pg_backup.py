@@ -0,0 +1,863 @@
+import bz2
+import datetime
+import gzip
+import hashlib
+import json
+import lzma
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2 import extensions, pool, sql
+from psycopg2.extras import execute_values
+
+from pg_stream import stream_rows
+
+# Tables covered by a backup, in load order (parents before children), with
+# the columns that are copied for each of them.
+BACKUP_TABLES = [
+    ("students", ("student_id", "name", "age", "email")),
+    ("instructors", ("instructor_id", "name", "age", "email")),
+    ("courses", ("course_id", "course_name")),
+    ("registrations", ("registration_id", "student_id", "course_id")),
+    ("instructor_courses", ("instructor_id", "course_id")),
+]
+
+MANIFEST_NAME = "manifest.json"
+COPY_FORMAT_VERSION = 1
+JSONL_FORMAT_VERSION = 1
+
+# Top-level keys of the original single-file JSON backup and the tables they hold.
+LEGACY_JSON_KEYS = {
+    "students": "students",
+    "instructors": "instructors",
+    "courses": "courses",
+    "registrations": "registrations",
+    "assignments": "instructor_courses",
+}
+
+# Primary key columns of each table, used to replay incremental changes.
+TABLE_KEYS = {
+    "students": ("student_id",),
+    "instructors": ("instructor_id",),
+    "courses": ("course_id",),
+    "registrations": ("registration_id",),
+    "instructor_courses": ("instructor_id", "course_id"),
+}
+
+# Supported compression schemes: name -> (opener, file suffix).
+COMPRESSIONS = {
+    None: (open, ""),
+    "gzip": (lambda path, mode: gzip.open(path, mode, compresslevel=6), ".gz"),
+    "bz2": (bz2.open, ".bz2"),
+    "xz": (lzma.open, ".xz"),
+}
+
+
+def open_compressed(path, mode, compression=None):
+    """
+    Opens a file for binary reading or writing with optional compression.
+
+    Args:
+        path (str): Path of the file.
+        mode (str): 'rb' or 'wb'.
+        compression (str, optional): One of the keys of COMPRESSIONS.
+
+    Returns:
+        file object: A binary file object.
+
+    Raises:
+        ValueError: If the compression scheme is unknown.
+    """
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    opener, _ = COMPRESSIONS[compression]
+    return opener(path, mode)
+
+
+def _table_file_name(table, compression):
+    """
+    Returns the file name used for a table's COPY data inside a backup directory.
+    """
+    return f"{table}.copy{COMPRESSIONS[compression][1]}"
+
+
+def _copy_table_out(cur, table, columns, path, compression):
+    """
+    Streams one table to a file with COPY ... TO STDOUT.
+
+    Returns:
+        dict: Row count, bytes written and elapsed seconds for the table.
+    """
+    started = time.perf_counter()
+    statement = sql.SQL("COPY {} ({}) TO STDOUT").format(
+        sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns)))
+    with open_compressed(path, "wb", compression) as out:
+        cur.copy_expert(statement, out)
+    return {
+        "name": table,
+        "columns": list(columns),
+        "file": os.path.basename(path),
+        "rows": cur.rowcount,
+        "bytes": os.path.getsize(path),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+def _write_manifest(target_dir, manifest):
+    """
+    Writes the manifest describing a backup directory.
+    """
+    with open(os.path.join(target_dir, MANIFEST_NAME), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=4)
+
+
+def read_manifest(source_dir):
+    """
+    Reads the manifest of a backup directory.
+
+    Args:
+        source_dir (str): The backup directory.
+
+    Returns:
+        dict: The parsed manifest.
+    """
+    with open(os.path.join(source_dir, MANIFEST_NAME)) as manifest_file:
+        return json.load(manifest_file)
+
+
+def copy_backup(conn, target_dir, compression=None):
+    """
+    Backs up all five tables into a directory using COPY TO STDOUT.
+
+    Each table is streamed by the server straight into its own (optionally
+    compressed) file, with no per-row Python work. All tables are read in one
+    REPEATABLE READ transaction. A `manifest.json` records the table order,
+    columns, row counts, sizes, timings and the transaction snapshot, which
+    `incremental_backup` uses as the starting point of the next backup.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        target_dir (str): Directory to write the backup into. Created if missing.
+        compression (str, optional): None, "gzip", "bz2" or "xz".
+
+    Returns:
+        dict: The manifest, including per-table and total timings.
+
+    Note:
+        The backup only reads, and the connection's transaction is rolled back
+        once all tables have been copied.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    started = time.perf_counter()
+    tables = []
+    conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+    try:
+        with conn.cursor() as cur:
+            txid_snapshot = _current_txid_snapshot(cur)
+            for table, columns in BACKUP_TABLES:
+                path = os.path.join(target_dir, _table_file_name(table, compression))
+                tables.append(_copy_table_out(cur, table, columns, path, compression))
+    finally:
+        conn.rollback()  # Read-only work; end the transaction
+        conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_DEFAULT, readonly=False)
+
+    manifest = _build_manifest(compression, tables, started, txid_snapshot=txid_snapshot)
+    _write_manifest(target_dir, manifest)
+    return manifest
+
+
+def _current_txid_snapshot(cur):
+    """
+    Returns the snapshot of the current transaction in txid_snapshot text form.
+    """
+    cur.execute("SELECT txid_current_snapshot()::text;")
+    return cur.fetchone()[0]
+
+
+# True when every transaction visible in snapshot {older} is also visible in
+# {newer}, i.e. {newer} was taken at or after {older}.
+_SNAPSHOT_COVERS = """
+    (txid_snapshot_xmax({older}) <= txid_snapshot_xmax({newer})
+     AND NOT EXISTS (SELECT 1 FROM txid_snapshot_xip({newer}) xip
+                     WHERE txid_visible_in_snapshot(xip, {older})))
+"""
+
+
+def _record_prune(cur, snapshot):
+    """
+    Records that the change log entries visible in `snapshot` are gone.
+
+    Entries of earlier prunes that this one covers are dropped, so
+    `change_log_prunes` stays small.
+    """
+    cur.execute("DELETE FROM change_log_prunes WHERE " + _SNAPSHOT_COVERS.format(
+        older="snapshot", newer="%(snapshot)s::txid_snapshot") + ";", {"snapshot": snapshot})
+    cur.execute("INSERT INTO change_log_prunes (snapshot) VALUES (%s::txid_snapshot);", (snapshot,))
+
+
+def _check_not_pruned(cur, parent_snapshot):
+    """
+    Refuses a parent backup whose changes may already have been pruned.
+
+    Raises:
+        ValueError: If `change_log_prunes` is missing, or the change log was
+            pruned past the parent's snapshot (by another incremental backup
+            taken from a later parent, or by a restore).
+    """
+    cur.execute("SELECT to_regclass('change_log_prunes') IS NOT NULL;")
+    if not cur.fetchone()[0]:
+        raise ValueError("Incremental backups need db/migrations/003_change_log_prunes.sql; "
+                         "run it and take a new full backup.")
+    cur.execute("SELECT pruned_at FROM change_log_prunes WHERE NOT " + _SNAPSHOT_COVERS.format(
+        older="snapshot", newer="%(parent)s::txid_snapshot") + " ORDER BY pruned_at DESC LIMIT 1;",
+        {"parent": parent_snapshot})
+    row = cur.fetchone()
+    if row:
+        raise ValueError(f"The change log was pruned past the parent backup on {row[0]:%Y-%m-%d %H:%M}, "
+                         "so changes made since the parent are missing; choose a later parent or take "
+                         "a new full backup.")
+
+
+def _build_manifest(compression, tables, started, **extra):
+    """
+    Assembles the manifest written next to the table files of a backup.
+    """
+    manifest = {
+        "format": "pg-copy",
+        "version": COPY_FORMAT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "compression": compression,
+        "tables": tables,
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    manifest.update(extra)
+    return manifest
+
+
+def _copy_table_in_snapshot(connection_pool, snapshot_id, table, columns, path, compression):
+    """
+    Copies one table on a pooled connection that has imported the given snapshot.
+    """
+    conn = connection_pool.getconn()
+    try:
+        conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+        with conn.cursor() as cur:
+            # Must be the first statement of the transaction.
+            cur.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot_id,))
+            return _copy_table_out(cur, table, columns, path, compression)
+    finally:
+        conn.rollback()
+        conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_DEFAULT, readonly=False)
+        connection_pool.putconn(conn)
+
+
+def snapshot_backup(conn_params, target_dir, compression=None, workers=None):
+    """
+    Backs up all five tables in parallel from a single consistent snapshot.
+
+    A leader connection opens a REPEATABLE READ transaction and exports its
+    snapshot with `pg_export_snapshot()`. Worker connections from a pool import
+    that snapshot and COPY one table each, writing their files concurrently.
+    Every table therefore reflects exactly the same moment in time, so no
+    registration can reference a student added after the students table was read.
+
+    The output directory has the same layout as `copy_backup` and is restored
+    with `copy_restore`.
+
+    Args:
+        conn_params (dict): Keyword arguments for `psycopg2.connect`.
+        target_dir (str): Directory to write the backup into. Created if missing.
+        compression (str, optional): None, "gzip", "bz2" or "xz".
+        workers (int, optional): Number of tables copied at once. Defaults to one per table.
+
+    Returns:
+        dict: The manifest, including the snapshot ID and per-table timings.
+    """
+    workers = workers or len(BACKUP_TABLES)
+    os.makedirs(target_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    # One extra connection for the leader, which holds the snapshot open.
+    connection_pool = pool.ThreadedConnectionPool(1, workers + 1, **conn_params)
+    leader = connection_pool.getconn()
+    try:
+        leader.set_session(isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+        with leader.cursor() as cur:
+            cur.execute("SELECT pg_export_snapshot();")
+            snapshot_id = cur.fetchone()[0]
+            txid_snapshot = _current_txid_snapshot(cur)
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_copy_table_in_snapshot, connection_pool, snapshot_id, table, columns,
+                                os.path.join(target_dir, _table_file_name(table, compression)), compression)
+                for table, columns in BACKUP_TABLES
+            ]
+            tables = [future.result() for future in futures]
+        leader.rollback()
+    finally:
+        connection_pool.closeall()
+
+    manifest = _build_manifest(compression, tables, started, snapshot=snapshot_id, workers=workers,
+                               txid_snapshot=txid_snapshot)
+    _write_manifest(target_dir, manifest)
+    return manifest
+
+
+def _table_oids(cur, tables):
+    """
+    Resolves table names to OIDs for catalog queries.
+    """
+    cur.execute("SELECT oid FROM pg_class WHERE relname = ANY(%s) AND relkind = 'r' "
+                "AND relnamespace = 'public'::regnamespace;", (list(tables),))
+    return [row[0] for row in cur.fetchall()]
+
+
+def _drop_constraints_and_indexes(cur, tables):
+    """
+    Drops the keys, foreign keys and secondary indexes on the given tables.
+
+    Loading into bare tables and building each index once afterwards is much
+    faster than maintaining the indexes row by row during the load.
+
+    Returns:
+        dict: The definitions needed by `_rebuild_constraints_and_indexes`.
+    """
+    oids = _table_oids(cur, tables)
+
+    cur.execute("""
+        SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid), contype
+        FROM pg_constraint
+        WHERE (conrelid = ANY(%s) OR confrelid = ANY(%s)) AND contype IN ('p', 'u', 'f');
+    """, (oids, oids))
+    constraints = cur.fetchall()
+
+    cur.execute("""
+        SELECT i.indexrelid::regclass::text, pg_get_indexdef(i.indexrelid)
+        FROM pg_index i
+        WHERE i.indrelid = ANY(%s)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid);
+    """, (oids,))
+    indexes = cur.fetchall()
+
+    # Foreign keys first, since they depend on the primary/unique keys.
+    for table, name, _, _ in sorted(constraints, key=lambda c: c[3] != "f"):
+        cur.execute(sql.SQL("ALTER TABLE {} DROP CONSTRAINT IF EXISTS {};").format(
+            sql.SQL(table), sql.Identifier(name)))
+    for name, _ in indexes:
+        cur.execute(sql.SQL("DROP INDEX IF EXISTS {};").format(sql.SQL(name)))
+
+    return {"constraints": constraints, "indexes": indexes}
+
+
+def _rebuild_constraints_and_indexes(cur, saved):
+    """
+    Recreates what `_drop_constraints_and_indexes` removed.
+    """
+    keys = [c for c in saved["constraints"] if c[3] != "f"]
+    foreign_keys = [c for c in saved["constraints"] if c[3] == "f"]
+    for table, name, definition, _ in keys:
+        cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {};").format(
+            sql.SQL(table), sql.Identifier(name), sql.SQL(definition)))
+    for _, definition in saved["indexes"]:
+        cur.execute(definition)
+    for table, name, definition, _ in foreign_keys:
+        cur.execute(sql.SQL("ALTER TABLE {} ADD CONSTRAINT {} {};").format(
+            sql.SQL(table), sql.Identifier(name), sql.SQL(definition)))
+
+
+def _set_change_tracking(cur, tables, enabled):
+    """
+    Enables or disables the user triggers (the change log) on the given tables.
+
+    Restores disable them so bulk loads do not flood `change_log`. Re-enabling
+    them also clears the log: a restored database starts a new backup chain,
+    which must begin with a full backup. The clearing is recorded as a prune,
+    so incremental backups refuse parents taken before the restore.
+    """
+    action = "ENABLE" if enabled else "DISABLE"
+    for table in tables:
+        cur.execute(sql.SQL("ALTER TABLE {} " + action + " TRIGGER USER;").format(sql.Identifier(table)))
+    if enabled:
+        cur.execute("SELECT to_regclass('change_log') IS NOT NULL, to_regclass('change_log_prunes') IS NOT NULL;")
+        has_log, has_prunes = cur.fetchone()
+        if has_log:
+            cur.execute("TRUNCATE change_log;")
+        if has_prunes:
+            _record_prune(cur, _current_txid_snapshot(cur))
+
+
+def _reset_sequences(cur):
+    """
+    Moves the registration_id sequence past the restored IDs.
+    """
+    cur.execute("""
+        SELECT setval(pg_get_serial_sequence('registrations', 'registration_id'),
+                      COALESCE(MAX(registration_id), 1), MAX(registration_id) IS NOT NULL)
+        FROM registrations;
+    """)
+
+
+def copy_restore(conn, source_dir, maintenance_work_mem="256MB", commit=True):
+    """
+    Restores a backup written by `copy_backup`, replacing the current data.
+
+    The restore runs in a single transaction: the tables are truncated, their
+    keys and indexes dropped, the data bulk loaded with COPY FROM STDIN and the
+    keys and indexes rebuilt once at the end. Either everything is restored or
+    nothing changes.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        source_dir (str): Directory holding the backup.
+        maintenance_work_mem (str): Memory PostgreSQL may use for each index build.
+        commit (bool): Commit when done. With False the transaction is left
+            open for the caller to continue and commit (it is still rolled
+            back on failure).
+
+    Returns:
+        dict: Per-table row counts and timings plus phase timings.
+    """
+    manifest = read_manifest(source_dir)
+    compression = manifest.get("compression")
+    table_names = [table["name"] for table in manifest["tables"]]
+    report = {"tables": [], "phases": {}}
+    started = time.perf_counter()
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SET LOCAL maintenance_work_mem = %s;", (maintenance_work_mem,))
+
+            phase = time.perf_counter()
+            saved = _drop_constraints_and_indexes(cur, table_names)
+            _set_change_tracking(cur, table_names, enabled=False)
+            cur.execute(sql.SQL("TRUNCATE {};").format(
+                sql.SQL(", ").join(map(sql.Identifier, table_names))))
+            report["phases"]["prepare"] = round(time.perf_counter() - phase, 3)
+
+            phase = time.perf_counter()
+            for table in manifest["tables"]:
+                table_started = time.perf_counter()
+                statement = sql.SQL("COPY {} ({}) FROM STDIN").format(
+                    sql.Identifier(table["name"]),
+                    sql.SQL(", ").join(map(sql.Identifier, table["columns"])))
+                with open_compressed(os.path.join(source_dir, table["file"]), "rb", compression) as data:
+                    cur.copy_expert(statement, data)
+                report["tables"].append({
+                    "name": table["name"],
+                    "rows": cur.rowcount,
+                    "seconds": round(time.perf_counter() - table_started, 3),
+                })
+            report["phases"]["load"] = round(time.perf_counter() - phase, 3)
+
+            phase = time.perf_counter()
+            _rebuild_constraints_and_indexes(cur, saved)
+            _reset_sequences(cur)
+            _set_change_tracking(cur, table_names, enabled=True)
+            report["phases"]["index"] = round(time.perf_counter() - phase, 3)
+
+            for table in table_names:
+                cur.execute(sql.SQL("ANALYZE {};").format(sql.Identifier(table)))
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+# ----------------- JSON Lines backups -----------------
+
+
+def _write_jsonl_table(rows, path, compression):
+    """
+    Writes rows to a JSON Lines file, one JSON array per row.
+
+    Args:
+        rows (iterable): The rows to write; consumed incrementally.
+        path (str): Destination file.
+        compression (str, optional): One of the keys of COMPRESSIONS.
+
+    Returns:
+        tuple: (row count, SHA-256 hex digest of the uncompressed content).
+    """
+    digest = hashlib.sha256()
+    row_count = 0
+    with open_compressed(path, "wb", compression) as out:
+        for row in rows:
+            line = (json.dumps(row, separators=(",", ":"), default=str) + "\n").encode("utf-8")
+            digest.update(line)
+            out.write(line)
+            row_count += 1
+    return row_count, digest.hexdigest()
+
+
+def _read_jsonl_table(path, compression, expected_rows, expected_sha256):
+    """
+    Yields the rows of a JSON Lines table file and verifies it once exhausted.
+
+    Raises:
+        ValueError: If the row count or checksum does not match the manifest.
+    """
+    digest = hashlib.sha256()
+    row_count = 0
+    with open_compressed(path, "rb", compression) as data:
+        for line in data:
+            digest.update(line)
+            row_count += 1
+            yield json.loads(line)
+    if row_count != expected_rows or digest.hexdigest() != expected_sha256:
+        raise ValueError(f"Backup file {os.path.basename(path)} is corrupt or incomplete.")
+
+
+def jsonl_backup(conn, target_dir, compression="gzip"):
+    """
+    Backs up all five tables as compressed JSON Lines files.
+
+    Rows are streamed from server-side cursors and written one line at a time,
+    so memory use is constant regardless of table size. All tables are read in a
+    single REPEATABLE READ transaction. `manifest.json` lists each table's
+    columns, row count and SHA-256 checksum.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        target_dir (str): Directory to write the backup into. Created if missing.
+        compression (str, optional): None, "gzip", "bz2" or "xz".
+
+    Returns:
+        dict: The manifest.
+    """
+    os.makedirs(target_dir, exist_ok=True)
+    started = time.perf_counter()
+    conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+    tables = []
+    try:
+        with conn.cursor() as cur:
+            txid_snapshot = _current_txid_snapshot(cur)
+        for table, columns in BACKUP_TABLES:
+            table_started = time.perf_counter()
+            file_name = f"{table}.jsonl{COMPRESSIONS[compression][1]}"
+            path = os.path.join(target_dir, file_name)
+            query = sql.SQL("SELECT {} FROM {}").format(
+                sql.SQL(", ").join(map(sql.Identifier, columns)), sql.Identifier(table))
+            row_count, checksum = _write_jsonl_table(stream_rows(conn, query), path, compression)
+            tables.append({
+                "name": table,
+                "columns": list(columns),
+                "file": file_name,
+                "rows": row_count,
+                "sha256": checksum,
+                "bytes": os.path.getsize(path),
+                "seconds": round(time.perf_counter() - table_started, 3),
+            })
+    finally:
+        conn.rollback()
+        conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_DEFAULT, readonly=False)
+
+    manifest = _build_manifest(compression, tables, started, txid_snapshot=txid_snapshot)
+    manifest.update({"format": "jsonl", "version": JSONL_FORMAT_VERSION})
+    _write_manifest(target_dir, manifest)
+    return manifest
+
+
+def iter_backup_tables(path):
+    """
+    Reads a JSON Lines backup directory or an original single-file JSON backup.
+
+    Args:
+        path (str): A backup directory, its `manifest.json`, or a `.json` backup
+            file written by the original `backup_database`.
+
+    Yields:
+        tuple: (table name, column names, iterable of row tuples/lists).
+    """
+    if os.path.basename(path) == MANIFEST_NAME:
+        path = os.path.dirname(path)
+
+    if os.path.isdir(path):
+        manifest = read_manifest(path)
+        if manifest.get("format") != "jsonl":
+            raise ValueError("Not a JSON Lines backup; use copy_restore for COPY backups.")
+        for table in manifest["tables"]:
+            rows = _read_jsonl_table(os.path.join(path, table["file"]), manifest.get("compression"),
+                                     table["rows"], table["sha256"])
+            yield table["name"], table["columns"], rows
+        return
+
+    # Original format: one JSON object holding a list of records per table.
+    with open(path) as backup_file:
+        backup_data = json.load(backup_file)
+    for key, table in LEGACY_JSON_KEYS.items():
+        records = backup_data.get(key, [])
+        if records:
+            columns = list(records[0].keys())
+            yield table, columns, ([record[column] for column in columns] for record in records)
+
+
+def json_restore(conn, path, page_size=1000, commit=True):
+    """
+    Restores a JSON Lines backup or an original JSON backup, replacing the current data.
+
+    Rows are inserted with multi-row INSERT statements in pages of `page_size`
+    inside one transaction; checksums are verified before the transaction commits.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        path (str): See `iter_backup_tables`.
+        page_size (int): Rows per INSERT statement.
+        commit (bool): Commit when done; see `copy_restore`.
+
+    Returns:
+        dict: Per-table row counts and total time.
+    """
+    started = time.perf_counter()
+    report = {"tables": []}
+    try:
+        with conn.cursor() as cur:
+            table_names = [table for table, _ in BACKUP_TABLES]
+            _set_change_tracking(cur, table_names, enabled=False)
+            cur.execute(sql.SQL("TRUNCATE {};").format(
+                sql.SQL(", ").join(map(sql.Identifier, table_names))))
+            for table, columns, rows in iter_backup_tables(path):
+                statement = sql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+                    sql.Identifier(table), sql.SQL(", ").join(map(sql.Identifier, columns)))
+                row_count = 0
+                for page in _pages(rows, page_size):
+                    execute_values(cur, statement.as_string(cur), page, page_size=page_size)
+                    row_count += len(page)
+                report["tables"].append({"name": table, "rows": row_count})
+            _reset_sequences(cur)
+            _set_change_tracking(cur, table_names, enabled=True)
+        if commit:
+            conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def _pages(rows, page_size):
+    """
+    Groups an iterable of rows into lists of at most `page_size` rows.
+    """
+    page = []
+    for row in rows:
+        page.append(row)
+        if len(page) == page_size:
+            yield page
+            page = []
+    if page:
+        yield page
+
+
+# ----------------- Incremental backups -----------------
+
+
+def _resolve_parent(backup_dir, manifest):
+    """
+    Returns the absolute directory of an incremental backup's parent.
+    """
+    return os.path.normpath(os.path.join(backup_dir, manifest["parent"]))
+
+
+def incremental_backup(conn, target_dir, parent_dir, compression="gzip"):
+    """
+    Backs up only the changes made since a previous backup.
+
+    Requires the change log from `db/migrations/002_change_log.sql`. The parent
+    may be a full backup (`copy_backup`, `snapshot_backup` or `jsonl_backup`) or
+    another incremental backup; together they form a chain that `restore_backup`
+    replays in order. The changes written are those committed after the parent's
+    snapshot was taken, so the cost is proportional to the activity since then.
+
+    Once the changes are safely written, log entries already covered by the
+    parent are pruned, which keeps `change_log` small. The prune is recorded
+    in `change_log_prunes` (`db/migrations/003_change_log_prunes.sql`), and a
+    parent taken before the latest prune is refused: its changes are no
+    longer all in the log.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        target_dir (str): Directory to write the backup into. Created if missing.
+        parent_dir (str): Directory of the previous backup in the chain.
+        compression (str, optional): None, "gzip", "bz2" or "xz".
+
+    Returns:
+        dict: The manifest.
+
+    Raises:
+        ValueError: If the parent backup did not record a snapshot, or the
+            change log was pruned past it.
+    """
+    parent = read_manifest(parent_dir)
+    parent_snapshot = parent.get("txid_snapshot")
+    if not parent_snapshot:
+        raise ValueError("The parent backup has no snapshot; take a new full backup first.")
+
+    os.makedirs(target_dir, exist_ok=True)
+    started = time.perf_counter()
+    file_name = f"changes.jsonl{COMPRESSIONS[compression][1]}"
+    path = os.path.join(target_dir, file_name)
+
+    conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+    try:
+        with conn.cursor() as cur:
+            # Checked in the same snapshot the changes are read from
+            _check_not_pruned(cur, parent_snapshot)
+            txid_snapshot = _current_txid_snapshot(cur)
+        changes = stream_rows(conn, """
+            SELECT change_id, table_name, operation, row_key, row_data
+            FROM change_log
+            WHERE NOT txid_visible_in_snapshot(txid, %s::txid_snapshot)
+            ORDER BY change_id;
+        """, (parent_snapshot,))
+        row_count, checksum = _write_jsonl_table(changes, path, compression)
+    finally:
+        conn.rollback()
+        conn.set_session(isolation_level=extensions.ISOLATION_LEVEL_DEFAULT, readonly=False)
+
+    manifest = {
+        "format": "jsonl-incremental",
+        "version": JSONL_FORMAT_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "compression": compression,
+        "parent": os.path.relpath(os.path.abspath(parent_dir), os.path.abspath(target_dir)),
+        "txid_snapshot": txid_snapshot,
+        "changes": {"file": file_name, "rows": row_count, "sha256": checksum,
+                    "bytes": os.path.getsize(path)},
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+    _write_manifest(target_dir, manifest)
+
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DELETE FROM change_log WHERE txid_visible_in_snapshot(txid, %s::txid_snapshot);",
+                        (parent_snapshot,))
+            _record_prune(cur, parent_snapshot)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return manifest
+
+
+def _upsert_statement(table):
+    """
+    Builds an INSERT ... ON CONFLICT statement taking the row as a JSON document.
+    """
+    keys = TABLE_KEYS[table]
+    columns = dict(BACKUP_TABLES)[table]
+    others = [column for column in columns if column not in keys]
+    if others:
+        conflict = sql.SQL("DO UPDATE SET {}").format(sql.SQL(", ").join(
+            sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column)) for column in others))
+    else:
+        conflict = sql.SQL("DO NOTHING")
+    column_list = sql.SQL(", ").join(map(sql.Identifier, columns))
+    return sql.SQL("INSERT INTO {table} ({columns}) SELECT {columns} "
+                   "FROM jsonb_populate_record(NULL::{table}, %s::jsonb) "
+                   "ON CONFLICT ({keys}) {conflict};").format(
+        table=sql.Identifier(table), columns=column_list,
+        keys=sql.SQL(", ").join(map(sql.Identifier, keys)), conflict=conflict)
+
+
+def _key_condition(table):
+    """
+    Builds the `key = %s AND ...` condition for a table's primary key.
+    """
+    return sql.SQL(" AND ").join(
+        sql.SQL("{} = %s").format(sql.Identifier(key)) for key in TABLE_KEYS[table])
+
+
+def _replay_changes(cur, changes):
+    """
+    Applies change log entries, in order, to the current tables.
+
+    Inserts become upserts, updates are applied by the row's previous key (so
+    key changes cascade as they did originally) and deletes remove the row.
+    """
+    applied = 0
+    for _, table, operation, row_key, row_data in changes:
+        key_values = [row_key[key] for key in TABLE_KEYS[table]]
+        if operation == "D":
+            cur.execute(sql.SQL("DELETE FROM {} WHERE {};").format(
+                sql.Identifier(table), _key_condition(table)), key_values)
+        else:
+            if operation == "U":
+                columns = sql.SQL(", ").join(map(sql.Identifier, dict(BACKUP_TABLES)[table]))
+                cur.execute(sql.SQL("UPDATE {table} SET ({columns}) = (SELECT {columns} "
+                                    "FROM jsonb_populate_record(NULL::{table}, %s::jsonb)) "
+                                    "WHERE {condition};").format(
+                    table=sql.Identifier(table), columns=columns, condition=_key_condition(table)),
+                    [json.dumps(row_data)] + key_values)
+            if operation == "I" or cur.rowcount == 0:
+                cur.execute(_upsert_statement(table), (json.dumps(row_data),))
+        applied += 1
+    return applied
+
+
+def restore_backup(conn, path):
+    """
+    Restores any backup written by this module, replacing the current data.
+
+    An incremental backup is restored by loading the full backup its chain
+    starts from and replaying every incremental backup in order, all in one
+    transaction: if any step fails, the database is left unchanged.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        path (str): A backup directory, its `manifest.json`, or a `.json` file
+            in the original single-file format.
+
+    Returns:
+        dict: Per-table row counts and timings. For incremental chains,
+        `incrementals` lists the number of changes replayed from each backup.
+    """
+    if os.path.basename(path) == MANIFEST_NAME:
+        path = os.path.dirname(path)
+    if not os.path.isdir(path):
+        return json_restore(conn, path)
+
+    # Walk back from the chosen backup to the full backup the chain starts from.
+    chain = []
+    manifest = read_manifest(path)
+    while manifest["format"] == "jsonl-incremental":
+        chain.append((path, manifest))
+        path = _resolve_parent(path, manifest)
+        manifest = read_manifest(path)
+
+    # The full backup and the incremental backups are restored in one
+    # transaction, committed only once the whole chain has been replayed.
+    if manifest["format"] == "pg-copy":
+        report = copy_restore(conn, path, commit=not chain)
+    else:
+        report = json_restore(conn, path, commit=not chain)
+    if not chain:
+        return report
+
+    # Replay the incremental backups, oldest first.
+    started = time.perf_counter()
+    table_names = [table for table, _ in BACKUP_TABLES]
+    report["incrementals"] = []
+    try:
+        with conn.cursor() as cur:
+            _set_change_tracking(cur, table_names, enabled=False)
+            for backup_dir, incremental in reversed(chain):
+                changes = incremental["changes"]
+                rows = _read_jsonl_table(os.path.join(backup_dir, changes["file"]),
+                                         incremental.get("compression"), changes["rows"], changes["sha256"])
+                report["incrementals"].append({"backup": backup_dir, "changes": _replay_changes(cur, rows)})
+            _reset_sequences(cur)
+            _set_change_tracking(cur, table_names, enabled=True)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    report["seconds"] = round(report["seconds"] + time.perf_counter() - started, 3)
+    return report
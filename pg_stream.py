@@ -0,0 +1,78 @@
+import os
+import uuid
+
+# Number of rows fetched per network round trip by the server-side cursors.
+# Can be overridden with the SCHOOL_STREAM_ITERSIZE environment variable.
+DEFAULT_ITERSIZE = int(os.environ.get("SCHOOL_STREAM_ITERSIZE", "2000"))
+
+
+def _named_cursor(conn, itersize):
+    """
+    Opens a server-side (named) cursor on the given connection.
+
+    Args:
+        conn (psycopg2.connection): An open connection. Named cursors only live
+            inside a transaction, so the connection must not be in autocommit mode.
+        itersize (int): Number of rows the cursor fetches per round trip.
+
+    Returns:
+        psycopg2.cursor: The named cursor.
+    """
+    cur = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+    cur.itersize = itersize
+    return cur
+
+
+def stream_rows(conn, query, params=None, itersize=None):
+    """
+    Runs a query on a server-side cursor and yields its rows one at a time.
+
+    Only `itersize` rows are held in client memory at once, so peak memory does
+    not grow with the size of the result set and the first rows are available
+    as soon as the server produces them.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        query (str): The SELECT statement to run.
+        params (tuple, optional): Query parameters.
+        itersize (int, optional): Rows fetched per round trip. Defaults to DEFAULT_ITERSIZE.
+
+    Yields:
+        tuple: One result row.
+    """
+    cur = _named_cursor(conn, itersize or DEFAULT_ITERSIZE)
+    try:
+        cur.execute(query, params)
+        for row in cur:
+            yield row
+    finally:
+        cur.close()
+
+
+def stream_batches(conn, query, params=None, itersize=None):
+    """
+    Runs a query on a server-side cursor and yields its rows in batches.
+
+    Useful for consumers that want to do some work per batch, such as letting
+    the UI repaint after each chunk of rows has been inserted.
+
+    Args:
+        conn (psycopg2.connection): An open connection.
+        query (str): The SELECT statement to run.
+        params (tuple, optional): Query parameters.
+        itersize (int, optional): Rows per batch. Defaults to DEFAULT_ITERSIZE.
+
+    Yields:
+        list: Up to `itersize` result rows.
+    """
+    itersize = itersize or DEFAULT_ITERSIZE
+    cur = _named_cursor(conn, itersize)
+    try:
+        cur.execute(query, params)
+        while True:
+            rows = cur.fetchmany(itersize)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cur.close()
@@ -0,0 +1,326 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import instrumentation
+import operations
+from writer import WriteQueue
+
+# Rows fetched per step by the async iterators.
+DEFAULT_BATCH_SIZE = 500
+
+
+class AsyncOperations:
+    """
+    The operations of `operations.py` as coroutines, for asyncio code.
+
+    Reads run on a dedicated thread pool of `max_workers` threads, each with
+    its own persistent connection, so they never block the event loop and
+    never compete with other parts of the program for threads. Writes are
+    submitted to a `writer.WriteQueue` and awaited through its future, so a
+    pending write occupies no thread at all and concurrent writes share group
+    commits. At most `max_pending` operations are in flight at once; further
+    callers wait, which keeps a burst of requests from queueing without bound.
+
+    Every function of operations.py is available under the same name and
+    arguments (without `conn`). Searching is `get_record_page`/`iter_records`
+    with a `prefix`. Large result sets can be read with the `iter_*` async
+    iterators, which yield lists of rows.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Database file (default: `operations.DB_PATH`). The schema must be
+        migrated already (see `db.schema.migrate`).
+    max_workers : int, optional
+        Threads (and read connections) of the executor (default 4).
+    max_pending : int, optional
+        Most operations in flight at once (default 64).
+    writer : writer.WriteQueue, optional
+        Write queue to share; one is started (and closed) when none is given.
+
+    Examples
+    --------
+    >>> async def main():
+    ...     async with AsyncOperations("school_management.db") as ops:
+    ...         student = await ops.add_student("S1", "Alice", 20, "alice@example.com")
+    ...         async for rows in ops.iter_records(prefix="ali"):
+    ...             print(rows)
+    >>> asyncio.run(main())
+    """
+
+    def __init__(self, db_path=None, max_workers=4, max_pending=64, writer=None):
+        self.db_path = db_path or operations.DB_PATH
+        self._owns_writer = writer is None
+        self.writer = writer or WriteQueue(self.db_path)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-operations")
+        self._pending = asyncio.Semaphore(max_pending)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    def _connect(self):
+        # check_same_thread=False only so that `close` can close it from
+        # another thread; each connection is used by its own executor thread
+        return instrumentation.connect(self.db_path, timeout=30, check_same_thread=False)
+
+    def _connection(self):
+        """
+        Returns the calling executor thread's read connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _call(self, func, args, kwargs):
+        return func(*args, conn=self._connection(), **kwargs)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args))
+
+    async def _read(self, func, *args, **kwargs):
+        async with self._pending:
+            return await self._run(self._call, func, args, kwargs)
+
+    async def _write(self, func, *args, **kwargs):
+        async with self._pending:
+            return await asyncio.wrap_future(self.writer.submit(func, *args, **kwargs))
+
+    async def _iterate(self, query, params=(), batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Yields the rows of a query in lists of up to `batch_size`.
+
+        The query runs on its own connection so a slow consumer does not hold
+        up other reads; being one statement, it sees a single consistent
+        snapshot of the database however long it is consumed.
+        """
+        async with self._pending:
+            cursor = await self._run(lambda: self._connect().execute(query, params))
+        try:
+            while True:
+                async with self._pending:
+                    rows = await self._run(cursor.fetchmany, batch_size)
+                if not rows:
+                    return
+                yield rows
+        finally:
+            await self._run(cursor.connection.close)
+
+    # ----------------- Create Operations -----------------
+
+    async def add_student(self, student_id, name, age, email):
+        """See `operations.add_student`."""
+        return await self._write(operations.add_student, student_id, name, age, email)
+
+    async def add_instructor(self, instructor_id, name, age, email):
+        """See `operations.add_instructor`."""
+        return await self._write(operations.add_instructor, instructor_id, name, age, email)
+
+    async def add_course(self, course_id, course_name, capacity=None):
+        """See `operations.add_course`."""
+        return await self._write(operations.add_course, course_id, course_name, capacity)
+
+    async def add_students(self, rows):
+        """See `operations.add_students`."""
+        return await self._write(operations.add_students, list(rows))
+
+    async def add_instructors(self, rows):
+        """See `operations.add_instructors`."""
+        return await self._write(operations.add_instructors, list(rows))
+
+    async def add_courses(self, rows):
+        """See `operations.add_courses`."""
+        return await self._write(operations.add_courses, list(rows))
+
+    async def enroll_student(self, student_id, course_id, request_key=None):
+        """See `operations.enroll_student`."""
+        return await self._write(operations.enroll_student, student_id, course_id, request_key)
+
+    async def enroll_students(self, requests):
+        """See `operations.enroll_students`."""
+        return await self._write(operations.enroll_students, list(requests))
+
+    async def assign_instructor(self, instructor_id, course_id):
+        """See `operations.assign_instructor`."""
+        return await self._write(operations.assign_instructor, instructor_id, course_id)
+
+    # ----------------- Read Operations -----------------
+
+    async def get_students(self):
+        """See `operations.get_students`."""
+        return await self._read(operations.get_students)
+
+    async def get_instructors(self):
+        """See `operations.get_instructors`."""
+        return await self._read(operations.get_instructors)
+
+    async def get_courses(self):
+        """See `operations.get_courses`."""
+        return await self._read(operations.get_courses)
+
+    async def get_enrollments(self):
+        """See `operations.get_enrollments`."""
+        return await self._read(operations.get_enrollments)
+
+    async def get_waitlist(self, course_id):
+        """See `operations.get_waitlist`."""
+        return await self._read(operations.get_waitlist, course_id)
+
+    async def get_course_stats(self):
+        """See `operations.get_course_stats`."""
+        return await self._read(operations.get_course_stats)
+
+    async def get_instructor_stats(self):
+        """See `operations.get_instructor_stats`."""
+        return await self._read(operations.get_instructor_stats)
+
+    async def get_record_page(self, offset=0, limit=100, record_type=None, prefix=None, order_by='name',
+                              descending=False):
+        """See `operations.get_record_page`."""
+        return await self._read(operations.get_record_page, offset, limit, record_type, prefix, order_by,
+                                descending)
+
+    async def count_records(self, record_type=None, prefix=None):
+        """See `operations.count_records`."""
+        return await self._read(operations.count_records, record_type, prefix)
+
+    # ----------------- Streaming Reads -----------------
+
+    def iter_students(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Streams all students, like `get_students`.
+
+        Parameters
+        ----------
+        batch_size : int, optional
+            Rows per yielded list.
+
+        Returns
+        -------
+        async iterator of list
+            Lists of (id, student_id, name, age, email) tuples.
+        """
+        return self._iterate("SELECT id, student_id, name, age, email FROM students ORDER BY id", (), batch_size)
+
+    def iter_instructors(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Streams all instructors, like `get_instructors`.
+        """
+        return self._iterate("SELECT * FROM instructors ORDER BY id", (), batch_size)
+
+    def iter_courses(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Streams all courses, like `get_courses`.
+        """
+        return self._iterate("SELECT * FROM courses ORDER BY id", (), batch_size)
+
+    def iter_enrollments(self, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Streams (student_name, course_name) pairs, like `get_enrollments`.
+        """
+        return self._iterate('''SELECT students.name, courses.course_name FROM registrations
+                                JOIN students ON students.id = registrations.student_id
+                                JOIN courses ON courses.id = registrations.course_id
+                                ORDER BY registrations.student_id, registrations.course_id''', (), batch_size)
+
+    def iter_records(self, record_type=None, prefix=None, order_by='name', descending=False,
+                     batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Streams the whole sorted record list `get_record_page` pages through.
+
+        Parameters
+        ----------
+        record_type : str, optional
+            Only 'Student', 'Instructor' or 'Course' records.
+        prefix : str, optional
+            Only records whose name or ID starts with this text, ignoring case.
+        order_by : str, optional
+            'name' (default), 'id' or 'type'.
+        descending : bool, optional
+            Sort in descending order.
+        batch_size : int, optional
+            Rows per yielded list.
+
+        Returns
+        -------
+        async iterator of list
+            Lists of (record_type, record_id, display_id, name) tuples.
+
+        Raises
+        ------
+        ValueError
+            If `order_by` is unknown.
+        """
+        if order_by not in operations.RECORD_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(operations.RECORD_ORDERS)}")
+        direction = ' DESC' if descending else ''
+        order = ', '.join(f'{column}{direction}' for column in operations.RECORD_ORDERS[order_by])
+        where, params = operations._record_filter(record_type, prefix)
+        return self._iterate(f'''SELECT record_type, record_id, display_id, name FROM record_index{where}
+                                 ORDER BY {order}''', params, batch_size)
+
+    # ----------------- Update Operations -----------------
+
+    async def update_student(self, student_id, name, age, email):
+        """See `operations.update_student`."""
+        return await self._write(operations.update_student, student_id, name, age, email)
+
+    async def update_instructor(self, instructor_id, name, age, email):
+        """See `operations.update_instructor`."""
+        return await self._write(operations.update_instructor, instructor_id, name, age, email)
+
+    async def update_course(self, course_id, course_name, new_course_id=None):
+        """See `operations.update_course`."""
+        return await self._write(operations.update_course, course_id, course_name, new_course_id)
+
+    async def set_course_capacity(self, course_id, capacity):
+        """See `operations.set_course_capacity`."""
+        return await self._write(operations.set_course_capacity, course_id, capacity)
+
+    # ----------------- Delete Operations -----------------
+
+    async def delete_student(self, student_id):
+        """See `operations.delete_student`."""
+        return await self._write(operations.delete_student, student_id)
+
+    async def delete_instructor(self, instructor_id):
+        """See `operations.delete_instructor`."""
+        return await self._write(operations.delete_instructor, instructor_id)
+
+    async def delete_course(self, course_id):
+        """See `operations.delete_course`."""
+        return await self._write(operations.delete_course, course_id)
+
+    async def delete_enrollment(self, student_id, course_id):
+        """See `operations.delete_enrollment`."""
+        return await self._write(operations.delete_enrollment, student_id, course_id)
+
+    # ----------------- Shutdown -----------------
+
+    def close(self):
+        """
+        Waits for running reads, commits queued writes and closes the connections.
+        """
+        self.executor.shutdown(wait=True)
+        if self._owns_writer:
+            self.writer.close()
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+
+    async def aclose(self):
+        """
+        `close` without blocking the event loop.
+        """
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,197 @@
+"""
+Compares async_operations.py with the synchronous operations.py under
+concurrent load.
+
+Both runs simulate the same number of concurrent clients, each running the
+same random mix of record searches, counts, student additions and
+enrollments:
+
+- sync: one thread per client calling operations.py directly, which opens a
+  connection per call and waits for SQLite's lock with the default timeout;
+- async: one asyncio task per client on a single event loop, calling
+  AsyncOperations (a small read thread pool plus the write queue).
+
+Reported per run: throughput, p50/p95/p99 latency, errors and the most
+threads alive at once.
+
+Usage:
+    cd pyqt
+    python benchmarks/async_operations_benchmark.py --db /tmp/async.db --clients 64 --operations 50
+    python benchmarks/async_operations_benchmark.py --only async --workers 8 --max-pending 128
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import operations  # noqa: E402
+from async_operations import AsyncOperations  # noqa: E402
+from load_test import percentile, seed_database  # noqa: E402
+
+MIX = (("search", 40), ("count", 20), ("add_student", 20), ("enroll_student", 20))
+
+# Prefixes typed into the search box.
+PREFIXES = ("s1", "student 4", "c", "course 2", "i", "zz")
+
+
+def plan(clients, operations_count, seed=0):
+    """
+    Draws the operations of every client, so both runs do identical work.
+
+    Returns
+    -------
+    list of list of str
+        One list of operation names per client.
+    """
+    rng = random.Random(seed)
+    names = [name for name, _ in MIX]
+    weights = [weight for _, weight in MIX]
+    return [rng.choices(names, weights, k=operations_count) for _ in range(clients)]
+
+
+class ThreadCounter:
+    """
+    Samples `threading.active_count()` in the background and keeps the maximum.
+    """
+
+    def __init__(self, interval=0.005):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+
+    def _run(self, interval):
+        while not self._stop.wait(interval):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def summarize(samples, seconds, peak_threads):
+    latencies = [latency for latency, _ in samples]
+    errors = {}
+    for _, error in samples:
+        if error:
+            errors[error] = errors.get(error, 0) + 1
+    return {
+        "operations": len(samples),
+        "seconds": round(seconds, 3),
+        "ops_per_sec": round(len(samples) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "errors": errors,
+        "peak_threads": peak_threads,
+    }
+
+
+def run_sync(db_path, work, student_ids, course_ids):
+    """
+    Runs every client's operations on its own thread with operations.py.
+    """
+    operations.DB_PATH = db_path
+    samples = []
+    lock = threading.Lock()
+
+    def client(number, names):
+        rng = random.Random(number)
+        own = []
+        for i, name in enumerate(names):
+            started = time.perf_counter()
+            error = None
+            try:
+                if name == "search":
+                    operations.get_record_page(0, 50, prefix=rng.choice(PREFIXES))
+                elif name == "count":
+                    operations.count_records(prefix=rng.choice(PREFIXES))
+                elif name == "add_student":
+                    operations.add_student(f"SY{number}-{i}", f"Sync {number}", 20, "sync@school.edu")
+                else:
+                    operations.enroll_student(rng.choice(student_ids), rng.choice(course_ids))
+            except Exception as e:
+                error = type(e).__name__
+            own.append((time.perf_counter() - started, error))
+        with lock:
+            samples.extend(own)
+
+    threads = [threading.Thread(target=client, args=(number, names)) for number, names in enumerate(work)]
+    with ThreadCounter() as counter:
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+    return summarize(samples, seconds, counter.peak)
+
+
+async def _run_async(db_path, work, student_ids, course_ids, workers, max_pending):
+    samples = []
+
+    async def client(ops, number, names):
+        rng = random.Random(number)
+        for i, name in enumerate(names):
+            started = time.perf_counter()
+            error = None
+            try:
+                if name == "search":
+                    await ops.get_record_page(0, 50, prefix=rng.choice(PREFIXES))
+                elif name == "count":
+                    await ops.count_records(prefix=rng.choice(PREFIXES))
+                elif name == "add_student":
+                    await ops.add_student(f"AS{number}-{i}", f"Async {number}", 20, "async@school.edu")
+                else:
+                    await ops.enroll_student(rng.choice(student_ids), rng.choice(course_ids))
+            except Exception as e:
+                error = type(e).__name__
+            samples.append((time.perf_counter() - started, error))
+
+    async with AsyncOperations(db_path, max_workers=workers, max_pending=max_pending) as ops:
+        with ThreadCounter() as counter:
+            started = time.perf_counter()
+            await asyncio.gather(*(client(ops, number, names) for number, names in enumerate(work)))
+            seconds = time.perf_counter() - started
+    return summarize(samples, seconds, counter.peak)
+
+
+def run_async(db_path, work, student_ids, course_ids, workers=4, max_pending=64):
+    """
+    Runs every client as a task on one event loop with AsyncOperations.
+    """
+    return asyncio.run(_run_async(db_path, work, student_ids, course_ids, workers, max_pending))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="async_benchmark.db", help="database file (created and seeded if empty)")
+    parser.add_argument("--clients", type=int, default=64, help="concurrent clients")
+    parser.add_argument("--operations", type=int, default=50, help="operations per client")
+    parser.add_argument("--workers", type=int, default=4, help="read threads of AsyncOperations")
+    parser.add_argument("--max-pending", type=int, default=64, help="operations AsyncOperations runs at once")
+    parser.add_argument("--only", choices=["sync", "async"], help="run one side only")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    args = parser.parse_args()
+
+    student_ids, course_ids = seed_database(args.db, 10000, 100, 50)
+    work = plan(args.clients, args.operations, args.seed)
+    report = {"clients": args.clients, "operations_per_client": args.operations}
+    if args.only != "async":
+        report["sync"] = run_sync(args.db, work, student_ids, course_ids)
+    if args.only != "sync":
+        report["async"] = run_async(args.db, work, student_ids, course_ids, args.workers, args.max_pending)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Stress test for the enrollment engine: many workers compete for a few seats.
+
+Worker processes (or threads) send enrollment requests for random students
+into a small number of limited-capacity courses, retry some of them with the
+same idempotency key, and drop some enrollments again so waitlisted students
+get promoted. When all workers are done the database is checked:
+
+- no course holds more students than its capacity,
+- no student is registered twice, or both registered and waitlisted,
+- no course has a free seat while students are still waiting for it,
+- every retried request returned its original outcome.
+
+The run fails (exit status 1) if any check fails, and prints the request rate.
+
+Usage:
+    cd pyqt
+    python benchmarks/enrollment_stress.py --db /tmp/stress.db --workers 8 --requests 5000
+    python benchmarks/enrollment_stress.py --db /tmp/stress.db --batch 100 --journal-mode wal
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import enrollment  # noqa: E402
+import operations  # noqa: E402
+from db.schema import recreate_tables  # noqa: E402
+
+
+def seed_database(db_path, students, courses, capacity):
+    """
+    Rebuilds the schema and adds `students` students and `courses` courses.
+    """
+    recreate_tables(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.executemany("INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)",
+                         ((f"S{i}", f"Student {i}", 18 + i % 10, f"s{i}@school.edu") for i in range(students)))
+        conn.executemany("INSERT INTO courses (course_id, course_name, capacity) VALUES (?, ?, ?)",
+                         ((f"C{i}", f"Course {i}", capacity) for i in range(courses)))
+        conn.commit()
+        student_ids = [row[0] for row in conn.execute("SELECT id FROM students")]
+        course_ids = [row[0] for row in conn.execute("SELECT id FROM courses")]
+    finally:
+        conn.close()
+    return student_ids, course_ids
+
+
+def worker(args):
+    """
+    Sends `requests` enrollment requests and returns what happened.
+
+    Returns
+    -------
+    dict
+        Counts per outcome, the number of drops and retries, any retry whose
+        outcome differed from the original, and the time spent.
+    """
+    worker_id, db_path, student_ids, course_ids, requests, batch, retry_rate, drop_rate, seed = args
+    rng = random.Random(seed)
+    conn = sqlite3.connect(db_path, timeout=60)
+    counts = {}
+    mismatches = []
+    drops = retries = 0
+    first_outcome = {}
+    started = time.perf_counter()
+    try:
+        sent = 0
+        while sent < requests:
+            size = min(batch, requests - sent)
+            pending = []
+            for i in range(size):
+                if first_outcome and rng.random() < retry_rate:
+                    key = rng.choice(list(first_outcome))
+                    student_id, course_id, _ = first_outcome[key]
+                    retries += 1
+                else:
+                    key = f"w{worker_id}-{sent + i}"
+                    student_id, course_id = rng.choice(student_ids), rng.choice(course_ids)
+                pending.append((student_id, course_id, key))
+
+            if batch > 1:
+                results = operations.enroll_students(pending, conn=conn)
+            else:
+                results = [operations.enroll_student(*pending[0], conn=conn)]
+            conn.commit()
+
+            for (student_id, course_id, key), result in zip(pending, results):
+                counts[result.status] = counts.get(result.status, 0) + 1
+                if key in first_outcome:
+                    if first_outcome[key][2] != result.status:
+                        mismatches.append((key, first_outcome[key][2], result.status))
+                else:
+                    first_outcome[key] = (student_id, course_id, result.status)
+
+                if result.status == enrollment.ENROLLED and rng.random() < drop_rate:
+                    operations.delete_enrollment(student_id, course_id, conn=conn)
+                    conn.commit()
+                    drops += 1
+            sent += size
+    finally:
+        conn.close()
+    return {"counts": counts, "drops": drops, "retries": retries, "mismatches": mismatches,
+            "seconds": time.perf_counter() - started}
+
+
+def check_invariants(db_path):
+    """
+    Verifies the enrollment invariants.
+
+    Returns
+    -------
+    dict
+        Name of each check to the offending rows (empty lists mean it passed).
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        return {
+            "overbooked": conn.execute('''
+                SELECT courses.id, courses.capacity, COUNT(*) FROM courses
+                JOIN registrations ON registrations.course_id = courses.id
+                WHERE courses.capacity IS NOT NULL
+                GROUP BY courses.id HAVING COUNT(*) > courses.capacity''').fetchall(),
+            "duplicate_registrations": conn.execute('''
+                SELECT student_id, course_id, COUNT(*) FROM registrations
+                GROUP BY student_id, course_id HAVING COUNT(*) > 1''').fetchall(),
+            "registered_and_waitlisted": conn.execute('''
+                SELECT waitlist.student_id, waitlist.course_id FROM waitlist
+                JOIN registrations USING (student_id, course_id)''').fetchall(),
+            "free_seat_with_waitlist": conn.execute('''
+                SELECT courses.id FROM courses
+                WHERE EXISTS (SELECT 1 FROM waitlist WHERE waitlist.course_id = courses.id)
+                  AND (courses.capacity IS NULL OR courses.capacity >
+                       (SELECT COUNT(*) FROM registrations WHERE registrations.course_id = courses.id))''').fetchall(),
+        }
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="enrollment_stress.db", help="scratch database (rebuilt)")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--mode", choices=["processes", "threads"], default="processes")
+    parser.add_argument("--requests", type=int, default=2000, help="requests per worker")
+    parser.add_argument("--batch", type=int, default=1, help="requests per transaction")
+    parser.add_argument("--students", type=int, default=5000)
+    parser.add_argument("--courses", type=int, default=20)
+    parser.add_argument("--capacity", type=int, default=30)
+    parser.add_argument("--retry-rate", type=float, default=0.05, help="share of requests that are retries")
+    parser.add_argument("--drop-rate", type=float, default=0.1, help="share of enrollments dropped again")
+    parser.add_argument("--journal-mode", help="PRAGMA journal_mode to use, e.g. wal")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    student_ids, course_ids = seed_database(args.db, args.students, args.courses, args.capacity)
+    if args.journal_mode:
+        conn = sqlite3.connect(args.db)
+        conn.execute(f"PRAGMA journal_mode = {args.journal_mode}")
+        conn.close()
+
+    jobs = [(i, args.db, student_ids, course_ids, args.requests, args.batch, args.retry_rate,
+             args.drop_rate, args.seed + i) for i in range(args.workers)]
+    started = time.perf_counter()
+    if args.mode == "processes":
+        with multiprocessing.Pool(args.workers) as pool:
+            results = pool.map(worker, jobs)
+    else:
+        results = [None] * args.workers
+
+        def run(i):
+            results[i] = worker(jobs[i])
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(args.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    seconds = time.perf_counter() - started
+
+    counts = {}
+    for result in results:
+        for status, count in result["counts"].items():
+            counts[status] = counts.get(status, 0) + count
+    total = sum(counts.values())
+    violations = check_invariants(args.db)
+    violations["retry_mismatches"] = [m for result in results for m in result["mismatches"]]
+
+    report = {
+        "workers": args.workers,
+        "mode": args.mode,
+        "batch": args.batch,
+        "requests": total,
+        "seconds": round(seconds, 3),
+        "requests_per_sec": round(total / seconds, 1),
+        "outcomes": counts,
+        "drops": sum(result["drops"] for result in results),
+        "retries": sum(result["retries"] for result in results),
+        "violations": {name: rows[:10] for name, rows in violations.items() if rows},
+    }
+    print(json.dumps(report, indent=4))
+    sys.exit(1 if report["violations"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""
+Times the PyQt window's refresh paths against databases of increasing size.
+
+For every size, a database with that many students (plus a course per 50
+students and an instructor per 100) is generated once and reused, and the
+real `SchoolManagementSystem` window is driven under Qt's offscreen
+platform, so no display is needed. Measured per size, each repeated
+--repeat times and reported as p50/p95/max in milliseconds:
+
+- startup: constructing and showing the window (it fills the table and all
+  four dropdowns);
+- refresh: `update_table` and each dropdown refresh on its own;
+- search: `search_records` for a few prefixes, from a handful of matches to
+  most of the table;
+- add/delete: adding a student through the form and deleting it again
+  from the table, including the refreshes each one triggers;
+- memory: resident memory of the window over an empty database's window,
+  per displayed row (table rows plus dropdown items).
+
+Every timing includes processing the Qt events it queued (layout and paint),
+as a user would wait for them. The results are printed as JSON and
+optionally written to --out. With --baseline, results are compared with an
+earlier --out file, and the script exits with status 1 if any p50 got slower
+by more than --tolerance, to catch UI regressions before a release.
+
+Usage:
+    cd pyqt
+    python benchmarks/gui_refresh.py --sizes 1000,10000,100000 --out gui.json
+    python benchmarks/gui_refresh.py --baseline gui.json --tolerance 0.25
+"""
+import argparse
+import gc
+import json
+import os
+import resource
+import sys
+import time
+
+# Must be set before Qt is loaded
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PyQt5.QtCore import QT_VERSION_STR, qInstallMessageHandler  # noqa: E402
+from PyQt5.QtWidgets import QApplication, QMessageBox  # noqa: E402
+
+import school_management_system  # noqa: E402  (puts the directory of repository.py on the path)
+import repository  # noqa: E402
+from load_test import percentile, seed_database  # noqa: E402
+
+DEFAULT_SIZES = "1000,10000,50000"
+
+# Search prefixes: one student, a few hundred, most of the table, nothing.
+SEARCH_PREFIXES = ("S12345", "Student 12", "Student", "zzz")
+
+# Differences below this many milliseconds are never reported as regressions.
+MIN_REGRESSION_MS = 1.0
+
+
+class Dialogs:
+    """
+    Replaces the window's message boxes, which would block offscreen, and
+    counts them by kind so failed round trips can be detected.
+    """
+
+    def __init__(self):
+        self.counts = {}
+
+    def _answer(self, kind):
+        def show(*args, **kwargs):
+            self.counts[kind] = self.counts.get(kind, 0) + 1
+            return QMessageBox.Ok
+        return show
+
+    def install(self):
+        for kind in ("information", "warning", "critical", "question"):
+            setattr(school_management_system.QMessageBox, kind, staticmethod(self._answer(kind)))
+
+
+def quiet_qt_messages(mode, context, message):
+    # The offscreen platform warns about every window it cannot resize to its hints
+    if "propagateSizeHints" not in message:
+        print(message, file=sys.stderr)
+
+
+def rss_kib():
+    """
+    Returns the resident memory of the process in KiB.
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+    except OSError:
+        # Peak rather than current memory, but good enough where /proc is missing
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def timings(samples):
+    return {
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+    }
+
+
+def timed(app, func, *args):
+    started = time.perf_counter()
+    func(*args)
+    app.processEvents()
+    return time.perf_counter() - started
+
+
+def displayed_rows(window):
+    return (window.record_table.rowCount() + window.student_dropdown.count() + window.course_dropdown.count()
+            + window.course_dropdown_for_instructors.count() + window.instructor_dropdown.count())
+
+
+def open_window(app, repo):
+    window = school_management_system.SchoolManagementSystem(repo)
+    window.show()
+    app.processEvents()
+    return window
+
+
+def close_window(app, window):
+    window.hide()
+    window.deleteLater()
+    app.processEvents()
+    gc.collect()
+
+
+def window_memory(app, repo):
+    """
+    Returns the memory a new window on `repo` takes, and its displayed rows.
+    """
+    gc.collect()
+    before = rss_kib()
+    window = open_window(app, repo)
+    gc.collect()
+    used = rss_kib() - before
+    rows = displayed_rows(window)
+    close_window(app, window)
+    return used, rows
+
+
+def run_size(app, dialogs, db_path, size, repeat, empty):
+    """
+    Runs every measurement against a database of `size` students.
+    """
+    courses = max(size // 50, 10)
+    instructors = max(size // 100, 5)
+    seed_database(db_path, size, courses, instructors)
+    result = {"students": size, "courses": courses, "instructors": instructors}
+
+    with repository.SQLiteRepository(db_path) as repo:
+        memory, rows = window_memory(app, repo)
+        result["memory"] = {
+            "displayed_rows": rows,
+            "window_kib": memory,
+            "bytes_per_row": round((memory - empty[0]) * 1024 / max(rows - empty[1], 1), 1),
+        }
+
+        startup = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            window = open_window(app, repo)
+            startup.append(time.perf_counter() - started)
+            close_window(app, window)
+        result["startup"] = timings(startup)
+
+        window = open_window(app, repo)
+        try:
+            refreshes = {"update_table": window.update_table,
+                         "update_student_dropdown": window.update_student_dropdown,
+                         "update_instructor_dropdown": window.update_instructor_dropdown,
+                         "update_course_dropdown": window.update_course_dropdown,
+                         "update_course_dropdown_for_instructors": window.update_course_dropdown_for_instructors}
+            result["refresh"] = {name: timings([timed(app, refresh) for _ in range(repeat)])
+                                 for name, refresh in refreshes.items()}
+
+            result["search"] = {}
+            for prefix in SEARCH_PREFIXES:
+                samples = []
+                for _ in range(repeat):
+                    window.search_edit.setText(prefix)
+                    samples.append(timed(app, window.search_records))
+                result["search"][prefix] = dict(timings(samples), total_matches=window.repo.count_records(
+                    None, prefix))
+            window.search_edit.clear()
+            window.search_records()
+
+            adds, deletes = [], []
+            warnings_before = dialogs.counts.get("warning", 0)
+            for i in range(repeat):
+                student_id = f"BENCH{i}"
+                window.student_name_edit.setText(f"Benchmark {i}")
+                window.student_id_edit.setText(student_id)
+                window.student_age_edit.setText("20")
+                window.student_email_edit.setText(f"bench{i}@school.edu")
+                adds.append(timed(app, window.add_student))
+
+                # Find the new record the way a user would, then delete it
+                window.search_edit.setText(student_id)
+                window.search_records()
+                app.processEvents()
+                window.record_table.setCurrentCell(0, 0)
+                if window.record_table.item(0, 0).text() != student_id:
+                    raise RuntimeError(f"Added student {student_id} not found")
+                deletes.append(timed(app, window.delete_record))
+                window.search_edit.clear()
+                window.search_records()
+            if dialogs.counts.get("warning", 0) != warnings_before:
+                raise RuntimeError("The window showed a warning during the add/delete round trips")
+            result["add_student"] = timings(adds)
+            result["delete_record"] = timings(deletes)
+            result["round_trip"] = timings([add + delete for add, delete in zip(adds, deletes)])
+        finally:
+            close_window(app, window)
+    return result
+
+
+def flatten(results):
+    """
+    Yields (size, metric path, p50 in ms) for every timing of a report.
+    """
+    for size, result in results.items():
+        stack = [((), result)]
+        while stack:
+            path, value = stack.pop()
+            if isinstance(value, dict):
+                if "p50_ms" in value:
+                    yield size, "/".join(path), value["p50_ms"]
+                else:
+                    stack.extend((path + (key,), item) for key, item in value.items())
+
+
+def regressions(baseline, results, tolerance):
+    """
+    Lists the p50 timings that got slower than `tolerance` allows.
+    """
+    before = {(size, path): ms for size, path, ms in flatten(baseline)}
+    found = []
+    for size, path, ms in flatten(results):
+        old = before.get((size, path))
+        if old is not None and ms > old * (1 + tolerance) and ms - old >= MIN_REGRESSION_MS:
+            found.append({"size": size, "metric": path, "baseline_ms": old, "p50_ms": ms,
+                          "change": f"+{(ms / old - 1) * 100:.0f}%" if old else "new"})
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated student counts")
+    parser.add_argument("--dir", default="gui_benchmark", help="where the generated databases are kept")
+    parser.add_argument("--repeat", type=int, default=5, help="runs of every measurement")
+    parser.add_argument("--out", help="also write the results to this JSON file")
+    parser.add_argument("--baseline", help="earlier --out file to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown of a p50 tolerated against --baseline (default 0.25, i.e. 25%%)")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    os.makedirs(args.dir, exist_ok=True)
+    qInstallMessageHandler(quiet_qt_messages)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    dialogs = Dialogs()
+    dialogs.install()
+
+    with repository.SQLiteRepository(os.path.join(args.dir, "gui_empty.db")) as repo:
+        # Loads Qt's lazily created parts, so they do not count against the first size
+        close_window(app, open_window(app, repo))
+        empty = window_memory(app, repo)
+
+    results = {}
+    for size in sizes:
+        results[str(size)] = run_size(app, dialogs, os.path.join(args.dir, f"gui_{size}.db"), size, args.repeat,
+                                      empty)
+        print(f"{size} students done", file=sys.stderr)
+
+    report = {
+        "python": sys.version.split()[0],
+        "qt": QT_VERSION_STR,
+        "platform": os.environ["QT_QPA_PLATFORM"],
+        "repeat": args.repeat,
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(json.load(f)["results"], results, args.tolerance)
+        report["regressions"] = found
+        status = 1 if found else 0
+    print(json.dumps(report, indent=4))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=4)
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
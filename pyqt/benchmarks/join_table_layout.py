@@ -0,0 +1,181 @@
+"""
+Compares the old and compact layouts of the registrations join table.
+
+Builds two databases with the same students, courses and enrollment rows:
+
+- legacy: `id INTEGER PRIMARY KEY AUTOINCREMENT` plus indexes on student_id,
+  on course_id and a unique (student_id, course_id) index (schema v5),
+- compact: `PRIMARY KEY (student_id, course_id)`, WITHOUT ROWID, STRICT, with a
+  reverse (course_id, student_id) index (schema v6),
+
+and reports, for each, the file size, the insert rate and the time of three
+joins: a course roster, a student's schedule and a full three-way join count.
+
+The interesting sizes are tens of millions of rows; building them takes a few
+minutes per layout and several GB of disk:
+
+Usage:
+    cd pyqt
+    python benchmarks/join_table_layout.py --rows 20000000 --dir /tmp/layout
+    python benchmarks/join_table_layout.py --rows 200000      # quick check
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from db.schema import COMPACT_REGISTRATIONS  # noqa: E402
+
+BASE_TABLES = [
+    '''CREATE TABLE students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, student_id TEXT NOT NULL, name TEXT NOT NULL,
+        age INTEGER NOT NULL, email TEXT NOT NULL)''',
+    '''CREATE TABLE courses (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, course_id TEXT NOT NULL, course_name TEXT NOT NULL,
+        capacity INTEGER)''',
+]
+
+LAYOUTS = {
+    "legacy": [
+        '''CREATE TABLE registrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            course_id INTEGER NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES students(id),
+            FOREIGN KEY (course_id) REFERENCES courses(id))''',
+        'CREATE INDEX registrations_student_id_idx ON registrations (student_id)',
+        'CREATE INDEX registrations_course_id_idx ON registrations (course_id)',
+        'CREATE UNIQUE INDEX registrations_student_course_idx ON registrations (student_id, course_id)',
+    ],
+    "compact": [
+        f'CREATE TABLE registrations {COMPACT_REGISTRATIONS}',
+        'CREATE INDEX registrations_course_student_idx ON registrations (course_id, student_id)',
+    ],
+}
+
+
+def enrollment_pairs(students, courses, per_student):
+    """
+    Yields `students * per_student` distinct (student, course) pairs.
+
+    Rows arrive one enrollment round at a time, so consecutive inserts touch
+    different students, as during a registration period.
+    """
+    step = 7919  # prime, so the courses of one student are distinct
+    for round_number in range(per_student):
+        for student in range(1, students + 1):
+            yield student, 1 + (student + round_number * step) % courses
+
+
+def build(path, layout, students, courses, per_student, batch):
+    """
+    Creates one database and returns its insert statistics.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("BEGIN")
+        for statement in BASE_TABLES + LAYOUTS[layout]:
+            conn.execute(statement)
+        conn.executemany("INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)",
+                         ((f"S{i}", f"Student {i}", 18 + i % 10, f"s{i}@school.edu") for i in range(students)))
+        conn.executemany("INSERT INTO courses (course_id, course_name) VALUES (?, ?)",
+                         ((f"C{i}", f"Course {i}") for i in range(courses)))
+        conn.execute("COMMIT")
+
+        rows = 0
+        pairs = enrollment_pairs(students, courses, per_student)
+        started = time.perf_counter()
+        while True:
+            chunk = [pair for _, pair in zip(range(batch), pairs)]
+            if not chunk:
+                break
+            conn.execute("BEGIN")
+            conn.executemany("INSERT INTO registrations (student_id, course_id) VALUES (?, ?)", chunk)
+            conn.execute("COMMIT")
+            rows += len(chunk)
+        seconds = time.perf_counter() - started
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("ANALYZE")
+    finally:
+        conn.close()
+    return {"rows": rows, "insert_seconds": round(seconds, 3), "rows_per_sec": round(rows / seconds)}
+
+
+def time_joins(path, students, courses, lookups, seed):
+    """
+    Times roster and schedule lookups and a full join on one database.
+    """
+    rng = random.Random(seed)
+    conn = sqlite3.connect(path)
+    try:
+        timings = {}
+
+        started = time.perf_counter()
+        for course in (rng.randint(1, courses) for _ in range(lookups)):
+            conn.execute('''SELECT students.name FROM registrations
+                            JOIN students ON students.id = registrations.student_id
+                            WHERE registrations.course_id = ?''', (course,)).fetchall()
+        timings["roster_ms"] = round((time.perf_counter() - started) / lookups * 1000, 3)
+
+        started = time.perf_counter()
+        for student in (rng.randint(1, students) for _ in range(lookups)):
+            conn.execute('''SELECT courses.course_name FROM registrations
+                            JOIN courses ON courses.id = registrations.course_id
+                            WHERE registrations.student_id = ?''', (student,)).fetchall()
+        timings["schedule_ms"] = round((time.perf_counter() - started) / lookups * 1000, 3)
+
+        started = time.perf_counter()
+        conn.execute('''SELECT COUNT(*) FROM registrations
+                        JOIN students ON students.id = registrations.student_id
+                        JOIN courses ON courses.id = registrations.course_id''').fetchone()
+        timings["full_join_seconds"] = round(time.perf_counter() - started, 3)
+    finally:
+        conn.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=20_000_000, help="enrollment rows")
+    parser.add_argument("--per-student", type=int, default=8, help="courses per student")
+    parser.add_argument("--courses", type=int, default=20_000)
+    parser.add_argument("--batch", type=int, default=100_000, help="rows per insert transaction")
+    parser.add_argument("--lookups", type=int, default=1000, help="roster and schedule queries to time")
+    parser.add_argument("--dir", default=".", help="where to create the two databases")
+    parser.add_argument("--keep", action="store_true", help="keep the databases afterwards")
+    args = parser.parse_args()
+
+    students = max(args.rows // args.per_student, 1)
+    os.makedirs(args.dir, exist_ok=True)
+    results = {}
+    for layout in LAYOUTS:
+        path = os.path.join(args.dir, f"layout_{layout}.db")
+        result = build(path, layout, students, args.courses, args.per_student, args.batch)
+        result["file_bytes"] = os.path.getsize(path)
+        result.update(time_joins(path, students, args.courses, args.lookups, seed=0))
+        results[layout] = result
+        if not args.keep:
+            os.remove(path)
+
+    legacy, compact = results["legacy"], results["compact"]
+    results["compact_vs_legacy"] = {
+        "file_size": round(compact["file_bytes"] / legacy["file_bytes"], 3),
+        "insert_rate": round(compact["rows_per_sec"] / legacy["rows_per_sec"], 3),
+        "roster": round(compact["roster_ms"] / legacy["roster_ms"], 3),
+        "schedule": round(compact["schedule_ms"] / legacy["schedule_ms"], 3),
+        "full_join": round(compact["full_join_seconds"] / legacy["full_join_seconds"], 3),
+    }
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
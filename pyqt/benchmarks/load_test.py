@@ -0,0 +1,386 @@
+"""
+Simulates several front-desk clerks using the same SQLite database at once.
+
+Each clerk (a thread or a process) runs a random mix of `add_student`,
+`enroll_student`, `get_enrollments` and searches from operations.py against
+the database file and records how long every operation took, how much of that
+was spent waiting for SQLite's lock, and whether it failed.
+
+Clerks open their connections with a zero busy timeout and retry "database is
+locked" errors themselves with a short backoff, so the time spent waiting for
+the lock can be measured separately from the time spent doing work. An
+operation that is still locked out after --lock-timeout seconds is counted as
+an error.
+
+Usage:
+    cd pyqt
+    python benchmarks/load_test.py --db /tmp/load.db --clerks 8 --duration 30
+    python benchmarks/load_test.py --mode processes --clerks 4 \\
+        --mix add_student=10,enroll_student=40,get_enrollments=20,search=30
+    python benchmarks/load_test.py --writer        # writes through writer.WriteQueue
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import operations  # noqa: E402
+from db.schema import migrate  # noqa: E402
+from writer import WriteQueue  # noqa: E402
+
+OPERATIONS = ("add_student", "enroll_student", "get_enrollments", "search")
+WRITE_OPERATIONS = ("add_student", "enroll_student")
+DEFAULT_MIX = "add_student=20,enroll_student=40,get_enrollments=10,search=30"
+
+# Search terms clerks type: student numbers, names and course names.
+SEARCH_TERMS = ("s1", "s42", "student 7", "course", "course 3", "inst", "zzz")
+
+
+def parse_mix(text):
+    """
+    Parses "op=weight,op=weight" into a dict of weights.
+
+    Raises
+    ------
+    ValueError
+        If an operation is unknown or no weight is positive.
+    """
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(f"Unknown operation {name!r}; expected one of {', '.join(OPERATIONS)}")
+        mix[name] = float(weight or 1)
+    if not any(weight > 0 for weight in mix.values()):
+        raise ValueError("At least one operation needs a positive weight")
+    return mix
+
+
+def seed_database(db_path, students, courses, instructors):
+    """
+    Creates the schema and, if the database is empty, adds a starting roster.
+
+    Returns
+    -------
+    tuple of list
+        The primary keys of all students and courses.
+    """
+    migrate(db_path)
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("SELECT COUNT(*) FROM students").fetchone()[0] == 0:
+            conn.executemany("INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)",
+                             ((f"S{i}", f"Student {i}", 18 + i % 10, f"s{i}@school.edu")
+                              for i in range(students)))
+            conn.executemany("INSERT INTO courses (course_id, course_name) VALUES (?, ?)",
+                             ((f"C{i}", f"Course {i}") for i in range(courses)))
+            conn.executemany("INSERT INTO instructors (instructor_id, name, age, email) VALUES (?, ?, ?, ?)",
+                             ((f"I{i}", f"Instructor {i}", 30 + i % 30, f"i{i}@school.edu")
+                              for i in range(instructors)))
+            conn.commit()
+        student_ids = [row[0] for row in conn.execute("SELECT id FROM students")]
+        course_ids = [row[0] for row in conn.execute("SELECT id FROM courses")]
+    finally:
+        conn.close()
+    return student_ids, course_ids
+
+
+def search(query, conn=None):
+    """
+    Searches students, instructors and courses the way the PyQt window does.
+    """
+    query = query.lower()
+    matches = []
+    for records in (operations.get_students(conn=conn), operations.get_instructors(conn=conn),
+                    operations.get_courses(conn=conn)):
+        matches.extend(r for r in records if query in r[2].lower() or query in str(r[1]))
+    return matches
+
+
+def _is_locked(error):
+    message = str(error)
+    return "locked" in message or "busy" in message
+
+
+class Clerk:
+    """
+    Runs random operations against the database and records their timings.
+
+    Parameters
+    ----------
+    clerk_id : int
+        Used to make the student numbers this clerk adds unique.
+    db_path : str
+        Database file.
+    mix : dict
+        Operation name to relative weight.
+    student_ids, course_ids : list of int
+        Primary keys to enroll.
+    lock_timeout : float
+        Seconds an operation may wait for the lock before it counts as failed.
+    writer : writer.WriteQueue, optional
+        If given, writes are submitted to it instead of run on the clerk's
+        own connection.
+    seed : int, optional
+        Random seed.
+    """
+
+    def __init__(self, clerk_id, db_path, mix, student_ids, course_ids, lock_timeout,
+                 writer=None, seed=None):
+        self.clerk_id = clerk_id
+        self.db_path = db_path
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.student_ids = student_ids
+        self.course_ids = course_ids
+        self.lock_timeout = lock_timeout
+        self.writer = writer
+        self.random = random.Random(seed)
+        self.added = 0
+
+    def _call(self, name):
+        """Returns (function, args) for one random instance of `name`."""
+        if name == "add_student":
+            self.added += 1
+            number = f"L{self.clerk_id}-{self.added}"
+            return operations.add_student, (number, f"Load Student {number}", 20, f"{number}@school.edu")
+        if name == "enroll_student":
+            return operations.enroll_student, (self.random.choice(self.student_ids),
+                                               self.random.choice(self.course_ids))
+        if name == "get_enrollments":
+            return operations.get_enrollments, ()
+        return search, (self.random.choice(SEARCH_TERMS),)
+
+    def _run_once(self, conn, name):
+        """
+        Runs one operation, retrying while the database is locked.
+
+        Returns
+        -------
+        tuple
+            (name, latency seconds, lock-wait seconds, error name or None)
+        """
+        func, args = self._call(name)
+        started = time.perf_counter()
+        waited = 0.0
+        backoff = 0.001
+        while True:
+            try:
+                if self.writer is not None and name in WRITE_OPERATIONS:
+                    self.writer.submit(func, *args).result()
+                else:
+                    func(*args, conn=conn)
+                    conn.commit()
+                return name, time.perf_counter() - started, waited, None
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                if not _is_locked(e):
+                    return name, time.perf_counter() - started, waited, type(e).__name__
+                if time.perf_counter() - started > self.lock_timeout:
+                    return name, time.perf_counter() - started, waited, "LockTimeout"
+                delay = self.random.uniform(0, backoff)
+                time.sleep(delay)
+                waited += delay
+                backoff = min(backoff * 2, 0.05)
+            except sqlite3.Error as e:
+                conn.rollback()
+                return name, time.perf_counter() - started, waited, type(e).__name__
+
+    def run(self, duration=None, operations_count=None):
+        """
+        Runs operations until `duration` seconds pass or `operations_count` are done.
+
+        Returns
+        -------
+        list of tuple
+            One (name, latency, lock_wait, error) sample per operation.
+        """
+        # timeout=0: lock waits are handled (and measured) by _run_once.
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        samples = []
+        deadline = time.perf_counter() + duration if duration else None
+        try:
+            while True:
+                if operations_count is not None and len(samples) >= operations_count:
+                    break
+                if deadline is not None and time.perf_counter() >= deadline:
+                    break
+                name = self.random.choices(self.names, self.weights)[0]
+                samples.append(self._run_once(conn, name))
+        finally:
+            conn.close()
+        return samples
+
+
+def _process_clerk(args):
+    """Entry point for a clerk running in its own process."""
+    clerk_id, db_path, mix, student_ids, course_ids, lock_timeout, seed, duration, count = args
+    clerk = Clerk(clerk_id, db_path, mix, student_ids, course_ids, lock_timeout, seed=seed)
+    return clerk.run(duration, count)
+
+
+def percentile(values, p):
+    """Returns the `p`-th percentile (0-100) of `values` by nearest rank."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def summarize(samples, seconds):
+    """
+    Builds the report for a run.
+
+    Parameters
+    ----------
+    samples : list of tuple
+        (name, latency, lock_wait, error) samples from all clerks.
+    seconds : float
+        Wall-clock duration of the run.
+
+    Returns
+    -------
+    dict
+        Overall and per-operation throughput, p50/p95/p99 latency in ms,
+        lock-wait totals and error counts.
+    """
+    def stats(group):
+        latencies = [s[1] for s in group]
+        waits = [s[2] for s in group]
+        errors = {}
+        for s in group:
+            if s[3]:
+                errors[s[3]] = errors.get(s[3], 0) + 1
+        failed = sum(errors.values())
+        return {
+            "operations": len(group),
+            "ops_per_sec": round(len(group) / seconds, 1) if seconds else None,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+            "max_ms": round(max(latencies, default=0) * 1000, 3),
+            "lock_wait_total_ms": round(sum(waits) * 1000, 3),
+            "lock_wait_p95_ms": round(percentile(waits, 95) * 1000, 3),
+            "waited_for_lock": sum(1 for w in waits if w > 0),
+            "errors": errors,
+            "error_rate": round(failed / len(group), 4) if group else 0.0,
+        }
+
+    report = {"seconds": round(seconds, 3), "overall": stats(samples), "by_operation": {}}
+    for name in OPERATIONS:
+        group = [s for s in samples if s[0] == name]
+        if group:
+            report["by_operation"][name] = stats(group)
+    return report
+
+
+def run_load_test(db_path, clerks=4, mix=None, duration=10.0, operations_count=None, mode="threads",
+                  lock_timeout=5.0, use_writer=False, journal_mode=None, seed_students=1000,
+                  seed_courses=50, seed_instructors=20, seed=None):
+    """
+    Runs a load test and returns its report (see `summarize`).
+
+    Parameters
+    ----------
+    db_path : str
+        Database file. It is created and seeded if empty.
+    clerks : int, optional
+        Number of concurrent clerks (default 4).
+    mix : dict, optional
+        Operation weights (default DEFAULT_MIX).
+    duration : float, optional
+        Seconds each clerk runs for (default 10). Ignored if `operations_count` is given.
+    operations_count : int, optional
+        Operations per clerk instead of a duration.
+    mode : {"threads", "processes"}, optional
+        Run clerks as threads of this process or as separate processes.
+    lock_timeout : float, optional
+        Seconds an operation may wait for the lock before failing (default 5).
+    use_writer : bool, optional
+        Send writes through one shared `writer.WriteQueue` (threads mode only).
+    journal_mode : str, optional
+        Set PRAGMA journal_mode (e.g. "wal") before the run.
+    seed_students, seed_courses, seed_instructors : int, optional
+        Size of the starting roster.
+    seed : int, optional
+        Random seed for reproducible operation sequences.
+    """
+    mix = mix or parse_mix(DEFAULT_MIX)
+    if use_writer and mode != "threads":
+        raise ValueError("The write queue can only be shared by clerks running as threads")
+    student_ids, course_ids = seed_database(db_path, seed_students, seed_courses, seed_instructors)
+    if journal_mode:
+        conn = sqlite3.connect(db_path)
+        conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+        conn.close()
+    if operations_count is not None:
+        duration = None
+    seeds = [None if seed is None else seed + i for i in range(clerks)]
+
+    started = time.perf_counter()
+    samples = []
+    if mode == "processes":
+        jobs = [(i, db_path, mix, student_ids, course_ids, lock_timeout, seeds[i], duration, operations_count)
+                for i in range(clerks)]
+        with multiprocessing.Pool(clerks) as pool:
+            for clerk_samples in pool.map(_process_clerk, jobs):
+                samples.extend(clerk_samples)
+    else:
+        writer = WriteQueue(db_path) if use_writer else None
+        results = [None] * clerks
+
+        def work(i):
+            clerk = Clerk(i, db_path, mix, student_ids, course_ids, lock_timeout, writer, seeds[i])
+            results[i] = clerk.run(duration, operations_count)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(clerks)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for clerk_samples in results:
+            samples.extend(clerk_samples)
+        if writer is not None:
+            writer.close()
+    seconds = time.perf_counter() - started
+
+    report = summarize(samples, seconds)
+    report.update({"clerks": clerks, "mode": mode, "writer": use_writer, "mix": mix,
+                   "journal_mode": journal_mode or "default"})
+    if use_writer:
+        report["writer_metrics"] = writer.metrics()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="load_test.db", help="database file (created and seeded if empty)")
+    parser.add_argument("--clerks", type=int, default=4, help="concurrent clerks")
+    parser.add_argument("--mode", choices=["threads", "processes"], default="threads")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="operation weights, e.g. %(default)s")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--operations", type=int, help="operations per clerk (instead of --duration)")
+    parser.add_argument("--lock-timeout", type=float, default=5.0, help="seconds before a locked operation fails")
+    parser.add_argument("--writer", action="store_true", help="send writes through writer.WriteQueue")
+    parser.add_argument("--journal-mode", help="PRAGMA journal_mode to use, e.g. wal")
+    parser.add_argument("--students", type=int, default=1000, help="students in the starting roster")
+    parser.add_argument("--courses", type=int, default=50, help="courses in the starting roster")
+    parser.add_argument("--seed", type=int, help="random seed")
+    args = parser.parse_args()
+
+    report = run_load_test(args.db, args.clerks, parse_mix(args.mix), args.duration, args.operations,
+                           args.mode, args.lock_timeout, args.writer, args.journal_mode,
+                           args.students, args.courses, seed=args.seed)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
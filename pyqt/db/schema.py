@@ -1,76 +1,718 @@
+import argparse
 import sqlite3
+import time
 
+DB_PATH = 'school_management.db'
 
-def recreate_tables():
-    conn = sqlite3.connect('school_management.db')
-    conn.execute("PRAGMA foreign_keys = ON")
-    cursor = conn.cursor()
-
-    # Drop dependent tables first
-    cursor.execute('DROP TABLE IF EXISTS instructor_assignments')
-    cursor.execute('DROP TABLE IF EXISTS registrations')
-
-    # Now drop the main tables
-    cursor.execute('DROP TABLE IF EXISTS students')
-    cursor.execute('DROP TABLE IF EXISTS instructors')
-    cursor.execute('DROP TABLE IF EXISTS courses')
-
-    # Recreate students table
-    cursor.execute('''
-        CREATE TABLE students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            age INTEGER NOT NULL,
-            email TEXT NOT NULL
-        )
-    ''')
-
-    # Recreate instructors table
-    cursor.execute('''
-        CREATE TABLE instructors (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            instructor_id TEXT NOT NULL,
-            name TEXT NOT NULL,
-            age INTEGER NOT NULL,
-            email TEXT NOT NULL
-        )
-    ''')
-
-    # Recreate courses table
-    cursor.execute('''
-        CREATE TABLE courses (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            course_id TEXT NOT NULL,
-            course_name TEXT NOT NULL
-        )
-    ''')
-
-    # Recreate instructor_assignments table
-    cursor.execute('''
-        CREATE TABLE instructor_assignments (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            instructor_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            FOREIGN KEY (instructor_id) REFERENCES instructors(id),
-            FOREIGN KEY (course_id) REFERENCES courses(id)
-        )
-    ''')
-
-    # Recreate registrations table for student-course enrollments
-    cursor.execute('''
-        CREATE TABLE registrations (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER NOT NULL,
-            course_id INTEGER NOT NULL,
-            FOREIGN KEY (student_id) REFERENCES students(id),
-            FOREIGN KEY (course_id) REFERENCES courses(id)
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+
+# ----------------- Migration steps -----------------
+#
+# A migration is a list of steps. Every step is idempotent, so a migration that
+# was interrupted part way (for example during a long backfill) can simply be
+# run again. The schema version in PRAGMA user_version is only bumped once all
+# steps of a migration have completed.
+
+
+def ddl(*statements, description=None):
+    """
+    Step that runs schema statements together in one transaction.
+
+    Parameters
+    ----------
+    *statements : str
+        SQL statements. They should be safe to re-run (IF NOT EXISTS, ...).
+    description : str, optional
+        Label used in timing reports.
+
+    Returns
+    -------
+    callable
+        The step.
+    """
+    def step(conn):
+        with _transaction(conn):
+            for statement in statements:
+                conn.execute(statement)
+    step.description = description or f"ddl ({len(statements)} statements)"
+    return step
+
+
+def add_column(table, column, declaration):
+    """
+    Step that adds a column to a table unless it already exists.
+
+    Parameters
+    ----------
+    table : str
+        The table to alter.
+    column : str
+        The new column's name.
+    declaration : str
+        Type and constraints, e.g. "INTEGER NOT NULL DEFAULT 0".
+
+    Returns
+    -------
+    callable
+        The step.
+    """
+    def step(conn):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if column not in columns:
+            with _transaction(conn):
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+    step.description = f"add column {table}.{column}"
+    return step
+
+
+def create_index(name, table, columns, unique=False):
+    """
+    Step that builds an index in its own short transaction.
+
+    SQLite blocks writers while an index is built, so each index build is kept
+    separate from other schema changes: the lock is held only for the build
+    itself, and writers waiting on their busy timeout proceed as soon as it
+    finishes.
+
+    Parameters
+    ----------
+    name : str
+        Index name.
+    table : str
+        Indexed table.
+    columns : str
+        Column list, e.g. "student_id, course_id".
+    unique : bool, optional
+        Create a UNIQUE index.
+
+    Returns
+    -------
+    callable
+        The step.
+    """
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+
+    def step(conn):
+        with _transaction(conn):
+            conn.execute(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})")
+    step.description = f"create index {name}"
+    return step
+
+
+def backfill(table, assignments, pending, batch_size=5000, pause=0.01):
+    """
+    Step that updates a large table in small batches.
+
+    Each batch updates at most `batch_size` rows still matching `pending` and
+    commits on its own, pausing in between so other connections can write. The
+    step ends when no pending rows remain, which also makes it resumable.
+
+    Parameters
+    ----------
+    table : str
+        Table to update.
+    assignments : str
+        SET clause, e.g. "name_lower = lower(name)".
+    pending : str
+        WHERE condition selecting rows that still need the update; the
+        assignments must make it false.
+    batch_size : int, optional
+        Rows per transaction (default 5000).
+    pause : float, optional
+        Seconds to sleep between batches (default 0.01).
+
+    Returns
+    -------
+    callable
+        The step.
+    """
+    def step(conn):
+        while True:
+            with _transaction(conn):
+                updated = conn.execute(
+                    f"UPDATE {table} SET {assignments} WHERE rowid IN "
+                    f"(SELECT rowid FROM {table} WHERE {pending} LIMIT ?)", (batch_size,)).rowcount
+            if updated < batch_size:
+                break
+            time.sleep(pause)
+    step.description = f"backfill {table}: {assignments}"
+    return step
+
+
+def rebuild_table(table, definition, copy, after=(), description=None):
+    """
+    Step that replaces a table with a new definition, keeping its rows.
+
+    Follows SQLite's procedure for changes ALTER TABLE cannot make: create the
+    new table under a temporary name, copy the rows, drop the old table and
+    rename the new one, all in one transaction. Indexes and triggers on the old
+    table are dropped with it, so `after` must recreate them. The step is
+    skipped if the table already has the new definition.
+
+    Parameters
+    ----------
+    table : str
+        The table to rebuild.
+    definition : str
+        Everything after "CREATE TABLE <name>", i.e. the column list and any
+        table options such as WITHOUT ROWID.
+    copy : str
+        SELECT producing the rows of the new table, in column order.
+    after : sequence of str, optional
+        Statements to run once the new table is in place.
+    description : str, optional
+        Label used in timing reports.
+
+    Returns
+    -------
+    callable
+        The step.
+    """
+    temp = f"{table}_rebuild"
+
+    def step(conn):
+        current = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?",
+                               (table,)).fetchone()
+        if current and " ".join(current[0].split()).endswith(" ".join(definition.split())):
+            return
+        with _transaction(conn):
+            conn.execute(f"DROP TABLE IF EXISTS {temp}")
+            conn.execute(f"CREATE TABLE {temp} {definition}")
+            conn.execute(f"INSERT INTO {temp} {copy}")
+            conn.execute(f"DROP TABLE {table}")
+            # Triggers on other tables still name the dropped table; with the
+            # legacy behaviour RENAME does not try to re-resolve them.
+            conn.execute("PRAGMA legacy_alter_table = ON")
+            try:
+                conn.execute(f"ALTER TABLE {temp} RENAME TO {table}")
+            finally:
+                conn.execute("PRAGMA legacy_alter_table = OFF")
+            for statement in after:
+                conn.execute(statement)
+    step.description = description or f"rebuild {table}"
+    return step
+
+
+class _transaction:
+    """
+    Context manager running a block inside BEGIN IMMEDIATE ... COMMIT.
+
+    Used with connections opened in autocommit mode (isolation_level=None).
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return False
+
+
+# ----------------- Enrollment -----------------
+
+# Rejects registrations past a course's capacity, whichever code inserts them.
+CAPACITY_GUARD = '''
+    CREATE TRIGGER IF NOT EXISTS registrations_capacity_guard
+    BEFORE INSERT ON registrations
+    WHEN (SELECT capacity FROM courses WHERE id = NEW.course_id) IS NOT NULL
+    BEGIN
+        SELECT RAISE(ABORT, 'course is full')
+        WHERE (SELECT COUNT(*) FROM registrations WHERE course_id = NEW.course_id)
+              >= (SELECT capacity FROM courses WHERE id = NEW.course_id);
+    END
+'''
+
+
+# ----------------- Statistics -----------------
+#
+# course_stats and instructor_stats hold one row per course / instructor with
+# running totals, kept up to date by the triggers below, so dashboards read
+# O(courses) rows instead of joining every registration. Average student age
+# is age_sum / enrollment_count (or / student_count for instructors). An
+# instructor's totals count the registrations of every course assigned to them.
+
+STATS_TABLES = [
+    '''
+    CREATE TABLE IF NOT EXISTS course_stats (
+        course_id INTEGER PRIMARY KEY,
+        enrollment_count INTEGER NOT NULL DEFAULT 0,
+        instructor_count INTEGER NOT NULL DEFAULT 0,
+        age_sum INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS instructor_stats (
+        instructor_id INTEGER PRIMARY KEY,
+        course_count INTEGER NOT NULL DEFAULT 0,
+        student_count INTEGER NOT NULL DEFAULT 0,
+        age_sum INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+]
+
+STATS_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS course_stats_course_insert AFTER INSERT ON courses
+    BEGIN
+        INSERT OR IGNORE INTO course_stats (course_id) VALUES (NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS course_stats_course_delete AFTER DELETE ON courses
+    BEGIN
+        DELETE FROM course_stats WHERE course_id = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS instructor_stats_instructor_insert AFTER INSERT ON instructors
+    BEGIN
+        INSERT OR IGNORE INTO instructor_stats (instructor_id) VALUES (NEW.id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS instructor_stats_instructor_delete AFTER DELETE ON instructors
+    BEGIN
+        DELETE FROM instructor_stats WHERE instructor_id = OLD.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_registration_insert AFTER INSERT ON registrations
+    BEGIN
+        UPDATE course_stats
+        SET enrollment_count = enrollment_count + 1,
+            age_sum = age_sum + COALESCE((SELECT age FROM students WHERE id = NEW.student_id), 0)
+        WHERE course_id = NEW.course_id;
+        UPDATE instructor_stats
+        SET student_count = student_count + (SELECT COUNT(*) FROM instructor_assignments a
+                WHERE a.instructor_id = instructor_stats.instructor_id AND a.course_id = NEW.course_id),
+            age_sum = age_sum + COALESCE((SELECT age FROM students WHERE id = NEW.student_id), 0)
+                * (SELECT COUNT(*) FROM instructor_assignments a
+                   WHERE a.instructor_id = instructor_stats.instructor_id AND a.course_id = NEW.course_id)
+        WHERE instructor_id IN (SELECT instructor_id FROM instructor_assignments WHERE course_id = NEW.course_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_registration_delete AFTER DELETE ON registrations
+    BEGIN
+        UPDATE course_stats
+        SET enrollment_count = enrollment_count - 1,
+            age_sum = age_sum - COALESCE((SELECT age FROM students WHERE id = OLD.student_id), 0)
+        WHERE course_id = OLD.course_id;
+        UPDATE instructor_stats
+        SET student_count = student_count - (SELECT COUNT(*) FROM instructor_assignments a
+                WHERE a.instructor_id = instructor_stats.instructor_id AND a.course_id = OLD.course_id),
+            age_sum = age_sum - COALESCE((SELECT age FROM students WHERE id = OLD.student_id), 0)
+                * (SELECT COUNT(*) FROM instructor_assignments a
+                   WHERE a.instructor_id = instructor_stats.instructor_id AND a.course_id = OLD.course_id)
+        WHERE instructor_id IN (SELECT instructor_id FROM instructor_assignments WHERE course_id = OLD.course_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_assignment_insert AFTER INSERT ON instructor_assignments
+    BEGIN
+        UPDATE course_stats SET instructor_count = instructor_count + 1 WHERE course_id = NEW.course_id;
+        UPDATE instructor_stats
+        SET course_count = course_count + 1,
+            student_count = student_count
+                + (SELECT COUNT(*) FROM registrations WHERE course_id = NEW.course_id),
+            age_sum = age_sum + (SELECT COALESCE(SUM(s.age), 0) FROM registrations r
+                JOIN students s ON s.id = r.student_id WHERE r.course_id = NEW.course_id)
+        WHERE instructor_id = NEW.instructor_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_assignment_delete AFTER DELETE ON instructor_assignments
+    BEGIN
+        UPDATE course_stats SET instructor_count = instructor_count - 1 WHERE course_id = OLD.course_id;
+        UPDATE instructor_stats
+        SET course_count = course_count - 1,
+            student_count = student_count
+                - (SELECT COUNT(*) FROM registrations WHERE course_id = OLD.course_id),
+            age_sum = age_sum - (SELECT COALESCE(SUM(s.age), 0) FROM registrations r
+                JOIN students s ON s.id = r.student_id WHERE r.course_id = OLD.course_id)
+        WHERE instructor_id = OLD.instructor_id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_student_age_update AFTER UPDATE OF age ON students
+    WHEN NEW.age IS NOT OLD.age
+    BEGIN
+        UPDATE course_stats
+        SET age_sum = age_sum + (NEW.age - OLD.age) * (SELECT COUNT(*) FROM registrations r
+                WHERE r.student_id = NEW.id AND r.course_id = course_stats.course_id)
+        WHERE course_id IN (SELECT course_id FROM registrations WHERE student_id = NEW.id);
+        UPDATE instructor_stats
+        SET age_sum = age_sum + (NEW.age - OLD.age) * (SELECT COUNT(*) FROM registrations r
+                JOIN instructor_assignments a ON a.course_id = r.course_id
+                WHERE r.student_id = NEW.id AND a.instructor_id = instructor_stats.instructor_id)
+        WHERE instructor_id IN (SELECT a.instructor_id FROM registrations r
+                JOIN instructor_assignments a ON a.course_id = r.course_id WHERE r.student_id = NEW.id);
+    END
+    ''',
+    # Registrations left behind by a deleted student no longer contribute an age.
+    '''
+    CREATE TRIGGER IF NOT EXISTS stats_student_delete AFTER DELETE ON students
+    BEGIN
+        UPDATE course_stats
+        SET age_sum = age_sum - OLD.age * (SELECT COUNT(*) FROM registrations r
+                WHERE r.student_id = OLD.id AND r.course_id = course_stats.course_id)
+        WHERE course_id IN (SELECT course_id FROM registrations WHERE student_id = OLD.id);
+        UPDATE instructor_stats
+        SET age_sum = age_sum - OLD.age * (SELECT COUNT(*) FROM registrations r
+                JOIN instructor_assignments a ON a.course_id = r.course_id
+                WHERE r.student_id = OLD.id AND a.instructor_id = instructor_stats.instructor_id)
+        WHERE instructor_id IN (SELECT a.instructor_id FROM registrations r
+                JOIN instructor_assignments a ON a.course_id = r.course_id WHERE r.student_id = OLD.id);
+    END
+    ''',
+]
+
+# Recomputes both tables from scratch; used to fill them when they are created.
+STATS_REBUILD = [
+    "DELETE FROM course_stats",
+    '''
+    INSERT INTO course_stats (course_id, enrollment_count, instructor_count, age_sum)
+    SELECT c.id,
+           (SELECT COUNT(*) FROM registrations r WHERE r.course_id = c.id),
+           (SELECT COUNT(*) FROM instructor_assignments a WHERE a.course_id = c.id),
+           (SELECT COALESCE(SUM(s.age), 0) FROM registrations r
+            JOIN students s ON s.id = r.student_id WHERE r.course_id = c.id)
+    FROM courses c
+    ''',
+    "DELETE FROM instructor_stats",
+    '''
+    INSERT INTO instructor_stats (instructor_id, course_count, student_count, age_sum)
+    SELECT i.id,
+           (SELECT COUNT(*) FROM instructor_assignments a WHERE a.instructor_id = i.id),
+           (SELECT COUNT(*) FROM instructor_assignments a
+            JOIN registrations r ON r.course_id = a.course_id WHERE a.instructor_id = i.id),
+           (SELECT COALESCE(SUM(s.age), 0) FROM instructor_assignments a
+            JOIN registrations r ON r.course_id = a.course_id
+            JOIN students s ON s.id = r.student_id WHERE a.instructor_id = i.id)
+    FROM instructors i
+    ''',
+]
+
+
+def rebuild_stats(conn):
+    """
+    Recomputes course_stats and instructor_stats from the base tables.
+
+    Only needed if the tables were modified with the triggers disabled; the
+    caller commits.
+    """
+    for statement in STATS_REBUILD:
+        conn.execute(statement)
+
+
+# ----------------- Record index -----------------
+#
+# record_index mirrors the ID / Name / Type grid of the PyQt record table: one
+# row per student, instructor and course, kept in sync by triggers. Its NOCASE
+# columns let case-insensitive prefix searches (LIKE 'abc%') and ordering use
+# the indexes, so the table can be served one sorted page at a time.
+
+# (record type shown in the grid, source table, display id column, name column)
+RECORD_SOURCES = [
+    ('Student', 'students', 'student_id', 'name'),
+    ('Instructor', 'instructors', 'instructor_id', 'name'),
+    ('Course', 'courses', 'course_id', 'course_name'),
+]
+
+
+def _record_index_triggers(record_type, table, id_column, name_column):
+    return [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_record_index_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT OR REPLACE INTO record_index (record_type, record_id, display_id, name)
+            VALUES ('{record_type}', NEW.id, NEW.{id_column}, NEW.{name_column});
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_record_index_update AFTER UPDATE OF {id_column}, {name_column} ON {table}
+        BEGIN
+            UPDATE record_index SET display_id = NEW.{id_column}, name = NEW.{name_column}
+            WHERE record_type = '{record_type}' AND record_id = NEW.id;
+        END
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS {table}_record_index_delete AFTER DELETE ON {table}
+        BEGIN
+            DELETE FROM record_index WHERE record_type = '{record_type}' AND record_id = OLD.id;
+        END
+        ''',
+    ]
+
+
+RECORD_INDEX_TABLE = '''
+    CREATE TABLE IF NOT EXISTS record_index (
+        record_type TEXT NOT NULL,
+        record_id INTEGER NOT NULL,
+        display_id TEXT NOT NULL COLLATE NOCASE,
+        name TEXT NOT NULL COLLATE NOCASE,
+        PRIMARY KEY (record_type, record_id)
+    )
+'''
+
+RECORD_INDEX_TRIGGERS = [trigger for source in RECORD_SOURCES for trigger in _record_index_triggers(*source)]
+
+RECORD_INDEX_FILL = ["DELETE FROM record_index"] + [
+    f"INSERT INTO record_index (record_type, record_id, display_id, name) "
+    f"SELECT '{record_type}', id, {id_column}, {name_column} FROM {table}"
+    for record_type, table, id_column, name_column in RECORD_SOURCES
+]
+
+
+# ----------------- Compact join tables -----------------
+#
+# The join tables are keyed by their two columns instead of a separate
+# AUTOINCREMENT id: WITHOUT ROWID stores each row once, in the primary key
+# b-tree, duplicates are impossible, and no sqlite_sequence row is updated on
+# insert. A reverse index serves lookups from the other side. STRICT typing
+# needs SQLite 3.37+, so it is only used where available.
+
+COMPACT_OPTIONS = "WITHOUT ROWID, STRICT" if sqlite3.sqlite_version_info >= (3, 37, 0) else "WITHOUT ROWID"
+
+COMPACT_REGISTRATIONS = f'''(
+    student_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    PRIMARY KEY (student_id, course_id),
+    FOREIGN KEY (student_id) REFERENCES students(id),
+    FOREIGN KEY (course_id) REFERENCES courses(id)
+) {COMPACT_OPTIONS}'''
+
+COMPACT_INSTRUCTOR_ASSIGNMENTS = f'''(
+    instructor_id INTEGER NOT NULL,
+    course_id INTEGER NOT NULL,
+    PRIMARY KEY (instructor_id, course_id),
+    FOREIGN KEY (instructor_id) REFERENCES instructors(id),
+    FOREIGN KEY (course_id) REFERENCES courses(id)
+) {COMPACT_OPTIONS}'''
+
+
+# ----------------- Migrations -----------------
+
+# (version, description, steps), in order. Append new migrations at the end;
+# never edit one that has been released.
+MIGRATIONS = [
+    (1, "baseline tables", [
+        ddl('''
+            CREATE TABLE IF NOT EXISTS students (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                age INTEGER NOT NULL,
+                email TEXT NOT NULL
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS instructors (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                instructor_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                age INTEGER NOT NULL,
+                email TEXT NOT NULL
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS courses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                course_id TEXT NOT NULL,
+                course_name TEXT NOT NULL
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS instructor_assignments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                instructor_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                FOREIGN KEY (instructor_id) REFERENCES instructors(id),
+                FOREIGN KEY (course_id) REFERENCES courses(id)
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS registrations (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                FOREIGN KEY (student_id) REFERENCES students(id),
+                FOREIGN KEY (course_id) REFERENCES courses(id)
+            )
+        ''', description="create tables"),
+    ]),
+    (2, "index join table foreign keys", [
+        create_index('registrations_student_id_idx', 'registrations', 'student_id'),
+        create_index('registrations_course_id_idx', 'registrations', 'course_id'),
+        create_index('instructor_assignments_instructor_id_idx', 'instructor_assignments', 'instructor_id'),
+        create_index('instructor_assignments_course_id_idx', 'instructor_assignments', 'course_id'),
+    ]),
+    (3, "course capacity and waitlists", [
+        # NULL capacity means the course is unlimited.
+        add_column('courses', 'capacity', 'INTEGER'),
+        ddl('''
+            DELETE FROM registrations WHERE id NOT IN (
+                SELECT MIN(id) FROM registrations GROUP BY student_id, course_id)
+        ''', description="remove duplicate registrations"),
+        create_index('registrations_student_course_idx', 'registrations', 'student_id, course_id', unique=True),
+        ddl('''
+            CREATE TABLE IF NOT EXISTS waitlist (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                student_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                requested_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (student_id, course_id),
+                FOREIGN KEY (student_id) REFERENCES students(id),
+                FOREIGN KEY (course_id) REFERENCES courses(id)
+            )
+        ''', '''
+            CREATE TABLE IF NOT EXISTS enrollment_requests (
+                request_key TEXT PRIMARY KEY,
+                student_id INTEGER NOT NULL,
+                course_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        ''', CAPACITY_GUARD, description="create waitlist, request log and capacity guard"),
+        create_index('waitlist_course_idx', 'waitlist', 'course_id, id'),
+    ]),
+    (4, "course and instructor statistics", [
+        # Triggers and the initial fill share one transaction so no write is missed.
+        ddl(*STATS_TABLES, *STATS_TRIGGERS, *STATS_REBUILD, description="create and fill statistics tables"),
+    ]),
+    (5, "unified record index", [
+        ddl(RECORD_INDEX_TABLE, *RECORD_INDEX_TRIGGERS, *RECORD_INDEX_FILL,
+            description="create and fill record_index"),
+        create_index('record_index_name_idx', 'record_index', 'name, record_type, record_id'),
+        create_index('record_index_display_id_idx', 'record_index', 'display_id, record_type, record_id'),
+        create_index('record_index_type_name_idx', 'record_index', 'record_type, name, record_id'),
+        create_index('record_index_type_display_id_idx', 'record_index', 'record_type, display_id, record_id'),
+    ]),
+    (6, "compact join tables", [
+        # Rows pointing at deleted students, instructors or courses are dropped,
+        # as are duplicates; the statistics are then recomputed to match.
+        rebuild_table('registrations', COMPACT_REGISTRATIONS, '''
+            SELECT DISTINCT CAST(student_id AS INTEGER), CAST(course_id AS INTEGER) FROM registrations
+            WHERE student_id IN (SELECT id FROM students) AND course_id IN (SELECT id FROM courses)
+        ''', after=[
+            'CREATE INDEX IF NOT EXISTS registrations_course_student_idx ON registrations (course_id, student_id)',
+            CAPACITY_GUARD,
+            *STATS_TRIGGERS,
+        ], description="rebuild registrations"),
+        rebuild_table('instructor_assignments', COMPACT_INSTRUCTOR_ASSIGNMENTS, '''
+            SELECT DISTINCT CAST(instructor_id AS INTEGER), CAST(course_id AS INTEGER) FROM instructor_assignments
+            WHERE instructor_id IN (SELECT id FROM instructors) AND course_id IN (SELECT id FROM courses)
+        ''', after=[
+            'CREATE INDEX IF NOT EXISTS instructor_assignments_course_instructor_idx '
+            'ON instructor_assignments (course_id, instructor_id)',
+            *STATS_TRIGGERS,
+        ], description="rebuild instructor_assignments"),
+        ddl(*STATS_REBUILD, description="recompute statistics"),
+    ]),
+    (7, "drop orphaned instructor assignments", [
+        # Deleting an instructor or course used to leave its assignments
+        # behind, still counted in the statistics of the other side.
+        ddl('''
+            DELETE FROM instructor_assignments
+            WHERE instructor_id NOT IN (SELECT id FROM instructors) OR course_id NOT IN (SELECT id FROM courses)
+        ''', *STATS_REBUILD, description="delete orphaned assignments and recompute statistics"),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_version(conn):
+    """
+    Returns the schema version stored in PRAGMA user_version.
+    """
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(db_path=DB_PATH, target=None, report=None):
+    """
+    Brings the database schema up to date, one migration at a time.
+
+    Each pending migration's steps are run in order and timed; PRAGMA
+    user_version is set to the migration's version only after all of its steps
+    have succeeded. Existing data is never dropped.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Database file (default 'school_management.db').
+    target : int, optional
+        Stop after this version (default: the latest).
+    report : callable, optional
+        Called with each step's timing dict as it completes.
+
+    Returns
+    -------
+    list of dict
+        One entry per step run: version, description, step and seconds.
+    """
+    target = LATEST_VERSION if target is None else target
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    timings = []
+    try:
+        conn.execute("PRAGMA foreign_keys = ON")
+        current = get_version(conn)
+        for version, description, steps in MIGRATIONS:
+            if version <= current or version > target:
+                continue
+            started = time.perf_counter()
+            for step in steps:
+                step_started = time.perf_counter()
+                step(conn)
+                timing = {
+                    "version": version,
+                    "description": description,
+                    "step": step.description,
+                    "seconds": round(time.perf_counter() - step_started, 3),
+                }
+                timings.append(timing)
+                if report:
+                    report(timing)
+            # PRAGMA statements cannot take bound parameters.
+            with _transaction(conn):
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+            if report:
+                report({"version": version, "description": description, "step": "done",
+                        "seconds": round(time.perf_counter() - started, 3)})
+    finally:
+        conn.close()
+    return timings
+
+
+def recreate_tables(db_path=DB_PATH):
+    """
+    Drops every table and rebuilds the schema from scratch.
+
+    This destroys all data and is only meant for development databases; use
+    `migrate` for anything else.
+    """
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    try:
+        conn.execute("PRAGMA foreign_keys = OFF")
+        tables = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+        with _transaction(conn):
+            for table in tables:
+                conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            conn.execute("PRAGMA user_version = 0")
+    finally:
+        conn.close()
+    return migrate(db_path)
 
 
 if __name__ == "__main__":
-    recreate_tables()
+    parser = argparse.ArgumentParser(description="Create or upgrade the school database schema.")
+    parser.add_argument("--db", default=DB_PATH, help="database file")
+    parser.add_argument("--target", type=int, help="migrate up to this version only")
+    parser.add_argument("--recreate", action="store_true", help="drop all tables first (destroys data)")
+    args = parser.parse_args()
+
+    if args.recreate:
+        recreate_tables(args.db)
+    else:
+        migrate(args.db, args.target, report=lambda t: print(
+            f"v{t['version']} {t['description']}: {t['step']} ({t['seconds']} s)"))
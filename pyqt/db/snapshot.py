@@ -0,0 +1,284 @@
+import argparse
+import datetime
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+
+class _BackupRestarted(Exception):
+    """Raised from the progress callback to abandon a paged copy that keeps restarting."""
+
+
+def _copy(source, target_path, pages, pause):
+    """
+    Copies an open database into `target_path` with the online backup API.
+
+    Parameters
+    ----------
+    source : sqlite3.Connection
+        Connection to the database being copied.
+    target_path : str
+        Path of the copy.
+    pages : int
+        Pages copied per step; -1 copies everything in one step.
+    pause : float
+        Seconds to wait between steps so writers can take the lock.
+
+    Returns
+    -------
+    dict
+        Step timings, total page count and number of restarts.
+    """
+    stats = {"steps": 0, "restarts": 0, "pages": 0, "lock_seconds": 0.0, "max_step_seconds": 0.0}
+    state = {"step_started": time.perf_counter(), "remaining": None}
+
+    def progress(status, remaining, total):
+        # The source's shared lock is only held inside each step, i.e. between
+        # the end of the previous callback and the start of this one.
+        step = time.perf_counter() - state["step_started"]
+        stats["steps"] += 1
+        stats["pages"] = total
+        stats["lock_seconds"] += step
+        stats["max_step_seconds"] = max(stats["max_step_seconds"], step)
+
+        # Another connection wrote to the source, so SQLite started over.
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            stats["restarts"] += 1
+            if stats["restarts"] > 3:
+                raise _BackupRestarted()
+        state["remaining"] = remaining
+
+        if remaining and pause:
+            time.sleep(pause)
+        state["step_started"] = time.perf_counter()
+
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, progress=progress)
+    finally:
+        target.close()
+    return stats
+
+
+def verify_snapshot(path):
+    """
+    Runs SQLite's integrity check on a snapshot.
+
+    Parameters
+    ----------
+    path : str
+        Path of the snapshot file.
+
+    Returns
+    -------
+    bool
+        True if the check reports "ok".
+    """
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        result = conn.execute("PRAGMA integrity_check").fetchall()
+    finally:
+        conn.close()
+    return result == [("ok",)]
+
+
+def take_snapshot(source_path, target_path, pages=256, pause=0.005, verify=True):
+    """
+    Takes a consistent copy of a live database with `sqlite3.Connection.backup`.
+
+    The copy is made `pages` pages at a time and the source is only locked
+    during each step, so writers are never blocked for the whole copy. If other
+    connections keep modifying the source and the paged copy restarts more than
+    three times, the copy is finished in a single step instead.
+
+    The snapshot is written to a temporary file and renamed into place once it
+    is complete (and has passed the integrity check), so a partial copy is never
+    left at `target_path`.
+
+    Parameters
+    ----------
+    source_path : str
+        Path of the live database.
+    target_path : str
+        Path of the snapshot to create.
+    pages : int, optional
+        Pages copied per step (default 256).
+    pause : float, optional
+        Seconds writers get between steps (default 0.005).
+    verify : bool, optional
+        Run an integrity check on the copy (default True).
+
+    Returns
+    -------
+    dict
+        Statistics: pages, seconds, pages_per_sec, steps, restarts, the longest
+        time writers were stalled by one step (max_stall_ms), the total time the
+        source was locked (lock_ms) and the integrity check result.
+
+    Raises
+    ------
+    sqlite3.OperationalError
+        If `source_path` does not exist or cannot be opened.
+    sqlite3.DatabaseError
+        If the copy fails the integrity check.
+    """
+    temp_path = target_path + ".partial"
+    # Read-only, so a missing source is an error instead of a new empty database
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    started = time.perf_counter()
+    try:
+        try:
+            stats = _copy(source, temp_path, pages, pause)
+            stats["mode"] = "paged"
+        except _BackupRestarted:
+            stats = _copy(source, temp_path, -1, 0)
+            stats["mode"] = "single-step"
+    except BaseException:
+        # Do not leave a half-written copy behind (I/O error, locked source, ...)
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        source.close()
+    seconds = time.perf_counter() - started
+
+    stats["integrity"] = verify_snapshot(temp_path) if verify else None
+    if stats["integrity"] is False:
+        os.remove(temp_path)
+        raise sqlite3.DatabaseError(f"Snapshot of {source_path} failed the integrity check")
+    os.replace(temp_path, target_path)
+
+    stats.update({
+        "path": target_path,
+        "seconds": round(seconds, 3),
+        "pages_per_sec": round(stats["pages"] / seconds) if seconds else None,
+        "max_stall_ms": round(stats.pop("max_step_seconds") * 1000, 3),
+        "lock_ms": round(stats.pop("lock_seconds") * 1000, 3),
+    })
+    return stats
+
+
+def snapshot_name(source_path, when=None):
+    """
+    Returns the timestamped file name used for a snapshot of `source_path`.
+    """
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    when = when or datetime.datetime.now()
+    return f"{stem}-{when.strftime('%Y%m%d-%H%M%S')}.db"
+
+
+def rotate_snapshots(snapshot_dir, source_path, keep):
+    """
+    Deletes the oldest snapshots of `source_path`, keeping the newest `keep`.
+
+    Returns
+    -------
+    list of str
+        The paths that were removed.
+    """
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    # Timestamped names sort chronologically.
+    snapshots = sorted(glob.glob(os.path.join(snapshot_dir, f"{stem}-*.db")))
+    removed = snapshots[:-keep] if keep > 0 else []
+    for path in removed:
+        os.remove(path)
+    return removed
+
+
+def run_snapshot(source_path, snapshot_dir, keep=7, **options):
+    """
+    Takes a timestamped snapshot into `snapshot_dir` and applies retention.
+
+    Parameters
+    ----------
+    source_path : str
+        Path of the live database.
+    snapshot_dir : str
+        Directory holding the snapshots. Created if missing.
+    keep : int, optional
+        Number of snapshots to retain (default 7).
+    **options
+        Passed to `take_snapshot`.
+
+    Returns
+    -------
+    dict
+        The statistics from `take_snapshot`, plus the list of rotated-out files.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    stats = take_snapshot(source_path, os.path.join(snapshot_dir, snapshot_name(source_path)), **options)
+    stats["removed"] = rotate_snapshots(snapshot_dir, source_path, keep)
+    return stats
+
+
+class SnapshotScheduler(threading.Thread):
+    """
+    Background thread that takes a snapshot every `interval` seconds.
+
+    Parameters
+    ----------
+    source_path : str
+        Path of the live database.
+    snapshot_dir : str
+        Directory holding the snapshots.
+    interval : float
+        Seconds between snapshots.
+    keep : int, optional
+        Number of snapshots to retain (default 7).
+    on_snapshot : callable, optional
+        Called with the statistics dict after each snapshot, or with the
+        exception if one failed.
+    **options
+        Passed to `take_snapshot`.
+    """
+
+    def __init__(self, source_path, snapshot_dir, interval, keep=7, on_snapshot=None, **options):
+        super().__init__(name="sqlite-snapshot", daemon=True)
+        self.source_path = source_path
+        self.snapshot_dir = snapshot_dir
+        self.interval = interval
+        self.keep = keep
+        self.on_snapshot = on_snapshot
+        self.options = options
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                result = run_snapshot(self.source_path, self.snapshot_dir, self.keep, **self.options)
+            except (sqlite3.Error, OSError) as e:
+                result = e
+            if self.on_snapshot:
+                self.on_snapshot(result)
+
+    def stop(self):
+        """Stops the scheduler after the current snapshot, if any."""
+        self._stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Take online snapshots of the school database.")
+    parser.add_argument("--source", default="school_management.db", help="database to copy")
+    parser.add_argument("--dest", default="snapshots", help="directory for the snapshots")
+    parser.add_argument("--keep", type=int, default=7, help="number of snapshots to retain")
+    parser.add_argument("--pages", type=int, default=256, help="pages copied per step")
+    parser.add_argument("--pause", type=float, default=0.005, help="seconds between steps")
+    parser.add_argument("--interval", type=float, help="repeat every INTERVAL seconds instead of once")
+    args = parser.parse_args()
+
+    options = {"pages": args.pages, "pause": args.pause}
+    if args.interval:
+        scheduler = SnapshotScheduler(args.source, args.dest, args.interval, args.keep, on_snapshot=print, **options)
+        scheduler.start()
+        try:
+            scheduler.join()
+        except KeyboardInterrupt:
+            scheduler.stop()
+    else:
+        print(run_snapshot(args.source, args.dest, args.keep, **options))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+import sqlite3
+from collections import namedtuple
+
+# Outcomes of an enrollment request.
+ENROLLED = 'enrolled'
+WAITLISTED = 'waitlisted'
+DUPLICATE = 'duplicate'
+NOT_FOUND = 'not_found'
+
+# position is the 1-based place on the course's waitlist, or None.
+EnrollmentResult = namedtuple('EnrollmentResult', ['status', 'student_id', 'course_id', 'position'])
+
+
+def begin_write(conn):
+    """
+    Takes SQLite's write lock unless the connection already holds a transaction.
+
+    Seat allocation reads the number of taken seats and then inserts, so both
+    must happen under the write lock: with BEGIN IMMEDIATE no other connection
+    can enroll into the same course in between. When the caller already opened
+    a transaction (e.g. the writer thread's BEGIN IMMEDIATE), it is reused.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to lock with.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
+
+def seats(conn, course_id):
+    """
+    Returns a course's capacity and taken seats.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to read with.
+    course_id : int
+        Primary key of the course.
+
+    Returns
+    -------
+    tuple or None
+        (capacity, enrolled), where capacity is None for an unlimited course,
+        or None if the course does not exist.
+    """
+    row = conn.execute("SELECT capacity FROM courses WHERE id = ?", (course_id,)).fetchone()
+    if row is None:
+        return None
+    enrolled = conn.execute("SELECT COUNT(*) FROM registrations WHERE course_id = ?", (course_id,)).fetchone()[0]
+    return row[0], enrolled
+
+
+def waitlist_position(conn, student_id, course_id):
+    """
+    Returns a student's 1-based place on a course's waitlist, or None.
+    """
+    row = conn.execute("SELECT id FROM waitlist WHERE student_id = ? AND course_id = ?",
+                       (student_id, course_id)).fetchone()
+    if row is None:
+        return None
+    return conn.execute("SELECT COUNT(*) FROM waitlist WHERE course_id = ? AND id <= ?",
+                        (course_id, row[0])).fetchone()[0]
+
+
+def _key(value):
+    """
+    Returns a primary key as the integer SQLite stores, e.g. for '12' from a form.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value  # Matches no row, so the request ends as NOT_FOUND
+
+
+def _allocate(conn, student_id, course_id):
+    """
+    Enrolls or waitlists one student. The write lock must already be held.
+    """
+    if conn.execute("SELECT 1 FROM students WHERE id = ?", (student_id,)).fetchone() is None:
+        return EnrollmentResult(NOT_FOUND, student_id, course_id, None)
+    course_seats = seats(conn, course_id)
+    if course_seats is None:
+        return EnrollmentResult(NOT_FOUND, student_id, course_id, None)
+
+    if conn.execute("SELECT 1 FROM registrations WHERE student_id = ? AND course_id = ?",
+                    (student_id, course_id)).fetchone():
+        return EnrollmentResult(DUPLICATE, student_id, course_id, None)
+    position = waitlist_position(conn, student_id, course_id)
+    if position is not None:
+        return EnrollmentResult(DUPLICATE, student_id, course_id, position)
+
+    capacity, enrolled = course_seats
+    # Seats freed while others are waiting go to the waitlist first.
+    queued = conn.execute("SELECT 1 FROM waitlist WHERE course_id = ? LIMIT 1", (course_id,)).fetchone()
+    if (capacity is None or enrolled < capacity) and not queued:
+        conn.execute("INSERT INTO registrations (student_id, course_id) VALUES (?, ?)", (student_id, course_id))
+        return EnrollmentResult(ENROLLED, student_id, course_id, None)
+
+    conn.execute("INSERT INTO waitlist (student_id, course_id) VALUES (?, ?)", (student_id, course_id))
+    return EnrollmentResult(WAITLISTED, student_id, course_id, waitlist_position(conn, student_id, course_id))
+
+
+def enroll(conn, student_id, course_id, request_key=None):
+    """
+    Atomically gives a student a seat in a course, or a place on its waitlist.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to write with. The caller commits.
+    student_id : int or str
+        Primary key of the student; digit strings are accepted.
+    course_id : int or str
+        Primary key of the course; digit strings are accepted.
+    request_key : str, optional
+        Client-chosen key that makes the request idempotent: repeating a
+        request with the same key returns the first outcome without enrolling
+        again, so clients can safely retry after a timeout.
+
+    Returns
+    -------
+    EnrollmentResult
+        ENROLLED, WAITLISTED (with the waitlist position), DUPLICATE if the
+        student already has a seat or a waitlist place, or NOT_FOUND if the
+        student or course does not exist.
+
+    Raises
+    ------
+    ValueError
+        If `request_key` was already used for a different student or course.
+    """
+    # Request keys are compared with the stored integer keys
+    student_id, course_id = _key(student_id), _key(course_id)
+    begin_write(conn)
+    if request_key is not None:
+        row = conn.execute("SELECT student_id, course_id, status FROM enrollment_requests WHERE request_key = ?",
+                           (request_key,)).fetchone()
+        if row is not None:
+            if (row[0], row[1]) != (student_id, course_id):
+                raise ValueError(f"Request key {request_key!r} was already used for another enrollment")
+            position = waitlist_position(conn, student_id, course_id) if row[2] == WAITLISTED else None
+            return EnrollmentResult(row[2], student_id, course_id, position)
+
+    result = _allocate(conn, student_id, course_id)
+    if request_key is not None:
+        conn.execute("INSERT INTO enrollment_requests (request_key, student_id, course_id, status) "
+                     "VALUES (?, ?, ?, ?)", (request_key, student_id, course_id, result.status))
+    return result
+
+
+def enroll_batch(conn, requests):
+    """
+    Processes many enrollment requests under one write lock.
+
+    Requests are handled in order, so earlier requests get seats first.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to write with. The caller commits.
+    requests : iterable of tuple
+        (student_id, course_id) or (student_id, course_id, request_key).
+
+    Returns
+    -------
+    list of EnrollmentResult
+        One result per request.
+    """
+    begin_write(conn)
+    return [enroll(conn, *request) for request in requests]
+
+
+def promote(conn, course_id):
+    """
+    Moves students from the head of a course's waitlist into free seats.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to write with. The caller commits.
+    course_id : int
+        Primary key of the course.
+
+    Returns
+    -------
+    list of int
+        Primary keys of the promoted students, in waitlist order.
+    """
+    begin_write(conn)
+    course_seats = seats(conn, course_id)
+    if course_seats is None:
+        return []
+    capacity, enrolled = course_seats
+    free = None if capacity is None else max(capacity - enrolled, 0)
+    if free == 0:
+        return []
+
+    query = "SELECT id, student_id FROM waitlist WHERE course_id = ? ORDER BY id"
+    params = (course_id,)
+    if free is not None:
+        query += " LIMIT ?"
+        params += (free,)
+    promoted = []
+    for waitlist_id, student_id in conn.execute(query, params).fetchall():
+        conn.execute("DELETE FROM waitlist WHERE id = ?", (waitlist_id,))
+        try:
+            conn.execute("INSERT INTO registrations (student_id, course_id) VALUES (?, ?)", (student_id, course_id))
+        except sqlite3.IntegrityError:
+            # Already registered through another path; just drop the waitlist entry.
+            continue
+        promoted.append(student_id)
+    return promoted
+
+
+def drop(conn, student_id, course_id):
+    """
+    Removes a student's seat (or waitlist place) and fills the freed seat.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to write with. The caller commits.
+    student_id : int
+        Primary key of the student.
+    course_id : int
+        Primary key of the course.
+
+    Returns
+    -------
+    list of int
+        Students promoted from the waitlist into the freed seat.
+    """
+    begin_write(conn)
+    conn.execute("DELETE FROM waitlist WHERE student_id = ? AND course_id = ?", (student_id, course_id))
+    removed = conn.execute("DELETE FROM registrations WHERE student_id = ? AND course_id = ?",
+                           (student_id, course_id)).rowcount
+    return promote(conn, course_id) if removed else []
+
+
+def set_capacity(conn, course_id, capacity):
+    """
+    Changes a course's capacity and promotes waitlisted students into new seats.
+
+    Lowering the capacity below the current enrollment keeps existing seats;
+    no new students are admitted until enough drop.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection
+        The connection to write with. The caller commits.
+    course_id : int
+        Primary key of the course.
+    capacity : int or None
+        New capacity; None makes the course unlimited.
+
+    Returns
+    -------
+    list of int
+        Students promoted from the waitlist.
+    """
+    if capacity is not None and capacity < 0:
+        raise ValueError("Capacity cannot be negative")
+    begin_write(conn)
+    conn.execute("UPDATE courses SET capacity = ? WHERE id = ?", (capacity, course_id))
+    return promote(conn, course_id)
+
+
+def release_student(conn, student_id):
+    """
+    Drops a student from every course and waitlist, promoting into freed seats.
+
+    Returns
+    -------
+    list of tuple
+        (course_id, promoted student ids) for every course the student left.
+    """
+    begin_write(conn)
+    conn.execute("DELETE FROM waitlist WHERE student_id = ?", (student_id,))
+    courses = [row[0] for row in conn.execute(
+        "SELECT course_id FROM registrations WHERE student_id = ?", (student_id,)).fetchall()]
+    return [(course_id, drop(conn, student_id, course_id)) for course_id in courses]
+
+
+def release_course(conn, course_id):
+    """
+    Removes all seats, waitlist places and request records of a course.
+    """
+    begin_write(conn)
+    for table in ("registrations", "waitlist", "enrollment_requests"):
+        conn.execute(f"DELETE FROM {table} WHERE course_id = ?", (course_id,))
@@ -0,0 +1,704 @@
+import functools
+import inspect
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager, nullcontext
+
+import metrics
+
+try:
+    import psycopg2.extensions as _pg
+except ImportError:  # Only PostgreSQL connections need psycopg2.
+    _pg = None
+
+# Default thresholds above which statements and UI actions are logged as slow.
+# Can be set with the SCHOOL_SLOW_QUERY_MS and SCHOOL_SLOW_ACTION_MS
+# environment variables.
+SLOW_QUERY_MS = float(os.environ.get('SCHOOL_SLOW_QUERY_MS', 100))
+SLOW_ACTION_MS = float(os.environ.get('SCHOOL_SLOW_ACTION_MS', 250))
+
+# Latencies kept per statement or action for the percentiles.
+LATENCY_WINDOW = 1024
+
+# Entries kept by the in-memory slow log.
+SLOW_LOG_ENTRIES = 1000
+
+# Longest statement text kept; statements are grouped by this text.
+STATEMENT_CHARS = 300
+
+# Slow statements and actions are also logged here, one JSON object per record.
+logger = logging.getLogger('school.slow')
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _shape(params):
+    """
+    Describes the parameters of a statement without their values.
+    """
+    if params is None or params == ():
+        return '()'
+    if isinstance(params, dict):
+        return '{' + ', '.join(sorted(map(str, params))) + '}'
+    if isinstance(params, (list, tuple)):
+        names = [type(value).__name__ for value in params[:8]]
+        if len(params) > 8:
+            names.append(f'+{len(params) - 8}')
+        return '(' + ', '.join(names) + ')'
+    return type(params).__name__
+
+
+def _many_shape(seq):
+    if isinstance(seq, (list, tuple)):
+        return f'[{len(seq)} x {_shape(seq[0]) if seq else "()"}]'
+    return '[iterator]'
+
+
+def _percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+class _Stats:
+    """
+    Running totals for one statement or action.
+    """
+
+    __slots__ = ('count', 'errors', 'seconds', 'max', 'rows', 'db', 'shape', 'latencies')
+
+    def __init__(self):
+        self.count = self.errors = self.rows = 0
+        self.seconds = self.max = self.db = 0.0
+        self.shape = None
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def add(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.max = max(self.max, seconds)
+        self.latencies.append(seconds)
+
+    def report(self):
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'total_ms': round(self.seconds * 1000, 3),
+            'mean_ms': round(self.seconds / self.count * 1000, 3) if self.count else 0,
+            'p95_ms': round(_percentile(self.latencies, 95) * 1000, 3) if self.latencies else 0,
+            'max_ms': round(self.max * 1000, 3),
+        }
+
+
+class Recorder:
+    """
+    Collects statement and UI action timings while enabled.
+
+    When disabled (the default) the instrumented connections hand out plain
+    cursors and the `action` wrappers call straight through, so the cost is a
+    single attribute check per cursor or action.
+
+    Statements are grouped by their text (whitespace collapsed). For each
+    group the recorder keeps the count, total and maximum time, the rows
+    returned (or changed), the shape of the last parameters and the most
+    recent latencies for the p95. A statement's time covers executing it and
+    fetching its rows. For actions it keeps the same timings split into time
+    spent in the database (statements run on the action's thread, plus time
+    waiting for the write queue or the API service) and everything else,
+    which is mostly updating widgets ("render" time).
+
+    Statements and actions slower than their threshold are appended to an
+    in-memory slow log and logged as JSON to the 'school.slow' logger.
+
+    A tracer (see tracing.py) can be attached with `set_tracer`; it is then
+    given every action and statement as a span, whether or not timings are
+    being recorded. Likewise a profiler (see profiling.py) attached with
+    `set_profiler` is handed every action.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether timings are being recorded.
+    capturing : bool
+        Whether statements and actions are intercepted at all (recording or
+        tracing).
+    tracer : tracing.Tracer or None
+        The attached tracer.
+    profiler : profiling.Profiler or None
+        The attached profiler.
+    slow_query_seconds, slow_action_seconds : float
+        Thresholds of the slow log.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.capturing = False
+        self.tracer = None
+        self.profiler = None
+        self.slow_query_seconds = SLOW_QUERY_MS / 1000
+        self.slow_action_seconds = SLOW_ACTION_MS / 1000
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._texts = {}
+        self._log_handler = None
+        self.reset()
+
+    def enable(self, slow_query_ms=None, slow_action_ms=None, log_path=None):
+        """
+        Starts recording.
+
+        Parameters
+        ----------
+        slow_query_ms, slow_action_ms : float, optional
+            New slow log thresholds in milliseconds.
+        log_path : str, optional
+            Also append the slow log to this file, one JSON object per line.
+        """
+        if slow_query_ms is not None:
+            self.slow_query_seconds = slow_query_ms / 1000
+        if slow_action_ms is not None:
+            self.slow_action_seconds = slow_action_ms / 1000
+        if log_path and self._log_handler is None:
+            self._log_handler = logging.FileHandler(log_path)
+            self._log_handler.setFormatter(logging.Formatter('%(message)s'))
+            logger.addHandler(self._log_handler)
+        self.enabled = True
+        self.capturing = True
+
+    def disable(self):
+        """
+        Stops recording; the collected timings are kept until `reset`.
+        """
+        self.enabled = False
+        self.capturing = self.tracer is not None
+        if self._log_handler is not None:
+            logger.removeHandler(self._log_handler)
+            self._log_handler.close()
+            self._log_handler = None
+
+    def set_tracer(self, tracer):
+        """
+        Attaches a tracer, or detaches it with None.
+        """
+        self.tracer = tracer
+        self.capturing = self.enabled or tracer is not None
+
+    def set_profiler(self, profiler):
+        """
+        Attaches a profiler, or detaches it with None.
+
+        Statements are not intercepted for the profiler, so profiles show the
+        plain sqlite3 calls.
+        """
+        self.profiler = profiler
+
+    def reset(self):
+        """
+        Discards all collected timings and the slow log.
+        """
+        with self._lock:
+            self._statements = {}
+            self._actions = {}
+            self.slow_log = deque(maxlen=SLOW_LOG_ENTRIES)
+
+    def _text(self, query):
+        text = self._texts.get(query)
+        if text is None:
+            if not isinstance(query, str):
+                query = query.decode('utf-8', 'replace') if isinstance(query, bytes) else str(query)
+            text = _WHITESPACE.sub(' ', query).strip()[:STATEMENT_CHARS]
+            if len(self._texts) > 10000:
+                self._texts.clear()
+            self._texts[query] = text
+        return text
+
+    def _slow(self, entry):
+        self.slow_log.append(entry)
+        logger.warning(json.dumps(entry, default=str))
+
+    def record_statement(self, query, shape, seconds, rows, error=False, started=None):
+        """
+        Records one executed statement.
+
+        Parameters
+        ----------
+        query : str
+            The statement text.
+        shape : str
+            Description of its parameters, e.g. '(str, int)'.
+        seconds : float
+            Time spent executing it and fetching its rows.
+        rows : int
+            Rows returned, or changed for INSERT/UPDATE/DELETE.
+        error : bool, optional
+            Whether the statement failed.
+        started : float, optional
+            `time.perf_counter()` when it was executed, for the tracer.
+        """
+        text = self._text(query)
+        tracer = self.tracer
+        if tracer is not None and started is not None:
+            tracer.complete(text, 'query', started, seconds, {'params': shape, 'rows': rows, 'error': error})
+        if not self.enabled:
+            return
+        self.add_db_time(seconds)
+        with self._lock:
+            stats = self._statements.get(text)
+            if stats is None:
+                stats = self._statements[text] = _Stats()
+            stats.add(seconds)
+            stats.rows += max(rows, 0)
+            stats.errors += error
+            stats.shape = shape
+        if seconds >= self.slow_query_seconds:
+            frames = getattr(self._local, 'actions', None)
+            self._slow({'kind': 'query', 'ms': round(seconds * 1000, 3), 'statement': text, 'params': shape,
+                        'rows': rows, 'error': error, 'action': frames[-1][0] if frames else None,
+                        'thread': threading.current_thread().name, 'time': time.time()})
+
+    def add_db_time(self, seconds):
+        """
+        Counts `seconds` as database time of the action running on this thread.
+        """
+        frames = getattr(self._local, 'actions', None)
+        if frames:
+            frames[-1][2] += seconds
+
+    @contextmanager
+    def action(self, name):
+        """
+        Times a UI action (or any block) and splits it into database and render time.
+        """
+        with self.tracer.span(name, 'action') if self.tracer is not None else nullcontext(), \
+                self.profiler.profile(name) if self.profiler is not None else nullcontext():
+            if not self.enabled:
+                yield
+                return
+            with self._timed_action(name):
+                yield
+
+    @contextmanager
+    def _timed_action(self, name):
+        frames = getattr(self._local, 'actions', None)
+        if frames is None:
+            frames = self._local.actions = []
+        frame = [name, time.perf_counter(), 0.0]
+        frames.append(frame)
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            frames.pop()
+            seconds = time.perf_counter() - frame[1]
+            db = min(frame[2], seconds)
+            if frames:
+                frames[-1][2] += db
+            with self._lock:
+                stats = self._actions.get(name)
+                if stats is None:
+                    stats = self._actions[name] = _Stats()
+                stats.add(seconds)
+                stats.db += db
+                stats.errors += error
+            if seconds >= self.slow_action_seconds:
+                self._slow({'kind': 'action', 'ms': round(seconds * 1000, 3), 'action': name,
+                            'db_ms': round(db * 1000, 3), 'render_ms': round((seconds - db) * 1000, 3),
+                            'error': error, 'thread': threading.current_thread().name, 'time': time.time()})
+
+    def summary(self, top=10):
+        """
+        Builds the summary report.
+
+        Parameters
+        ----------
+        top : int, optional
+            Statements listed in each ranking (default 10).
+
+        Returns
+        -------
+        dict
+            'statements' ranked three ways ('by_total', 'by_count', 'by_p95'),
+            'actions' by total time with their db/render split, and the 20
+            most recent 'slow' log entries.
+        """
+        with self._lock:
+            statements = []
+            for text, stats in self._statements.items():
+                entry = {'statement': text, 'params': stats.shape, 'rows': stats.rows}
+                entry.update(stats.report())
+                statements.append(entry)
+            actions = []
+            for name, stats in self._actions.items():
+                entry = {'action': name}
+                entry.update(stats.report())
+                entry['db_ms'] = round(stats.db * 1000, 3)
+                entry['render_ms'] = round((stats.seconds - stats.db) * 1000, 3)
+                actions.append(entry)
+            slow = list(self.slow_log)[-20:]
+        return {
+            'enabled': self.enabled,
+            'statements': {
+                'by_total': sorted(statements, key=lambda s: -s['total_ms'])[:top],
+                'by_count': sorted(statements, key=lambda s: -s['count'])[:top],
+                'by_p95': sorted(statements, key=lambda s: -s['p95_ms'])[:top],
+            },
+            'actions': sorted(actions, key=lambda a: -a['total_ms']),
+            'slow': slow,
+        }
+
+    def format_summary(self, top=10):
+        """
+        Returns the summary report as aligned text.
+        """
+        report = self.summary(top)
+        lines = []
+        for title, key in (('Statements by total time', 'by_total'), ('Statements by count', 'by_count'),
+                           ('Statements by p95', 'by_p95')):
+            lines.append(f'{title}:')
+            lines.append(f'  {"count":>7} {"total ms":>10} {"p95 ms":>9} {"max ms":>9} {"rows":>8}  statement')
+            for s in report['statements'][key]:
+                lines.append(f'  {s["count"]:>7} {s["total_ms"]:>10.1f} {s["p95_ms"]:>9.3f} {s["max_ms"]:>9.3f} '
+                             f'{s["rows"]:>8}  {s["statement"][:100]} {s["params"]}')
+            lines.append('')
+        lines.append('Actions:')
+        lines.append(f'  {"count":>7} {"total ms":>10} {"db ms":>10} {"render ms":>10} {"p95 ms":>9}  action')
+        for a in report['actions']:
+            lines.append(f'  {a["count"]:>7} {a["total_ms"]:>10.1f} {a["db_ms"]:>10.1f} {a["render_ms"]:>10.1f} '
+                         f'{a["p95_ms"]:>9.2f}  {a["action"]}')
+        lines.append('')
+        lines.append(f'Slow log ({len(self.slow_log)} entries, thresholds {self.slow_query_seconds * 1000:g} ms / '
+                     f'{self.slow_action_seconds * 1000:g} ms):')
+        for entry in report['slow']:
+            lines.append(f'  {entry["ms"]:>9.1f} ms  {entry["kind"]:<6} '
+                         f'{entry.get("statement") or entry.get("action")}')
+        return '\n'.join(lines)
+
+
+# The recorder used by every instrumented connection and action.
+RECORDER = Recorder()
+
+
+# ----------------- Cursors -----------------
+
+class _TimedCursor:
+    """
+    Times each statement from execution until its rows have been fetched.
+
+    A statement's sample is completed when its rows run out, when the cursor
+    runs another statement, or when it is closed or garbage collected.
+    """
+
+    _sample = None
+
+    def _begin(self, query, shape, started, seconds):
+        # [query, params shape, seconds so far, rows so far, start time]
+        self._sample = [query, shape, seconds, 0, started]
+        if self.description is None:
+            self._finish(rows=self.rowcount)
+
+    def _finish(self, rows=None, error=False):
+        sample = self._sample
+        if sample is not None:
+            self._sample = None
+            RECORDER.record_statement(sample[0], sample[1], sample[2], sample[3] if rows is None else rows, error,
+                                      sample[4])
+
+    def _timed(self, query, shape, run):
+        self._finish()
+        started = time.perf_counter()
+        try:
+            result = run()
+        except BaseException:
+            self._sample = [query, shape, time.perf_counter() - started, 0, started]
+            self._finish(error=True)
+            raise
+        self._begin(query, shape, started, time.perf_counter() - started)
+        return result
+
+    def _fetched(self, started, rows, done):
+        sample = self._sample
+        if sample is not None:
+            sample[2] += time.perf_counter() - started
+            sample[3] += rows
+            if done:
+                self._finish()
+
+    def execute(self, query, *args, **kwargs):
+        shape = _shape(args[0] if args else next(iter(kwargs.values()), None))
+        return self._timed(query, shape, lambda: super(_TimedCursor, self).execute(query, *args, **kwargs))
+
+    def executemany(self, query, seq, *args, **kwargs):
+        shape = _many_shape(seq)
+        return self._timed(query, shape, lambda: super(_TimedCursor, self).executemany(query, seq, *args, **kwargs))
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, row is None)
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        started = time.perf_counter()
+        rows = super().fetchmany(*args, **kwargs)
+        self._fetched(started, len(rows), not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), True)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, True)
+            raise
+        self._fetched(started, 1, False)
+        return row
+
+    def close(self):
+        self._finish()
+        return super().close()
+
+    def __del__(self):
+        self._finish()
+
+
+class InstrumentedCursor(_TimedCursor, sqlite3.Cursor):
+    """
+    SQLite cursor whose statements are recorded by RECORDER.
+    """
+
+    def executescript(self, script):
+        return self._timed(script, '()', lambda: super(InstrumentedCursor, self).executescript(script))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    SQLite connection that hands out instrumented cursors while RECORDER is
+    recording or tracing.
+
+    The `execute` shortcuts are overridden as well, because sqlite3 creates
+    their cursors without calling `cursor()`. Opening and closing it are
+    counted in `metrics`.
+    """
+
+    _open = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._open = True
+        metrics.CONNECTIONS_OPENED.inc()
+
+    def close(self):
+        super().close()
+        if self._open:
+            self._open = False
+            metrics.CONNECTIONS_CLOSED.inc()
+
+    def __del__(self):
+        if self._open:
+            self._open = False
+            metrics.CONNECTIONS_CLOSED.inc()
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = InstrumentedCursor if RECORDER.capturing else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if not RECORDER.capturing:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if not RECORDER.capturing:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        if not RECORDER.capturing:
+            return super().executescript(script)
+        return self.cursor().executescript(script)
+
+
+def connect(database, **kwargs):
+    """
+    Opens an SQLite connection whose statements can be recorded.
+
+    Parameters
+    ----------
+    database : str
+        The database file.
+    **kwargs
+        Other arguments of `sqlite3.connect`.
+
+    Returns
+    -------
+    InstrumentedConnection
+        The connection.
+    """
+    return sqlite3.connect(database, factory=InstrumentedConnection, **kwargs)
+
+
+if _pg is not None:
+    class PgCursor(_TimedCursor, _pg.cursor):
+        """
+        psycopg2 cursor whose statements are recorded by RECORDER.
+        """
+
+        def _text(self, query):
+            return query if isinstance(query, (str, bytes)) else query.as_string(self.connection)
+
+        def execute(self, query, vars=None):
+            return self._timed(self._text(query), _shape(vars),
+                               lambda: super(PgCursor, self).execute(query, vars))
+
+        def executemany(self, query, vars_list):
+            return self._timed(self._text(query), _many_shape(vars_list),
+                               lambda: super(PgCursor, self).executemany(query, vars_list))
+
+        def copy_expert(self, sql, file, size=8192):
+            return self._timed(self._text(sql), 'copy', lambda: super(PgCursor, self).copy_expert(sql, file, size))
+
+    class PgConnection(_pg.connection):
+        """
+        psycopg2 connection that hands out instrumented cursors while RECORDER
+        is recording or tracing. Pass it as `connection_factory` to `psycopg2.connect`.
+        """
+
+        def cursor(self, *args, **kwargs):
+            if RECORDER.capturing and kwargs.get('cursor_factory') is None:
+                kwargs['cursor_factory'] = PgCursor
+            return super().cursor(*args, **kwargs)
+else:
+    PgCursor = PgConnection = None
+
+
+# ----------------- Actions -----------------
+
+def action(name=None):
+    """
+    Decorates a UI handler so that its calls are recorded as an action.
+
+    Qt and Tk pass extra arguments to some handlers (e.g. the `checked` state
+    of a button, or an event); arguments beyond the ones the handler takes are
+    dropped, just as Qt does for undecorated slots.
+
+    Parameters
+    ----------
+    name : str, optional
+        Name of the action (default: the function's qualified name).
+
+    Examples
+    --------
+    >>> @action('PyQt.add_student')
+    ... def add_student(self):
+    ...     ...
+    """
+    if callable(name):
+        return action()(name)
+
+    def decorate(func):
+        label = name or func.__qualname__
+        code = func.__code__
+        max_args = None if code.co_flags & inspect.CO_VARARGS else code.co_argcount
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if max_args is not None:
+                args = args[:max_args]
+            if not RECORDER.capturing and RECORDER.profiler is None:
+                return func(*args, **kwargs)
+            with RECORDER.action(label):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def db_wait():
+    """
+    Counts the time spent in the block as database time of the current action.
+
+    For waits on work done elsewhere, such as a write queue commit or an API
+    service request. Traced as a 'db' span.
+    """
+    if not RECORDER.capturing:
+        yield
+        return
+    with RECORDER.tracer.span('wait for database', 'db') if RECORDER.tracer is not None else nullcontext():
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if RECORDER.enabled:
+                RECORDER.add_db_time(time.perf_counter() - started)
+
+
+# ----------------- Module-level controls -----------------
+
+def enable(slow_query_ms=None, slow_action_ms=None, log_path=None):
+    """See `Recorder.enable`."""
+    RECORDER.enable(slow_query_ms, slow_action_ms, log_path)
+
+
+def disable():
+    """See `Recorder.disable`."""
+    RECORDER.disable()
+
+
+def reset():
+    """See `Recorder.reset`."""
+    RECORDER.reset()
+
+
+def summary(top=10):
+    """See `Recorder.summary`."""
+    return RECORDER.summary(top)
+
+
+def format_summary(top=10):
+    """See `Recorder.format_summary`."""
+    return RECORDER.format_summary(top)
+
+
+def toggle(stream=None):
+    """
+    Switches recording on, or off after writing the summary report.
+
+    Bound to Ctrl+Shift+I in both applications.
+
+    Parameters
+    ----------
+    stream : file, optional
+        Where the report goes (default: sys.stderr).
+
+    Returns
+    -------
+    bool
+        Whether recording is now enabled.
+    """
+    if RECORDER.enabled:
+        RECORDER.disable()
+        print(RECORDER.format_summary(), file=stream or sys.stderr)
+        RECORDER.reset()
+    else:
+        RECORDER.enable()
+    return RECORDER.enabled
+
+
+if os.environ.get('SCHOOL_INSTRUMENT', '').lower() in ('1', 'true', 'yes', 'on'):
+    RECORDER.enable(log_path=os.environ.get('SCHOOL_SLOW_LOG') or None)
@@ -0,0 +1,600 @@
+import functools
+import json
+import os
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets for durations, in seconds.
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Histogram buckets for row counts.
+ROW_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000)
+
+# Seconds between two writes of the Prometheus text file by `start_exporter`.
+EXPORT_INTERVAL = 15.0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Child:
+    """
+    One labelled series of a metric.
+    """
+
+    __slots__ = ('_metric', '_key')
+
+    def __init__(self, metric, key):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount=1):
+        """
+        Adds `amount` to a counter or gauge.
+        """
+        shard = self._metric._shard()
+        shard[self._key] = shard.get(self._key, 0) + amount
+
+    def dec(self, amount=1):
+        """
+        Subtracts `amount` from a gauge.
+        """
+        self.inc(-amount)
+
+    def observe(self, value):
+        """
+        Records a value in a histogram.
+        """
+        metric = self._metric
+        shard = metric._shard()
+        cell = shard.get(self._key)
+        if cell is None:
+            # [count per bucket..., count above the last bucket, sum]
+            cell = shard[self._key] = [0] * (len(metric.buckets) + 1) + [0.0]
+        cell[bisect_left(metric.buckets, value)] += 1
+        cell[-1] += value
+
+    @contextmanager
+    def time(self):
+        """
+        Observes the duration of the block in a histogram, in seconds.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Metric:
+    """
+    A counter, gauge or histogram, optionally split by labels.
+
+    Updates are made without taking a lock: every thread accumulates into
+    its own shard, which only that thread writes to, and the shards are
+    added up when the metrics are collected. Updating a metric from the GUI,
+    the write queue or a thread pool therefore costs a dict lookup and an
+    addition, and never waits for another thread.
+
+    Create metrics with `Registry.counter`, `Registry.gauge` and
+    `Registry.histogram`.
+
+    Parameters
+    ----------
+    name : str
+        Metric name, e.g. 'school_operation_calls_total'.
+    kind : str
+        'counter', 'gauge' or 'histogram'.
+    description : str
+        Help text.
+    labels : tuple of str, optional
+        Label names.
+    buckets : tuple of float, optional
+        Upper bounds of the histogram buckets.
+    """
+
+    def __init__(self, name, kind, description, labels=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.description = description
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._shards = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._default = _Child(self, ())
+
+    def _shard(self):
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._shards.append(values)
+            return values
+
+    def labels(self, *values, **labelled):
+        """
+        Returns the series with the given label values.
+
+        Keep the returned object for hot paths; looking it up again costs a
+        dict lookup more.
+
+        Examples
+        --------
+        >>> calls = REGISTRY.counter('calls_total', 'Calls.', ('function',))
+        >>> calls.labels('add_student').inc()
+        >>> calls.labels(function='add_student').inc()
+        """
+        key = values or tuple(labelled[name] for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.label_names):
+                raise ValueError(f"{self.name} takes the labels {', '.join(self.label_names)}")
+            key = tuple(str(value) for value in key)
+            child = self._children.setdefault(key, _Child(self, key))
+        return child
+
+    def inc(self, amount=1):
+        """See `_Child.inc`; for metrics without labels."""
+        self._default.inc(amount)
+
+    def dec(self, amount=1):
+        """See `_Child.dec`; for metrics without labels."""
+        self._default.dec(amount)
+
+    def observe(self, value):
+        """See `_Child.observe`; for metrics without labels."""
+        self._default.observe(value)
+
+    def time(self):
+        """See `_Child.time`; for metrics without labels."""
+        return self._default.time()
+
+    def collect(self):
+        """
+        Adds up the shards of all threads.
+
+        Returns
+        -------
+        dict
+            Label values tuple -> value (counters and gauges) or
+            [count per bucket..., count above, sum] (histograms).
+        """
+        with self._lock:
+            shards = list(self._shards)
+        totals = {}
+        for shard in shards:
+            # dict.copy is atomic, so a thread updating its shard meanwhile is harmless
+            for key, value in shard.copy().items():
+                if self.kind == 'histogram':
+                    total = totals.get(key)
+                    if total is None:
+                        totals[key] = list(value)
+                    else:
+                        totals[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def reset(self):
+        """
+        Sets every series back to zero.
+        """
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Registry:
+    """
+    The metrics of the process, plus collectors that report values owned by
+    other objects (write queue depth, pool usage) when metrics are read.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _add(self, name, kind, description, labels, buckets=DURATION_BUCKETS):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Metric(name, kind, description, labels, buckets)
+            elif metric.kind != kind or metric.label_names != tuple(labels):
+                raise ValueError(f"Metric {name} is already registered differently")
+            return metric
+
+    def counter(self, name, description, labels=()):
+        """
+        Returns the counter `name`, registering it on first use.
+        """
+        return self._add(name, 'counter', description, labels)
+
+    def gauge(self, name, description, labels=()):
+        """
+        Returns the gauge `name` (moved with `inc`/`dec`), registering it on first use.
+        """
+        return self._add(name, 'gauge', description, labels)
+
+    def histogram(self, name, description, labels=(), buckets=DURATION_BUCKETS):
+        """
+        Returns the histogram `name`, registering it on first use.
+        """
+        return self._add(name, 'histogram', description, labels, buckets)
+
+    def add_collector(self, collector):
+        """
+        Registers a function called whenever the metrics are read.
+
+        Bound methods are held weakly, so an object's collector goes away
+        with the object.
+
+        Parameters
+        ----------
+        collector : callable
+            Returns an iterable of (name, kind, description, labels dict,
+            value) samples, kind being 'counter' or 'gauge'.
+        """
+        ref = weakref.WeakMethod(collector) if hasattr(collector, '__self__') else (lambda: collector)
+        with self._lock:
+            self._collectors.append(ref)
+
+    def _collected(self):
+        with self._lock:
+            refs = list(self._collectors)
+        samples = []
+        for ref in refs:
+            collector = ref()
+            if collector is None:
+                with self._lock:
+                    if ref in self._collectors:
+                        self._collectors.remove(ref)
+                continue
+            samples.extend(collector())
+        return samples
+
+    def reset(self):
+        """
+        Sets every metric back to zero.
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            metric.reset()
+
+    def snapshot(self):
+        """
+        Returns all metrics as a JSON-serializable dict.
+
+        Returns
+        -------
+        dict
+            {"time": ..., "metrics": {name: {"type", "help", "samples"}}};
+            histogram samples hold "count", "sum" and cumulative "buckets".
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        report = {}
+        for name, metric in metrics:
+            samples = []
+            for key, value in sorted(metric.collect().items()):
+                labels = dict(zip(metric.label_names, key))
+                if metric.kind == 'histogram':
+                    cumulative, buckets = 0, {}
+                    for bound, count in zip(metric.buckets, value):
+                        cumulative += count
+                        buckets[_format_number(bound)] = cumulative
+                    samples.append({'labels': labels, 'count': sum(value[:-1]), 'sum': value[-1],
+                                    'buckets': buckets})
+                else:
+                    samples.append({'labels': labels, 'value': value})
+            report[name] = {'type': metric.kind, 'help': metric.description, 'samples': samples}
+        for name, kind, description, labels, value in self._collected():
+            entry = report.setdefault(name, {'type': kind, 'help': description, 'samples': []})
+            entry['samples'].append({'labels': labels, 'value': value})
+        return {'time': time.time(), 'metrics': report}
+
+    def prometheus(self):
+        """
+        Returns all metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        for name, metric in metrics:
+            values = metric.collect()
+            lines.append(f'# HELP {name} {metric.description}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            for key, value in sorted(values.items()):
+                if metric.kind == 'histogram':
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value):
+                        cumulative += count
+                        labels = _format_labels(metric.label_names, key, [('le', _format_number(bound))])
+                        lines.append(f'{name}_bucket{labels} {cumulative}')
+                    labels = _format_labels(metric.label_names, key)
+                    lines.append(f'{name}_sum{labels} {_format_number(value[-1])}')
+                    lines.append(f'{name}_count{labels} {cumulative}')
+                else:
+                    lines.append(f'{name}{_format_labels(metric.label_names, key)} {_format_number(value)}')
+        described = set()
+        for name, kind, description, labels, value in self._collected():
+            if name not in described:
+                described.add(name)
+                lines.append(f'# HELP {name} {description}')
+                lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name}{_format_labels(labels, labels.values())} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        """
+        Writes `prometheus` to a file, replacing it atomically.
+
+        Suited to node_exporter's textfile collector (use a `.prom` file in
+        its directory).
+        """
+        _write_atomically(path, self.prometheus())
+
+    def write_json(self, path):
+        """
+        Writes `snapshot` to a JSON file, replacing it atomically.
+        """
+        _write_atomically(path, json.dumps(self.snapshot(), indent=4))
+
+
+def _write_atomically(path, text):
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(temporary, path)
+
+
+REGISTRY = Registry()
+
+# ----------------- School metrics -----------------
+
+OPERATION_CALLS = REGISTRY.counter(
+    'school_operation_calls_total', 'Calls of operations.py functions.', ('function', 'outcome'))
+OPERATION_SECONDS = REGISTRY.histogram(
+    'school_operation_duration_seconds', 'Duration of operations.py functions.', ('function',))
+CONNECTIONS_OPENED = REGISTRY.counter(
+    'school_db_connections_opened_total', 'SQLite connections opened.')
+CONNECTIONS_CLOSED = REGISTRY.counter(
+    'school_db_connections_closed_total', 'SQLite connections closed or garbage collected.')
+CACHE_LOOKUPS = REGISTRY.counter(
+    'school_cache_lookups_total', 'Cache lookups by result (hit or miss).', ('cache', 'result'))
+REFRESH_SECONDS = REGISTRY.histogram(
+    'school_ui_refresh_duration_seconds', 'Time to refresh a widget with database rows.', ('widget',))
+REFRESH_ROWS = REGISTRY.histogram(
+    'school_ui_rows_rendered', 'Rows rendered per widget refresh.', ('widget',), ROW_BUCKETS)
+
+
+def _derived():
+    # Values computed from the counters above
+    opened = sum(CONNECTIONS_OPENED.collect().values())
+    closed = sum(CONNECTIONS_CLOSED.collect().values())
+    yield ('school_db_connections_open', 'gauge', 'SQLite connections currently open.', {}, opened - closed)
+    lookups = {}
+    for (cache, result), count in CACHE_LOOKUPS.collect().items():
+        lookups.setdefault(cache, {})[result] = count
+    for cache, counts in sorted(lookups.items()):
+        total = counts.get('hit', 0) + counts.get('miss', 0)
+        yield ('school_cache_hit_ratio', 'gauge', 'Share of cache lookups that were hits.', {'cache': cache},
+               counts.get('hit', 0) / total if total else 0.0)
+
+
+REGISTRY.add_collector(_derived)
+
+
+def operation(func):
+    """
+    Decorates an operations.py function to count its calls and time them.
+
+    Examples
+    --------
+    >>> @metrics.operation
+    ... def add_student(student_id, name, age, email, conn=None):
+    ...     ...
+    """
+    name = func.__name__
+    ok = OPERATION_CALLS.labels(name, 'ok')
+    failed = OPERATION_CALLS.labels(name, 'error')
+    seconds = OPERATION_SECONDS.labels(name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            failed.inc()
+            seconds.observe(time.perf_counter() - started)
+            raise
+        ok.inc()
+        seconds.observe(time.perf_counter() - started)
+        return result
+    return wrapper
+
+
+class _Refresh:
+    __slots__ = ('rows',)
+
+    def __init__(self, rows):
+        self.rows = rows
+
+
+@contextmanager
+def refresh(widget, rows=0):
+    """
+    Records the duration and row count of a widget refresh.
+
+    Parameters
+    ----------
+    widget : str
+        Widget name, e.g. 'record table'.
+    rows : int, optional
+        Rows rendered; when they are only known as they stream in, add them
+        to the `rows` attribute of the yielded object instead.
+
+    Examples
+    --------
+    >>> with metrics.refresh('students tree') as refreshed:
+    ...     for batch in batches:
+    ...         refreshed.rows += len(batch)
+    """
+    refreshed = _Refresh(rows)
+    started = time.perf_counter()
+    try:
+        yield refreshed
+    finally:
+        REFRESH_SECONDS.labels(widget).observe(time.perf_counter() - started)
+        REFRESH_ROWS.labels(widget).observe(refreshed.rows)
+
+
+# ----------------- Exposition -----------------
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body, content_type = self.registry.prometheus(), 'text/plain; version=0.0.4'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body, content_type = json.dumps(self.registry.snapshot()), 'application/json'
+        else:
+            self.send_error(404)
+            return
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Exporter:
+    """
+    Publishes the metrics in the background: periodically as a Prometheus
+    text file, and/or on a local HTTP endpoint (/metrics in text format,
+    /metrics.json as a snapshot).
+
+    Parameters
+    ----------
+    path : str, optional
+        Prometheus text file to rewrite every `interval` seconds.
+    port : int, optional
+        Port to serve on; 0 picks a free one (see `address`).
+    interval : float, optional
+        Seconds between two writes of `path` (default `EXPORT_INTERVAL`).
+    host : str, optional
+        Address to serve on (default 127.0.0.1, this workstation only).
+    registry : Registry, optional
+        Metrics to publish (default `REGISTRY`).
+    """
+
+    def __init__(self, path=None, port=None, interval=EXPORT_INTERVAL, host='127.0.0.1', registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self.server = None
+        self._stop = threading.Event()
+        self._threads = []
+        if port is not None:
+            handler = type('Handler', (_Handler,), {'registry': registry})
+            self.server = ThreadingHTTPServer((host, port), handler)
+            self.server.daemon_threads = True
+
+    @property
+    def address(self):
+        """(host, port) served on, or None."""
+        return self.server.server_address if self.server else None
+
+    def _write_periodically(self):
+        while not self._stop.wait(self.interval):
+            self.registry.write_prometheus(self.path)
+
+    def start(self):
+        if self.server is not None:
+            self._threads.append(threading.Thread(target=self.server.serve_forever, name='metrics-http',
+                                                  daemon=True))
+        if self.path:
+            self.registry.write_prometheus(self.path)
+            self._threads.append(threading.Thread(target=self._write_periodically, name='metrics-file',
+                                                  daemon=True))
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops publishing; the file is written one last time.
+        """
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self.path:
+            self.registry.write_prometheus(self.path)
+
+
+def start_exporter(path=None, port=None, interval=EXPORT_INTERVAL):
+    """
+    Starts an `Exporter` of `REGISTRY`.
+    """
+    return Exporter(path, port, interval).start()
+
+
+def start_exporter_from_env():
+    """
+    Starts an `Exporter` as configured by SCHOOL_METRICS_FILE,
+    SCHOOL_METRICS_PORT and SCHOOL_METRICS_INTERVAL, if either of the first
+    two is set.
+
+    Returns
+    -------
+    Exporter or None
+        The started exporter.
+    """
+    path = os.environ.get('SCHOOL_METRICS_FILE') or None
+    port = os.environ.get('SCHOOL_METRICS_PORT')
+    if not path and not port:
+        return None
+    return start_exporter(path, int(port) if port else None,
+                          float(os.environ.get('SCHOOL_METRICS_INTERVAL', EXPORT_INTERVAL)))
+
+
+def snapshot():
+    """See `Registry.snapshot`."""
+    return REGISTRY.snapshot()
+
+
+def prometheus():
+    """See `Registry.prometheus`."""
+    return REGISTRY.prometheus()
@@ -1,11 +1,65 @@
-import sqlite3
+import os
+from contextlib import contextmanager
+
+import enrollment
+import instrumentation
+import metrics
+
+# Path of the SQLite database. Can be overridden with the SCHOOL_DB_PATH
+# environment variable, or by assigning to operations.DB_PATH.
+DB_PATH = os.environ.get('SCHOOL_DB_PATH', 'school_management.db')
+
+
+def get_connection():
+    """
+    Opens a new connection to the school database.
+
+    Returns
+    -------
+    sqlite3.Connection
+        A new connection to DB_PATH.
+    """
+    return instrumentation.connect(DB_PATH)
+
+
+@contextmanager
+def use_connection(conn=None):
+    """
+    Provides the connection an operation should run on.
+
+    If `conn` is given it is used as is, and committing or rolling back is left
+    to the caller (for example the writer thread, which commits many operations
+    together). Otherwise a new connection is opened, committed if the block
+    succeeds and closed afterwards.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        An existing connection.
+
+    Yields
+    ------
+    sqlite3.Connection
+        The connection to use.
+    """
+    if conn is not None:
+        yield conn
+        return
+
+    conn = get_connection()
+    try:
+        yield conn
+        conn.commit()
+    finally:
+        conn.close()
 
 # ----------------- Create Operations -----------------
 
 # Function to add a student to the database
 
 
-def add_student(student_id, name, age, email):
+@metrics.operation
+def add_student(student_id, name, age, email, conn=None):
     """
     Adds a new student to the database.
 
@@ -19,26 +73,28 @@ def add_student(student_id, name, age, email):
         The age of the student.
     email : str
         The email address of the student.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
-    None
+    int
+        The primary key of the new student.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Insert student into the students table
-    cursor.execute(
-        'INSERT INTO students (student_id,name, age, email) VALUES (?, ?, ?, ?)', (student_id, name, age, email))
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Insert student into the students table
+        cursor.execute(
+            'INSERT INTO students (student_id,name, age, email) VALUES (?, ?, ?, ?)', (student_id, name, age, email))
+    return cursor.lastrowid
 
 # Function to add an instructor to the database
 
 
-def add_instructor(instructor_id, name, age, email):
+@metrics.operation
+def add_instructor(instructor_id, name, age, email, conn=None):
     """
     Adds a new instructor to the database.
 
@@ -52,26 +108,28 @@ def add_instructor(instructor_id, name, age, email):
         The age of the instructor.
     email : str
         The email address of the instructor.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
-    None
+    int
+        The primary key of the new instructor.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Insert instructor into the instructors table
-    cursor.execute(
-        'INSERT INTO instructors (instructor_id, name, age, email) VALUES (?, ?, ?, ?)', (instructor_id, name, age, email))
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Insert instructor into the instructors table
+        cursor.execute(
+            'INSERT INTO instructors (instructor_id, name, age, email) VALUES (?, ?, ?, ?)', (instructor_id, name, age, email))
+    return cursor.lastrowid
 
 # Function to add a course to the database
 
 
-def add_course(course_id, course_name):
+@metrics.operation
+def add_course(course_id, course_name, capacity=None, conn=None):
     """
     Adds a new course to the database.
 
@@ -81,27 +139,117 @@ def add_course(course_id, course_name):
         The unique identifier for the course.
     course_name : str
         The name of the course.
+    capacity : int, optional
+        Maximum number of enrolled students; None (default) means unlimited.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
-    None
+    int
+        The primary key of the new course.
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Insert the course into the database
+        cursor.execute(
+            "INSERT INTO courses (course_id, course_name, capacity) VALUES (?, ?, ?)",
+            (course_id, course_name, capacity))
+    return cursor.lastrowid
+
+# Functions to add many students, instructors or courses at once
+
+
+@metrics.operation
+def add_students(rows, conn=None):
+    """
+    Adds many students with a single executemany call.
+
+    Parameters
+    ----------
+    rows : iterable of tuple
+        (student_id, name, age, email) for each student; may be a generator.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    int
+        The number of students added.
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.executemany(
+            'INSERT INTO students (student_id, name, age, email) VALUES (?, ?, ?, ?)', rows)
+    return cursor.rowcount
+
+
+@metrics.operation
+def add_instructors(rows, conn=None):
+    """
+    Adds many instructors with a single executemany call.
+
+    Parameters
+    ----------
+    rows : iterable of tuple
+        (instructor_id, name, age, email) for each instructor; may be a generator.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    int
+        The number of instructors added.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Insert the course into the database
-    cursor.execute(
-        "INSERT INTO courses (course_id, course_name) VALUES (?, ?)", (course_id, course_name))
-    conn.commit()
-    conn.close()
+        cursor.executemany(
+            'INSERT INTO instructors (instructor_id, name, age, email) VALUES (?, ?, ?, ?)', rows)
+    return cursor.rowcount
 
 
+@metrics.operation
+def add_courses(rows, conn=None):
+    """
+    Adds many courses with a single executemany call.
+
+    Parameters
+    ----------
+    rows : iterable of tuple
+        (course_id, course_name, capacity) for each course; a capacity of None
+        means unlimited. May be a generator.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    int
+        The number of courses added.
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.executemany(
+            'INSERT INTO courses (course_id, course_name, capacity) VALUES (?, ?, ?)', rows)
+    return cursor.rowcount
+
 # Function to enroll a student in a course
 
 
-def enroll_student(student_id, course_id):
+@metrics.operation
+def enroll_student(student_id, course_id, request_key=None, conn=None):
     """
-    Enrolls a student in a specified course.
+    Enrolls a student in a specified course, or waitlists them if it is full.
+
+    The seat is allocated atomically under SQLite's write lock, so concurrent
+    enrollments can never overbook a course. See `enrollment.enroll`.
 
     Parameters
     ----------
@@ -109,153 +257,418 @@ def enroll_student(student_id, course_id):
         The ID of the student to enroll.
     course_id : str
         The ID of the course the student is enrolling in.
+    request_key : str, optional
+        Idempotency key; retrying with the same key returns the first outcome.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
-    None
+    enrollment.EnrollmentResult
+        The outcome: enrolled, waitlisted (with position), duplicate or not_found.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        result = enrollment.enroll(conn, student_id, course_id, request_key)
+    return result
 
-    # Insert into registrations (join table)
-    cursor.execute(
-        'INSERT INTO registrations (student_id, course_id) VALUES (?, ?)', (student_id, course_id))
+# Function to process many enrollment requests at once
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+
+@metrics.operation
+def enroll_students(requests, conn=None):
+    """
+    Processes a batch of enrollment requests in one transaction.
+
+    Parameters
+    ----------
+    requests : iterable of tuple
+        (student_id, course_id) or (student_id, course_id, request_key), in
+        priority order.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    list of enrollment.EnrollmentResult
+        One outcome per request.
+    """
+    with use_connection(conn) as conn:
+        results = enrollment.enroll_batch(conn, requests)
+    return results
 
 # Function to assign an instructor to a course
 
 
-def assign_instructor(instructor_id, course_id):
+@metrics.operation
+def assign_instructor(instructor_id, course_id, conn=None):
     """
     Assigns an instructor to a specified course.
 
+    Assigning an instructor who already teaches the course does nothing.
+
     Parameters
     ----------
     instructor_id : str
         The ID of the instructor.
     course_id : str
         The ID of the course.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Insert instructor assignment into the instructor_assignments table
-    cursor.execute('''
-        INSERT INTO instructor_assignments (instructor_id, course_id)
-        VALUES (?, ?)
-    ''', (instructor_id, course_id))
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Insert instructor assignment into the instructor_assignments table;
+        # the (instructor_id, course_id) primary key ignores repeats
+        cursor.execute('''
+            INSERT OR IGNORE INTO instructor_assignments (instructor_id, course_id)
+            VALUES (?, ?)
+        ''', (instructor_id, course_id))
 
 # ----------------- Read Operations -----------------
 
 # Function to get all students
 
 
-def get_students():
+@metrics.operation
+def get_students(conn=None):
     """
     Retrieves all students from the database.
 
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
     Returns
     -------
     list
         A list of tuples representing each student.
         Each tuple contains (id, student_id, name, age, email).
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Select all students
-    cursor.execute("SELECT id, student_id, name, age, email FROM students")
-    students = cursor.fetchall()
-
-    conn.close()
+        # Select all students
+        cursor.execute("SELECT id, student_id, name, age, email FROM students")
+        students = cursor.fetchall()
     return students
 
 # Function to get all instructors
 
 
-def get_instructors():
+@metrics.operation
+def get_instructors(conn=None):
     """
     Retrieves all instructors from the database.
 
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
     Returns
     -------
     list
         A list of tuples representing each instructor.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Select all instructors
-    cursor.execute('SELECT * FROM instructors')
-    instructors = cursor.fetchall()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    conn.close()
+        # Select all instructors
+        cursor.execute('SELECT * FROM instructors')
+        instructors = cursor.fetchall()
     return instructors
 
 # Function to get all courses
 
 
-def get_courses():
+@metrics.operation
+def get_courses(conn=None):
     """
     Retrieves all courses from the database.
 
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
     Returns
     -------
     list
         A list of tuples representing each course.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Select all courses
-    cursor.execute('SELECT * FROM courses')
-    courses = cursor.fetchall()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    conn.close()
+        # Select all courses
+        cursor.execute('SELECT * FROM courses')
+        courses = cursor.fetchall()
     return courses
 
 # Function to get all enrollments
 
 
-def get_enrollments():
+@metrics.operation
+def get_enrollments(conn=None):
     """
     Retrieves all student enrollments in courses.
 
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
     Returns
     -------
     list
         A list of tuples representing each enrollment.
         Each tuple contains (student_name, course_name).
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Select all registrations (enrollments)
-    cursor.execute('''SELECT students.name, courses.course_name FROM registrations
-                      JOIN students ON students.id = registrations.student_id
-                      JOIN courses ON courses.id = registrations.course_id''')
-    enrollments = cursor.fetchall()
-
-    conn.close()
+        # Select all registrations (enrollments)
+        cursor.execute('''SELECT students.name, courses.course_name FROM registrations
+                          JOIN students ON students.id = registrations.student_id
+                          JOIN courses ON courses.id = registrations.course_id''')
+        enrollments = cursor.fetchall()
     return enrollments
 
+# Function to get a course's waitlist
+
+
+@metrics.operation
+def get_waitlist(course_id, conn=None):
+    """
+    Retrieves the students waiting for a seat in a course.
+
+    Parameters
+    ----------
+    course_id : str
+        The ID of the course.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    list
+        A list of tuples (student_id, student_name, requested_at), first in
+        line first.
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''SELECT students.id, students.name, waitlist.requested_at FROM waitlist
+                          JOIN students ON students.id = waitlist.student_id
+                          WHERE waitlist.course_id = ? ORDER BY waitlist.id''', (course_id,))
+        waitlist = cursor.fetchall()
+    return waitlist
+
+# Function to get per-course statistics
+
+
+@metrics.operation
+def get_course_stats(conn=None):
+    """
+    Retrieves enrollment statistics for every course.
+
+    The figures come from the trigger-maintained `course_stats` table, so this
+    reads one row per course instead of every registration.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    list
+        A list of tuples (id, course_id, course_name, enrollment_count,
+        instructor_count, average_student_age); the average is None for a
+        course without students.
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''SELECT courses.id, courses.course_id, courses.course_name,
+                                 course_stats.enrollment_count, course_stats.instructor_count,
+                                 CASE WHEN course_stats.enrollment_count > 0
+                                      THEN CAST(course_stats.age_sum AS REAL) / course_stats.enrollment_count
+                                 END
+                          FROM course_stats JOIN courses ON courses.id = course_stats.course_id
+                          ORDER BY courses.id''')
+        stats = cursor.fetchall()
+    return stats
+
+# Function to get per-instructor statistics
+
+
+@metrics.operation
+def get_instructor_stats(conn=None):
+    """
+    Retrieves the teaching load of every instructor.
+
+    The figures come from the trigger-maintained `instructor_stats` table.
+
+    Parameters
+    ----------
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    list
+        A list of tuples (id, instructor_id, name, course_count,
+        student_count, average_student_age), where student_count adds up the
+        enrollments of all the instructor's courses; the average is None for
+        an instructor without students.
+    """
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute('''SELECT instructors.id, instructors.instructor_id, instructors.name,
+                                 instructor_stats.course_count, instructor_stats.student_count,
+                                 CASE WHEN instructor_stats.student_count > 0
+                                      THEN CAST(instructor_stats.age_sum AS REAL) / instructor_stats.student_count
+                                 END
+                          FROM instructor_stats
+                          JOIN instructors ON instructors.id = instructor_stats.instructor_id
+                          ORDER BY instructors.id''')
+        stats = cursor.fetchall()
+    return stats
+
+# Sort orders for the record index, by the column the user sorts on. Each
+# order is total (so pages never overlap) and matches one of its indexes.
+RECORD_ORDERS = {
+    'id': ('display_id', 'record_type', 'record_id'),
+    'name': ('name', 'record_type', 'record_id'),
+    'type': ('record_type', 'name', 'record_id'),
+}
+
+
+def _record_filter(record_type, prefix):
+    """
+    Builds the WHERE clause and parameters for record index queries.
+
+    The prefix is matched case-insensitively against the name and the display
+    ID with LIKE 'prefix%', which SQLite answers from the NOCASE indexes.
+    """
+    conditions = []
+    params = []
+    if record_type:
+        conditions.append('record_type = ?')
+        params.append(record_type)
+    if prefix:
+        pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append("(name LIKE ? ESCAPE '\\' OR display_id LIKE ? ESCAPE '\\')")
+        params.extend([pattern, pattern])
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    return where, params
+
+# Function to get one page of the unified record list
+
+
+@metrics.operation
+def get_record_page(offset=0, limit=100, record_type=None, prefix=None, order_by='name',
+                    descending=False, conn=None):
+    """
+    Retrieves one sorted page of students, instructors and courses.
+
+    Reads the trigger-maintained `record_index` table, so filtering, sorting
+    and paging all happen in SQL and only `limit` rows are returned.
+
+    Parameters
+    ----------
+    offset : int, optional
+        Number of records to skip (default 0).
+    limit : int, optional
+        Maximum number of records to return (default 100).
+    record_type : str, optional
+        Only return 'Student', 'Instructor' or 'Course' records.
+    prefix : str, optional
+        Only return records whose name or ID starts with this text, ignoring case.
+    order_by : str, optional
+        'name' (default), 'id' or 'type'.
+    descending : bool, optional
+        Sort in descending order.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    list
+        A list of tuples (record_type, record_id, display_id, name), where
+        record_id is the primary key in the record's own table.
+    """
+    if order_by not in RECORD_ORDERS:
+        raise ValueError(f"order_by must be one of {', '.join(RECORD_ORDERS)}")
+    direction = ' DESC' if descending else ''
+    order = ', '.join(f'{column}{direction}' for column in RECORD_ORDERS[order_by])
+    where, params = _record_filter(record_type, prefix)
+
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(f'''SELECT record_type, record_id, display_id, name FROM record_index{where}
+                           ORDER BY {order} LIMIT ? OFFSET ?''', params + [limit, offset])
+        records = cursor.fetchall()
+    return records
+
+# Function to count the records matching a filter
+
+
+@metrics.operation
+def count_records(record_type=None, prefix=None, conn=None):
+    """
+    Counts the records `get_record_page` would page through.
+
+    Parameters
+    ----------
+    record_type : str, optional
+        Only count 'Student', 'Instructor' or 'Course' records.
+    prefix : str, optional
+        Only count records whose name or ID starts with this text, ignoring case.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    int
+        The number of matching records.
+    """
+    where, params = _record_filter(record_type, prefix)
+
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute(f'SELECT COUNT(*) FROM record_index{where}', params)
+        count = cursor.fetchone()[0]
+    return count
+
 # ----------------- Update Operations -----------------
 
 # Function to update a student's information
 
 
-def update_student(student_id, name, age, email):
+@metrics.operation
+def update_student(student_id, name, age, email, conn=None):
     """
     Updates a student's information in the database.
 
@@ -269,26 +682,26 @@ def update_student(student_id, name, age, email):
         The new age of the student.
     email : str
         The new email address of the student.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Update student record
-    cursor.execute('UPDATE students SET name = ?, age = ?, email = ? WHERE id = ?',
-                   (name, age, email, student_id))
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Update student record
+        cursor.execute('UPDATE students SET name = ?, age = ?, email = ? WHERE id = ?',
+                       (name, age, email, student_id))
 
 # Function to update an instructor's information
 
 
-def update_instructor(instructor_id, name, age, email):
+@metrics.operation
+def update_instructor(instructor_id, name, age, email, conn=None):
     """
     Updates an instructor's information in the database.
 
@@ -302,28 +715,28 @@ def update_instructor(instructor_id, name, age, email):
         The new age of the instructor.
     email : str
         The new email address of the instructor.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Update instructor record
-    cursor.execute('UPDATE instructors SET name = ?, age = ?, email = ? WHERE id = ?',
-                   (name, age, email, instructor_id))
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Update instructor record
+        cursor.execute('UPDATE instructors SET name = ?, age = ?, email = ? WHERE id = ?',
+                       (name, age, email, instructor_id))
 
 # Function to update a course
 
 
-def update_course(course_id, course_name):
+@metrics.operation
+def update_course(course_id, course_name, new_course_id=None, conn=None):
     """
-    Updates a course's name in the database.
+    Updates a course's name, and optionally its course code, in the database.
 
     Parameters
     ----------
@@ -331,28 +744,60 @@ def update_course(course_id, course_name):
         The ID of the course to update.
     course_name : str
         The new name of the course.
+    new_course_id : str, optional
+        The new course code (the `course_id` column); unchanged if None.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
+
+        # Update course record
+        cursor.execute(
+            'UPDATE courses SET course_name = ?, course_id = COALESCE(?, course_id) WHERE id = ?',
+            (course_name, new_course_id, course_id))
+
+# Function to change a course's capacity
+
+
+@metrics.operation
+def set_course_capacity(course_id, capacity, conn=None):
+    """
+    Changes how many students a course can hold.
 
-    # Update course record
-    cursor.execute(
-        'UPDATE courses SET course_name = ? WHERE id = ?', (course_name, course_id))
+    Waitlisted students are promoted into any seats the change opens up.
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+    Parameters
+    ----------
+    course_id : str
+        The ID of the course.
+    capacity : int or None
+        The new capacity; None makes the course unlimited.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
+
+    Returns
+    -------
+    list
+        IDs of the students promoted from the waitlist.
+    """
+    with use_connection(conn) as conn:
+        promoted = enrollment.set_capacity(conn, course_id, capacity)
+    return promoted
 
 # ----------------- Delete Operations -----------------
 
 # Function to delete a student
 
 
-def delete_student(student_id):
+@metrics.operation
+def delete_student(student_id, conn=None):
     """
     Deletes a student from the database.
 
@@ -360,98 +805,112 @@ def delete_student(student_id):
     ----------
     student_id : str
         The ID of the student to delete.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        # Free the student's seats for the next students on the waitlists
+        enrollment.release_student(conn, student_id)
 
-    # Delete student record
-    cursor.execute('DELETE FROM students WHERE id = ?', (student_id,))
+        cursor = conn.cursor()
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Delete student record
+        cursor.execute('DELETE FROM students WHERE id = ?', (student_id,))
 
 # Function to delete an instructor
 
 
-def delete_instructor(instructor_id):
+@metrics.operation
+def delete_instructor(instructor_id, conn=None):
     """
-    Deletes an instructor from the database.
+    Deletes an instructor from the database, together with their course
+    assignments.
 
     Parameters
     ----------
     instructor_id : str
         The ID of the instructor to delete.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        cursor = conn.cursor()
 
-    # Delete instructor record
-    cursor.execute('DELETE FROM instructors WHERE id = ?', (instructor_id,))
+        # Remove the instructor's course assignments first, so the statistics
+        # triggers take their courses and students off the course figures
+        cursor.execute('DELETE FROM instructor_assignments WHERE instructor_id = ?', (instructor_id,))
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Delete instructor record
+        cursor.execute('DELETE FROM instructors WHERE id = ?', (instructor_id,))
 
 # Function to delete a course
 
 
-def delete_course(course_id):
+@metrics.operation
+def delete_course(course_id, conn=None):
     """
-    Deletes a course from the database.
+    Deletes a course from the database, together with its registrations,
+    waitlist and instructor assignments.
 
     Parameters
     ----------
     course_id : str
         The ID of the course to delete.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
     None
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
+    with use_connection(conn) as conn:
+        enrollment.release_course(conn, course_id)
+
+        cursor = conn.cursor()
 
-    # Delete course record
-    cursor.execute('DELETE FROM courses WHERE id = ?', (course_id,))
+        # Remove the course's instructor assignments, updating the instructors' statistics
+        cursor.execute('DELETE FROM instructor_assignments WHERE course_id = ?', (course_id,))
 
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+        # Delete course record
+        cursor.execute('DELETE FROM courses WHERE id = ?', (course_id,))
 
 # Function to delete a student from a course (remove enrollment)
 
 
-def delete_enrollment(student_id, course_id):
+@metrics.operation
+def delete_enrollment(student_id, course_id, conn=None):
     """
     Removes a student's enrollment from a course.
 
+    The freed seat goes to the first student on the course's waitlist. A
+    student who was only waitlisted is removed from the waitlist.
+
     Parameters
     ----------
     student_id : str
         The ID of the student.
     course_id : str
         The ID of the course.
+    conn : sqlite3.Connection, optional
+        Connection to run on instead of opening a new one; the caller then
+        commits. See `use_connection`.
 
     Returns
     -------
-    None
+    list
+        IDs of the students promoted from the waitlist.
     """
-    conn = sqlite3.connect('school_management.db')
-    cursor = conn.cursor()
-
-    # Delete enrollment record
-    cursor.execute(
-        'DELETE FROM registrations WHERE student_id = ? AND course_id = ?', (student_id, course_id))
-
-    # Commit and close the connection
-    conn.commit()
-    conn.close()
+    with use_connection(conn) as conn:
+        promoted = enrollment.drop(conn, student_id, course_id)
+    return promoted
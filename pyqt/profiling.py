@@ -0,0 +1,267 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+from instrumentation import RECORDER
+
+# Actions profiled after arming, unless told otherwise. SCHOOL_PROFILE=<n>
+# arms the profiler for the next n actions at startup.
+DEFAULT_ACTIONS = 5
+
+# Where profiles are written (SCHOOL_PROFILE_DIR overrides it).
+DEFAULT_DIRECTORY = os.environ.get('SCHOOL_PROFILE_DIR') or 'school_profiles'
+
+# Functions and allocation sites listed in each summary.
+TOP = 25
+
+# Frames stored per allocation; the dumped snapshots can be grouped by
+# traceback up to this depth.
+TRACEMALLOC_FRAMES = 10
+
+_UNSAFE = re.compile(r'[^\w.-]+')
+
+# Allocations by the profilers themselves, left out of the allocation reports.
+_OWN_ALLOCATIONS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+)
+
+
+def _top_functions(stats, top):
+    rows = []
+    for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+        rows.append({'function': function, 'file': filename, 'line': line, 'calls': calls,
+                     'own_ms': round(own * 1000, 3), 'cumulative_ms': round(cumulative * 1000, 3)})
+    rows.sort(key=lambda row: row['cumulative_ms'], reverse=True)
+    return rows[:top]
+
+
+def _top_allocations(differences, top):
+    rows = []
+    for difference in differences[:top]:
+        frame = difference.traceback[0]
+        rows.append({'file': frame.filename, 'line': frame.lineno,
+                     'kib': round(difference.size_diff / 1024, 1), 'blocks': difference.count_diff})
+    return rows
+
+
+class Profiler:
+    """
+    Captures a CPU profile and an allocation snapshot of each of the next
+    `actions` UI actions.
+
+    Attached to `instrumentation.RECORDER`, it is handed every action of the
+    `@instrumentation.action` handlers. An action that runs inside another
+    one (e.g. `update_table` called by `add_student`) is part of the outer
+    capture. Only one action is captured at a time; actions of other threads
+    meanwhile are left alone.
+
+    For the n-th action named `name`, it writes to `directory`:
+
+    - `<n>_<name>.prof`: the cProfile statistics (`pstats`, snakeviz, ...);
+    - `<n>_<name>.snapshot`: the tracemalloc snapshot of the memory allocated
+      during the action and still held at its end
+      (`tracemalloc.Snapshot.load`);
+    - `<n>_<name>.txt`: a readable summary with the top functions by
+      cumulative time and the top allocation sites;
+
+    and keeps `summary.json` up to date with one entry per action.
+
+    Parameters
+    ----------
+    directory : str, optional
+        Output directory, created if needed (default `DEFAULT_DIRECTORY`).
+    actions : int, optional
+        Actions to capture before the profiler detaches itself (default
+        `DEFAULT_ACTIONS`).
+    top : int, optional
+        Functions and allocation sites per summary (default `TOP`).
+
+    Attributes
+    ----------
+    captured : list of dict
+        The summary entries written so far.
+    """
+
+    def __init__(self, directory=None, actions=DEFAULT_ACTIONS, top=TOP):
+        self.directory = os.path.abspath(directory or DEFAULT_DIRECTORY)
+        self.remaining = actions
+        self.top = top
+        self.captured = []
+        self._lock = threading.Lock()
+        self._active = False
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _claim(self):
+        with self._lock:
+            if self._active or self.remaining <= 0:
+                return False
+            self._active = True
+            self.remaining -= 1
+            return True
+
+    def profile(self, name):
+        """
+        Returns a context manager capturing the block as the action `name`,
+        or doing nothing if a capture is already running or none are left.
+        """
+        if self._active or self.remaining <= 0 or not self._claim():
+            return _NOT_CAPTURED
+        return self._capture(name)
+
+    @contextmanager
+    def _capture(self, name):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        profile = cProfile.Profile()
+        error = None
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. `python -m cProfile`) is already running.
+            if started_tracing:
+                tracemalloc.stop()
+            with self._lock:
+                self._active = False
+                self.remaining += 1
+            yield
+            return
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            profile.disable()
+            cpu = time.thread_time() - cpu
+            wall = time.perf_counter() - wall
+            peak = tracemalloc.get_traced_memory()[1]
+            after = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            try:
+                self._write(name, profile, before, after, wall, cpu, peak, error)
+            finally:
+                with self._lock:
+                    self._active = False
+                    done = self.remaining <= 0
+                if done and RECORDER.profiler is self:
+                    RECORDER.set_profiler(None)
+                    print(f"Profiled {len(self.captured)} actions into {self.directory}", file=sys.stderr)
+
+    def _write(self, name, profile, before, after, wall, cpu, peak, error):
+        number = len(self.captured) + 1
+        base = os.path.join(self.directory, f'{number:03d}_{_UNSAFE.sub("_", name)}')
+        profile.dump_stats(base + '.prof')
+        stats = pstats.Stats(profile)
+        after = after.filter_traces(_OWN_ALLOCATIONS)
+        after.dump(base + '.snapshot')
+        differences = after.compare_to(before.filter_traces(_OWN_ALLOCATIONS), 'lineno')
+        held = sum(difference.size_diff for difference in differences)
+        entry = {
+            'number': number,
+            'action': name,
+            'time': time.time(),
+            'thread': threading.current_thread().name,
+            'wall_ms': round(wall * 1000, 3),
+            'cpu_ms': round(cpu * 1000, 3),
+            'peak_kib': round(peak / 1024, 1),
+            'held_kib': round(held / 1024, 1),
+            'error': error,
+            'files': {'profile': base + '.prof', 'snapshot': base + '.snapshot', 'summary': base + '.txt'},
+            'top_functions': _top_functions(stats, self.top),
+            'top_allocations': _top_allocations(differences, self.top),
+        }
+
+        report = io.StringIO()
+        report.write(f"Action {number}: {name}{f' (raised {error})' if error else ''}\n")
+        report.write(f"Wall {entry['wall_ms']} ms, CPU {entry['cpu_ms']} ms, "
+                     f"peak memory {entry['peak_kib']} KiB, still held {entry['held_kib']} KiB\n\n")
+        report.write("Top functions by cumulative time\n")
+        stats.stream = report
+        stats.sort_stats('cumulative').print_stats(self.top)
+        report.write("Top allocation sites (still held at the end of the action)\n")
+        for difference in differences[:self.top]:
+            report.write(f"  {difference}\n")
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(report.getvalue())
+
+        self.captured.append(entry)
+        with open(os.path.join(self.directory, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.captured, f, indent=4)
+
+
+class _NotCaptured:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOT_CAPTURED = _NotCaptured()
+
+
+# ----------------- Module-level controls -----------------
+
+def arm(actions=DEFAULT_ACTIONS, directory=None):
+    """
+    Profiles the next `actions` UI actions.
+
+    Returns
+    -------
+    Profiler
+        The profiler, also available as `instrumentation.RECORDER.profiler`.
+    """
+    profiler = Profiler(directory, actions)
+    RECORDER.set_profiler(profiler)
+    print(f"Profiling the next {actions} actions into {profiler.directory}", file=sys.stderr)
+    return profiler
+
+
+def disarm():
+    """
+    Stops profiling; the actions captured so far stay on disk.
+    """
+    RECORDER.set_profiler(None)
+
+
+def toggle():
+    """
+    Arms the profiler for the next `DEFAULT_ACTIONS` actions, or disarms it.
+
+    Bound to Ctrl+Shift+P in both applications.
+
+    Returns
+    -------
+    bool
+        Whether the profiler is now armed.
+    """
+    if RECORDER.profiler is None:
+        arm()
+        return True
+    disarm()
+    return False
+
+
+if os.environ.get('SCHOOL_PROFILE'):
+    arm(int(os.environ['SCHOOL_PROFILE']) if os.environ['SCHOOL_PROFILE'].isdigit() else DEFAULT_ACTIONS)
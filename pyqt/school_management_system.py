@@ -1,8 +1,20 @@
+import os
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QLineEdit, QPushButton, QVBoxLayout, QWidget, QHBoxLayout, QFormLayout, QMessageBox, QComboBox, QTableWidget, QTableWidgetItem, QFileDialog
+from PyQt5.QtWidgets import QApplication, QMainWindow, QLabel, QLineEdit, QPushButton, QVBoxLayout, QWidget, QHBoxLayout, QFormLayout, QMessageBox, QComboBox, QTableWidget, QTableWidgetItem, QFileDialog, QShortcut
 import csv
-import re
-from operations import assign_instructor, enroll_student, add_student, get_students, update_student, delete_student, get_instructors, add_instructor, delete_instructor, get_courses, add_course, delete_course, get_students
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QKeySequence
+
+# validation.py is shared with the Tkinter application in the parent directory
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import repository  # noqa: E402
+import validation  # noqa: E402
+import instrumentation
+import metrics
+import profiling
+import tracing
+from db.snapshot import SnapshotScheduler
+from enrollment import DUPLICATE, ENROLLED, WAITLISTED
 
 # Create a main window class
 
@@ -41,7 +53,11 @@ class SchoolManagementSystem(QMainWindow):
     update_course_dropdown()
         Updates the course dropdown list with available courses.
     update_table()
-        Refreshes the table to display the latest student, instructor, and course data.
+        Shows the current page of students, instructors, and courses.
+    change_page(step)
+        Moves the table forward or back by `step` pages.
+    sort_records(column)
+        Sorts the table by the clicked column.
     export_to_csv()
         Exports the current records to a CSV file.
     search_records()
@@ -50,17 +66,27 @@ class SchoolManagementSystem(QMainWindow):
         Edits the selected record in the table.
     delete_record()
         Deletes the selected record from the database.
+    closeEvent(event)
+        Flushes pending writes before the window closes.
     """
 
-    def __init__(self):
+    def __init__(self, repo):
         """
         Initializes the SchoolManagementSystem GUI.
 
         Sets up the main window layout, including forms for students, instructors,
         courses, and registration/assignment functions.
+
+        Parameters
+        ----------
+        repo : repository.Repository
+            The storage all reads and writes go through. On SQLite its writes
+            are committed in groups by a single writer thread.
         """
         super().__init__()
 
+        self.repo = repo
+
         # Set window title
         self.setWindowTitle("School Management System")
 
@@ -100,15 +126,40 @@ class SchoolManagementSystem(QMainWindow):
         self.search_edit.setPlaceholderText("Search by Name or ID")
         search_button = QPushButton("Search")
         search_button.clicked.connect(self.search_records)
+        # Filter the table by record type
+        self.type_filter = QComboBox()
+        self.type_filter.addItems(["All", "Student", "Instructor", "Course"])
+        self.type_filter.currentIndexChanged.connect(self.search_records)
         search_layout.addWidget(self.search_edit)
+        search_layout.addWidget(self.type_filter)
         search_layout.addWidget(search_button)
         main_layout.addLayout(search_layout)
 
+        # The table shows one page of the record index at a time, sorted in SQL
+        self.page = 0
+        self.page_size = 100
+        self.search_prefix = None
+        self.sort_order = "name"
+        self.sort_descending = False
+
         self.record_table = QTableWidget()
         self.record_table.setColumnCount(3)
         self.record_table.setHorizontalHeaderLabels(["ID", "Name", "Type"])
+        self.record_table.horizontalHeader().sectionClicked.connect(self.sort_records)
         main_layout.addWidget(self.record_table)
 
+        # Add pagination controls
+        page_layout = QHBoxLayout()
+        self.previous_page_button = QPushButton("Previous")
+        self.previous_page_button.clicked.connect(lambda: self.change_page(-1))
+        self.page_label = QLabel()
+        self.next_page_button = QPushButton("Next")
+        self.next_page_button.clicked.connect(lambda: self.change_page(1))
+        page_layout.addWidget(self.previous_page_button)
+        page_layout.addWidget(self.page_label)
+        page_layout.addWidget(self.next_page_button)
+        main_layout.addLayout(page_layout)
+
         # Add buttons for editing and deleting records
         edit_button = QPushButton("Edit Record")
         edit_button.clicked.connect(self.edit_record)
@@ -132,6 +183,15 @@ class SchoolManagementSystem(QMainWindow):
         # Set the main layout
         central_widget.setLayout(main_layout)
 
+        # Ctrl+Shift+I starts timing queries and actions; pressing it again
+        # prints the report (see instrumentation.py)
+        QShortcut(QKeySequence("Ctrl+Shift+I"), self, activated=instrumentation.toggle)
+        # Ctrl+Shift+T starts tracing; pressing it again exports the traces
+        # as Chrome trace-event JSON (see tracing.py)
+        QShortcut(QKeySequence("Ctrl+Shift+T"), self, activated=tracing.toggle)
+        # Ctrl+Shift+P profiles the next few actions (see profiling.py)
+        QShortcut(QKeySequence("Ctrl+Shift+P"), self, activated=profiling.toggle)
+
         self.update_student_dropdown()
         self.update_course_dropdown()
         self.update_course_dropdown_for_instructors()
@@ -237,6 +297,9 @@ class SchoolManagementSystem(QMainWindow):
         course_name_label = QLabel("Course Name:")
         self.course_name_edit = QLineEdit()  # Input for course name
 
+        course_capacity_label = QLabel("Capacity (optional):")
+        self.course_capacity_edit = QLineEdit()  # Input for course capacity
+
         # Create the button to add course
         add_course_button = QPushButton("Add Course")
         add_course_button.clicked.connect(self.add_course)
@@ -244,6 +307,7 @@ class SchoolManagementSystem(QMainWindow):
         # Add the widgets to the form layout
         form_layout.addRow(course_id_label, self.course_id_edit)
         form_layout.addRow(course_name_label, self.course_name_edit)
+        form_layout.addRow(course_capacity_label, self.course_capacity_edit)
         form_layout.addWidget(add_course_button)
 
         return form_layout
@@ -324,6 +388,7 @@ class SchoolManagementSystem(QMainWindow):
         return form_layout
 
     # Slots for buttons to add Student, Instructor, and Course
+    @instrumentation.action
     def add_student(self):
         """
         Adds a new student to the database.
@@ -347,10 +412,11 @@ class SchoolManagementSystem(QMainWindow):
                                 "All fields are required for adding a student.")
             return
 
-        # Validate that the age is a positive integer
-        if not student_age.isdigit() or int(student_age) <= 0:
-            QMessageBox.warning(self, "Input Error",
-                                "Age must be a positive integer.")
+        # Validate the age with the shared rules
+        try:
+            student_age = validation.validate_age(student_age)
+        except validation.ValidationError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
             return
 
         # Validate the email format
@@ -359,8 +425,8 @@ class SchoolManagementSystem(QMainWindow):
                                 "Please enter a valid email address.")
             return
 
-        # Add the student to the database using the function from operations.py
-        add_student(student_id, student_name, student_age, student_email)
+        # Add the student to the database through the repository
+        self.repo.add_student(student_id, student_name, student_age, student_email)
 
         # Update the table to reflect changes
         self.update_table()
@@ -372,6 +438,7 @@ class SchoolManagementSystem(QMainWindow):
         self.student_age_edit.clear()
         self.student_email_edit.clear()
 
+    @instrumentation.action
     def add_instructor(self):
         """
         Adds a new instructor to the database.
@@ -395,10 +462,11 @@ class SchoolManagementSystem(QMainWindow):
                 self, "Input Error", "All fields are required for adding an instructor.")
             return
 
-        # Validate that the age is a positive integer
-        if not instructor_age.isdigit() or int(instructor_age) <= 0:
-            QMessageBox.warning(self, "Input Error",
-                                "Age must be a positive integer.")
+        # Validate the age with the shared rules
+        try:
+            instructor_age = validation.validate_age(instructor_age)
+        except validation.ValidationError as e:
+            QMessageBox.warning(self, "Input Error", str(e))
             return
 
         # Validate the email format
@@ -407,9 +475,8 @@ class SchoolManagementSystem(QMainWindow):
                                 "Please enter a valid email address.")
             return
 
-        # Add the instructor to the database using the function from operations.py
-        add_instructor(instructor_id, instructor_name,
-                       instructor_age, instructor_email)
+        # Add the instructor to the database through the repository
+        self.repo.add_instructor(instructor_id, instructor_name, instructor_age, instructor_email)
 
         # Update the table and dropdowns
         self.update_table()
@@ -421,6 +488,7 @@ class SchoolManagementSystem(QMainWindow):
         self.instructor_age_edit.clear()
         self.instructor_email_edit.clear()
 
+    @instrumentation.action
     def update_student_dropdown(self):
         """
         Updates the student dropdown with the latest student names from the database.
@@ -436,14 +504,16 @@ class SchoolManagementSystem(QMainWindow):
         self.student_dropdown.addItem("Select Student")
 
         # Fetch students from the database
-        students = get_students()
+        students = self.repo.students()
 
         # Add each student to the dropdown
-        for student in students:
-            print(f"Adding student: {student}")  # Debugging print statement
-            # Assuming student[2] is the student's name
-            self.student_dropdown.addItem(student[2])
+        with metrics.refresh("student dropdown", len(students)), \
+                tracing.span("fill student dropdown", "widget", rows=len(students)):
+            for student in students:
+                # Assuming student[2] is the student's name
+                self.student_dropdown.addItem(student[2])
 
+    @instrumentation.action
     def update_instructor_dropdown(self):
         """
         Updates the instructor dropdown with the latest instructor names from the database.
@@ -459,13 +529,16 @@ class SchoolManagementSystem(QMainWindow):
         self.instructor_dropdown.addItem("Select Instructor")
 
         # Fetch instructors from the database
-        instructors = get_instructors()
+        instructors = self.repo.instructors()
 
         # Add each instructor to the dropdown
-        for instructor in instructors:
-            # Assuming instructor[1] is the instructor name
-            self.instructor_dropdown.addItem(instructor[2])
+        with metrics.refresh("instructor dropdown", len(instructors)), \
+                tracing.span("fill instructor dropdown", "widget", rows=len(instructors)):
+            for instructor in instructors:
+                # Assuming instructor[1] is the instructor name
+                self.instructor_dropdown.addItem(instructor[2])
 
+    @instrumentation.action
     def add_course(self):
         """
         Adds a new course to the database.
@@ -479,6 +552,7 @@ class SchoolManagementSystem(QMainWindow):
         """
         course_id = self.course_id_edit.text()  # Get the course_id
         course_name = self.course_name_edit.text()
+        course_capacity = self.course_capacity_edit.text().strip()
 
         # Validate the fields
         if not course_id or not course_name:
@@ -486,8 +560,15 @@ class SchoolManagementSystem(QMainWindow):
                                 "Both Course ID and Course Name are required.")
             return
 
+        # An empty capacity means the course is unlimited
+        if course_capacity and not course_capacity.isdigit():
+            QMessageBox.warning(self, "Input Error",
+                                "Capacity must be a whole number.")
+            return
+        capacity = int(course_capacity) if course_capacity else None
+
         # Add the course to the database
-        add_course(course_id, course_name)
+        self.repo.add_course(course_id, course_name, capacity)
 
         # Update the table and dropdowns
         self.update_table()
@@ -497,7 +578,9 @@ class SchoolManagementSystem(QMainWindow):
         # Clear the input fields after adding
         self.course_id_edit.clear()
         self.course_name_edit.clear()
+        self.course_capacity_edit.clear()
 
+    @instrumentation.action
     def update_course_dropdown(self):
         """
         Updates the course dropdown with the latest course names from the database.
@@ -513,14 +596,16 @@ class SchoolManagementSystem(QMainWindow):
         self.course_dropdown.addItem("Select Course")
 
         # Fetch courses from the database
-        courses = get_courses()
+        courses = self.repo.courses()
 
         # Add each course with ID and name to the dropdown
-        for course in courses:
-            print(f"Adding course: {course}")  # Debugging print statement
-            # Show both course_id and course_name
-            self.course_dropdown.addItem(f"{course[0]} - {course[2]}")
+        with metrics.refresh("course dropdown", len(courses)), \
+                tracing.span("fill course dropdown", "widget", rows=len(courses)):
+            for course in courses:
+                # Show both course_id and course_name
+                self.course_dropdown.addItem(f"{course[0]} - {course[2]}")
 
+    @instrumentation.action
     def update_course_dropdown_for_instructors(self):
         """
         Updates the course dropdown for instructor assignment.
@@ -540,64 +625,82 @@ class SchoolManagementSystem(QMainWindow):
         self.course_dropdown_for_instructors.clear()
         self.course_dropdown_for_instructors.addItem("Select Course")
 
-        courses = get_courses()
+        courses = self.repo.courses()
 
         # Add each course with ID and name to the dropdown
-        for course in courses:
-            print(f"Adding course for instructor assignment: {
-                  course}")  # Debugging print statement
-            # Format the dropdown item as "course_id - course_name"
-            self.course_dropdown_for_instructors.addItem(
-                f"{course[0]} - {course[2]}")
-
+        with metrics.refresh("assignment course dropdown", len(courses)), \
+                tracing.span("fill assignment course dropdown", "widget", rows=len(courses)):
+            for course in courses:
+                # Format the dropdown item as "course_id - course_name"
+                self.course_dropdown_for_instructors.addItem(
+                    f"{course[0]} - {course[2]}")
+
+    @instrumentation.action
     def update_table(self):
         """
-        Refreshes the records table to display the latest students, instructors, and courses.
+        Refreshes the records table with the current page of records.
 
-        Fetches data from the database for students, instructors, and courses, and
-        updates the table displayed in the user interface. This method ensures that
-        the displayed data is up to date.
+        Reads one sorted page of students, instructors, and courses from the
+        record index, applying the search prefix and type filter in SQL. The
+        primary key of each record is stored with its ID cell (Qt.UserRole) so
+        that editing and deleting do not need to look the record up again.
         """
-        self.record_table.setRowCount(0)  # Clear existing rows
+        record_type = self.type_filter.currentText()
+        record_type = None if record_type == "All" else record_type
+
+        total = self.repo.count_records(record_type, self.search_prefix)
+        last_page = max((total - 1) // self.page_size, 0)
+        self.page = min(self.page, last_page)
+
+        records = self.repo.record_page(self.page * self.page_size, self.page_size, record_type,
+                                        self.search_prefix, self.sort_order, self.sort_descending)
+
+        with metrics.refresh("record table", len(records)):
+            self.record_table.setRowCount(len(records))
+            for row_position, (kind, record_id, display_id, name) in enumerate(records):
+                id_item = QTableWidgetItem(str(display_id))
+                id_item.setData(Qt.UserRole, record_id)  # Primary key of the record
+                self.record_table.setItem(row_position, 0, id_item)
+                self.record_table.setItem(row_position, 1, QTableWidgetItem(name))
+                self.record_table.setItem(row_position, 2, QTableWidgetItem(kind))
+
+        # Update the pagination controls
+        self.page_label.setText(f"Page {self.page + 1} of {last_page + 1} ({total} records)")
+        self.previous_page_button.setEnabled(self.page > 0)
+        self.next_page_button.setEnabled(self.page < last_page)
+
+    @instrumentation.action
+    def change_page(self, step):
+        """
+        Moves the records table `step` pages forward (or back, if negative).
+        """
+        self.page = max(self.page + step, 0)
+        self.update_table()
 
-        # Fetch students from the database
-        students = get_students()
-        for student in students:
-            row_position = self.record_table.rowCount()
-            self.record_table.insertRow(row_position)
-            self.record_table.setItem(
-                # Student ID (not the primary key)
-                row_position, 0, QTableWidgetItem(student[1]))
-            self.record_table.setItem(
-                row_position, 1, QTableWidgetItem(student[2]))  # Student Name
-            self.record_table.setItem(
-                # Type (always "Student")
-                row_position, 2, QTableWidgetItem("Student"))
+    @instrumentation.action
+    def sort_records(self, column):
+        """
+        Sorts the records table by the clicked column.
 
-        # Fetch instructors from the database
-        instructors = get_instructors()
-        for instructor in instructors:
-            row_position = self.record_table.rowCount()
-            self.record_table.insertRow(row_position)
-            self.record_table.setItem(row_position, 0, QTableWidgetItem(
-                str(instructor[1])))  # Instructor ID
-            self.record_table.setItem(row_position, 1, QTableWidgetItem(
-                instructor[2]))  # Instructor Name
-            self.record_table.setItem(
-                row_position, 2, QTableWidgetItem("Instructor"))
+        Clicking the column the table is already sorted by reverses the order.
 
-        # Fetch courses from the database
-        courses = get_courses()
-        for course in courses:
-            row_position = self.record_table.rowCount()
-            self.record_table.insertRow(row_position)
-            self.record_table.setItem(
-                row_position, 0, QTableWidgetItem(str(course[1])))  # Course ID
-            self.record_table.setItem(
-                row_position, 1, QTableWidgetItem(course[2]))  # Course Name
-            self.record_table.setItem(
-                row_position, 2, QTableWidgetItem("Course"))
+        Parameters
+        ----------
+        column : int
+            Index of the clicked column (0: ID, 1: Name, 2: Type).
+        """
+        order = ("id", "name", "type")[column]
+        if order == self.sort_order:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_order = order
+            self.sort_descending = False
+        self.record_table.horizontalHeader().setSortIndicator(
+            column, Qt.DescendingOrder if self.sort_descending else Qt.AscendingOrder)
+        self.page = 0
+        self.update_table()
 
+    @instrumentation.action
     def delete_record(self):
         """
         Deletes the selected record from the database.
@@ -616,34 +719,15 @@ class SchoolManagementSystem(QMainWindow):
 
         # Get the type (Student, Instructor, or Course)
         record_type = self.record_table.item(selected_row, 2).text()
-        # Get the ID of the selected record (Primary Key ID)
-        display_id = self.record_table.item(selected_row, 0).text()
+        # Get the primary key stored with the ID cell by update_table
+        record_id = self.record_table.item(selected_row, 0).data(Qt.UserRole)
 
-        # Fetch the actual primary key `id` for deletion
         if record_type == "Student":
-            students = get_students()
-            # Match the displayed student_id with the database's actual primary key `id`
-            student_record = next(
-                (s for s in students if str(s[1]) == display_id), None)
-            if student_record:
-                # Pass the actual primary key `id`
-                delete_student(student_record[0])
+            self.repo.delete_student(record_id)
         elif record_type == "Instructor":
-            instructors = get_instructors()
-            # Match the displayed instructor_id with the database's actual primary key `id`
-            instructor_record = next(
-                (i for i in instructors if str(i[1]) == display_id), None)
-            if instructor_record:
-                # Pass the actual primary key `id`
-                delete_instructor(instructor_record[0])
+            self.repo.delete_instructor(record_id)
         elif record_type == "Course":
-            courses = get_courses()
-            # Match the displayed course_code with the database's actual primary key `id`
-            course_record = next(
-                (c for c in courses if str(c[1]) == display_id), None)
-            if course_record:
-                # Pass the actual primary key `id`
-                delete_course(course_record[0])
+            self.repo.delete_course(record_id)
 
         # Update the table to reflect the changes
         self.update_table()
@@ -652,6 +736,7 @@ class SchoolManagementSystem(QMainWindow):
         QMessageBox.information(
             self, "Success", f"{record_type} deleted successfully.")
 
+    @instrumentation.action
     def export_to_csv(self):
         """
         Exports the records of students, instructors, and courses to a CSV file.
@@ -673,18 +758,18 @@ class SchoolManagementSystem(QMainWindow):
                 writer.writerow(['ID', 'Name', 'Type'])
 
                 # Write students
-                students = get_students()
+                students = self.repo.students()
                 for student in students:
                     writer.writerow([student[0], student[1], 'Student'])
 
                 # Write instructors
-                instructors = get_instructors()
+                instructors = self.repo.instructors()
                 for instructor in instructors:
                     writer.writerow(
                         [instructor[0], instructor[1], 'Instructor'])
 
                 # Write courses
-                courses = get_courses()
+                courses = self.repo.courses()
                 for course in courses:
                     writer.writerow([course[0], course[1], 'Course'])
 
@@ -693,11 +778,10 @@ class SchoolManagementSystem(QMainWindow):
 
     def is_valid_email(self, email):
         """
-        Validates the format of an email address using a regular expression.
+        Validates the format of an email address.
 
-        This method checks if the provided email matches a standard email format
-        using a regular expression pattern. It supports common email formats
-        including alphanumeric characters, dots, underscores, and domain names.
+        Uses the shared pattern in validation.py, so both applications accept
+        the same addresses.
 
         Parameters
         ----------
@@ -709,9 +793,9 @@ class SchoolManagementSystem(QMainWindow):
         bool
             Returns True if the email matches the valid format, otherwise False.
         """
-        email_regex = r'^[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+$'
-        return re.match(email_regex, email)
+        return validation.is_valid_email(email)
 
+    @instrumentation.action
     def assign_instructor_to_course(self):
         """
         Assigns an instructor to a selected course based on user input.
@@ -732,27 +816,23 @@ class SchoolManagementSystem(QMainWindow):
         instructor_name = self.instructor_dropdown.currentText()
         course_info = self.course_dropdown_for_instructors.currentText()
 
-        print(f"Selected instructor: {instructor_name}")
-        print(f"Selected course: {course_info}")
+        tracing.annotate(instructor=instructor_name, course=course_info)
 
         if instructor_name != "Select Instructor" and course_info != "Select Course":
             # Extract course_id and course_name from course_info
             try:
                 course_id, course_name = course_info.split(' - ')
-                print(f"Split course_id: {
-                      course_id}, course_name: {course_name}")
             except ValueError:
-                print("Error splitting course info")
+                tracing.annotate(outcome="bad course selection")
                 QMessageBox.warning(self, "Selection Error",
                                     "Course selection is incorrect")
                 return
 
             # Fetch instructor and course IDs from the database
-            instructors = get_instructors()
-            courses = get_courses()
+            instructors = self.repo.instructors()
+            courses = self.repo.courses()
 
-            print(f"Fetched instructors: {instructors}")
-            print(f"Fetched courses: {courses}")
+            tracing.annotate(instructors=len(instructors), courses=len(courses))
 
             # Find the instructor_id by matching the instructor name
             instructor_id = next(
@@ -760,14 +840,13 @@ class SchoolManagementSystem(QMainWindow):
 
             # Find the course_id by matching the course code
             found_course_id = next(
-                (c[0] for c in courses if c[0] == int(course_id)), None)
+                (c[0] for c in courses if str(c[0]) == course_id), None)
 
-            print(f"Found instructor_id: {instructor_id}")
-            print(f"Found course_id: {found_course_id}")
+            tracing.annotate(instructor_id=instructor_id, course_id=found_course_id)
 
             if instructor_id and found_course_id:
                 # Call the function to assign instructor to course
-                assign_instructor(instructor_id, found_course_id)
+                self.repo.assign(instructor_id, found_course_id)
                 QMessageBox.information(self, "Success", f"Assigned {
                                         instructor_name} to {course_name}")
             else:
@@ -777,6 +856,7 @@ class SchoolManagementSystem(QMainWindow):
             QMessageBox.warning(self, "Selection Error",
                                 "Please select both an instructor and a course")
 
+    @instrumentation.action
     def register_student_for_course(self):
         """
         Registers a selected student for a selected course.
@@ -797,27 +877,23 @@ class SchoolManagementSystem(QMainWindow):
         # Get the selected course info (course_id - course_name)
         course_info = self.course_dropdown.currentText()
 
-        print(f"Selected student: {student_name}")
-        print(f"Selected course: {course_info}")
+        tracing.annotate(student=student_name, course=course_info)
 
         if student_name != "Select Student" and course_info != "Select Course":
             try:
                 # Extract course_id and course_name from course_info (format: 'course_id - course_name')
                 course_id, course_name = course_info.split(' - ')
-                print(f"Split course_id: {
-                      course_id}, course_name: {course_name}")
             except ValueError:
-                print("Error splitting course info")
+                tracing.annotate(outcome="bad course selection")
                 QMessageBox.warning(self, "Selection Error",
                                     "Course selection is incorrect")
                 return
 
             # Get students and courses from the database
-            students = get_students()
-            courses = get_courses()
+            students = self.repo.students()
+            courses = self.repo.courses()
 
-            print(f"Fetched students: {students}")
-            print(f"Fetched courses: {courses}")
+            tracing.annotate(students=len(students), courses=len(courses))
 
             # Find the student_id by matching the student name
             student_id = next(
@@ -827,85 +903,47 @@ class SchoolManagementSystem(QMainWindow):
             found_course_id = next(
                 (c[0] for c in courses if str(c[0]) == course_id), None)
 
-            print(f"Found student_id: {student_id}")
-            print(f"Found course_id: {found_course_id}")
+            tracing.annotate(student_id=student_id, course_id=found_course_id)
 
             if student_id and found_course_id:
-                enroll_student(student_id, found_course_id)
-                QMessageBox.information(self, "Success", f"Registered {
-                                        student_name} for {course_name}")
+                result = self.repo.enroll(student_id, found_course_id)
+                tracing.annotate(outcome=result.status)
+                if result.status == ENROLLED:
+                    QMessageBox.information(self, "Success",
+                                            f"Registered {student_name} for {course_name}")
+                elif result.status == WAITLISTED:
+                    QMessageBox.information(self, "Course Full",
+                                            f"{course_name} is full. {student_name} is number "
+                                            f"{result.position} on the waitlist")
+                elif result.status == DUPLICATE:
+                    QMessageBox.warning(self, "Already Registered",
+                                        f"{student_name} is already registered or waitlisted for {course_name}")
+                else:
+                    QMessageBox.warning(self, "Selection Error",
+                                        "Invalid student or course selection")
             else:
-                print("Invalid student or course selection")
+                tracing.annotate(outcome="student or course not found")
                 QMessageBox.warning(self, "Selection Error",
                                     "Invalid student or course selection")
         else:
             QMessageBox.warning(self, "Selection Error",
                                 "Please select both a student and a course")
 
+    @instrumentation.action
     def search_records(self):
         """
         Searches for records in the database based on the user input and selected criteria.
 
-        Retrieves records of students, instructors, or courses that match the search
-        query entered by the user. Updates the records table to display the filtered
-        results.
-        """
-        search_query = self.search_edit.text().lower()
-
-        # Clear the table for filtered results
-        self.record_table.setRowCount(0)
-
-        # Search in students
-        students = get_students()  # Fetch students from the database
-        for student in students:
-            # student[2] is the name
-            if search_query in student[2].lower() or search_query in str(student[1]):
-                row_position = self.record_table.rowCount()
-                self.record_table.insertRow(row_position)
-                self.record_table.setItem(
-                    # Student ID
-                    row_position, 0, QTableWidgetItem(str(student[1])))
-                self.record_table.setItem(
-                    # Student Name
-                    row_position, 1, QTableWidgetItem(student[2]))
-                self.record_table.setItem(
-                    # Type: Student
-                    row_position, 2, QTableWidgetItem("Student"))
-
-        # Search in instructors
-        instructors = get_instructors()  # Fetch instructors from the database
-        for instructor in instructors:
-            # instructor[2] is the name
-            if search_query in instructor[2].lower() or search_query in str(instructor[1]):
-                row_position = self.record_table.rowCount()
-                self.record_table.insertRow(row_position)
-                self.record_table.setItem(
-                    # Instructor ID
-                    row_position, 0, QTableWidgetItem(str(instructor[1])))
-                self.record_table.setItem(
-                    # Instructor Name
-                    row_position, 1, QTableWidgetItem(instructor[2]))
-                self.record_table.setItem(
-                    # Type: Instructor
-                    row_position, 2, QTableWidgetItem("Instructor"))
-
-        # Search in courses
-        courses = get_courses()  # Fetch courses from the database
-        for course in courses:
-            # course[2] is the course name
-            if search_query in course[2].lower() or search_query in str(course[1]):
-                row_position = self.record_table.rowCount()
-                self.record_table.insertRow(row_position)
-                self.record_table.setItem(
-                    # Course Code
-                    row_position, 0, QTableWidgetItem(str(course[1])))
-                self.record_table.setItem(
-                    # Course Name
-                    row_position, 1, QTableWidgetItem(course[2]))
-                self.record_table.setItem(
-                    # Type: Course
-                    row_position, 2, QTableWidgetItem("Course"))
+        Shows the students, instructors, or courses whose name or ID starts with
+        the search text (ignoring case), limited to the type selected in the
+        type filter. The search runs in SQL against the record index, and the
+        results are paginated like the full table.
+        """
+        self.search_prefix = self.search_edit.text().strip() or None
+        self.page = 0
+        self.update_table()
 
+    @instrumentation.action
     def edit_record(self):
         """
         Allows the user to edit the selected record in the table.
@@ -925,13 +963,13 @@ class SchoolManagementSystem(QMainWindow):
 
         # Get the type (Student, Instructor, or Course)
         record_type = self.record_table.item(selected_row, 2).text()
-        # Get the ID (or displayed ID like student_id, instructor_id) of the selected record
-        display_id = self.record_table.item(selected_row, 0).text()
+        # Get the primary key stored with the ID cell by update_table
+        record_id = self.record_table.item(selected_row, 0).data(Qt.UserRole)
 
         if record_type == "Student":
-            students = get_students()
+            students = self.repo.students()
             student = next(
-                (s for s in students if str(s[1]) == display_id), None)
+                (s for s in students if s[0] == record_id), None)
             if student:
                 # Populate the form fields with the student details
                 self.student_id_edit.setText(student[1])
@@ -943,9 +981,9 @@ class SchoolManagementSystem(QMainWindow):
                 self.delete_student_record_before_update(student[0])
 
         elif record_type == "Instructor":
-            instructors = get_instructors()
+            instructors = self.repo.instructors()
             instructor = next(
-                (i for i in instructors if str(i[1]) == display_id), None)
+                (i for i in instructors if i[0] == record_id), None)
             if instructor:
                 # Populate the form fields with the instructor details
                 self.instructor_id_edit.setText(instructor[1])
@@ -957,9 +995,9 @@ class SchoolManagementSystem(QMainWindow):
                 self.delete_instructor_record_before_update(instructor[0])
 
         elif record_type == "Course":
-            courses = get_courses()
+            courses = self.repo.courses()
             course = next(
-                (c for c in courses if str(c[1]) == display_id), None)
+                (c for c in courses if c[0] == record_id), None)
             if course:
                 # Populate the form fields with the course details
                 self.course_id_edit.setText(course[1])
@@ -972,29 +1010,76 @@ class SchoolManagementSystem(QMainWindow):
         self.update_table()
 
     def delete_student_record_before_update(self, student_id):
-        delete_student(student_id)
+        self.repo.delete_student(student_id)
 
     def delete_instructor_record_before_update(self, instructor_id):
-        delete_instructor(instructor_id)
+        self.repo.delete_instructor(instructor_id)
 
     def delete_course_record_before_update(self, course_id):
-        delete_course(course_id)
+        self.repo.delete_course(course_id)
+
+    def closeEvent(self, event):
+        """
+        Applies any queued writes and closes the repository before closing.
+        """
+        self.repo.close()
+        super().closeEvent(event)
 
 
 # Main function to run the PyQt5 application
 
 
+def report_snapshot_failure(result):
+    """
+    Prints a failed background snapshot to stderr; successful ones are silent.
+
+    Parameters
+    ----------
+    result : dict or Exception
+        What `SnapshotScheduler` passes to its `on_snapshot` callback.
+    """
+    if isinstance(result, Exception):
+        print(f"Snapshot of the database failed: {result}", file=sys.stderr)
+
+
 def main():
     """
     The main function to run the School Management System PyQt5 application.
 
     Creates an instance of QApplication and SchoolManagementSystem,
     then starts the application's event loop.
+
+    The database backend comes from school.ini or SCHOOL_BACKEND (see
+    `repository.load_config`) and defaults to SQLite; opening a SQLite
+    repository applies any pending schema migrations.
+
+    If the SCHOOL_SNAPSHOT_DIR environment variable is set, a background thread
+    also takes an online snapshot of the SQLite database every
+    SCHOOL_SNAPSHOT_INTERVAL seconds (default 3600), keeping the newest
+    SCHOOL_SNAPSHOT_KEEP (default 7). Failed snapshots are reported on stderr.
+
+    SCHOOL_METRICS_FILE and SCHOOL_METRICS_PORT publish the runtime metrics as
+    a Prometheus text file and/or on a local endpoint (see metrics.py).
     """
+    repo = repository.open_repository(default_backend="sqlite")
+
+    snapshot_dir = os.environ.get("SCHOOL_SNAPSHOT_DIR")
+    if snapshot_dir and repo.backend == "sqlite":
+        SnapshotScheduler(repo.db_path, snapshot_dir,
+                          float(os.environ.get("SCHOOL_SNAPSHOT_INTERVAL", "3600")),
+                          int(os.environ.get("SCHOOL_SNAPSHOT_KEEP", "7")),
+                          on_snapshot=report_snapshot_failure).start()
+
+    # SCHOOL_METRICS_FILE / SCHOOL_METRICS_PORT publish the metrics (see metrics.py)
+    exporter = metrics.start_exporter_from_env()
+
     app = QApplication(sys.argv)
-    window = SchoolManagementSystem()
+    window = SchoolManagementSystem(repo)
     window.show()
-    sys.exit(app.exec_())
+    status = app.exec_()
+    if exporter is not None:
+        exporter.stop()
+    sys.exit(status)
 
 
 if __name__ == "__main__":
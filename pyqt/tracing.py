@@ -0,0 +1,396 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import deque
+
+from instrumentation import RECORDER
+
+# Traces kept by the in-memory ring buffer; the oldest are dropped first.
+DEFAULT_CAPACITY = 200
+
+# Spans kept per trace; further spans of the same trace are only counted.
+MAX_SPANS_PER_TRACE = 5000
+
+# Sampling can be set with the SCHOOL_TRACE_SAMPLE (fraction of actions traced)
+# and SCHOOL_TRACE_SLOW_MS (unsampled actions slower than this are kept
+# anyway) environment variables.
+SAMPLE_RATE = float(os.environ.get('SCHOOL_TRACE_SAMPLE', 1.0))
+KEEP_SLOW_MS = float(os.environ['SCHOOL_TRACE_SLOW_MS']) if os.environ.get('SCHOOL_TRACE_SLOW_MS') else None
+
+
+class _NullSpan:
+    """
+    Span that records nothing, handed out while tracing is off.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Trace:
+    """
+    The spans recorded under one root span, on one thread.
+    """
+
+    __slots__ = ('name', 'tid', 'thread', 'sampled', 'spans', 'dropped')
+
+    def __init__(self, name, sampled):
+        thread = threading.current_thread()
+        self.name = name
+        self.tid = thread.ident
+        self.thread = thread.name
+        self.sampled = sampled
+        # [name, category, start, seconds, args]
+        self.spans = []
+        self.dropped = 0
+
+
+# Marks the current thread as inside a root span that was not sampled.
+_UNSAMPLED = object()
+
+
+class _Span:
+    __slots__ = ('tracer', 'name', 'category', 'args', 'trace', 'root', 'started')
+
+    def __init__(self, tracer, name, category, args, trace, root):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.trace = trace
+        self.root = root
+
+    def __enter__(self):
+        local = self.tracer._local
+        if self.root:
+            local.trace = self.trace
+            local.stack = []
+        local.stack.append(self)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        local = self.tracer._local
+        local.stack.pop()
+        if exc_type is not None:
+            self.args['error'] = exc_type.__name__
+        self.tracer._add(self.trace, [self.name, self.category, self.started, seconds, self.args])
+        if self.root:
+            local.trace = None
+            self.tracer._close(self.trace, seconds)
+        return False
+
+
+class _UnsampledSpan:
+    """
+    Root span that was not sampled: suppresses the spans nested in it.
+    """
+
+    __slots__ = ('tracer',)
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+
+    def __enter__(self):
+        self.tracer._local.trace = _UNSAMPLED
+        return self
+
+    def __exit__(self, *exc_info):
+        self.tracer._local.trace = None
+        return False
+
+
+class Tracer:
+    """
+    Records what actions do as nested spans, kept in a ring buffer.
+
+    An outermost span (normally a UI action) starts a trace; spans opened on
+    the same thread while it is open, and the statements executed meanwhile,
+    become its children. Only a `sample_rate` fraction of the traces is
+    recorded. With `keep_slow_ms`, the others are recorded too but only kept
+    when they turn out to be slower than that, so slow clicks are never lost
+    to sampling. Statements run outside of any span (e.g. on the write queue
+    thread) are traces of their own.
+
+    Spans hold their name, category, timing and a few arguments (row counts,
+    selections, parameter types), never whole rows, so a trace costs about
+    the same however much data an action handles.
+
+    Parameters
+    ----------
+    capacity : int, optional
+        Traces kept; the oldest are dropped first (default `DEFAULT_CAPACITY`).
+    sample_rate : float, optional
+        Fraction of the traces recorded, between 0 and 1 (default `SAMPLE_RATE`).
+    keep_slow_ms : float, optional
+        Also keep unsampled traces that take at least this long (default
+        `KEEP_SLOW_MS`, none).
+
+    Attributes
+    ----------
+    traces : collections.deque of _Trace
+        The ring buffer.
+    dropped : int
+        Traces that fell out of the ring buffer.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, sample_rate=None, keep_slow_ms=None):
+        self.traces = deque(maxlen=capacity)
+        self.sample_rate = SAMPLE_RATE if sample_rate is None else sample_rate
+        if keep_slow_ms is None:
+            keep_slow_ms = KEEP_SLOW_MS
+        self.keep_slow_seconds = None if keep_slow_ms is None else keep_slow_ms / 1000
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._random = random.Random()
+
+    def _sampled(self):
+        return self.sample_rate >= 1 or self._random.random() < self.sample_rate
+
+    def span(self, name, category='app', **args):
+        """
+        Returns a context manager timing the block as a span.
+
+        Parameters
+        ----------
+        name : str
+            What the block does, e.g. "fill student dropdown".
+        category : str, optional
+            'action', 'query', 'db', 'widget', ... (shown and filterable in
+            the trace viewer).
+        **args
+            Small values to attach, such as row counts.
+        """
+        trace = getattr(self._local, 'trace', None)
+        if trace is _UNSAMPLED:
+            return _NULL_SPAN
+        if trace is not None:
+            return _Span(self, name, category, args, trace, False)
+        sampled = self._sampled()
+        if not sampled and self.keep_slow_seconds is None:
+            return _UnsampledSpan(self)
+        return _Span(self, name, category, args, _Trace(name, sampled), True)
+
+    def complete(self, name, category, started, seconds, args=None):
+        """
+        Records a span that has already finished, such as a statement.
+
+        Parameters
+        ----------
+        name : str
+            Span name.
+        category : str
+            Span category.
+        started : float
+            `time.perf_counter()` at its start.
+        seconds : float
+            Its duration.
+        args : dict, optional
+            Values to attach.
+        """
+        trace = getattr(self._local, 'trace', None)
+        if trace is _UNSAMPLED:
+            return
+        span = [name, category, started, seconds, args or {}]
+        if trace is not None:
+            self._add(trace, span)
+            return
+        sampled = self._sampled()
+        if not sampled and (self.keep_slow_seconds is None or seconds < self.keep_slow_seconds):
+            return
+        trace = _Trace(name, sampled)
+        trace.spans.append(span)
+        self._keep(trace)
+
+    def annotate(self, **args):
+        """
+        Attaches values to the innermost open span of the calling thread.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack and getattr(self._local, 'trace', None) is not None:
+            stack[-1].args.update(args)
+
+    def _add(self, trace, span):
+        if len(trace.spans) < MAX_SPANS_PER_TRACE:
+            trace.spans.append(span)
+        else:
+            trace.dropped += 1
+
+    def _close(self, trace, seconds):
+        if trace.sampled or seconds >= self.keep_slow_seconds:
+            self._keep(trace)
+
+    def _keep(self, trace):
+        with self._lock:
+            if len(self.traces) == self.traces.maxlen:
+                self.dropped += 1
+            self.traces.append(trace)
+
+    def clear(self):
+        """
+        Empties the ring buffer.
+        """
+        with self._lock:
+            self.traces.clear()
+            self.dropped = 0
+
+    def chrome_trace(self):
+        """
+        Returns the buffered traces in the Chrome trace-event format.
+
+        The result can be loaded in chrome://tracing, https://ui.perfetto.dev
+        or speedscope. Each span is a complete ('X') event with microsecond
+        timestamps; spans of the same thread nest by time.
+
+        Returns
+        -------
+        dict
+            {"traceEvents": [...], "displayTimeUnit": "ms", "otherData": {...}}.
+        """
+        with self._lock:
+            traces = list(self.traces)
+            dropped = self.dropped
+        pid = os.getpid()
+        events = []
+        threads = {}
+        origin = min((span[2] for trace in traces for span in trace.spans), default=0.0)
+        for trace in traces:
+            threads.setdefault(trace.tid, trace.thread)
+            for name, category, started, seconds, args in trace.spans:
+                events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': trace.tid,
+                               'ts': round((started - origin) * 1e6, 3), 'dur': round(seconds * 1e6, 3),
+                               'args': args})
+            if trace.dropped:
+                events.append({'name': 'spans dropped', 'cat': 'tracing', 'ph': 'i', 's': 't', 'pid': pid,
+                               'tid': trace.tid, 'ts': round((trace.spans[-1][2] - origin) * 1e6, 3),
+                               'args': {'count': trace.dropped}})
+        for tid, thread in threads.items():
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': thread}})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'traces': len(traces), 'traces_dropped': dropped, 'sample_rate': self.sample_rate}}
+
+    def export_chrome(self, path):
+        """
+        Writes `chrome_trace` to a JSON file.
+
+        Parameters
+        ----------
+        path : str
+            File to write.
+
+        Returns
+        -------
+        int
+            The number of traces written.
+        """
+        data = self.chrome_trace()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, default=str)
+        return data['otherData']['traces']
+
+
+# ----------------- Module-level controls -----------------
+
+def enable(capacity=DEFAULT_CAPACITY, sample_rate=None, keep_slow_ms=None):
+    """
+    Starts tracing actions and statements with a new `Tracer`.
+
+    Returns
+    -------
+    Tracer
+        The tracer, also available as `instrumentation.RECORDER.tracer`.
+    """
+    tracer = Tracer(capacity, sample_rate, keep_slow_ms)
+    RECORDER.set_tracer(tracer)
+    return tracer
+
+
+def disable():
+    """
+    Stops tracing. The traces recorded so far are discarded.
+    """
+    RECORDER.set_tracer(None)
+
+
+def span(name, category='app', **args):
+    """
+    See `Tracer.span`; a no-op while tracing is off.
+
+    Examples
+    --------
+    >>> with tracing.span("fill student dropdown", "widget", rows=len(students)):
+    ...     for student in students:
+    ...         dropdown.addItem(student[2])
+    """
+    tracer = RECORDER.tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, category, **args)
+
+
+def annotate(**args):
+    """See `Tracer.annotate`; a no-op while tracing is off."""
+    tracer = RECORDER.tracer
+    if tracer is not None:
+        tracer.annotate(**args)
+
+
+def export_chrome(path):
+    """
+    See `Tracer.export_chrome`.
+
+    Raises
+    ------
+    RuntimeError
+        If tracing is off.
+    """
+    tracer = RECORDER.tracer
+    if tracer is None:
+        raise RuntimeError("Tracing is not enabled")
+    return tracer.export_chrome(path)
+
+
+def toggle(path=None, stream=None):
+    """
+    Switches tracing on, or off after exporting the traces.
+
+    Bound to Ctrl+Shift+T in the PyQt application.
+
+    Parameters
+    ----------
+    path : str, optional
+        File the traces are exported to (default: SCHOOL_TRACE_FILE, or
+        school_trace_<time>.json in the working directory).
+    stream : file, optional
+        Where the export is reported (default: sys.stderr).
+
+    Returns
+    -------
+    bool
+        Whether tracing is now enabled.
+    """
+    if RECORDER.tracer is None:
+        enable()
+        return True
+    path = path or os.environ.get('SCHOOL_TRACE_FILE') or time.strftime('school_trace_%Y%m%d_%H%M%S.json')
+    count = export_chrome(path)
+    disable()
+    print(f"Wrote {count} traces to {os.path.abspath(path)}", file=stream or sys.stderr)
+    return False
+
+
+if os.environ.get('SCHOOL_TRACE', '').lower() in ('1', 'true', 'yes', 'on'):
+    enable()
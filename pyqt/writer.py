@@ -0,0 +1,226 @@
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import instrumentation
+import metrics
+import operations
+import tracing
+
+# Sentinel placed on the queue to stop the writer thread.
+_STOP = object()
+
+
+class WriteQueue:
+    """
+    A single writer thread that applies write operations with group commit.
+
+    Callers submit operations (usually the write functions of `operations.py`)
+    and get a `concurrent.futures.Future` back. The writer thread takes the
+    first waiting operation, keeps collecting more for up to `max_delay`
+    seconds (or until `max_batch` are queued), runs them all in one
+    transaction and commits once. Every operation runs inside its own
+    SAVEPOINT, so a failing operation only fails its own future. Futures are
+    resolved after the commit, i.e. once the write is durable.
+
+    Because only this thread writes, the process never contends with itself
+    for SQLite's write lock, and N concurrent writes cost one commit (one
+    fsync) instead of N.
+
+    Parameters
+    ----------
+    db_path : str, optional
+        Database file (default: `operations.DB_PATH`).
+    max_batch : int, optional
+        Most operations committed together (default 256).
+    max_delay : float, optional
+        Seconds to wait for more operations once one is queued (default 0.002).
+    timeout : float, optional
+        SQLite busy timeout in seconds for the writer connection (default 30).
+
+    Methods
+    -------
+    submit(func, *args, **kwargs)
+        Queues `func(*args, conn=<writer connection>, **kwargs)`.
+    metrics()
+        Returns queue depth, batch size and commit latency statistics.
+    close()
+        Drains the queue and stops the writer thread.
+    """
+
+    def __init__(self, db_path=None, max_batch=256, max_delay=0.002, timeout=30):
+        self.db_path = db_path or operations.DB_PATH
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stats = {"operations": 0, "failed": 0, "batches": 0, "max_batch": 0,
+                       "commit_seconds": 0.0}
+        self._commit_latencies = deque(maxlen=1024)
+        self._batch_sizes = deque(maxlen=1024)
+        self._thread = threading.Thread(target=self._run, name="sqlite-writer", daemon=True)
+        self._thread.start()
+        metrics.REGISTRY.add_collector(self._metric_samples)
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queues a write operation.
+
+        Parameters
+        ----------
+        func : callable
+            Called as `func(*args, conn=conn, **kwargs)` on the writer thread.
+            It must not commit; the writer commits the whole batch.
+        *args, **kwargs
+            Arguments for `func`.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Resolves to `func`'s return value once the batch has committed, or
+            to the exception it raised.
+        """
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def _collect(self, first):
+        """
+        Gathers a batch starting with `first`, waiting at most `max_delay`.
+        """
+        batch = [first]
+        deadline = time.perf_counter() + self.max_delay
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                # Finish this batch first, then stop.
+                self._queue.put(_STOP)
+                break
+            batch.append(item)
+        return batch
+
+    def _apply(self, conn, batch):
+        """
+        Runs a batch in one transaction and resolves its futures.
+        """
+        results = []
+        started = time.perf_counter()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                conn.execute("SAVEPOINT op")
+                try:
+                    with tracing.span(func.__name__, "write"):
+                        value = func(*args, conn=conn, **kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    results.append((future, None, e))
+                else:
+                    results.append((future, value, None))
+                conn.execute("RELEASE op")
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            # The transaction itself failed (e.g. the lock could not be taken).
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for future, _, _, _ in batch:
+                if future.running():
+                    future.set_exception(e)
+            return
+        latency = time.perf_counter() - started
+
+        failed = 0
+        for future, value, error in results:
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+                failed += 1
+
+        with self._lock:
+            self._stats["operations"] += len(results)
+            self._stats["failed"] += failed
+            self._stats["batches"] += 1
+            self._stats["max_batch"] = max(self._stats["max_batch"], len(batch))
+            self._stats["commit_seconds"] += latency
+            self._commit_latencies.append(latency)
+            self._batch_sizes.append(len(batch))
+
+    def _run(self):
+        conn = instrumentation.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = self._collect(item)
+                with tracing.span("group commit", "db", operations=len(batch)):
+                    self._apply(conn, batch)
+        finally:
+            conn.close()
+
+    def metrics(self):
+        """
+        Returns a snapshot of the writer's statistics.
+
+        Returns
+        -------
+        dict
+            queue_depth, operations, failed, batches, mean/max batch size and
+            mean/p50/p95/max commit latency in milliseconds (the latency figures
+            cover the most recent 1024 batches).
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = sorted(self._commit_latencies)
+            sizes = list(self._batch_sizes)
+
+        def percentile(p):
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 3)
+
+        return {
+            "queue_depth": self._queue.qsize(),
+            "operations": stats["operations"],
+            "failed": stats["failed"],
+            "batches": stats["batches"],
+            "mean_batch_size": round(sum(sizes) / len(sizes), 2) if sizes else 0,
+            "max_batch_size": stats["max_batch"],
+            "mean_commit_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0,
+            "p50_commit_ms": percentile(0.50) if latencies else 0,
+            "p95_commit_ms": percentile(0.95) if latencies else 0,
+            "max_commit_ms": round(latencies[-1] * 1000, 3) if latencies else 0,
+        }
+
+    def _metric_samples(self):
+        # Reported through metrics.REGISTRY while this queue is running
+        if not self._thread.is_alive():
+            return
+        with self._lock:
+            stats = dict(self._stats)
+        labels = {"db": self.db_path}
+        yield ("school_write_queue_depth", "gauge", "Writes waiting for the writer thread.", labels,
+               self._queue.qsize())
+        yield ("school_write_queue_operations_total", "counter", "Writes applied by the writer thread.", labels,
+               stats["operations"])
+        yield ("school_write_queue_failed_total", "counter", "Writes that raised an error.", labels,
+               stats["failed"])
+        yield ("school_write_queue_commits_total", "counter", "Group commits.", labels, stats["batches"])
+        yield ("school_write_queue_commit_seconds_total", "counter", "Time spent in group commits.", labels,
+               stats["commit_seconds"])
+
+    def close(self):
+        """
+        Applies everything already queued, then stops the writer thread.
+        """
+        self._queue.put(_STOP)
+        self._thread.join()
@@ -0,0 +1,1203 @@
+import configparser
+import http.client
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from abc import ABC, abstractmethod
+from itertools import islice
+from urllib.parse import quote, urlencode, urlsplit
+
+try:
+    import psycopg2
+except ImportError:  # Only the PostgreSQL engine needs psycopg2.
+    psycopg2 = None
+
+from pg_stream import DEFAULT_ITERSIZE, stream_batches
+
+# The SQLite engine is built on the PyQt application's modules.
+PYQT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pyqt")
+if PYQT_DIR not in sys.path:
+    sys.path.append(PYQT_DIR)
+
+import instrumentation  # noqa: E402
+import operations  # noqa: E402
+from db.schema import migrate  # noqa: E402
+from db.snapshot import take_snapshot, verify_snapshot  # noqa: E402
+from enrollment import DUPLICATE, ENROLLED, NOT_FOUND, EnrollmentResult  # noqa: E402
+from writer import WriteQueue  # noqa: E402
+
+# Settings file read by `load_config`. Can be overridden with the
+# SCHOOL_CONFIG environment variable.
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "school.ini")
+
+BACKENDS = ("sqlite", "postgres", "http")
+
+# Connection settings used when the config file does not set them.
+POSTGRES_DEFAULTS = {
+    "dbname": "Lab_2_435L_tkinter",
+    "user": "postgres",
+    "password": "doudi123$",
+    "host": "localhost",
+    "port": "5432",
+}
+
+# Address of the API service (api_service.py) used by the "http" backend.
+DEFAULT_SERVICE_URL = "http://127.0.0.1:8765"
+
+# Settings of the API service itself. Its `backend` is the database it
+# serves and must not be "http".
+SERVICE_DEFAULTS = {
+    "backend": "sqlite",
+    "host": "127.0.0.1",
+    "port": "8765",
+    "pool_size": "8",
+    "cache_ttl": "1.0",
+}
+
+# Rows sent per COPY ... FROM STDIN call by the PostgreSQL bulk inserts.
+COPY_BATCH_ROWS = 10000
+
+# Columns `stream_students`/`stream_instructors` can search on.
+SEARCH_FIELDS = ("name", "id", "course")
+
+# Error of `add_course` with a capacity on PostgreSQL, whose schema has no
+# capacity column; the API service answers it with a 400.
+CAPACITY_UNSUPPORTED = "Course capacities are only supported by the SQLite backend; leave capacity empty"
+
+
+def load_config(path=None):
+    """
+    Reads the database settings shared by both applications.
+
+    The settings come from an INI file (`school.ini` next to this module, or the
+    file named by SCHOOL_CONFIG) with a `[database]` section choosing the
+    backend, a `[sqlite]` section with the database `path` and a `[postgres]`
+    section with psycopg2 connection parameters. With the "http" backend the
+    applications talk to the API service at `[http] url` instead; the service's
+    own settings are in `[service]`. The file is optional. The SCHOOL_BACKEND
+    and SCHOOL_DB_PATH environment variables override it.
+
+    Args:
+        path (str, optional): The INI file to read instead of the default.
+
+    Returns:
+        dict: {"backend": str or None, "sqlite": {"path": str},
+        "postgres": dict of connection parameters, "http": {"url": str},
+        "service": dict of SERVICE_DEFAULTS keys}.
+    """
+    parser = configparser.ConfigParser(interpolation=None)
+    parser.read(path or os.environ.get("SCHOOL_CONFIG", DEFAULT_CONFIG_PATH))
+
+    postgres = dict(POSTGRES_DEFAULTS)
+    if parser.has_section("postgres"):
+        postgres.update(parser["postgres"])
+
+    service = dict(SERVICE_DEFAULTS)
+    if parser.has_section("service"):
+        service.update(parser["service"])
+
+    sqlite_path = operations.DB_PATH
+    if parser.has_option("sqlite", "path") and "SCHOOL_DB_PATH" not in os.environ:
+        sqlite_path = parser["sqlite"]["path"]
+
+    return {
+        "backend": os.environ.get("SCHOOL_BACKEND") or parser.get("database", "backend", fallback=None),
+        "sqlite": {"path": sqlite_path},
+        "postgres": postgres,
+        "http": {"url": parser.get("http", "url", fallback=DEFAULT_SERVICE_URL)},
+        "service": service,
+    }
+
+
+def open_repository(backend=None, config=None, default_backend="sqlite"):
+    """
+    Opens the repository for the configured backend.
+
+    Args:
+        backend (str, optional): "sqlite", "postgres" or "http"; overrides the config.
+        config (dict, optional): Settings from `load_config` (read if omitted).
+        default_backend (str): Backend used when neither `backend` nor the
+            config chooses one; each application passes its traditional backend.
+
+    Returns:
+        Repository: An open SQLiteRepository, PostgresRepository or HttpRepository.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    config = config or load_config()
+    backend = backend or config["backend"] or default_backend
+    if backend == "sqlite":
+        return SQLiteRepository(config["sqlite"]["path"])
+    if backend == "postgres":
+        return PostgresRepository(config["postgres"])
+    if backend == "http":
+        return HttpRepository(config["http"]["url"])
+    raise ValueError(f"Unknown backend: {backend} (expected one of {', '.join(BACKENDS)})")
+
+
+def _like_pattern(text, prefix_only=False):
+    """
+    Escapes LIKE wildcards in `text` and wraps it for a contains (or prefix) match.
+    """
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%" if prefix_only else "%" + escaped + "%"
+
+
+class Repository(ABC):
+    """
+    Storage interface used by both GUIs and the command-line tools.
+
+    Every record is addressed by an opaque `key`: the first column of each row
+    the repository returns. Callers pass keys back unchanged; they are integer
+    primary keys on SQLite and the student/instructor/course IDs on PostgreSQL.
+
+    Row layouts:
+        students(), instructors(): (key, id, name, age, email)
+        courses(): (key, course_id, course_name, capacity)
+        stream_students(), stream_instructors(): (key, id, name, age, email, course_name),
+            one row per course (course_name is None for no course)
+        stream_courses(): (key, course_id, course_name)
+        record_page(): (record_type, key, display_id, name)
+
+    Attributes:
+        backend (str): "sqlite", "postgres" or "http".
+        Error (type): Base class of the errors the driver raises, like the
+            DB-API module attribute of the same name.
+    """
+
+    backend = None
+    Error = Exception
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # ----------------- Create -----------------
+
+    @abstractmethod
+    def add_student(self, student_id, name, age, email, course_key=None):
+        """
+        Adds a student, and registers them for a course if one is given.
+
+        Returns:
+            The key of the new student.
+        """
+
+    @abstractmethod
+    def add_instructor(self, instructor_id, name, age, email, course_key=None):
+        """
+        Adds an instructor, and assigns them to a course if one is given.
+
+        Returns:
+            The key of the new instructor.
+        """
+
+    @abstractmethod
+    def add_course(self, course_id, course_name, capacity=None):
+        """
+        Adds a course; a capacity of None means unlimited.
+
+        Returns:
+            The key of the new course.
+
+        Raises:
+            ValueError: If a capacity is given to a backend without capacities
+                (PostgreSQL).
+        """
+
+    @abstractmethod
+    def add_students(self, rows):
+        """
+        Bulk-adds (student_id, name, age, email) rows; returns the number added.
+        """
+
+    @abstractmethod
+    def add_instructors(self, rows):
+        """
+        Bulk-adds (instructor_id, name, age, email) rows; returns the number added.
+        """
+
+    @abstractmethod
+    def add_courses(self, rows):
+        """
+        Bulk-adds (course_id, course_name) rows; returns the number added.
+        """
+
+    @abstractmethod
+    def enroll(self, student_key, course_key):
+        """
+        Registers a student for a course.
+
+        Returns:
+            enrollment.EnrollmentResult: The outcome of the request.
+        """
+
+    @abstractmethod
+    def assign(self, instructor_key, course_key):
+        """
+        Assigns an instructor to a course; repeating an assignment does nothing.
+        """
+
+    def enroll_many(self, pairs):
+        """
+        Registers many (student_key, course_key) pairs.
+
+        Returns:
+            list: One enrollment.EnrollmentResult per pair, in order.
+        """
+        return [self.enroll(student_key, course_key) for student_key, course_key in pairs]
+
+    def assign_many(self, pairs):
+        """
+        Assigns many (instructor_key, course_key) pairs; returns the number of pairs.
+        """
+        pairs = list(pairs)
+        for instructor_key, course_key in pairs:
+            self.assign(instructor_key, course_key)
+        return len(pairs)
+
+    # ----------------- Read -----------------
+
+    @abstractmethod
+    def students(self):
+        """
+        Returns all students as (key, student_id, name, age, email) rows.
+        """
+
+    @abstractmethod
+    def instructors(self):
+        """
+        Returns all instructors as (key, instructor_id, name, age, email) rows.
+        """
+
+    @abstractmethod
+    def courses(self):
+        """
+        Returns all courses as (key, course_id, course_name, capacity) rows.
+        """
+
+    @abstractmethod
+    def stream_students(self, search=None, field="name", batch_size=None):
+        """
+        Streams students with their courses in batches of rows.
+
+        Args:
+            search (str, optional): Only rows whose `field` contains this text,
+                ignoring case.
+            field (str): "name", "id" or "course".
+            batch_size (int, optional): Rows per batch (default DEFAULT_ITERSIZE).
+
+        Yields:
+            list: Up to `batch_size` (key, student_id, name, age, email, course_name) rows.
+        """
+
+    @abstractmethod
+    def stream_instructors(self, search=None, field="name", batch_size=None):
+        """
+        Streams instructors with their courses; see `stream_students`.
+        """
+
+    @abstractmethod
+    def stream_courses(self, search=None, batch_size=None):
+        """
+        Streams (key, course_id, course_name) rows of the courses whose name
+        contains `search`, ignoring case.
+        """
+
+    @abstractmethod
+    def record_page(self, offset=0, limit=100, record_type=None, prefix=None, order_by="name",
+                    descending=False):
+        """
+        Returns one sorted page of students, instructors and courses.
+
+        Args:
+            offset (int): Number of records to skip.
+            limit (int): Maximum number of records to return.
+            record_type (str, optional): "Student", "Instructor" or "Course".
+            prefix (str, optional): Only records whose name or ID starts with
+                this text, ignoring case.
+            order_by (str): "name", "id" or "type".
+            descending (bool): Sort in descending order.
+
+        Returns:
+            list: (record_type, key, display_id, name) rows.
+        """
+
+    @abstractmethod
+    def count_records(self, record_type=None, prefix=None):
+        """
+        Counts the records `record_page` pages through.
+        """
+
+    # ----------------- Update -----------------
+
+    @abstractmethod
+    def update_student(self, key, name, age, email):
+        """
+        Updates a student's name, age and email.
+        """
+
+    @abstractmethod
+    def update_instructor(self, key, name, age, email):
+        """
+        Updates an instructor's name, age and email.
+        """
+
+    @abstractmethod
+    def update_course(self, key, course_name, course_id=None):
+        """
+        Renames a course and, if `course_id` is given, changes its course ID.
+        """
+
+    # ----------------- Delete -----------------
+
+    @abstractmethod
+    def delete_student(self, key):
+        """
+        Deletes a student together with their registrations.
+        """
+
+    @abstractmethod
+    def delete_instructor(self, key):
+        """
+        Deletes an instructor together with their course assignments.
+        """
+
+    @abstractmethod
+    def delete_course(self, key):
+        """
+        Deletes a course together with its registrations and assignments.
+        """
+
+    # ----------------- Administration -----------------
+
+    @abstractmethod
+    def counts(self):
+        """
+        Returns the number of rows in each table.
+
+        Returns:
+            dict: students, instructors, courses, registrations and assignments.
+        """
+
+    @abstractmethod
+    def course_stats(self):
+        """
+        Returns enrollment statistics for every course.
+
+        Returns:
+            list: (key, course_id, course_name, enrollment_count, instructor_count,
+            average_student_age) rows; the average is None for an empty course.
+        """
+
+    @abstractmethod
+    def analyze(self):
+        """
+        Refreshes the query planner's statistics.
+        """
+
+    @abstractmethod
+    def vacuum(self):
+        """
+        Reclaims the space left by deleted rows.
+        """
+
+    @abstractmethod
+    def backup(self, target):
+        """
+        Takes a consistent backup of the whole database while it stays online.
+
+        Args:
+            target (str): Snapshot file (SQLite) or backup directory (PostgreSQL).
+
+        Returns:
+            dict: Statistics of the backup.
+        """
+
+    @abstractmethod
+    def restore(self, source):
+        """
+        Replaces all data with a backup written by `backup`.
+
+        Args:
+            source (str): The snapshot file (SQLite), or a backup directory or
+                its manifest.json (PostgreSQL).
+
+        Returns:
+            dict: Statistics of the restore.
+        """
+
+    def close(self):
+        """
+        Releases the connections held by the repository.
+        """
+
+
+# ----------------- SQLite -----------------
+
+def _add_person(add, enroll_or_assign, person_id, name, age, email, course_key, conn):
+    """
+    Adds a student or instructor and links them to a course in one operation.
+    """
+    key = add(person_id, name, age, email, conn=conn)
+    if course_key is not None:
+        enroll_or_assign(key, course_key, conn=conn)
+    return key
+
+
+def _add_course_rows(rows, conn):
+    """
+    Adds (course_id, course_name) rows with no capacity limit.
+    """
+    return operations.add_courses(((course_id, name, None) for course_id, name in rows), conn=conn)
+
+
+class SQLiteRepository(Repository):
+    """
+    Repository over the PyQt application's SQLite database.
+
+    Reads call the functions of `operations.py` on one shared connection.
+    Writes are submitted to a `WriteQueue`, so concurrent writes share commits;
+    bulk inserts use executemany. The schema is migrated when the repository
+    is opened.
+
+    A repository may be used from any thread, but by one thread at a time;
+    servers keep several of them sharing one `writer` (see api_service.py).
+
+    Args:
+        db_path (str, optional): Database file (default: `operations.DB_PATH`).
+        writer (WriteQueue, optional): Write queue to share with other
+            repositories on the same file. The repository starts (and closes)
+            its own when none is given.
+    """
+
+    backend = "sqlite"
+    Error = sqlite3.Error
+
+    # Search columns of the student and instructor streams.
+    _SEARCH_COLUMNS = {"name": "p.name", "id": "p.{id_column}", "course": "c.course_name"}
+
+    def __init__(self, db_path=None, writer=None):
+        self.db_path = db_path or operations.DB_PATH
+        self._owns_writer = writer is None
+        if self._owns_writer:
+            migrate(self.db_path)
+            writer = WriteQueue(self.db_path)
+        self.writer = writer
+        self._conn = instrumentation.connect(self.db_path, timeout=30, check_same_thread=False)
+
+    def _write(self, func, *args):
+        future = self.writer.submit(func, *args)
+        with instrumentation.db_wait():
+            return future.result()
+
+    def add_student(self, student_id, name, age, email, course_key=None):
+        return self._write(_add_person, operations.add_student, operations.enroll_student,
+                           student_id, name, age, email, course_key)
+
+    def add_instructor(self, instructor_id, name, age, email, course_key=None):
+        return self._write(_add_person, operations.add_instructor, operations.assign_instructor,
+                           instructor_id, name, age, email, course_key)
+
+    def add_course(self, course_id, course_name, capacity=None):
+        return self._write(operations.add_course, course_id, course_name, capacity)
+
+    def add_students(self, rows):
+        return self._write(operations.add_students, rows)
+
+    def add_instructors(self, rows):
+        return self._write(operations.add_instructors, rows)
+
+    def add_courses(self, rows):
+        return self._write(_add_course_rows, rows)
+
+    def enroll(self, student_key, course_key):
+        return self._write(operations.enroll_student, student_key, course_key)
+
+    def assign(self, instructor_key, course_key):
+        self._write(operations.assign_instructor, instructor_key, course_key)
+
+    def enroll_many(self, pairs):
+        # Queued together, so the writer commits them in as few batches as possible
+        futures = [self.writer.submit(operations.enroll_student, student_key, course_key)
+                   for student_key, course_key in pairs]
+        with instrumentation.db_wait():
+            return [future.result() for future in futures]
+
+    def assign_many(self, pairs):
+        futures = [self.writer.submit(operations.assign_instructor, instructor_key, course_key)
+                   for instructor_key, course_key in pairs]
+        with instrumentation.db_wait():
+            for future in futures:
+                future.result()
+        return len(futures)
+
+    def students(self):
+        return operations.get_students(conn=self._conn)
+
+    def instructors(self):
+        return operations.get_instructors(conn=self._conn)
+
+    def courses(self):
+        return operations.get_courses(conn=self._conn)
+
+    def _stream_people(self, table, id_column, join_table, join_column, search, field, batch_size):
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"field must be one of {', '.join(SEARCH_FIELDS)}")
+        query = f'''SELECT p.id, p.{id_column}, p.name, p.age, p.email, c.course_name FROM {table} p
+                    LEFT JOIN {join_table} j ON j.{join_column} = p.id
+                    LEFT JOIN courses c ON c.id = j.course_id'''
+        params = ()
+        if search:
+            column = self._SEARCH_COLUMNS[field].format(id_column=id_column)
+            query += f" WHERE {column} LIKE ? ESCAPE '\\'"
+            params = (_like_pattern(search),)
+        return self._stream(query + " ORDER BY p.id", params, batch_size)
+
+    def _stream(self, query, params, batch_size):
+        cursor = self._conn.execute(query, params)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size or DEFAULT_ITERSIZE)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def stream_students(self, search=None, field="name", batch_size=None):
+        return self._stream_people("students", "student_id", "registrations", "student_id",
+                                   search, field, batch_size)
+
+    def stream_instructors(self, search=None, field="name", batch_size=None):
+        return self._stream_people("instructors", "instructor_id", "instructor_assignments", "instructor_id",
+                                   search, field, batch_size)
+
+    def stream_courses(self, search=None, batch_size=None):
+        query = "SELECT id, course_id, course_name FROM courses"
+        params = ()
+        if search:
+            query += " WHERE course_name LIKE ? ESCAPE '\\'"
+            params = (_like_pattern(search),)
+        return self._stream(query + " ORDER BY id", params, batch_size)
+
+    def record_page(self, offset=0, limit=100, record_type=None, prefix=None, order_by="name",
+                    descending=False):
+        return operations.get_record_page(offset, limit, record_type, prefix, order_by, descending,
+                                          conn=self._conn)
+
+    def count_records(self, record_type=None, prefix=None):
+        return operations.count_records(record_type, prefix, conn=self._conn)
+
+    def update_student(self, key, name, age, email):
+        self._write(operations.update_student, key, name, age, email)
+
+    def update_instructor(self, key, name, age, email):
+        self._write(operations.update_instructor, key, name, age, email)
+
+    def update_course(self, key, course_name, course_id=None):
+        self._write(operations.update_course, key, course_name, course_id)
+
+    def delete_student(self, key):
+        self._write(operations.delete_student, key)
+
+    def delete_instructor(self, key):
+        self._write(operations.delete_instructor, key)
+
+    def delete_course(self, key):
+        self._write(operations.delete_course, key)
+
+    def counts(self):
+        tables = (("students", "students"), ("instructors", "instructors"), ("courses", "courses"),
+                  ("registrations", "registrations"), ("assignments", "instructor_assignments"))
+        return {name: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for name, table in tables}
+
+    def course_stats(self):
+        return operations.get_course_stats(conn=self._conn)
+
+    def _maintenance(self, statement):
+        # Own autocommit connection: VACUUM cannot run inside a transaction.
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        try:
+            conn.execute(statement)
+        finally:
+            conn.close()
+
+    def analyze(self):
+        self._maintenance("ANALYZE")
+
+    def vacuum(self):
+        self._maintenance("VACUUM")
+
+    def backup(self, target):
+        return take_snapshot(self.db_path, target)
+
+    def restore(self, source):
+        if not verify_snapshot(source):
+            raise sqlite3.DatabaseError(f"{source} failed the integrity check")
+        started = time.perf_counter()
+        snapshot = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+        target = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            # The online backup API replaces every page of the database under one lock
+            snapshot.backup(target)
+        finally:
+            target.close()
+            snapshot.close()
+        # Bring snapshots taken before a schema change up to date
+        migrate(self.db_path)
+        return {"source": source, "seconds": round(time.perf_counter() - started, 3)}
+
+    def close(self):
+        if self._owns_writer:
+            self.writer.close()
+        self._conn.close()
+
+
+# ----------------- PostgreSQL -----------------
+
+def _copy_field(value):
+    """
+    Formats one value for COPY's text format.
+    """
+    if value is None:
+        return "\\N"
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class PostgresRepository(Repository):
+    """
+    Repository over the Tkinter application's PostgreSQL database.
+
+    Keeps one connection open. Inserts return their keys with RETURNING, bulk
+    inserts stream the rows with COPY ... FROM STDIN, and the streaming reads
+    use server-side cursors (see `pg_stream.py`). Deleting or re-keying rows
+    relies on the cascading foreign keys of `db/schema.sql`.
+
+    Args:
+        conn_params (dict): psycopg2 connection parameters.
+
+    Raises:
+        RuntimeError: If psycopg2 is not installed.
+    """
+
+    backend = "postgres"
+    Error = psycopg2.Error if psycopg2 else Exception
+
+    # (table, id column, join table) of the student and instructor streams.
+    _PEOPLE = {
+        "students": ("students", "student_id", "registrations"),
+        "instructors": ("instructors", "instructor_id", "instructor_courses"),
+    }
+    _SEARCH_COLUMNS = {"name": "p.name", "id": "p.{id_column}", "course": "c.course_name"}
+
+    # The three record types as one relation with record_index's columns.
+    _RECORDS = '''(
+        SELECT 'Student' AS record_type, student_id AS record_id, student_id AS display_id, name FROM students
+        UNION ALL
+        SELECT 'Instructor', instructor_id, instructor_id, name FROM instructors
+        UNION ALL
+        SELECT 'Course', course_id, course_id, course_name FROM courses
+    ) AS record_index'''
+
+    def __init__(self, conn_params):
+        if psycopg2 is None:
+            raise RuntimeError("The PostgreSQL backend requires psycopg2 (pip install psycopg2)")
+        self.conn_params = dict(conn_params)
+        self.conn = psycopg2.connect(**self.conn_params, connection_factory=instrumentation.PgConnection)
+
+    def _execute(self, query, params=None, fetch=False):
+        """
+        Runs one write statement in its own transaction.
+        """
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(query, params)
+                result = cur.fetchone() if fetch else None
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return result
+
+    def _read(self, query, params=None):
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(query, params)
+                return cur.fetchall()
+        finally:
+            self.conn.rollback()  # Read-only; end the transaction
+
+    def _add_person(self, table, id_column, join_table, person_id, name, age, email, course_key):
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(f"INSERT INTO {table} ({id_column}, name, age, email) "
+                            f"VALUES (%s, %s, %s, %s) RETURNING {id_column};",
+                            (str(person_id), name, age, email))
+                key = cur.fetchone()[0]
+                if course_key is not None:
+                    cur.execute(f"INSERT INTO {join_table} ({id_column}, course_id) VALUES (%s, %s);",
+                                (key, str(course_key)))
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return key
+
+    def add_student(self, student_id, name, age, email, course_key=None):
+        return self._add_person("students", "student_id", "registrations",
+                                student_id, name, age, email, course_key)
+
+    def add_instructor(self, instructor_id, name, age, email, course_key=None):
+        return self._add_person("instructors", "instructor_id", "instructor_courses",
+                                instructor_id, name, age, email, course_key)
+
+    def add_course(self, course_id, course_name, capacity=None):
+        if capacity is not None:
+            raise ValueError(CAPACITY_UNSUPPORTED)
+        return self._execute("INSERT INTO courses (course_id, course_name) VALUES (%s, %s) RETURNING course_id;",
+                             (str(course_id), course_name), fetch=True)[0]
+
+    def _copy(self, table, columns, rows):
+        """
+        Streams rows into a table with COPY ... FROM STDIN, COPY_BATCH_ROWS at a time.
+        """
+        statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+        rows = iter(rows)
+        total = 0
+        try:
+            with self.conn.cursor() as cur:
+                while True:
+                    batch = list(islice(rows, COPY_BATCH_ROWS))
+                    if not batch:
+                        break
+                    data = "".join("\t".join(map(_copy_field, row)) + "\n" for row in batch)
+                    cur.copy_expert(statement, io.StringIO(data))
+                    total += len(batch)
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return total
+
+    def add_students(self, rows):
+        return self._copy("students", ("student_id", "name", "age", "email"), rows)
+
+    def add_instructors(self, rows):
+        return self._copy("instructors", ("instructor_id", "name", "age", "email"), rows)
+
+    def add_courses(self, rows):
+        return self._copy("courses", ("course_id", "course_name"), rows)
+
+    def enroll(self, student_key, course_key):
+        student_key, course_key = str(student_key), str(course_key)
+        try:
+            with self.conn.cursor() as cur:
+                # Repeats hit the unique (student_id, course_id) index of
+                # db/migrations/004_unique_registrations.sql and insert nothing.
+                cur.execute('''
+                    INSERT INTO registrations (student_id, course_id)
+                    SELECT s.student_id, c.course_id FROM students s, courses c
+                    WHERE s.student_id = %s AND c.course_id = %s
+                    ON CONFLICT (student_id, course_id) DO NOTHING
+                    RETURNING registration_id;
+                ''', (student_key, course_key))
+                if cur.fetchone():
+                    status = ENROLLED
+                else:
+                    cur.execute('''
+                        SELECT EXISTS (SELECT 1 FROM students WHERE student_id = %s)
+                           AND EXISTS (SELECT 1 FROM courses WHERE course_id = %s);
+                    ''', (student_key, course_key))
+                    status = DUPLICATE if cur.fetchone()[0] else NOT_FOUND
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        return EnrollmentResult(status, student_key, course_key, None)
+
+    def assign(self, instructor_key, course_key):
+        self._execute("INSERT INTO instructor_courses (instructor_id, course_id) VALUES (%s, %s) "
+                      "ON CONFLICT DO NOTHING;", (str(instructor_key), str(course_key)))
+
+    def students(self):
+        return self._read("SELECT student_id, student_id, name, age, email FROM students ORDER BY student_id;")
+
+    def instructors(self):
+        return self._read("SELECT instructor_id, instructor_id, name, age, email FROM instructors "
+                          "ORDER BY instructor_id;")
+
+    def courses(self):
+        return self._read("SELECT course_id, course_id, course_name, NULL FROM courses ORDER BY course_id;")
+
+    def _stream(self, query, params, batch_size):
+        try:
+            yield from stream_batches(self.conn, query, params, batch_size)
+        finally:
+            self.conn.rollback()  # Read-only; end the transaction
+
+    def _stream_people(self, kind, search, field, batch_size):
+        if field not in SEARCH_FIELDS:
+            raise ValueError(f"field must be one of {', '.join(SEARCH_FIELDS)}")
+        table, id_column, join_table = self._PEOPLE[kind]
+        query = f'''SELECT p.{id_column}, p.{id_column}, p.name, p.age, p.email, c.course_name FROM {table} p
+                    LEFT JOIN {join_table} j ON j.{id_column} = p.{id_column}
+                    LEFT JOIN courses c ON c.course_id = j.course_id'''
+        params = None
+        if search:
+            query += f" WHERE {self._SEARCH_COLUMNS[field].format(id_column=id_column)} ILIKE %s"
+            params = (_like_pattern(search),)
+        return self._stream(query + f" ORDER BY p.{id_column};", params, batch_size)
+
+    def stream_students(self, search=None, field="name", batch_size=None):
+        return self._stream_people("students", search, field, batch_size)
+
+    def stream_instructors(self, search=None, field="name", batch_size=None):
+        return self._stream_people("instructors", search, field, batch_size)
+
+    def stream_courses(self, search=None, batch_size=None):
+        query = "SELECT course_id, course_id, course_name FROM courses"
+        params = None
+        if search:
+            query += " WHERE course_name ILIKE %s"
+            params = (_like_pattern(search),)
+        return self._stream(query + " ORDER BY course_id;", params, batch_size)
+
+    def _record_filter(self, record_type, prefix):
+        conditions = []
+        params = []
+        if record_type:
+            conditions.append("record_type = %s")
+            params.append(record_type)
+        if prefix:
+            conditions.append("(name ILIKE %s OR display_id ILIKE %s)")
+            params.extend([_like_pattern(prefix, prefix_only=True)] * 2)
+        return (" WHERE " + " AND ".join(conditions) if conditions else ""), params
+
+    def record_page(self, offset=0, limit=100, record_type=None, prefix=None, order_by="name",
+                    descending=False):
+        if order_by not in operations.RECORD_ORDERS:
+            raise ValueError(f"order_by must be one of {', '.join(operations.RECORD_ORDERS)}")
+        direction = " DESC" if descending else ""
+        order = ", ".join(f"{column}{direction}" for column in operations.RECORD_ORDERS[order_by])
+        where, params = self._record_filter(record_type, prefix)
+        return self._read(f"SELECT record_type, record_id, display_id, name FROM {self._RECORDS}{where} "
+                          f"ORDER BY {order} LIMIT %s OFFSET %s;", params + [limit, offset])
+
+    def count_records(self, record_type=None, prefix=None):
+        where, params = self._record_filter(record_type, prefix)
+        return self._read(f"SELECT COUNT(*) FROM {self._RECORDS}{where};", params)[0][0]
+
+    def update_student(self, key, name, age, email):
+        self._execute("UPDATE students SET name = %s, age = %s, email = %s WHERE student_id = %s;",
+                      (name, age, email, str(key)))
+
+    def update_instructor(self, key, name, age, email):
+        self._execute("UPDATE instructors SET name = %s, age = %s, email = %s WHERE instructor_id = %s;",
+                      (name, age, email, str(key)))
+
+    def update_course(self, key, course_name, course_id=None):
+        # ON UPDATE CASCADE carries a changed course ID into the join tables
+        self._execute("UPDATE courses SET course_id = COALESCE(%s, course_id), course_name = %s "
+                      "WHERE course_id = %s;", (course_id and str(course_id), course_name, str(key)))
+
+    def delete_student(self, key):
+        self._execute("DELETE FROM students WHERE student_id = %s;", (str(key),))
+
+    def delete_instructor(self, key):
+        self._execute("DELETE FROM instructors WHERE instructor_id = %s;", (str(key),))
+
+    def delete_course(self, key):
+        self._execute("DELETE FROM courses WHERE course_id = %s;", (str(key),))
+
+    def counts(self):
+        row = self._read('''
+            SELECT (SELECT COUNT(*) FROM students), (SELECT COUNT(*) FROM instructors),
+                   (SELECT COUNT(*) FROM courses), (SELECT COUNT(*) FROM registrations),
+                   (SELECT COUNT(*) FROM instructor_courses);
+        ''')[0]
+        return dict(zip(("students", "instructors", "courses", "registrations", "assignments"), row))
+
+    def course_stats(self):
+        return self._read('''
+            SELECT c.course_id, c.course_id, c.course_name,
+                   (SELECT COUNT(*) FROM registrations r WHERE r.course_id = c.course_id),
+                   (SELECT COUNT(*) FROM instructor_courses ic WHERE ic.course_id = c.course_id),
+                   (SELECT AVG(s.age)::float FROM registrations r
+                    JOIN students s ON s.student_id = r.student_id WHERE r.course_id = c.course_id)
+            FROM courses c ORDER BY c.course_id;
+        ''')
+
+    def _maintenance(self, statement):
+        # VACUUM cannot run inside a transaction block
+        self.conn.autocommit = True
+        try:
+            with self.conn.cursor() as cur:
+                cur.execute(statement)
+        finally:
+            self.conn.autocommit = False
+
+    def analyze(self):
+        self._maintenance("ANALYZE;")
+
+    def vacuum(self):
+        self._maintenance("VACUUM;")
+
+    def backup(self, target):
+        # pg_backup is only needed here; it pulls in psycopg2's pool and sql modules
+        from pg_backup import snapshot_backup
+        return snapshot_backup(self.conn_params, target, compression="gzip")
+
+    def restore(self, source):
+        from pg_backup import restore_backup
+        return restore_backup(self.conn, source)
+
+    def close(self):
+        self.conn.close()
+
+
+# ----------------- HTTP -----------------
+
+class ServiceError(Exception):
+    """
+    Raised by HttpRepository when the API service rejects a request or cannot
+    be reached.
+
+    Attributes:
+        status (int or None): The HTTP status, or None if there was no response.
+        kind (str or None): Class name of the error raised in the service, e.g.
+            "IntegrityError".
+    """
+
+    def __init__(self, message, status=None, kind=None):
+        super().__init__(message)
+        self.status = status
+        self.kind = kind
+
+
+class HttpRepository(Repository):
+    """
+    Repository served by the API service (api_service.py) over HTTP/JSON.
+
+    Lets several workstations share one database through the service's
+    connection pool, write queue and cache instead of opening the database
+    themselves. Requests reuse one keep-alive connection; the streaming reads
+    open their own, so other calls can be made while a stream is consumed.
+    Keys are whatever the service's database uses. VACUUM and ANALYZE run on
+    the service; backups and restores are not exposed over HTTP (they read
+    and write files on the server), so run school_cli.py on the server for
+    those.
+
+    Args:
+        url (str): Base URL of the service, e.g. "http://10.0.0.5:8765".
+        timeout (float): Socket timeout in seconds.
+    """
+
+    backend = "http"
+    Error = ServiceError
+
+    def __init__(self, url=DEFAULT_SERVICE_URL, timeout=30):
+        parts = urlsplit(url)
+        if parts.scheme != "http" or not parts.hostname:
+            raise ValueError(f"Expected an http:// URL for the API service, got {url!r}")
+        self.url = url
+        self.timeout = timeout
+        self._address = (parts.hostname, parts.port or 80)
+        self._prefix = parts.path.rstrip("/")
+        self._conn = None
+
+    def _connect(self):
+        return http.client.HTTPConnection(*self._address, timeout=self.timeout)
+
+    def _send(self, conn, method, path, body=None, query=None):
+        """
+        Sends one request and returns the response, raising ServiceError for
+        error statuses.
+        """
+        url = self._prefix + path
+        if query:
+            url += "?" + urlencode({name: value for name, value in query.items() if value is not None})
+        headers = {"Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+        conn.request(method, url, payload, headers)
+        response = conn.getresponse()
+        if response.status >= 400:
+            data = response.read()
+            try:
+                error = json.loads(data)
+            except ValueError:
+                error = {"error": data.decode("utf-8", "replace") or response.reason}
+            raise ServiceError(error.get("error"), response.status, error.get("type"))
+        return response
+
+    def _request(self, method, path, body=None, query=None):
+        """
+        Sends a request on the keep-alive connection and returns the decoded JSON.
+        """
+        for attempt in (1, 2):
+            if self._conn is None:
+                self._conn = self._connect()
+            try:
+                with instrumentation.db_wait():
+                    response = self._send(self._conn, method, path, body, query)
+                    return json.loads(response.read() or b"null")
+            except ServiceError:
+                raise
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                # The service closed an idle keep-alive connection; try once on a new one
+                self._conn.close()
+                self._conn = None
+                if attempt == 2:
+                    raise ServiceError(f"Lost the connection to {self.url}: {e}")
+            except (OSError, http.client.HTTPException) as e:
+                self._conn.close()
+                self._conn = None
+                raise ServiceError(f"Cannot reach the API service at {self.url}: {e}")
+
+    def _stream(self, kind, query):
+        conn = self._connect()
+        try:
+            try:
+                response = self._send(conn, "GET", f"/{kind}/stream", query=query)
+                # One JSON array of rows per line
+                for line in response:
+                    if line.strip():
+                        yield json.loads(line)
+            except (OSError, http.client.HTTPException) as e:
+                raise ServiceError(f"Stream from {self.url} failed: {e}")
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _path(kind, key):
+        return f"/{kind}/{quote(str(key), safe='')}"
+
+    def add_student(self, student_id, name, age, email, course_key=None):
+        return self._request("POST", "/students", {"student_id": student_id, "name": name, "age": age,
+                                                   "email": email, "course_key": course_key})["key"]
+
+    def add_instructor(self, instructor_id, name, age, email, course_key=None):
+        return self._request("POST", "/instructors", {"instructor_id": instructor_id, "name": name, "age": age,
+                                                      "email": email, "course_key": course_key})["key"]
+
+    def add_course(self, course_id, course_name, capacity=None):
+        return self._request("POST", "/courses", {"course_id": course_id, "course_name": course_name,
+                                                  "capacity": capacity})["key"]
+
+    def _add_rows(self, kind, rows):
+        total = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, COPY_BATCH_ROWS))
+            if not batch:
+                return total
+            total += self._request("POST", f"/{kind}/batch", {"rows": batch})["added"]
+
+    def add_students(self, rows):
+        return self._add_rows("students", rows)
+
+    def add_instructors(self, rows):
+        return self._add_rows("instructors", rows)
+
+    def add_courses(self, rows):
+        return self._add_rows("courses", rows)
+
+    def enroll(self, student_key, course_key):
+        result = self._request("POST", "/enrollments", {"student_key": student_key, "course_key": course_key})
+        return EnrollmentResult(**result)
+
+    def assign(self, instructor_key, course_key):
+        self._request("POST", "/assignments", {"instructor_key": instructor_key, "course_key": course_key})
+
+    def enroll_many(self, pairs):
+        results = self._request("POST", "/enrollments/batch", {"pairs": list(pairs)})["results"]
+        return [EnrollmentResult(**result) for result in results]
+
+    def assign_many(self, pairs):
+        return self._request("POST", "/assignments/batch", {"pairs": list(pairs)})["assigned"]
+
+    def students(self):
+        return self._request("GET", "/students")["rows"]
+
+    def instructors(self):
+        return self._request("GET", "/instructors")["rows"]
+
+    def courses(self):
+        return self._request("GET", "/courses")["rows"]
+
+    def stream_students(self, search=None, field="name", batch_size=None):
+        return self._stream("students", {"search": search, "field": field, "batch_size": batch_size})
+
+    def stream_instructors(self, search=None, field="name", batch_size=None):
+        return self._stream("instructors", {"search": search, "field": field, "batch_size": batch_size})
+
+    def stream_courses(self, search=None, batch_size=None):
+        return self._stream("courses", {"search": search, "batch_size": batch_size})
+
+    def record_page(self, offset=0, limit=100, record_type=None, prefix=None, order_by="name",
+                    descending=False):
+        return self._request("GET", "/records", query={
+            "offset": offset, "limit": limit, "record_type": record_type, "prefix": prefix,
+            "order_by": order_by, "descending": int(bool(descending)),
+        })["rows"]
+
+    def count_records(self, record_type=None, prefix=None):
+        return self._request("GET", "/records/count", query={"record_type": record_type, "prefix": prefix})["count"]
+
+    def update_student(self, key, name, age, email):
+        self._request("PUT", self._path("students", key), {"name": name, "age": age, "email": email})
+
+    def update_instructor(self, key, name, age, email):
+        self._request("PUT", self._path("instructors", key), {"name": name, "age": age, "email": email})
+
+    def update_course(self, key, course_name, course_id=None):
+        self._request("PUT", self._path("courses", key), {"course_name": course_name, "course_id": course_id})
+
+    def delete_student(self, key):
+        self._request("DELETE", self._path("students", key))
+
+    def delete_instructor(self, key):
+        self._request("DELETE", self._path("instructors", key))
+
+    def delete_course(self, key):
+        self._request("DELETE", self._path("courses", key))
+
+    def counts(self):
+        return self._request("GET", "/stats")["counts"]
+
+    def course_stats(self):
+        return self._request("GET", "/stats/courses")["rows"]
+
+    def analyze(self):
+        self._request("POST", "/maintenance/analyze")
+
+    def vacuum(self):
+        self._request("POST", "/maintenance/vacuum")
+
+    def backup(self, target):
+        raise ServiceError("Backups are not served over HTTP; run school_cli.py backup on the API server")
+
+    def restore(self, source):
+        raise ServiceError("Restores are not served over HTTP; run school_cli.py restore on the API server")
+
+    def metrics(self):
+        """
+        Returns the service's latency, pool, cache and writer metrics.
+        """
+        return self._request("GET", "/metrics")
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
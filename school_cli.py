@@ -0,0 +1,435 @@
+"""
+Command-line administration for the school database.
+
+Runs the bulk jobs that otherwise need one of the GUIs (importing rosters,
+exporting, backups, maintenance) against the backend configured in school.ini
+(see repository.load_config). No GUI toolkit is imported, so the tool can be
+scripted and scheduled.
+
+Usage:
+    python school_cli.py import students roster.csv --rejects rejected.csv
+    python school_cli.py export students -o students.csv
+    python school_cli.py backup /backups/school-2024-01-31.db
+    python school_cli.py restore /backups/school-2024-01-31.db --yes
+    python school_cli.py vacuum
+    python school_cli.py analyze
+    python school_cli.py stats --courses
+    python school_cli.py benchmark --rows 200000
+    python school_cli.py --backend postgres stats
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from itertools import islice
+
+# instrumentation is shared with the PyQt application.
+PYQT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pyqt")
+if PYQT_DIR not in sys.path:
+    sys.path.append(PYQT_DIR)
+
+import repository  # noqa: E402
+import instrumentation  # noqa: E402
+
+# Columns expected in the header of an import file, by record kind.
+IMPORT_COLUMNS = {
+    "students": ("student_id", "name", "age", "email"),
+    "instructors": ("instructor_id", "name", "age", "email"),
+    "courses": ("course_id", "course_name"),
+}
+
+# Header of an export file, by record kind.
+EXPORT_COLUMNS = {
+    "students": ("student_id", "name", "age", "email", "course_name"),
+    "instructors": ("instructor_id", "name", "age", "email", "course_name"),
+    "courses": ("course_id", "course_name"),
+}
+
+# Rows validated and inserted per transaction by `import`.
+DEFAULT_BATCH_SIZE = 10000
+
+
+class Progress:
+    """
+    Reports the progress of a streaming job on stderr.
+
+    On a terminal the line is redrawn in place at most every `interval`
+    seconds; otherwise (e.g. under cron) a line is written every
+    `log_interval` seconds so logs stay short.
+
+    Args:
+        label (str): What is being counted, e.g. "imported".
+        quiet (bool): Report nothing.
+        interval (float): Seconds between terminal updates.
+        log_interval (float): Seconds between lines when not on a terminal.
+    """
+
+    def __init__(self, label, quiet=False, interval=0.2, log_interval=10.0):
+        self.label = label
+        self.quiet = quiet
+        self.tty = sys.stderr.isatty()
+        self.interval = interval if self.tty else log_interval
+        self.count = 0
+        self.started = time.perf_counter()
+        self._last = self.started
+
+    def _line(self):
+        seconds = time.perf_counter() - self.started
+        rate = self.count / seconds if seconds else 0
+        return f"{self.label}: {self.count:,} rows in {seconds:.1f} s ({rate:,.0f} rows/s)"
+
+    def update(self, rows):
+        """
+        Adds `rows` to the count and reports it if enough time has passed.
+        """
+        self.count += rows
+        now = time.perf_counter()
+        if self.quiet or now - self._last < self.interval:
+            return
+        self._last = now
+        if self.tty:
+            sys.stderr.write("\r" + self._line())
+        else:
+            sys.stderr.write(self._line() + "\n")
+        sys.stderr.flush()
+
+    def finish(self):
+        """
+        Reports the final count.
+
+        Returns:
+            float: Seconds since the job started.
+        """
+        if not self.quiet:
+            sys.stderr.write(("\r" if self.tty else "") + self._line() + "\n")
+            sys.stderr.flush()
+        return time.perf_counter() - self.started
+
+
+def open_text(path, mode):
+    """
+    Opens a CSV file, or stdin/stdout for "-".
+    """
+    if path == "-":
+        return open(sys.stdin.fileno() if "r" in mode else sys.stdout.fileno(), mode,
+                    newline="", encoding="utf-8", closefd=False)
+    return open(path, mode, newline="", encoding="utf-8")
+
+
+def read_batches(reader, kind, batch_size):
+    """
+    Yields lists of at most `batch_size` rows, reordered to IMPORT_COLUMNS[kind].
+
+    Raises:
+        ValueError: If the header lacks a required column.
+    """
+    header = [name.strip().lower() for name in next(reader, [])]
+    missing = [column for column in IMPORT_COLUMNS[kind] if column not in header]
+    if missing:
+        raise ValueError(f"Missing column(s) in the header: {', '.join(missing)}")
+    positions = [header.index(column) for column in IMPORT_COLUMNS[kind]]
+    width = max(positions) + 1
+    while True:
+        # Short rows keep the cells they have, so they are rejected as typed
+        batch = [[row[i] for i in positions] if len(row) >= width
+                 else [row[i] if i < len(row) else None for i in positions]
+                 for row in islice(reader, batch_size)]
+        if not batch:
+            return
+        yield batch
+
+
+def check_people(batch):
+    """
+    Validates a batch of (id, name, age, email) rows with the shared rules.
+
+    Returns:
+        tuple: (valid rows ready to insert, [(row, errors)] for the invalid ones).
+    """
+    # Imported lazily: NumPy (if installed) is only worth loading for imports
+    import validation
+
+    ids, names, ages, emails = zip(*batch)
+    result = validation.validate_batch(ages=ages, emails=emails, ids=ids, names=names)
+    rejected_rows = set(result.error_rows())
+    valid = [(person_id.strip(), name.strip(), int(age), email.strip())
+             for row, (person_id, name, email, age) in enumerate(zip(ids, names, emails, result.ages))
+             if row not in rejected_rows]
+    rejected = [(batch[row], result.errors(row)) for row in sorted(rejected_rows)]
+    return valid, rejected
+
+
+def check_courses(batch):
+    """
+    Checks that every course row has an ID and a name.
+
+    Returns:
+        tuple: (valid rows ready to insert, [(row, errors)] for the invalid ones).
+    """
+    valid, rejected = [], []
+    for row in batch:
+        course_id, course_name = ((value or "").strip() for value in row)
+        if course_id and course_name:
+            valid.append((course_id, course_name))
+        else:
+            rejected.append((row, {"course": "Course ID and Course Name are required."}))
+    return valid, rejected
+
+
+# ----------------- Commands -----------------
+
+def cmd_import(repo, args):
+    """
+    Streams a CSV file into the database, one validated batch per transaction.
+
+    Rows that fail validation are skipped and, with --rejects, written to a CSV
+    file together with the reasons.
+    """
+    add = {"students": repo.add_students, "instructors": repo.add_instructors,
+           "courses": repo.add_courses}[args.kind]
+    check = check_courses if args.kind == "courses" else check_people
+    progress = Progress("imported", args.quiet)
+    imported = rejected_count = 0
+
+    rejects_file = open_text(args.rejects, "w") if args.rejects else None
+    try:
+        rejects = csv.writer(rejects_file) if rejects_file else None
+        if rejects:
+            rejects.writerow(IMPORT_COLUMNS[args.kind] + ("errors",))
+        with open_text(args.file, "r") as source:
+            for batch in read_batches(csv.reader(source), args.kind, args.batch_size):
+                valid, rejected = check(batch)
+                if valid:
+                    imported += add(valid)
+                rejected_count += len(rejected)
+                if rejects:
+                    rejects.writerows(list(row) + ["; ".join(errors.values())] for row, errors in rejected)
+                progress.update(len(batch))
+    finally:
+        if rejects_file:
+            rejects_file.close()
+
+    seconds = progress.finish()
+    return {"imported": imported, "rejected": rejected_count, "seconds": round(seconds, 3)}
+
+
+def cmd_export(repo, args):
+    """
+    Streams students, instructors or courses to a CSV file (stdout by default).
+    """
+    stream = {"students": repo.stream_students, "instructors": repo.stream_instructors,
+              "courses": repo.stream_courses}[args.kind]
+    progress = Progress("exported", args.quiet)
+    with open_text(args.output, "w") as target:
+        writer = csv.writer(target)
+        writer.writerow(EXPORT_COLUMNS[args.kind])
+        for batch in stream(batch_size=args.batch_size):
+            writer.writerows(row[1:] for row in batch)
+            progress.update(len(batch))
+    seconds = progress.finish()
+    return {"exported": progress.count, "seconds": round(seconds, 3)}
+
+
+def cmd_backup(repo, args):
+    """
+    Takes an online backup of the database.
+    """
+    return repo.backup(args.target)
+
+
+def cmd_restore(repo, args):
+    """
+    Replaces all data with a backup, after confirmation (or --yes).
+    """
+    if not args.yes:
+        if not sys.stdin.isatty():
+            raise SystemExit("restore replaces all data; pass --yes to run it non-interactively")
+        answer = input(f"Replace all data in the {repo.backend} database with {args.source}? [y/N] ")
+        if answer.strip().lower() not in ("y", "yes"):
+            raise SystemExit("Restore cancelled")
+    return repo.restore(args.source)
+
+
+def _timed(func):
+    started = time.perf_counter()
+    func()
+    return {"seconds": round(time.perf_counter() - started, 3)}
+
+
+def cmd_vacuum(repo, args):
+    """
+    Reclaims the space of deleted rows (and refreshes statistics with --analyze).
+    """
+    report = {"vacuum": _timed(repo.vacuum)}
+    if args.analyze:
+        report["analyze"] = _timed(repo.analyze)
+    return report
+
+
+def cmd_analyze(repo, args):
+    """
+    Refreshes the query planner's statistics.
+    """
+    return {"analyze": _timed(repo.analyze)}
+
+
+def cmd_stats(repo, args):
+    """
+    Reports table sizes and, with --courses, per-course enrollment figures.
+    """
+    report = {"backend": repo.backend, "counts": repo.counts()}
+    if args.courses:
+        report["courses"] = [
+            {"course_id": course_id, "course_name": name, "enrolled": enrolled,
+             "instructors": instructors, "average_age": None if age is None else round(age, 1)}
+            for _, course_id, name, enrolled, instructors, age in repo.course_stats()
+        ]
+    return report
+
+
+def cmd_benchmark(repo, args):
+    """
+    Times the main data paths.
+
+    Bulk inserts run on a scratch SQLite database, so the configured database
+    is never written to; the read paths (streaming, paging, counting) are then
+    timed on the scratch database and, with --live, on the configured backend.
+    """
+    report = {}
+    with tempfile.TemporaryDirectory() as scratch_dir:
+        with repository.SQLiteRepository(os.path.join(scratch_dir, "benchmark.db")) as scratch:
+            started = time.perf_counter()
+            rows = ((f"B{i}", f"Student {i}", 18 + i % 40, f"b{i}@school.edu") for i in range(args.rows))
+            while True:
+                batch = list(islice(rows, args.batch_size))
+                if not batch:
+                    break
+                scratch.add_students(batch)
+            seconds = time.perf_counter() - started
+            report["scratch_sqlite"] = {"insert_rows_per_sec": round(args.rows / seconds) if seconds else None}
+            report["scratch_sqlite"].update(_time_reads(scratch, args.batch_size))
+    if args.live:
+        report[f"live_{repo.backend}"] = _time_reads(repo, args.batch_size)
+    return report
+
+
+def _time_reads(repo, batch_size):
+    """
+    Times a full streamed scan, the first and last record pages and a count.
+    """
+    timings = {}
+    started = time.perf_counter()
+    scanned = sum(len(batch) for batch in repo.stream_students(batch_size=batch_size))
+    seconds = time.perf_counter() - started
+    timings["stream_rows_per_sec"] = round(scanned / seconds) if seconds else None
+
+    started = time.perf_counter()
+    total = repo.count_records()
+    timings["count_ms"] = round((time.perf_counter() - started) * 1000, 3)
+
+    for name, offset in (("first_page_ms", 0), ("last_page_ms", max(total - 100, 0))):
+        started = time.perf_counter()
+        repo.record_page(offset, 100)
+        timings[name] = round((time.perf_counter() - started) * 1000, 3)
+    return timings
+
+
+def build_parser():
+    """
+    Builds the argument parser with one subcommand per administrative job.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=repository.BACKENDS, help="override the configured backend")
+    parser.add_argument("--config", help="settings file (default: school.ini or $SCHOOL_CONFIG)")
+    parser.add_argument("--db", help="SQLite database file (overrides the configured path)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no progress output")
+    parser.add_argument("--instrument", action="store_true",
+                        help="time every statement and print the slowest ones on stderr at the end")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("import", help="bulk-load records from a CSV file")
+    command.add_argument("kind", choices=IMPORT_COLUMNS)
+    command.add_argument("file", help="CSV file with a header row, or - for stdin")
+    command.add_argument("--rejects", help="write rows that fail validation to this CSV file")
+    command.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    command.set_defaults(func=cmd_import)
+
+    command = commands.add_parser("export", help="stream records to a CSV file")
+    command.add_argument("kind", choices=EXPORT_COLUMNS)
+    command.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    command.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows fetched at a time")
+    command.set_defaults(func=cmd_export)
+
+    command = commands.add_parser("backup", help="take an online backup")
+    command.add_argument("target", help="snapshot file (SQLite) or backup directory (PostgreSQL)")
+    command.set_defaults(func=cmd_backup)
+
+    command = commands.add_parser("restore", help="replace all data with a backup")
+    command.add_argument("source", help="snapshot file (SQLite) or backup directory (PostgreSQL)")
+    command.add_argument("--yes", action="store_true", help="do not ask for confirmation")
+    command.set_defaults(func=cmd_restore)
+
+    command = commands.add_parser("vacuum", help="reclaim the space of deleted rows")
+    command.add_argument("--analyze", action="store_true", help="also refresh planner statistics")
+    command.set_defaults(func=cmd_vacuum)
+
+    command = commands.add_parser("analyze", help="refresh planner statistics")
+    command.set_defaults(func=cmd_analyze)
+
+    command = commands.add_parser("stats", help="show table sizes and course statistics")
+    command.add_argument("--courses", action="store_true", help="include per-course figures")
+    command.set_defaults(func=cmd_stats)
+
+    command = commands.add_parser("benchmark", help="time bulk inserts and reads")
+    command.add_argument("--rows", type=int, default=100000, help="students inserted into the scratch database")
+    command.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per transaction")
+    command.add_argument("--live", action="store_true", help="also time reads on the configured database")
+    command.set_defaults(func=cmd_benchmark)
+    return parser
+
+
+def main(argv=None):
+    """
+    Runs one command and prints its report as JSON on stdout.
+
+    Args:
+        argv (list, optional): Arguments (default: sys.argv[1:]).
+
+    Returns:
+        int: The exit status.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.instrument:
+        instrumentation.enable()
+    config = repository.load_config(args.config)
+    if args.db:
+        config["sqlite"]["path"] = args.db
+    if args.command in ("backup", "restore") and (args.backend or config["backend"]) == "http":
+        parser.error(f"{args.command} reads and writes files on the database server, so it is not available "
+                     "with the http backend; run it on the API server")
+
+    with repository.open_repository(args.backend, config) as repo:
+        try:
+            report = args.func(repo, args)
+        except (repo.Error, ValueError, OSError) as e:
+            print(f"{args.command} failed: {e}", file=sys.stderr)
+            return 1
+
+    # Exports may be writing CSV to stdout; their report goes to stderr instead
+    out = sys.stderr if args.command == "export" and args.output == "-" else sys.stdout
+    if report is not None and not (out is sys.stderr and args.quiet):
+        print(json.dumps(report, indent=4, default=str), file=out)
+    if args.instrument:
+        print(instrumentation.format_summary(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (ROOT, os.path.join(ROOT, 'pyqt')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import operations  # noqa: E402
+from db.schema import migrate  # noqa: E402
+
+
+@pytest.fixture
+def school_db(tmp_path, monkeypatch):
+    """
+    A migrated SQLite database that `operations` uses for the test.
+    """
+    path = str(tmp_path / 'school.db')
+    migrate(path)
+    monkeypatch.setattr(operations, 'DB_PATH', path)
+    return path
@@ -0,0 +1,113 @@
+import asyncio
+import contextlib
+import json
+import threading
+
+import pytest
+
+import api_service
+import repository
+
+
+def post(service, path, body):
+    request = api_service.Request("POST", path, {}, json.dumps(body).encode())
+    response, _ = asyncio.run(service.handle(request))
+    return response.status, json.loads(response.body)
+
+
+def test_writes_are_validated(tmp_path):
+    config = repository.load_config()
+    config["sqlite"]["path"] = str(tmp_path / "school.db")
+    pool = api_service.RepositoryPool(api_service.open_repositories(config, "sqlite", 1))
+    try:
+        service = api_service.ApiService(pool, 0)
+        status, body = post(service, "/students", {"student_id": "S1", "name": "Cy", "age": "notanage",
+                                                   "email": "cy@school.edu"})
+        assert status == 400
+        assert list(body["fields"]) == ["age"]
+
+        status, body = post(service, "/students/batch", {"rows": [["S2", "Di", "21", "di@school.edu"],
+                                                                  ["S3", "Ed", "22", "ed@school"]]})
+        assert status == 400
+        assert body["rows"] == [{"row": 1, "fields": {"email": "Invalid email format."}}]
+
+        assert post(service, "/students", {"student_id": "S1", "name": "Cy", "age": "20",
+                                           "email": "cy@school.edu"})[0] == 201
+        assert pool.repos[0].counts()["students"] == 1
+    finally:
+        pool.close()
+
+
+def test_serve_runs_outside_the_main_thread(tmp_path, monkeypatch):
+    config = repository.load_config()
+    config["sqlite"]["path"] = str(tmp_path / "school.db")
+    closed = []
+    monkeypatch.setattr(api_service.RepositoryPool, "close",
+                        lambda pool, close=api_service.RepositoryPool.close: closed.append(close(pool)))
+    addresses = []
+
+    def run():
+        async def main():
+            task = asyncio.create_task(api_service.serve(config, "sqlite", "127.0.0.1", 0, 1, 0,
+                                                         ready=addresses.append))
+            while not addresses and not task.done():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        asyncio.run(main())
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    thread.join(30)
+    assert addresses
+    assert closed
+
+
+def test_maintenance_runs_on_the_service(tmp_path):
+    config = repository.load_config()
+    config["sqlite"]["path"] = str(tmp_path / "school.db")
+    addresses = []
+    stop = threading.Event()
+
+    def run():
+        async def main():
+            task = asyncio.create_task(api_service.serve(config, "sqlite", "127.0.0.1", 0, 1, 0,
+                                                         ready=addresses.append))
+            while not stop.is_set() and not task.done():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        asyncio.run(main())
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    try:
+        while not addresses and thread.is_alive():
+            thread.join(0.01)
+        host, port = addresses[0]
+        with repository.HttpRepository(f"http://{host}:{port}") as repo:
+            repo.vacuum()
+            repo.analyze()
+            with pytest.raises(repository.ServiceError):
+                repo.backup(str(tmp_path / "copy.db"))
+    finally:
+        stop.set()
+        thread.join(30)
+
+
+def test_cli_rejects_backups_over_http(capsys):
+    import school_cli
+
+    with pytest.raises(SystemExit) as exit_info:
+        school_cli.main(["--backend", "http", "backup", "copy.db"])
+    assert exit_info.value.code == 2
+    assert "run it on the API server" in capsys.readouterr().err
+
+
+def test_unsupported_capacity_is_a_bad_request():
+    service = api_service.ApiService(None, 0)
+    response = service.error_response(ValueError(repository.CAPACITY_UNSUPPORTED))
+    assert response.status == 400
+    assert json.loads(response.body)["error"] == repository.CAPACITY_UNSUPPORTED
@@ -0,0 +1,25 @@
+import pytest
+
+import operations
+from enrollment import ENROLLED
+
+
+def test_retry_with_string_ids_returns_first_outcome(school_db):
+    student = operations.add_student("S1", "Cy", 20, "cy@school.edu")
+    course = operations.add_course("C1", "Algebra", capacity=1)
+
+    first = operations.enroll_student(str(student), str(course), request_key="k")
+    retry = operations.enroll_student(str(student), str(course), request_key="k")
+
+    assert first.status == retry.status == ENROLLED
+    assert operations.get_course_stats()[0][3] == 1
+
+
+def test_request_key_reused_for_another_course(school_db):
+    student = operations.add_student("S1", "Cy", 20, "cy@school.edu")
+    first = operations.add_course("C1", "Algebra")
+    second = operations.add_course("C2", "Biology")
+    operations.enroll_student(student, first, request_key="k")
+
+    with pytest.raises(ValueError):
+        operations.enroll_student(str(student), str(second), request_key="k")
@@ -0,0 +1,33 @@
+import pytest
+
+import repository
+
+
+def test_sqlite_deletes_remove_registrations_and_assignments(tmp_path):
+    with repository.SQLiteRepository(str(tmp_path / "school.db")) as repo:
+        course = repo.add_course("C1", "Algebra")
+        other = repo.add_course("C2", "Biology")
+        student = repo.add_student("S1", "Cy", 20, "cy@school.edu", course_key=course)
+        instructor = repo.add_instructor("I1", "Ada", 40, "ada@school.edu", course_key=course)
+        repo.assign(instructor, other)
+        assert repo.counts() == {"students": 1, "instructors": 1, "courses": 2, "registrations": 1,
+                                 "assignments": 2}
+
+        repo.delete_course(course)
+        assert repo.counts()["registrations"] == 0
+        assert repo.counts()["assignments"] == 1
+
+        repo.delete_instructor(instructor)
+        assert repo.counts()["assignments"] == 0
+        repo.delete_student(student)
+        assert repo.counts() == {"students": 0, "instructors": 0, "courses": 1, "registrations": 0,
+                                 "assignments": 0}
+
+
+def test_incomplete_backend_cannot_be_created():
+    class Partial(repository.Repository):
+        def students(self):
+            return []
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+
+import pytest
+
+from db import snapshot
+
+
+def test_failed_copy_removes_partial_file(tmp_path, monkeypatch):
+    source = str(tmp_path / "school.db")
+    sqlite3.connect(source).close()
+    target = str(tmp_path / "snapshot.db")
+
+    def failing_copy(source, temp_path, pages, pause):
+        with open(temp_path, "wb") as f:
+            f.write(b"half a page")
+        raise OSError("disk full")
+
+    monkeypatch.setattr(snapshot, "_copy", failing_copy)
+    with pytest.raises(OSError):
+        snapshot.take_snapshot(source, target)
+    assert os.listdir(tmp_path) == ["school.db"]
+
+
+def test_missing_source_is_not_created(tmp_path):
+    source = str(tmp_path / "missing.db")
+    with pytest.raises(sqlite3.OperationalError):
+        snapshot.take_snapshot(source, str(tmp_path / "snapshot.db"))
+    assert os.listdir(tmp_path) == []
+
+
+def test_snapshot_of_a_wal_database(tmp_path):
+    source = str(tmp_path / "school.db")
+    conn = sqlite3.connect(source)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE t (x)")
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    target = str(tmp_path / "snapshot.db")
+    try:
+        assert snapshot.take_snapshot(source, target)["integrity"] is True
+    finally:
+        conn.close()
+    copy = sqlite3.connect(target)
+    assert copy.execute("SELECT x FROM t").fetchall() == [(1,)]
+    copy.close()
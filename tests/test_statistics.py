@@ -0,0 +1,48 @@
+import sqlite3
+
+import operations
+
+
+def assignments(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute("SELECT instructor_id, course_id FROM instructor_assignments ORDER BY 1, 2").fetchall()
+
+
+def test_deleting_course_and_instructor_updates_statistics(school_db):
+    first = operations.add_instructor("I1", "Ada", 40, "ada@school.edu")
+    second = operations.add_instructor("I2", "Bob", 50, "bob@school.edu")
+    c1 = operations.add_course("C1", "Algebra")
+    c2 = operations.add_course("C2", "Biology")
+    student = operations.add_student("S1", "Cy", 20, "cy@school.edu")
+    operations.enroll_student(student, c1)
+    operations.enroll_student(student, c2)
+    for instructor in (first, second):
+        operations.assign_instructor(instructor, c1)
+        operations.assign_instructor(instructor, c2)
+
+    operations.delete_course(c1)
+    assert [row[3:5] for row in operations.get_instructor_stats()] == [(1, 1), (1, 1)]
+    assert assignments(school_db) == [(first, c2), (second, c2)]
+
+    operations.delete_instructor(first)
+    assert [(row[0], row[4]) for row in operations.get_course_stats()] == [(c2, 1)]
+    assert [row[0] for row in operations.get_instructor_stats()] == [second]
+    assert assignments(school_db) == [(second, c2)]
+
+
+def test_migration_drops_orphaned_assignments(tmp_path):
+    from db.schema import migrate
+
+    path = str(tmp_path / "old.db")
+    migrate(path, target=6)
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO instructors (instructor_id, name, age, email) VALUES ('I1', 'Ada', 40, 'a@x.edu')")
+        conn.execute("INSERT INTO courses (course_id, course_name) VALUES ('C1', 'Algebra')")
+        conn.execute("INSERT INTO courses (course_id, course_name) VALUES ('C2', 'Biology')")
+        conn.execute("INSERT INTO instructor_assignments (instructor_id, course_id) VALUES (1, 1), (1, 2)")
+        # What delete_course used to do
+        conn.execute("DELETE FROM courses WHERE id = 1")
+    migrate(path)
+    assert assignments(path) == [(1, 2)]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT course_count FROM instructor_stats").fetchall() == [(1,)]
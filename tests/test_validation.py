@@ -0,0 +1,39 @@
+import pytest
+
+import validation
+
+
+@pytest.mark.parametrize("age", ["²", "٢٠", "２０", "-3", "abc", "151", ""])
+def test_single_and_batch_reject_the_same_ages(age):
+    with pytest.raises(validation.ValidationError):
+        validation.validate_age(age)
+    assert validation.validate_batch(ages=[age]).error_count == 1
+
+
+def test_ascii_ages_are_accepted():
+    assert validation.validate_age(" 20 ") == 20
+    assert validation.validate_batch(ages=["20", 30]).error_count == 0
+
+
+def test_bools_are_not_ages():
+    with pytest.raises(validation.ValidationError):
+        validation.validate_age(True)
+    result = validation.validate_batch(ages=[True, 25])
+    assert list(result.masks["age"]) == [True, False]
+    assert list(result.ages) == [0, 25]
+
+
+@pytest.mark.parametrize("ages, expected", [
+    ([25.0, "30"], [25, 30]),
+    (["0025", "007"], [25, 7]),
+    ([25.5, 2e300, float("nan")], [0, 0, 0]),
+])
+def test_batch_agrees_with_validate_age(ages, expected):
+    single = []
+    for age in ages:
+        try:
+            single.append(validation.validate_age(age))
+        except validation.ValidationError:
+            single.append(0)
+    assert single == expected
+    assert list(validation.validate_batch(ages=ages).ages) == expected
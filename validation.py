@@ -0,0 +1,314 @@
+import re
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the batch API falls back to plain lists.
+    np = None
+
+# Ages accepted for students and instructors.
+MIN_AGE = 1
+MAX_AGE = 150
+
+# Precompiled once; used for single emails and whole columns alike.
+EMAIL_PATTERN = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+
+# Messages for each kind of error, keyed by field.
+MESSAGES = {
+    "id": "ID is required.",
+    "name": "Name is required.",
+    "age": f"Age must be a whole number between {MIN_AGE} and {MAX_AGE}.",
+    "email": "Invalid email format.",
+}
+
+
+class ValidationError(ValueError):
+    """
+    Raised by the single-record validators.
+
+    Attributes:
+        field (str): The field that failed ("id", "name", "age" or "email").
+    """
+
+    def __init__(self, field, message=None):
+        super().__init__(message or MESSAGES[field])
+        self.field = field
+
+
+# ----------------- Single-record API -----------------
+
+def validate_age(age):
+    """
+    Validates an age typed into a form.
+
+    Args:
+        age (str, int or float): The age, as entered. Floats must be whole numbers.
+
+    Returns:
+        int: The age as an integer.
+
+    Raises:
+        ValidationError: If the age is not a whole number between MIN_AGE and MAX_AGE.
+    """
+    if isinstance(age, float) and age.is_integer():
+        age = int(age)
+    text = str(age).strip()
+    # isdigit() alone also accepts non-ASCII digits ('²', '٢'), which _age_mask rejects
+    if not (text.isascii() and text.isdigit()) or not MIN_AGE <= int(text) <= MAX_AGE:
+        raise ValidationError("age")
+    return int(text)
+
+
+def is_valid_email(email):
+    """
+    Checks an email address against EMAIL_PATTERN.
+
+    Args:
+        email (str): The email address.
+
+    Returns:
+        bool: True if the address is well formed.
+    """
+    return isinstance(email, str) and EMAIL_PATTERN.fullmatch(email.strip()) is not None
+
+
+def validate_email(email):
+    """
+    Validates an email address typed into a form.
+
+    Args:
+        email (str): The email address, as entered.
+
+    Returns:
+        str: The address without surrounding whitespace.
+
+    Raises:
+        ValidationError: If the address is not well formed.
+    """
+    if not is_valid_email(email):
+        raise ValidationError("email", f"Invalid email format: {email}")
+    return email.strip()
+
+
+def validate_person(person_id, name, age, email):
+    """
+    Validates all fields of a student or instructor at once.
+
+    Args:
+        person_id (str): The student or instructor ID.
+        name (str): The full name.
+        age (str or int): The age.
+        email (str): The email address.
+
+    Returns:
+        dict: Field name to error message for every invalid field; empty if
+        the record is valid.
+    """
+    errors = {}
+    if not str(person_id or "").strip():
+        errors["id"] = MESSAGES["id"]
+    if not str(name or "").strip():
+        errors["name"] = MESSAGES["name"]
+    try:
+        validate_age(age)
+    except ValidationError as e:
+        errors["age"] = str(e)
+    if not is_valid_email(email):
+        errors["email"] = MESSAGES["email"]
+    return errors
+
+
+# ----------------- Batch API -----------------
+
+class BatchResult:
+    """
+    Outcome of validating whole columns of records.
+
+    The masks are NumPy boolean arrays when NumPy is installed and lists of
+    bools otherwise; True marks a row whose field is invalid.
+
+    Attributes:
+        masks (dict): Field name to error mask, for every field validated.
+        invalid: Rows with at least one error.
+        ages: The parsed ages (0 where the age is invalid), or None if ages
+            were not validated.
+    """
+
+    def __init__(self, masks, ages):
+        self.masks = masks
+        self.ages = ages
+        columns = list(masks.values())
+        if np is not None:
+            self.invalid = np.logical_or.reduce(columns) if columns else np.zeros(0, dtype=bool)
+        else:
+            self.invalid = [any(flags) for flags in zip(*columns)]
+
+    def __len__(self):
+        return len(self.invalid)
+
+    @property
+    def error_count(self):
+        """int: Number of rows with at least one error."""
+        if np is not None:
+            return int(np.count_nonzero(self.invalid))
+        return sum(self.invalid)
+
+    def error_rows(self):
+        """
+        Returns the indexes of the rows with errors.
+
+        Returns:
+            list: Row indexes, in order.
+        """
+        if np is not None:
+            return np.flatnonzero(self.invalid).tolist()
+        return [row for row, invalid in enumerate(self.invalid) if invalid]
+
+    def errors(self, row):
+        """
+        Returns the error messages of one row.
+
+        Args:
+            row (int): The row index.
+
+        Returns:
+            dict: Field name to error message; empty if the row is valid.
+        """
+        return {field: MESSAGES[field] for field, mask in self.masks.items() if mask[row]}
+
+
+def _column_kind(ages):
+    """
+    Returns "i", "f" or "U" if every age is an int, a float or a string
+    respectively, or "O" for bools and mixed or other columns.
+    """
+    if isinstance(ages, np.ndarray) and ages.dtype.kind != "O":
+        return {"u": "i", "S": "O"}.get(ages.dtype.kind, ages.dtype.kind)
+    types = set(map(type, ages))
+    # bool is a subclass of int, but True is not an age
+    if any(issubclass(t, (bool, np.bool_)) for t in types):
+        return "O"
+    for kind, accepted in (("i", (int, np.integer)), ("f", (float, np.floating)), ("U", str)):
+        if all(issubclass(t, accepted) for t in types):
+            return kind
+    return "O"
+
+
+def _age_mask_per_item(ages):
+    """
+    Validates ages one at a time with `validate_age`; returns (error mask, parsed ages).
+    """
+    parsed = []
+    for age in ages:
+        try:
+            parsed.append(validate_age(age))
+        except ValidationError:
+            parsed.append(0)
+    if np is None:
+        return [value == 0 for value in parsed], parsed
+    parsed = np.array(parsed, dtype=np.int64)
+    return parsed == 0, parsed
+
+
+def _age_mask(ages):
+    """
+    Validates a column of ages; returns (error mask, parsed ages).
+
+    Columns of only ints, only floats or only strings are checked with array
+    operations; bools and mixed columns go through `validate_age` one by one,
+    so both APIs accept exactly the same ages.
+    """
+    if np is None:
+        return _age_mask_per_item(ages)
+
+    kind = _column_kind(ages)
+    if kind == "i":
+        column = np.asarray(ages)
+        if column.dtype.kind not in "iu":
+            # Too large for int64 (NumPy fell back to objects)
+            return _age_mask_per_item(ages)
+        values = column.astype(np.int64)
+        valid = np.ones(len(column), dtype=bool)
+    elif kind == "f":
+        column = np.asarray(ages, dtype=np.float64)
+        with np.errstate(invalid="ignore"):
+            valid = np.isfinite(column) & (np.mod(column, 1) == 0) & (np.abs(column) <= MAX_AGE)
+        values = np.where(valid, column, 0).astype(np.int64)
+    elif kind == "U":
+        # Only strings of at most `width` ASCII digits (after any leading
+        # zeros) can be valid, so each one is read as `width` code points and
+        # turned into a number with array arithmetic, which is much faster
+        # than NumPy's string-to-integer conversion.
+        width = len(str(MAX_AGE))
+        text = np.char.lstrip(np.char.strip(np.asarray(ages, dtype=str)), "0")
+        short = np.char.str_len(text) <= width
+        codes = text.astype(f"U{width}").view(np.uint32).reshape(-1, width).astype(np.int64)
+        present = codes != 0
+        digits = (codes >= ord("0")) & (codes <= ord("9"))
+        valid = short & present[:, 0] & np.all(digits | ~present, axis=1)
+        values = np.zeros(len(text), dtype=np.int64)
+        for position in range(width):
+            values = np.where(present[:, position], values * 10 + codes[:, position] - ord("0"), values)
+    else:
+        return _age_mask_per_item(ages)
+    valid &= (values >= MIN_AGE) & (values <= MAX_AGE)
+    return ~valid, np.where(valid, values, 0)
+
+
+def _email_mask(emails):
+    """
+    Validates a column of emails; returns the error mask.
+    """
+    match = EMAIL_PATTERN.fullmatch
+    flags = (not (isinstance(email, str) and match(email.strip())) for email in emails)
+    if np is None:
+        return list(flags)
+    return np.fromiter(flags, dtype=bool, count=len(emails))
+
+
+def _required_mask(values):
+    """
+    Flags empty values in a column of required text.
+    """
+    flags = (not str(value or "").strip() for value in values)
+    if np is None:
+        return list(flags)
+    return np.fromiter(flags, dtype=bool, count=len(values))
+
+
+def validate_batch(ages=None, emails=None, ids=None, names=None):
+    """
+    Validates whole columns of records at once, e.g. for bulk imports.
+
+    Numeric checks on the ages are vectorized with NumPy when it is installed;
+    emails are matched with the precompiled EMAIL_PATTERN. Columns that are
+    given must all have the same length.
+
+    Args:
+        ages (sequence, optional): Ages as numbers or strings.
+        emails (sequence, optional): Email addresses.
+        ids (sequence, optional): Student or instructor IDs (must not be empty).
+        names (sequence, optional): Names (must not be empty).
+
+    Returns:
+        BatchResult: Per-field error masks, the combined invalid mask and the
+        parsed ages.
+
+    Raises:
+        ValueError: If the columns have different lengths.
+    """
+    columns = {"id": ids, "name": names, "age": ages, "email": emails}
+    lengths = {len(column) for column in columns.values() if column is not None}
+    if len(lengths) > 1:
+        raise ValueError("All columns must have the same length")
+
+    masks = {}
+    parsed_ages = None
+    if ids is not None:
+        masks["id"] = _required_mask(ids)
+    if names is not None:
+        masks["name"] = _required_mask(names)
+    if ages is not None:
+        masks["age"], parsed_ages = _age_mask(ages)
+    if emails is not None:
+        masks["email"] = _email_mask(emails)
+    return BatchResult(masks, parsed_ages)